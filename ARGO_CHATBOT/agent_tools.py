@@ -36,7 +36,8 @@ def query_ocean_data(
 
     This is the primary tool for AI agents. It converts the question into SQL,
     executes it against the PostgreSQL database, and returns structured results
-    with an AI-generated summary.
+    with an English summary rendered from the computed figures (no second LLM
+    call; see summary_templates).
 
     Args:
         question (str):
@@ -55,7 +56,7 @@ def query_ocean_data(
     Returns:
         dict with keys:
             success (bool)       — True if query succeeded.
-            answer  (str)        — Concise AI-generated English summary.
+            answer  (str)        — Concise English summary of the figures.
             data    (list[dict]) — Tabular results, each row as a dict.
             chart_type (str)     — Suggested chart type: "line", "bar",
                                    "scatter", "map", "profile", "table".
@@ -77,7 +78,7 @@ def query_ocean_data(
         if engine is None:
             engine = get_engine()
 
-        response = get_intelligent_answer(question)
+        response = get_intelligent_answer(question, llm_summary=False)
 
         # Enforce row cap
         if isinstance(response.get("data"), list) and len(response["data"]) > max_rows:
@@ -122,7 +123,9 @@ def build_and_validate_sql(intent: dict, db_context: dict, engine=None) -> dict:
     Returns:
         dict with keys:
             success (bool)   — True if SQL was generated and passed safety checks.
-            sql     (str)    — The generated SQL statement.
+            sql     (str)    — The generated SQL statement, values inlined.
+            template (str)   — The same statement with :name bind markers.
+            params  (dict)   — Bind values for `template`.
             safe    (bool)   — True if the SQL passed the safety sanitizer.
             blocked_reason (str | None)
                              — If `safe` is False, explains why the query was blocked.
@@ -142,7 +145,9 @@ def build_and_validate_sql(intent: dict, db_context: dict, engine=None) -> dict:
         safety = validate_sql_safety(sql)
         return {
             "success": safety["safe"],
-            "sql": sql,
+            "sql": sql.render() if hasattr(sql, "render") else sql,
+            "template": str(sql),
+            "params": getattr(sql, "params", {}),
             "safe": safety["safe"],
             "blocked_reason": safety.get("reason"),
             "error": None if safety["safe"] else safety["reason"],
@@ -170,6 +175,9 @@ def validate_sql_safety(sql: str) -> dict:
                           — If `safe` is False, a human-readable explanation
                             of which rule was violated.
             checks (dict) — Individual check results for transparency.
+            sql    (str | None)
+                          — The SQL to run: unchanged, or with LIMIT added
+                            when it returns rows without one.
     """
     from sql_sanitizer import SQLSanitizer
     return SQLSanitizer.validate(sql)
@@ -183,6 +191,9 @@ def parse_query_intent(question: str) -> dict:
       1. Parse intent → inspect / override fields.
       2. Pass to `build_and_validate_sql` → execute.
 
+    Common question shapes are parsed by rules without an LLM call (see
+    intent_rules); the rest go to the LLM.
+
     Args:
         question (str): Plain-English question about ARGO ocean data.
 
@@ -191,6 +202,7 @@ def parse_query_intent(question: str) -> dict:
             success     (bool)
             intent      (dict) — Structured intent (query_type, metrics, etc.)
             complexity  (str)  — "simple" or "complex"
+            source      (str)  — "rules", "llm" or "fallback" (rules after an unusable LLM reply)
             error       (str | None)
 
     Intent fields:
@@ -208,12 +220,19 @@ def parse_query_intent(question: str) -> dict:
         distance_km  (float)    — Radius for proximity queries (default 500)
     """
     try:
-        from brain import classify_query_complexity, _fallback_intent_parser, get_llm, INTENT_PARSER_PROMPT
+        from brain import classify_query_complexity, _fallback_intent_parser, get_llm, INTENT_PARSER_PROMPT, LOCATIONS
         from langchain_core.prompts import PromptTemplate
         from langchain_core.output_parsers import StrOutputParser
+        import intent_rules
 
         complexity = classify_query_complexity(question)
 
+        rules = intent_rules.parse(question, LOCATIONS)
+        if intent_rules.is_enabled() and rules.confidence >= intent_rules.min_confidence():
+            return {"success": True, "intent": rules.intent, "complexity": complexity, "source": "rules",
+                    "error": None}
+
+        source = "llm"
         try:
             llm = get_llm(query_complexity=complexity)
             prompt = PromptTemplate.from_template(INTENT_PARSER_PROMPT)
@@ -223,9 +242,9 @@ def parse_query_intent(question: str) -> dict:
             raw = raw.strip().lstrip("```json").lstrip("```").rstrip("```").strip()
             intent = json.loads(raw)
         except Exception:
-            intent = _fallback_intent_parser(question)
+            intent, source = _fallback_intent_parser(question), "fallback"
 
-        return {"success": True, "intent": intent, "complexity": complexity, "error": None}
+        return {"success": True, "intent": intent, "complexity": complexity, "source": source, "error": None}
 
     except Exception as exc:
         return {"success": False, "intent": {}, "complexity": "unknown", "error": str(exc)}
@@ -268,6 +287,30 @@ def get_floats_near_location(
         >>> for f in result["data"]:
         ...     print(f["float_id"], f["distance_km"], "km away")
     """
+    start = time.time()
+    limit = min(int(limit or 10), 100)
+    if latitude is None or longitude is None:
+        from sql_builder import LOCATION_CENTERS
+        latitude, longitude = LOCATION_CENTERS.get((location_name or "").strip().lower(), (latitude, longitude))
+    if latitude is not None and longitude is not None:
+        # Fast path: latest positions from the memory-mapped fleet snapshot
+        import fleet_snapshot
+        df = fleet_snapshot.nearest(float(latitude), float(longitude), radius_km, limit,
+                                    metrics=["temperature", "salinity"])
+        if df is not None:
+            df["timestamp"] = df["timestamp"].dt.strftime("%Y-%m-%d %H:%M:%S")
+            data = df.astype(object).where(df.notna(), None).to_dict(orient="records")
+            return {
+                "success": True,
+                "query_type": "Proximity",
+                "chart_type": "map",
+                "data": data,
+                "record_count": len(data),
+                "source": "fleet_snapshot",
+                "elapsed_ms": round((time.time() - start) * 1000, 3),
+                "error": None,
+            }
+
     question = _build_proximity_question(location_name, latitude, longitude, radius_km, limit)
     return query_ocean_data(question)
 
@@ -338,47 +381,82 @@ def get_database_stats(engine=None) -> dict:
     Returns:
         dict with keys:
             success         (bool)
-            total_records   (int)   — Approximate total rows in argo_data.
+            total_records   (int)   — Total rows in argo_data.
             unique_floats   (int)   — Count of distinct float WMO IDs.
             date_range      (dict)  — {"min": ISO date, "max": ISO date}
-            avg_temperature (float) — Global average surface temperature (°C).
-            avg_salinity    (float) — Global average salinity (PSU).
+            avg_temperature (float) — Mean temperature over all measurements (°C).
+            avg_salinity    (float) — Mean salinity over all measurements (PSU).
+            region_records  (dict)  — Row counts per named ocean region.
             error           (str | None)
     """
     try:
-        from brain import get_engine, get_database_context
+        from brain import get_engine
+        import dataset_stats
         if engine is None:
             engine = get_engine()
-        ctx = get_database_context(engine)
-        if not ctx:
-            return {"success": False, "error": "Database empty or unreachable."}
-
-        from sqlalchemy import text
-        with engine.connect() as conn:
-            row = conn.execute(text("""
-                SELECT COUNT(*) as total,
-                       COUNT(DISTINCT float_id) as floats,
-                       ROUND(AVG("temperature")::numeric, 2) as avg_temp,
-                       ROUND(AVG("salinity")::numeric,    2) as avg_sal
-                FROM (SELECT * FROM argo_data LIMIT 500000) sample
-            """)).fetchone()
+
+        # Exact, incrementally maintained counters — a single small-table read
+        stats = dataset_stats.read_stats(engine)
+        if not stats:
+            return {
+                "success": False,
+                "error": "Dataset statistics not built. Run: python bulk_fetch.py --rebuild-stats",
+            }
 
         return {
             "success": True,
-            "total_records": row[0],
-            "unique_floats": row[1],
+            "total_records": stats["total_records"],
+            "unique_floats": stats["unique_floats"],
             "date_range": {
-                "min": str(ctx["min_date"]),
-                "max": str(ctx["max_date"]),
+                "min": stats["min_date"],
+                "max": stats["max_date"],
             },
-            "avg_temperature": float(row[2]) if row[2] else None,
-            "avg_salinity":    float(row[3]) if row[3] else None,
+            "avg_temperature": stats["avg_temperature"],
+            "avg_salinity":    stats["avg_salinity"],
+            "region_records":  stats["regions"],
             "error": None,
         }
     except Exception as exc:
         return {"success": False, "error": str(exc)}
 
 
+def get_schema(engine=None) -> dict:
+    """
+    Describe the ``argo_data`` table: columns, indexes and row estimate.
+
+    Served from the shared schema catalog (schema_catalog.py), the same
+    cached copy the query builder uses, so calling it costs no database
+    round-trip once the catalog is loaded.
+
+    Args:
+        engine: SQLAlchemy engine (optional; created from env if None).
+
+    Returns:
+        dict with keys:
+            success      (bool)
+            table        (str)        — Always "argo_data".
+            columns      (dict)       — Column name → SQL data type.
+            indexes      (dict)       — Index name → definition.
+            row_estimate (int | None) — Planner's row count estimate.
+            error        (str | None)
+    """
+    try:
+        import schema_catalog
+        if engine is None:
+            from brain import get_engine
+            engine = get_engine()
+
+        catalog = schema_catalog.get_catalog(engine)
+        if not catalog.exists:
+            return {"success": False, "error": "Table argo_data does not exist."}
+
+        schema = catalog.to_dict()
+        schema.pop("data_version")
+        return {"success": True, **schema, "error": None}
+    except Exception as exc:
+        return {"success": False, "error": str(exc)}
+
+
 # ─────────────────────────────────────────────────────────────────────────────
 # INTERNAL HELPERS
 # ─────────────────────────────────────────────────────────────────────────────
@@ -453,8 +531,8 @@ def get_tool_manifest() -> dict:
                     "Ask a natural-language question about ARGO ocean float "
                     "data. Converts the question into safe, read-only SQL, "
                     "executes it against the PostgreSQL/CockroachDB database, "
-                    "and returns structured JSON with tabular data, an AI-"
-                    "generated English summary, suggested chart type, and "
+                    "and returns structured JSON with tabular data, an "
+                    "English summary of the figures, suggested chart type, and "
                     "the executed SQL for transparency."
                 ),
                 "inputSchema": {
@@ -597,6 +675,21 @@ def get_tool_manifest() -> dict:
                     "required": [],
                 },
             },
+            # ── Table schema ────────────────────────────────────────────
+            {
+                "name": "get_schema",
+                "description": (
+                    "Describe the argo_data table — column names and SQL "
+                    "types, indexes, and the estimated row count. Useful "
+                    "for checking which variables (e.g. dissolved oxygen, "
+                    "chlorophyll) exist before asking about them."
+                ),
+                "inputSchema": {
+                    "type": "object",
+                    "properties": {},
+                    "required": [],
+                },
+            },
             # ── Intent parser (advanced) ────────────────────────────────
             {
                 "name": "parse_query_intent",
@@ -6,6 +6,9 @@ This is the main chat interface - for data management, use DATA_GENERATOR/app.py
 
 import os
 import json
+import logging
+import queue
+import threading
 import time
 from functools import wraps
 from flask import Flask, jsonify, request, send_from_directory, Response, stream_with_context
@@ -18,9 +21,10 @@ from pathlib import Path
 
 # Import the brain module for intelligent queries
 try:
-    from brain import get_intelligent_answer
+    from brain import get_intelligent_answer, QueryCancelled
 except ImportError:
     get_intelligent_answer = None
+    QueryCancelled = None
 
 # Predefined locations for search queries
 LOCATIONS = {
@@ -290,16 +294,10 @@ def health_check():
             
             # Check if argo_data table exists and has data
             try:
-                with engine.connect() as conn:
-                    result = conn.execute(text("""
-                        SELECT EXISTS (
-                            SELECT 1 FROM information_schema.tables 
-                            WHERE table_name = 'argo_data'
-                        )
-                    """)).fetchone()
-                    table_exists = result[0] if result else False
-                    
-                    if table_exists:
+                import schema_catalog
+                table_exists = schema_catalog.table_exists(engine)
+                if table_exists:
+                    with engine.connect() as conn:
                         count_result = conn.execute(text("SELECT COUNT(*) FROM argo_data LIMIT 1")).fetchone()
                         record_count = count_result[0] if count_result else 0
             except Exception as e:
@@ -376,12 +374,19 @@ def get_status():
 @app.route('/api/stats')
 @cached()  # Uses CACHE_TTLS['get_stats'] = 120s
 def get_stats():
-    """Get database statistics for dashboard - OPTIMIZED with sampling."""
+    """Get database statistics for dashboard - O(1) read of dataset_stats."""
     engine = get_db_engine()
     
     if not engine:
         return jsonify({"error": "Database not connected"}), 500
     
+    # Exact counters maintained by every ingest writer (dataset_stats.py)
+    import dataset_stats
+    stats = dataset_stats.read_stats(engine)
+    if stats:
+        return jsonify(stats)
+    
+    # Fallback for databases without dataset_stats yet: sampled estimates
     try:
         with engine.connect() as conn:
             # OPTIMIZATION: Use approximate count for huge tables (CockroachDB compatible)
@@ -470,6 +475,21 @@ def cache_query_result(query: str, result: dict):
             _query_cache.pop(oldest, None)
             _query_cache_expiry.pop(oldest, None)
 
+def _parse_zoom(value):
+    """Web-map zoom level (0-22) from a request value, or None."""
+    try:
+        return None if value in (None, '') else min(max(float(value), 0.0), 22.0)
+    except (TypeError, ValueError):
+        return None
+
+def _parse_flag(value):
+    """True/False from a JSON boolean or a query-string value, or None when absent."""
+    if value in (None, ''):
+        return None
+    if isinstance(value, bool):
+        return value
+    return str(value).lower() in ('1', 'true', 'yes')
+
 @app.route('/api/query', methods=['GET', 'POST'])
 def handle_query():
     """Handle natural language queries using AI - with intelligent caching."""
@@ -479,23 +499,34 @@ def handle_query():
     # Support both GET (from map) and POST (from chat)
     if request.method == 'GET':
         user_query = request.args.get('question', '') or request.args.get('query', '')
+        zoom = request.args.get('zoom')
+        llm_summary = request.args.get('llm_summary')
     else:
         data = request.get_json() or {}
         user_query = data.get('query', '') or data.get('question', '')
+        zoom = data.get('zoom')
+        llm_summary = data.get('llm_summary')
     
     if not user_query:
         return jsonify({"error": "No query provided"}), 400
+    # Optional map zoom: trajectories are simplified to what is visible at it
+    zoom = _parse_zoom(zoom)
+    # Optional LLM-written answer (default: template answer, or LLM_SUMMARY_ENABLED)
+    llm_summary = _parse_flag(llm_summary)
+    cache_key = user_query if zoom is None else f"{user_query} @zoom {zoom}"
+    if llm_summary is not None:
+        cache_key += f" @llm_summary {llm_summary}"
     
     # Check query cache first for instant response on repeated questions
-    cached_result = get_cached_query(user_query)
+    cached_result = get_cached_query(cache_key)
     if cached_result:
         cached_result['cached'] = True  # Mark as cached response
         return jsonify(cached_result)
     
     try:
-        response = get_intelligent_answer(user_query)
+        response = get_intelligent_answer(user_query, zoom=zoom, llm_summary=llm_summary)
         # Cache successful responses
-        cache_query_result(user_query, response)
+        cache_query_result(cache_key, response)
         return jsonify(response)
     except Exception as e:
         import traceback
@@ -503,36 +534,80 @@ def handle_query():
         print(f"Query error: {error_detail}")
         return jsonify({"error": str(e), "detail": error_detail}), 500
 
-@app.route('/api/query/stream', methods=['POST'])
+# Seconds between SSE keep-alive comments; each one also notices a closed client
+STREAM_HEARTBEAT_SECONDS = 1.0
+
+def _sse(kind, payload):
+    """One server-sent event; the frontend switches on its ``type``."""
+    return f"data: {json.dumps({'type': kind, **payload}, default=str)}\n\n"
+
+@app.route('/api/query/stream', methods=['GET', 'POST'])
 def handle_query_stream():
-    """Handle natural language queries with streaming response."""
+    """
+    Answer a query as server-sent events, each sent as soon as it is ready:
+
+        start → intent → sql → data → insights → chunk… → done
+
+    ``chunk`` events carry the summary: LLM tokens as they arrive when the
+    LLM summary is on, otherwise the template answer in one piece. ``done``
+    carries the full response (as /api/query returns it); ``error`` replaces
+    it on failure. When the client disconnects, the query stops at its next
+    step (before the SQL runs, between summary tokens).
+    """
     if not get_intelligent_answer:
         return jsonify({"error": "AI module not available"}), 500
     
-    data = request.get_json()
-    user_query = data.get('query', '')
+    if request.method == 'GET':
+        user_query = request.args.get('question', '') or request.args.get('query', '')
+        zoom = request.args.get('zoom')
+        llm_summary = request.args.get('llm_summary')
+    else:
+        data = request.get_json(silent=True) or {}
+        user_query = data.get('query', '') or data.get('question', '')
+        zoom = data.get('zoom')
+        llm_summary = data.get('llm_summary')
     
     if not user_query:
         return jsonify({"error": "No query provided"}), 400
-    
-    def generate():
+    zoom = _parse_zoom(zoom)
+    llm_summary = _parse_flag(llm_summary)
+
+    events = queue.Queue()
+    cancelled = threading.Event()
+
+    def on_event(kind, payload):
+        if cancelled.is_set():
+            raise QueryCancelled()
+        events.put((kind, payload))
+
+    def answer():
         try:
-            response = get_intelligent_answer(user_query)
-            
-            # Send response in chunks
-            if 'answer' in response:
-                words = response['answer'].split(' ')
-                for i, word in enumerate(words):
-                    chunk = {'text': word + ' ', 'done': False}
-                    yield f"data: {json.dumps(chunk)}\n\n"
-                    time.sleep(0.02)
-            
-            # Send final chunk with full data
-            response['done'] = True
-            yield f"data: {json.dumps(response)}\n\n"
-            
+            result = get_intelligent_answer(user_query, zoom=zoom, llm_summary=llm_summary, on_event=on_event)
+            events.put(("done", {"result": result}))
+        except QueryCancelled:
+            logging.info(f"Stream cancelled by client: {user_query[:50]}")
         except Exception as e:
-            yield f"data: {json.dumps({'error': str(e), 'done': True})}\n\n"
+            events.put(("error", {"message": str(e)}))
+        finally:
+            events.put(None)
+
+    def generate():
+        worker = threading.Thread(target=answer, name="query-stream", daemon=True)
+        worker.start()
+        try:
+            yield _sse("start", {"query": user_query})
+            while True:
+                try:
+                    item = events.get(timeout=STREAM_HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    yield ": keep-alive\n\n"
+                    continue
+                if item is None:
+                    break
+                yield _sse(*item)
+        finally:
+            # Normal end, or GeneratorExit when the client went away
+            cancelled.set()
     
     return Response(
         stream_with_context(generate()),
@@ -608,8 +683,9 @@ def get_data():
     params['limit'] = limit
     params['offset'] = offset
     
+    import session_profiles
     try:
-        with engine.connect() as conn:
+        with engine.connect() as conn, session_profiles.applied(conn, "General"):
             result = conn.execute(text(query), params)
             rows = result.fetchall()
             
@@ -632,6 +708,8 @@ def get_data():
                 "limit": limit,
                 "offset": offset
             })
+    except session_profiles.QueryTimeoutError as e:
+        return jsonify({"error": str(e)}), 504
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -644,8 +722,9 @@ def get_floats():
     if not engine:
         return jsonify({"error": "Database not connected"}), 500
     
+    import session_profiles
     try:
-        with engine.connect() as conn:
+        with engine.connect() as conn, session_profiles.applied(conn, "General"):
             result = conn.execute(text("""
                 SELECT DISTINCT float_id 
                 FROM argo_data 
@@ -655,6 +734,8 @@ def get_floats():
             floats = [row[0] for row in result.fetchall()]
             
             return jsonify({"floats": floats, "count": len(floats)})
+    except session_profiles.QueryTimeoutError as e:
+        return jsonify({"error": str(e)}), 504
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -670,21 +751,31 @@ def get_map_points():
     limit = min(int(request.args.get('limit', 5000)), 10000)
     # Allow optional time filter for faster queries (default: last 2 years)
     years = int(request.args.get('years', 2))
+    # Optional clustering: ?cluster=<geohash precision 1-6> groups the latest
+    # float positions by the prefix of their ingest-time geocell key
+    cluster = request.args.get('cluster')
     
+    import session_profiles
     try:
-        with engine.connect() as conn:
-            # OPTIMIZED: Filter by recent timestamp first (uses idx_argo_timestamp index)
+        if cluster:
+            return jsonify(_get_map_clusters(engine, min(max(int(cluster), 1), 6), years))
+        # Served from the memory-mapped fleet snapshot when one has been built
+        import fleet_snapshot
+        points = fleet_snapshot.map_points(limit, years)
+        if points is not None:
+            return jsonify({"points": points, "count": len(points), "source": "fleet_snapshot"})
+        import sql_dialects
+        with engine.connect() as conn, session_profiles.applied(conn, "Map"):
+            # OPTIMIZED: Filter by recent timestamp first (uses timestamp-leading idx_argo_time_geo)
             # This dramatically reduces rows scanned from 45M to ~5-10M
-            result = conn.execute(text("""
-                SELECT DISTINCT ON (float_id) 
-                    float_id, latitude, longitude, timestamp, temperature
-                FROM argo_data
+            latest = sql_dialects.latest_per_group(
+                ['"float_id"', '"latitude"', '"longitude"', '"timestamp"', '"temperature"'],
+                ['"float_id"'], '"timestamp"', """FROM argo_data
                 WHERE latitude IS NOT NULL 
                   AND longitude IS NOT NULL
-                  AND timestamp >= NOW() - INTERVAL ':years years'
-                ORDER BY float_id, timestamp DESC
-                LIMIT :limit
-            """.replace(':years', str(years))), {"limit": limit})
+                  AND timestamp >= NOW() - :years * INTERVAL '1 year'""",
+                sql_dialects.dialect_of(engine), newline="\n                ")
+            result = conn.execute(text(f"{latest}\n                LIMIT :limit"), {"limit": limit, "years": years})
             
             points = [
                 {
@@ -698,9 +789,43 @@ def get_map_points():
             ]
             
             return jsonify({"points": points, "count": len(points)})
+    except session_profiles.QueryTimeoutError as e:
+        return jsonify({"error": str(e)}), 504
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def _get_map_clusters(engine, precision, years):
+    """Count the latest float positions per geocell at the given precision."""
+    import geocell
+    import session_profiles
+    import sql_dialects
+    latest = sql_dialects.latest_per_group(
+        ['"float_id"', '"latitude"', '"longitude"', '"geocell"'], ['"float_id"'], '"timestamp"',
+        """FROM argo_data
+                WHERE geocell IS NOT NULL
+                  AND timestamp >= NOW() - :years * INTERVAL '1 year'""",
+        sql_dialects.dialect_of(engine), newline="\n                ")
+    with engine.connect() as conn, session_profiles.applied(conn, "Map"):
+        result = conn.execute(text(f"""
+            WITH latest AS (
+                {latest}
+            )
+            SELECT geocell >> :shift AS cell, COUNT(*) AS floats,
+                   AVG(latitude) AS lat, AVG(longitude) AS lng
+            FROM latest
+            GROUP BY geocell >> :shift
+        """), {"shift": geocell.cluster_shift(precision), "years": years})
+        clusters = [
+            {
+                "cell": geocell.to_geohash(int(row[0]), precision),
+                "count": int(row[1]),
+                "lat": float(row[2]),
+                "lng": float(row[3]),
+            }
+            for row in result.fetchall()
+        ]
+    return {"clusters": clusters, "count": len(clusters), "precision": precision}
+
 # =============================================
 # API v1 — STABLE, VERSIONED, AGENT-READY
 # =============================================
@@ -749,6 +874,11 @@ def api_v1_query():
         "api_version": "v1"
     }
 
+    ── LLM calls ────────────────────────────────────────────────────────────
+    The answer text is rendered from the computed figures (summary_templates),
+    never by a second LLM call. Common questions are parsed by rules, so a
+    query makes one LLM call (the intent parse) or none.
+
     ── Safety ───────────────────────────────────────────────────────────────
     All SQL generated by this endpoint passes through the FloatChart SQL
     Sanitizer before execution. Destructive queries (DROP, DELETE, INSERT,
@@ -793,7 +923,8 @@ def api_v1_query():
     # ── Execute query ────────────────────────────────────────────────────────
     start = time.time()
     try:
-        response = get_intelligent_answer(user_query)
+        # Answer text from templates: at most one LLM call (the intent parse)
+        response = get_intelligent_answer(user_query, llm_summary=False)
 
         # Enforce row cap on data list
         if isinstance(response.get('data'), list) and len(response['data']) > max_rows:
@@ -869,13 +1000,23 @@ def api_v1_validate_sql():
     Useful for developers building on top of FloatChart who want to pre-validate
     queries before submission.
 
-    POST body: { "sql": "SELECT ... FROM argo_data ..." }
+    POST body: { "sql": "SELECT ... FROM argo_data ...", "query_type": "General" }
+
+    Safe queries are also planned (EXPLAIN, not executed) and checked against
+    the cost guard's budget for ``query_type`` (optional). A query returning
+    rows without a LIMIT is planned as returned in ``sql``, with the cap added.
+    cost_guard.estimate plans a single statement only, read-only and under a
+    short statement timeout; anything else gets ``"cost": null``.
 
     Response:
     {
         "safe":   true | false,
         "reason": null | "Blocked keyword detected: DROP",
-        "checks": { "non_empty": true, "is_select_or_cte": true, ... }
+        "checks": { "non_empty": true, "is_select_or_cte": true, ... },
+        "sql":    null | "SELECT ... FROM argo_data ...\nLIMIT 10000",
+        "limit_added": false | true,
+        "cost":   null | { "rows": 46000000, "cost": 912345.0, "output_rows": 500,
+                           "dialect": "postgresql", "budget": {...}, "within_budget": false }
     }
     """
     body = request.get_json(silent=True) or {}
@@ -886,10 +1027,53 @@ def api_v1_validate_sql():
     try:
         from sql_sanitizer import SQLSanitizer
         result = SQLSanitizer.validate(sql)
-        return jsonify(result), 200 if result['safe'] else 400
     except ImportError:
         return jsonify({"error": "SQL Sanitizer module not available."}), 500
 
+    result["cost"] = None
+    engine = get_db_engine() if result['safe'] else None
+    if engine:
+        import cost_guard
+        estimate = cost_guard.estimate(result["sql"], engine)
+        if estimate:
+            budget = cost_guard.budget_for(body.get('query_type'))
+            result["cost"] = {**estimate, "budget": budget,
+                              "within_budget": not cost_guard.over_budget(estimate, budget)}
+    return jsonify(result), 200 if result['safe'] else 400
+
+
+@app.route('/api/v1/metrics', methods=['GET'])
+def api_v1_metrics():
+    """
+    Query-shape, timeout and intent-cache metrics for this process.
+
+    sql_builder emits parameterized templates, so every question of the same
+    shape runs the same SQL text. This reports how many distinct shapes
+    (i.e. server-side plans) have been executed and how often, how many
+    queries their session profile's statement timeout cancelled, and how
+    often a question's intent came from the intent cache instead of the LLM.
+
+    Response (200):
+        {
+            "distinct_shapes": 7,
+            "executions": 212,
+            "shapes": [
+                {"shape": "3f2a9c...", "query_type": "Proximity",
+                 "template": "WITH filtered_data AS (...)",
+                 "executions": 120, "prepared_executions": 118},
+                ...
+            ],
+            "timeouts": {"total": 1, "by_query_type": {"Scatter": 1}},
+            "intent_cache": {"hits": 150, "misses": 62, "hit_rate": 0.708, "stores": 60,
+                             "evictions": 0, "errors": 0, "entries": 4210, "enabled": true}
+        }
+    """
+    import intent_cache
+    import query_executor
+    import session_profiles
+    return jsonify({**query_executor.shape_stats(), "timeouts": session_profiles.timeout_stats(),
+                    "intent_cache": intent_cache.stats()}), 200
+
 
 # =============================================
 # RUN SERVER
@@ -1,5 +1,6 @@
 import os
 import json
+import logging
 import pandas as pd
 from dotenv import load_dotenv
 from sqlalchemy import create_engine, text
@@ -9,6 +10,20 @@ from langchain_core.output_parsers import StrOutputParser
 from datetime import datetime
 import numpy as np
 import sql_builder
+import tiered_storage
+import fleet_snapshot
+import knn_search
+import downsample
+import density
+import comparison
+import schema_catalog
+import cost_guard
+import query_executor
+import session_profiles
+import intent_cache
+import intent_rules
+import summary_templates
+import stage_graph
 import time
 
 # ------------------------------------------------------------------
@@ -292,68 +307,16 @@ def invoke_with_retry(chain, inputs, max_retries=2, delay=0.5):
     raise last_error
 
 
+class QueryCancelled(Exception):
+    """Raised by an ``on_event`` callback to stop get_intelligent_answer (the client went away)."""
+
+
 def _fallback_intent_parser(question: str) -> dict:
     """
-    Fallback regex-based intent parser when LLM fails.
-    Extracts basic intent from the question using pattern matching.
+    Rule-based intent for the question (see intent_rules), whatever its
+    confidence. Used when the LLM reply holds no usable JSON.
     """
-    question_lower = question.lower()
-    intent = {"query_type": "General", "metrics": ["temperature", "salinity"]}
-    
-    # Detect query type
-    if any(word in question_lower for word in ["average", "avg", "mean", "count", "how many", "maximum", "max", "minimum", "min", "total"]):
-        intent["query_type"] = "Statistic"
-        if "average" in question_lower or "avg" in question_lower or "mean" in question_lower:
-            intent["aggregation"] = "avg"
-        elif "max" in question_lower:
-            intent["aggregation"] = "max"
-        elif "min" in question_lower:
-            intent["aggregation"] = "min"
-        elif "count" in question_lower or "how many" in question_lower:
-            intent["aggregation"] = "count"
-    elif any(word in question_lower for word in ["near", "nearest", "close", "within", "around"]):
-        intent["query_type"] = "Proximity"
-    elif any(word in question_lower for word in ["trajectory", "path", "track", "movement", "traveled"]):
-        intent["query_type"] = "Trajectory"
-    elif any(word in question_lower for word in ["profile", "depth", "vertical"]):
-        intent["query_type"] = "Profile"
-    elif any(word in question_lower for word in ["trend", "over time", "monthly", "yearly", "time series"]):
-        intent["query_type"] = "Time-Series"
-    elif " vs " in question_lower or "versus" in question_lower or "correlation" in question_lower:
-        intent["query_type"] = "Scatter"
-    
-    # Extract float ID
-    float_match = re.search(r'float\s*(?:id)?\s*(\d+)', question_lower)
-    if float_match:
-        intent["float_id"] = int(float_match.group(1))
-    
-    # Extract year
-    year_match = re.search(r'\b(20\d{2})\b', question)
-    if year_match:
-        intent["year"] = int(year_match.group(1))
-    
-    # Extract location
-    location_keywords = ["chennai", "mumbai", "bay of bengal", "arabian sea", "indian ocean", 
-                        "pacific", "atlantic", "mediterranean", "caribbean", "kolkata", "goa"]
-    for loc in location_keywords:
-        if loc in question_lower:
-            intent["location_name"] = loc
-            break
-    
-    # Extract metrics
-    metrics = []
-    if "temperature" in question_lower or "temp" in question_lower:
-        metrics.append("temperature")
-    if "salinity" in question_lower or "salt" in question_lower:
-        metrics.append("salinity")
-    if "oxygen" in question_lower:
-        metrics.append("dissolved_oxygen")
-    if "pressure" in question_lower or "depth" in question_lower:
-        metrics.append("pressure")
-    if metrics:
-        intent["metrics"] = metrics
-    
-    return intent
+    return intent_rules.parse(question, LOCATIONS).intent
 
 
 # ------------------------------------------------------------------
@@ -684,6 +647,9 @@ LOCATIONS = {
     "south pole": "(\"latitude\" BETWEEN -90 AND -85)"
 }
 
+# Measurement columns a question gets when it names none (never keys such as id or geocell)
+SENSOR_COLUMNS = ["temperature", "salinity", "pressure", "dissolved_oxygen", "chlorophyll", "nitrate", "ph"]
+
 # Cache for database context with TTL - OPTIMIZED
 _db_context_cache = None
 _db_context_timestamp = None
@@ -700,25 +666,24 @@ def get_database_context(engine):
             return _db_context_cache
     
     try:
+        # First check if table exists (from the shared schema catalog)
+        if not schema_catalog.table_exists(engine):
+            logging.warning("argo_data table does not exist")
+            return None
+
         with engine.connect() as connection:
-            # First check if table exists
-            result = connection.execute(text("""
-                SELECT EXISTS (
-                    SELECT 1 FROM information_schema.tables 
-                    WHERE table_name = 'argo_data'
-                )
-            """)).fetchone()
-            
-            if not result or not result[0]:
-                print("WARNING: argo_data table does not exist!")
-                return None
-            
             # OPTIMIZATION: Use indexed timestamp column for faster MIN/MAX
-            # With idx_argo_timestamp index, this is O(log n) not O(n)
+            # With idx_argo_time_geo (timestamp-leading) index, this is O(log n) not O(n)
             result = connection.execute(text('''
                 SELECT MIN("timestamp"), MAX("timestamp") FROM argo_data
             ''')).fetchone()
             min_date, max_date = result
+            # New or moved rows change the row estimate: reload the catalog with them
+            schema_catalog.get_catalog(engine, data_version=f"{min_date}|{max_date}")
+            # History moved to the Parquet cold tier is still answerable
+            cold_min = tiered_storage.cold_min_date()
+            if cold_min and (min_date is None or cold_min < min_date):
+                min_date = cold_min
             
             if not min_date or not max_date:
                 print("WARNING: argo_data table is empty!")
@@ -751,7 +716,8 @@ Columns: float_id (int), timestamp (datetime), latitude (float), longitude (floa
    Examples: "trajectory of float 2902115", "path of float 2901234", "where did float X travel"
    
 4. "Profile" - Vertical depth profile data (measurements at different depths)
-   Examples: "depth profile", "temperature vs pressure", "vertical profile of salinity"
+   Examples: "depth profile", "temperature vs pressure", "vertical profile of salinity",
+   "last 5 profiles of float 2902115", "profile closest to 15 March 2023 in the arabian sea"
    
 5. "Time-Series" - Data changes over time periods
    Examples: "temperature trend in 2024", "salinity from January to March", "monthly averages"
@@ -759,7 +725,10 @@ Columns: float_id (int), timestamp (datetime), latitude (float), longitude (floa
 6. "Scatter" - Comparing relationships between two variables
    Examples: "temperature vs salinity", "correlation between oxygen and depth"
    
-7. "General" - Default for exploration or unclear queries
+7. "Comparison" - The same measurements side by side for two or more named regions
+   Examples: "compare Bay of Bengal and Arabian Sea temperatures", "salinity in red sea vs persian gulf in 2023"
+
+8. "General" - Default for exploration or unclear queries
 
 ## SUPPORTED LOCATIONS (use exact names):
 **Indian Ocean:** arabian sea, bay of bengal, indian ocean, andaman sea, laccadive sea, red sea, persian gulf, mozambique channel
@@ -770,12 +739,13 @@ Columns: float_id (int), timestamp (datetime), latitude (float), longitude (floa
 **Special Regions:** equator, tropics, southern ocean
 
 ## FIELDS TO EXTRACT:
-- "query_type": One of the 7 types above (REQUIRED)
+- "query_type": One of the 8 types above (REQUIRED)
 - "metrics": Array of measurements needed: ["temperature", "salinity", "dissolved_oxygen", "pressure", "chlorophyll"]
 - "location_name": Geographic location name (lowercase, from supported list)
+- "regions": For Comparison queries, every region being compared (lowercase, from supported list), e.g. ["bay of bengal", "arabian sea"]
 - "latitude": Numeric latitude if explicitly mentioned (-90 to 90)
 - "longitude": Numeric longitude if explicitly mentioned (-180 to 180)
-- "time_constraint": Time period string (e.g., "2024", "March 2024", "from 2023 to 2024", "last 6 months")
+- "time_constraint": Time period string, copied from the question (e.g., "2024", "March 2024", "Q1 2024", "monsoon 2023", "from 2019 to 2022", "2024-01-05 to 2024-02-01", "last 30 days", "last 6 months", "since 2020")
 - "year": Specific year as integer (2020-2026)
 - "month": Specific month as integer (1-12)
 - "distance_km": Search radius in kilometers for proximity queries (default: 500)
@@ -783,6 +753,10 @@ Columns: float_id (int), timestamp (datetime), latitude (float), longitude (floa
 - "float_id": Integer float ID if mentioned (e.g., 2902115)
 - "limit": Number of results to return (default: 10 for lists, 500 for data)
 - "group_by": Field to group results by (e.g., "month", "float_id")
+- "surface_only": For Trajectory queries, false only when depth levels are wanted (default: one surface position per profile)
+- "scatter_mode": For Scatter queries, "density" for T-S diagrams or distributions over many points (binned counts of every row); omit for a representative sample of points
+- "profile_count": For Profile queries, how many of the most recent profiles to return (e.g., 5 for "last 5 profiles")
+- "target_date": For Profile queries, the date the profile should be closest to (e.g., "2023-03-15", "March 2023")
 
 ## USER QUESTION:
 "{question}"
@@ -801,6 +775,9 @@ Return a single JSON object with the extracted fields. Omit fields that don't ap
 
 JSON:"""
 
+# Cached intents are valid for this prompt and gazetteer only (see intent_cache)
+INTENT_CACHE_VERSION = intent_cache.version_of(INTENT_PARSER_PROMPT, LOCATIONS)
+
 SUMMARIZATION_PROMPT = """You are an expert oceanographic analyst. Provide clear, data-driven responses.
 
 ## DATA PROVIDED
@@ -977,6 +954,10 @@ def calculate_insights(df, data_records, query_type, intent):
         insights = _profile_insights(df, data_records, intent, insights)
     elif query_type == "Time-Series":
         insights = _timeseries_insights(df, data_records, intent, insights)
+    elif query_type == "Scatter":
+        insights = _scatter_insights(df, data_records, intent, insights)
+    elif query_type == "Comparison":
+        insights = _comparison_insights(df, data_records, intent, insights)
     else:
         insights = _general_insights(df, data_records, intent, insights)
     
@@ -1037,6 +1018,16 @@ def _statistic_insights(df, data_records, intent, insights):
     metrics = intent.get('metrics', [])
     aggregation = intent.get('aggregation', 'avg').upper()
     
+    # COUNT queries return one unnamed count column
+    count_columns = [c for c in df.columns if str(c).lower().startswith('count')]
+    if aggregation == 'COUNT' and count_columns and len(df) == 1 and pd.notna(df[count_columns[0]].iloc[0]):
+        insights["highlight"] = {
+            "type": "count",
+            "value": int(df[count_columns[0]].iloc[0]),
+            "label": "Unique Floats" if 'float_id' in str(count_columns[0]) else "Total Records"
+        }
+        metrics = []
+
     # Find the main metric result
     for metric in metrics:
         if metric in df.columns and df[metric].notna().any():
@@ -1099,12 +1090,11 @@ def _trajectory_insights(df, data_records, intent, insights):
             # Sort by timestamp
             df_sorted = df.sort_values('timestamp') if 'timestamp' in df.columns else df
             
-            # Calculate total distance traveled
-            total_distance = 0
-            for i in range(1, len(df_sorted)):
-                lat1, lon1 = df_sorted.iloc[i-1]['latitude'], df_sorted.iloc[i-1]['longitude']
-                lat2, lon2 = df_sorted.iloc[i]['latitude'], df_sorted.iloc[i]['longitude']
-                total_distance += _haversine_distance(lat1, lon1, lat2, lon2)
+            # Calculate total distance traveled (vectorized; depth levels of one profile add 0 km)
+            lat = pd.to_numeric(df_sorted['latitude'], errors='coerce').to_numpy(dtype=float)
+            lon = pd.to_numeric(df_sorted['longitude'], errors='coerce').to_numpy(dtype=float)
+            legs = downsample.haversine_km(lat[:-1], lon[:-1], lat[1:], lon[1:])
+            total_distance = float(np.nansum(legs))
             
             insights["highlight"] = {
                 "type": "trajectory",
@@ -1124,6 +1114,11 @@ def _trajectory_insights(df, data_records, intent, insights):
                     insights["stats"]["time_span_days"] = time_span
                     if time_span > 0:
                         insights["stats"]["avg_speed_km_day"] = round(total_distance / time_span, 1)
+                    # Fastest leg between consecutive profiles
+                    leg_days = np.diff(pd.to_datetime(df_sorted['timestamp']).to_numpy()) / np.timedelta64(1, 'D')
+                    moving = leg_days > 0
+                    if moving.any():
+                        insights["stats"]["max_speed_km_day"] = round(float(np.nanmax(legs[moving] / leg_days[moving])), 1)
                 except:
                     pass
             
@@ -1166,11 +1161,43 @@ def _profile_insights(df, data_records, intent, insights):
                         thermocline_idx = temp_diff.idxmax()
                         insights["stats"]["thermocline_depth"] = round(float(df_sorted.loc[thermocline_idx, 'pressure']), 0)
     
+    if {'float_id', 'timestamp'} <= set(df.columns):
+        insights["stats"]["profiles"] = int(len(df[['float_id', 'timestamp']].drop_duplicates()))
     float_id = intent.get('float_id')
     insights["context"] = f"Vertical profile from Float #{float_id}" if float_id else "Depth profile"
     return insights
 
 
+def _scatter_insights(df, data_records, intent, insights):
+    """Insights for scatter / T-S queries: correlation and regression line."""
+    metrics = [m for m in intent.get('metrics', []) if m in df.columns][:2]
+    fit = density.scatter_stats(df, metrics)
+    if fit:
+        population = density.is_density(df)
+        insights["stats"]["fit"] = fit
+        insights["stats"]["population_points" if population else "sample_points"] = fit["n"]
+        if "r" in fit:
+            insights["highlight"] = {"type": "correlation", "r": fit["r"], "slope": fit.get("slope"),
+                                     "population": population}
+    label = f"{metrics[1]} vs {metrics[0]}" if len(metrics) == 2 else "Scatter"
+    insights["context"] = label + (" density" if density.is_density(df) else " (representative sample)")
+    return insights
+
+
+def _comparison_insights(df, data_records, intent, insights):
+    """Insights for region comparisons: exact per-region figures and the largest contrast."""
+    summary = comparison.region_summary(df)
+    insights["stats"]["regions"] = summary
+    for metric in comparison.metric_columns(df):
+        contrast = comparison.contrast(summary, metric)
+        if contrast:
+            insights["highlight"] = {"type": "comparison", "unit": _get_unit(metric), **contrast}
+            break
+    names = [entry["region"].title() for entry in summary]
+    insights["context"] = " vs ".join(names) + (f" ({intent['time_constraint']})" if intent.get("time_constraint") else "")
+    return insights
+
+
 def _timeseries_insights(df, data_records, intent, insights):
     """Insights for time-series queries."""
     metrics = intent.get('metrics', ['temperature'])
@@ -1238,16 +1265,7 @@ def _general_insights(df, data_records, intent, insights):
 
 def _get_unit(metric):
     """Get the unit for a metric."""
-    units = {
-        'temperature': '°C',
-        'salinity': 'PSU',
-        'pressure': 'dbar',
-        'dissolved_oxygen': 'μmol/kg',
-        'chlorophyll': 'mg/m³',
-        'ph': '',
-        'nitrate': 'μmol/kg'
-    }
-    return units.get(metric, '')
+    return summary_templates.UNITS.get(metric, '')
 
 
 def _haversine_distance(lat1, lon1, lat2, lon2):
@@ -1322,6 +1340,16 @@ def recommend_visualization(query_type, df, intent):
             "show_comparison": True
         }
         
+    elif query_type == "Comparison":
+        viz["recommended"] = "comparison_chart"
+        viz["alternatives"] = ["bar_chart", "table"]
+        metrics = comparison.metric_columns(df)
+        viz["config"] = {
+            "x_axis": "period",
+            "y_axis": metrics[0] if metrics else "temperature",
+            "series_by": "region"
+        }
+
     elif query_type == "Scatter":
         viz["recommended"] = "scatter"
         viz["alternatives"] = ["ts_diagram", "histogram"]
@@ -1330,6 +1358,10 @@ def recommend_visualization(query_type, df, intent):
             "x_axis": metrics[0] if len(metrics) > 0 else "temperature",
             "y_axis": metrics[1] if len(metrics) > 1 else "salinity"
         }
+        if density.is_density(df):
+            # Points are bin centres; size/colour them by row count
+            viz["recommended"] = "ts_diagram"
+            viz["config"]["weight"] = "count"
     else:
         # Auto-detect best visualization
         if 'distance_km' in df.columns:
@@ -1441,6 +1473,23 @@ def generate_suggestions(query_type, intent, data_records, db_context):
             "icon": "📊"
         })
     
+    elif query_type == "Comparison":
+        regions = intent.get('regions') or []
+        metric = (intent.get('metrics') or ['temperature'])[0]
+        other = 'salinity' if metric != 'salinity' else 'temperature'
+        if len(regions) >= 2:
+            suggestions.append({
+                "text": f"Compare {other} as well",
+                "query": f"compare {other} in {' and '.join(regions)}",
+                "icon": "⚖️"
+            })
+        if regions:
+            suggestions.append({
+                "text": f"Depth profile in {regions[0].title()}",
+                "query": f"latest depth profile in {regions[0]}",
+                "icon": "⬇️"
+            })
+    
     # Always offer export option
     suggestions.append({
         "text": "Export this data as CSV",
@@ -1503,17 +1552,71 @@ def build_metadata(df, intent, db_context, processing_time):
     return metadata
 
 
-def get_intelligent_answer(user_question: str):
+def parse_intent_with_llm(llm, user_question: str):
+    """
+    Parse the question with INTENT_PARSER_PROMPT.
+
+    Returns (intent, source): source is "llm", or "fallback" when the reply
+    held no usable JSON and the regex parser was used instead (such intents
+    are not cached, so the next ask tries the LLM again).
+    """
+    import logging
+    prompt = PromptTemplate.from_template(INTENT_PARSER_PROMPT)
+    parser_chain = prompt | llm | StrOutputParser()
+
+    # Use retry logic for robustness
+    intent_json_str = invoke_with_retry(parser_chain, {"question": user_question}, max_retries=2)
+
+    # Extract JSON from response (handle markdown code blocks)
+    intent_json_str = intent_json_str.strip()
+    if intent_json_str.startswith("```"):
+        # Remove markdown code block
+        intent_json_str = re.sub(r'^```(?:json)?\s*', '', intent_json_str)
+        intent_json_str = re.sub(r'\s*```$', '', intent_json_str)
+
+    match = re.search(r'\{.*\}', intent_json_str, re.DOTALL)
+    if not match:
+        logging.error(f"LLM did not return valid JSON. Response: {intent_json_str[:200]}")
+        # Fallback: try to construct a basic intent from the question
+        return _fallback_intent_parser(user_question), "fallback"
+    try:
+        intent = json.loads(match.group(0))
+    except json.JSONDecodeError as je:
+        logging.error(f"JSON parse error: {je}. Attempting fallback...")
+        return _fallback_intent_parser(user_question), "fallback"
+    if not isinstance(intent, dict):
+        return _fallback_intent_parser(user_question), "fallback"
+    return intent, "llm"
+
+
+def get_intelligent_answer(user_question: str, zoom: float = None, llm_summary: bool = None, on_event=None):
     """
     Main function to process user questions and return intelligent answers.
     Uses SMART AI ROUTING for optimal performance:
       - Simple queries → Groq (fast)
       - Complex ocean queries → DeepSeek (reliable)
+
+    ``zoom`` is the map's web-map zoom level, when the question comes from
+    the map; trajectory payloads are then simplified for that zoom.
+
+    The answer text is rendered from the computed insights
+    (summary_templates); ``llm_summary=True`` has the LLM write it instead
+    (default: LLM_SUMMARY_ENABLED).
+
+    ``on_event(kind, payload)`` is called as each part is ready: "intent",
+    "sql", "data", "insights", then "chunk" for the summary text (LLM tokens
+    as they arrive; if the LLM fails mid-stream, the template text follows
+    with ``replace`` set). It may raise QueryCancelled to stop the remaining
+    work.
     """
     import logging
     logging.basicConfig(filename="backend.log", level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
     
     start_time = time.time()
+
+    def emit(kind, **payload):
+        if on_event is not None:
+            on_event(kind, payload)
     
     # === STEP 0: Check for simple conversational messages ===
     conversational_response = handle_conversational_query(user_question)
@@ -1523,13 +1626,43 @@ def get_intelligent_answer(user_question: str):
     try:
         load_dotenv()
         engine = get_engine()
-        
-        # 🧠 SMART AI ROUTING - classify query and route to best AI
-        query_complexity = classify_query_complexity(user_question)
-        logging.info(f"Query complexity: {query_complexity} for: {user_question[:50]}...")
-        llm = get_llm(query_complexity=query_complexity)  # Smart routing!
 
-        context = get_database_context(engine)
+        # === STEP 1: Parse user intent (rules, else cached LLM intent, else LLM) ===
+        rules = intent_rules.parse(user_question, LOCATIONS)
+        if intent_rules.is_enabled() and rules.confidence >= intent_rules.min_confidence():
+            intent, intent_source = rules.intent, "rules"
+        else:
+            intent = intent_cache.get(user_question, INTENT_CACHE_VERSION)
+            intent_source = "cache" if intent is not None else None
+        if llm_summary is None:
+            llm_summary = summary_templates.llm_summary_enabled()
+
+        # === Pre-query stage: independent I/O runs concurrently (see stage_graph) ===
+        stages = [
+            stage_graph.Stage("context", lambda: get_database_context(engine)),
+            # After the context, which reloads the catalog when the data changed
+            stage_graph.Stage("schema", lambda context: schema_catalog.columns(engine), after=("context",)),
+        ]
+        if intent is None or llm_summary:
+            # 🧠 SMART AI ROUTING - classify query and route to best AI
+            query_complexity = classify_query_complexity(user_question)
+            logging.info(f"Query complexity: {query_complexity} for: {user_question[:50]}...")
+            stages.append(stage_graph.Stage("llm", lambda: get_llm(query_complexity=query_complexity)))
+        if intent is None:
+            stages.append(stage_graph.Stage("intent", lambda llm: parse_intent_with_llm(llm, user_question),
+                                            after=("llm",)))
+        prequery = stage_graph.run(stages)
+        context = prequery.results["context"]
+        llm = prequery.results.get("llm")
+        # Actual columns from the cached schema catalog (no per-question round-trip)
+        actual_columns = prequery.results["schema"]
+        if intent is None:
+            intent, intent_source = prequery.results["intent"]
+            if intent_source == "llm":
+                intent_cache.put(user_question, INTENT_CACHE_VERSION, intent)
+        logging.info(f"Intent source: {intent_source} (rule confidence {rules.confidence}: {rules.reasons}); "
+                     f"pre-query stages: {prequery.report()}")
+
         if not context:
             logging.error("Database has no data or table doesn't exist.")
             return {"query_type": "Error", "summary": "No ocean data available yet. Please run the Data Generator to fetch ARGO float data first.", "data": []}
@@ -1543,85 +1676,13 @@ def get_intelligent_answer(user_question: str):
             max_date_str = max_date.strftime("%b %d, %Y") if hasattr(max_date, 'strftime') else str(max_date)[:10]
             data_range_info = f"Data available: {min_date_str} to {max_date_str}"
 
-        # === STEP 1: Parse user intent with LLM ===
-        prompt = PromptTemplate.from_template(INTENT_PARSER_PROMPT)
-        parser_chain = prompt | llm | StrOutputParser()
-        
-        # Use retry logic for robustness
-        intent_json_str = invoke_with_retry(parser_chain, {"question": user_question}, max_retries=2)
-
-        # Extract JSON from response (handle markdown code blocks)
-        intent_json_str = intent_json_str.strip()
-        if intent_json_str.startswith("```"):
-            # Remove markdown code block
-            intent_json_str = re.sub(r'^```(?:json)?\s*', '', intent_json_str)
-            intent_json_str = re.sub(r'\s*```$', '', intent_json_str)
-        
-        match = re.search(r'\{.*\}', intent_json_str, re.DOTALL)
-        if not match:
-            logging.error(f"LLM did not return valid JSON. Response: {intent_json_str[:200]}")
-            # Fallback: try to construct a basic intent from the question
-            intent = _fallback_intent_parser(user_question)
-        else:
-            try:
-                intent = json.loads(match.group(0))
-            except json.JSONDecodeError as je:
-                logging.error(f"JSON parse error: {je}. Attempting fallback...")
-                intent = _fallback_intent_parser(user_question)
-
-
-        # --- Fallback pre-processing BEFORE sanitization (regex assist) ---
-        # Extract coordinates if user typed them explicitly (e.g., 'latitude 13 longitude 80.25')
-        coord_lat = None; coord_lon = None
-        lat_match = re.search(r'latitude\s+(-?\d+(?:\.\d+)?)', user_question, re.IGNORECASE)
-        lon_match = re.search(r'longitude\s+(-?\d+(?:\.\d+)?)', user_question, re.IGNORECASE)
-        if lat_match and lon_match:
-            try:
-                coord_lat = float(lat_match.group(1)); coord_lon = float(lon_match.group(1))
-            except Exception:
-                coord_lat = coord_lon = None
-        # Pattern like 'near 13, 80.25' or '13 80.25' following 'nearest'
-        if coord_lat is None or coord_lon is None:
-            pair_match = re.search(r'(?:near|at|around)?\s*(-?\d+(?:\.\d+)?)\s*[, ]\s*(-?\d+(?:\.\d+)?)', user_question, re.IGNORECASE)
-            if pair_match:
-                try:
-                    coord_lat = float(pair_match.group(1)); coord_lon = float(pair_match.group(2))
-                except Exception:
-                    coord_lat = coord_lon = None
-        # Extract explicit limit like 'nearest 5 floats' if LLM misses it
-        explicit_limit = None
-        limit_match = re.search(r'(?:nearest|top|find)\s+(\d{1,3})\s+(?:float|ARGO)', user_question, re.IGNORECASE)
-        if limit_match:
-            explicit_limit = int(limit_match.group(1))
-        
-        # Extract time constraints from the question (robust fallback)
-        explicit_time_constraint = None
-        month_names = {"jan": 1, "january": 1, "feb": 2, "february": 2, "mar": 3, "march": 3,
-                       "apr": 4, "april": 4, "may": 5, "jun": 6, "june": 6, "jul": 7, "july": 7,
-                       "aug": 8, "august": 8, "sep": 9, "september": 9, "oct": 10, "october": 10,
-                       "nov": 11, "november": 11, "dec": 12, "december": 12}
-        
-        # Pattern: "March 2025" or "march 2025" or "Mar 2025"
-        month_year_match = re.search(r'\b(jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|jun(?:e)?|jul(?:y)?|aug(?:ust)?|sep(?:tember)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)\s*(\d{4})\b', user_question, re.IGNORECASE)
-        if month_year_match:
-            month_str = month_year_match.group(1).lower()[:3]
-            year_str = month_year_match.group(2)
-            explicit_time_constraint = f"{month_str} {year_str}"
-        else:
-            # Pattern: "2025" alone
-            year_match = re.search(r'\b(20[12]\d)\b', user_question)
-            if year_match:
-                explicit_time_constraint = year_match.group(1)
+        # --- Values stated outright in the question (regex assist for LLM intents) ---
+        hints = rules.hints
 
         # --- MASTER SANITIZER STEP ---
         intent["query_type"] = intent.get("query_type", "General")
         intent["metrics"] = [m for m in intent.get("metrics", []) if m]
 
-        # Get actual columns from DB
-        with engine.connect() as connection:
-            insp = connection.execute(text("SELECT column_name FROM information_schema.columns WHERE table_name = 'argo_data';"))
-            actual_columns = set(row[0] for row in insp)
-
         # Fix: Extract float_id from location_name if present, never treat as location
         if intent.get("location_name") and str(intent["location_name"]).lower().startswith("float"):
             float_id_str = str(intent["location_name"]).lower().replace("float", "").strip()
@@ -1632,9 +1693,15 @@ def get_intelligent_answer(user_question: str):
             intent["location_name"] = None
         # Only keep metrics that exist in DB, but if none, just use all available metrics
         intent["metrics"] = [m for m in intent["metrics"] if m in actual_columns]
-        if not intent["metrics"]:
-            # Use all available metrics except coordinates and IDs
-            intent["metrics"] = [col for col in actual_columns if col not in ["latitude", "longitude", "float_id", "timestamp"]]
+        # Tracks return one surface position per profile unless depth was asked for
+        # (decided before the metrics are filled with every column, pressure included)
+        if intent["query_type"] in ["Trajectory", "Path"] and intent.get("surface_only") is None:
+            intent["surface_only"] = "pressure" not in intent["metrics"] and not re.search(
+                r'\b(depth|depths|pressure|levels?)\b', user_question, re.IGNORECASE)
+        metrics_defaulted = not intent["metrics"]
+        if metrics_defaulted:
+            # Every sensor column the table has
+            intent["metrics"] = [col for col in SENSOR_COLUMNS if col in actual_columns]
         if not intent["metrics"]:
             # If still empty, just use temperature if present
             if "temperature" in actual_columns:
@@ -1649,65 +1716,30 @@ def get_intelligent_answer(user_question: str):
             intent["query_type"] = "Trajectory"
 
         # Inject coordinates if not provided by LLM but detected via regex
-        if coord_lat is not None and coord_lon is not None and not any(k in intent for k in ["latitude","longitude"]):
-            intent["latitude"] = coord_lat
-            intent["longitude"] = coord_lon
+        if "latitude" in hints and not any(k in intent for k in ["latitude","longitude"]):
+            intent["latitude"] = hints["latitude"]
+            intent["longitude"] = hints["longitude"]
             # If user referenced 'nearest' and query_type not set use Proximity
             if re.search(r'nearest|within\s+\d+\s*km', user_question, re.IGNORECASE) and intent["query_type"] not in ["Proximity"]:
                 intent["query_type"] = "Proximity"
 
         # Apply explicit numeric limit if parsed and no limit already
-        if explicit_limit and "limit" not in intent:
-            intent["limit"] = explicit_limit
+        if hints.get("limit") and "limit" not in intent:
+            intent["limit"] = hints["limit"]
         
         # Apply explicit time constraint if LLM missed it
-        if explicit_time_constraint and not intent.get("time_constraint"):
-            intent["time_constraint"] = explicit_time_constraint
-            logging.info(f"Applied fallback time_constraint: {explicit_time_constraint}")
+        if hints.get("time_constraint") and not intent.get("time_constraint"):
+            intent["time_constraint"] = hints["time_constraint"]
+            logging.info(f"Applied fallback time_constraint: {hints['time_constraint']}")
 
         # Proximity location fallback and robust distance parsing
         if intent.get("query_type") == "Proximity":
             lat = intent.get("latitude")
             lon = intent.get("longitude")
             location_name = (intent.get("location_name") or "").lower()
-            location_centers = {
-                # Indian Ocean
-                "arabian sea": (15, 62.5),
-                "bay of bengal": (13.5, 87.5),
-                "indian ocean": (0, 75),
-                "andaman sea": (10, 95),
-                "laccadive sea": (11, 74),
-                "red sea": (20, 38),
-                "persian gulf": (27, 52),
-                "mozambique channel": (-18, 40),
-                # Pacific Ocean
-                "pacific ocean": (0, 160),
-                "south china sea": (15, 115),
-                "philippine sea": (20, 130),
-                "coral sea": (-16, 155),
-                "tasman sea": (-37, 162),
-                # Atlantic Ocean
-                "atlantic ocean": (25, -40),
-                "caribbean sea": (17, -75),
-                "gulf of mexico": (25, -90),
-                "mediterranean sea": (38, 18),
-                "north sea": (56, 3),
-                # Cities
-                "chennai": (13, 80.25),
-                "mumbai": (19, 72.75),
-                "sri lanka": (7.5, 80.5),
-                "singapore": (1.3, 104),
-                "tokyo": (35.5, 140),
-                "sydney": (-34, 151),
-                "cape town": (-34, 18),
-                "miami": (26, -80),
-                # Special
-                "equator": (0, 80),
-                "southern ocean": (-55, 0),
-                "tropics": (10, 80),
-            }
-            if (lat is None or lon is None) and location_name in location_centers:
-                lat, lon = location_centers[location_name]
+            center = intent_rules.center_of(location_name, LOCATIONS)
+            if (lat is None or lon is None) and center:
+                lat, lon = center
                 intent["latitude"] = lat
                 intent["longitude"] = lon
             # Parse distance_km robustly
@@ -1725,7 +1757,7 @@ def get_intelligent_answer(user_question: str):
                 except Exception:
                     intent["distance_km"] = 500
             else:
-                intent["distance_km"] = 500
+                intent["distance_km"] = hints.get("distance_km", 500)
             # Default limit if not present
             if "limit" not in intent:
                 intent["limit"] = 5
@@ -1752,6 +1784,8 @@ def get_intelligent_answer(user_question: str):
             intent["limit"] = _as_int(intent.get("limit"), 5)
         if intent.get("limit") is None:
             intent["limit"] = 5
+        if "profile_count" in intent:
+            intent["profile_count"] = _as_int(intent.get("profile_count"))
         if "distance_km" in intent:
             # Extract first integer occurrence
             if isinstance(intent["distance_km"], str):
@@ -1773,10 +1807,55 @@ def get_intelligent_answer(user_question: str):
                 intent.pop(k)
 
         intent["location_clause"] = LOCATIONS.get((intent.get("location_name") or "").lower(), "1=1")
+        if intent.get("query_type") == "Comparison":
+            # Every compared region becomes a labelled bucket of one grouped query
+            regions = list(dict.fromkeys(str(r).lower().strip() for r in intent.get("regions") or [] if r))
+            unknown = [r for r in regions if r not in LOCATIONS]
+            if unknown:
+                return {
+                    "query_type": "Error",
+                    "summary": f"Region(s) {', '.join(unknown)} are not supported. Valid locations are: {', '.join(LOCATIONS)}.",
+                    "data": []
+                }
+            intent["regions"] = regions
+            intent["region_clauses"] = {r: LOCATIONS[r] for r in regions}
+        # Missing float ID check (before any SQL runs): suggest available floats for user's filters.
+        # A profile scoped by region, time range, profile_count or target_date needs no float.
+        time_clause = "1=1"
+        if intent.get("time_constraint"):
+            time_clause = sql_builder._get_time_clause(intent["time_constraint"], context.get("max_date") or datetime.now())
+        profile_scoped = intent.get("query_type") == "Profile" and (
+            intent.get("location_clause") not in (None, "", "1=1") or time_clause != "1=1"
+            or intent.get("profile_count") or intent.get("target_date"))
+        if intent.get("query_type") in ["Trajectory", "Profile"] and not intent.get("float_id") and not profile_scoped:
+            # Find available floats for the user's location/time filter
+            where_clauses = []
+            if intent.get("location_clause"):
+                where_clauses.append(intent["location_clause"])
+            if time_clause != "1=1":
+                where_clauses.append(time_clause)
+            where_sql = " AND ".join(where_clauses) if where_clauses else "1=1"
+            float_query = f'SELECT DISTINCT "float_id", MAX("latitude") as latitude, MAX("longitude") as longitude, MAX("timestamp") as timestamp FROM argo_data WHERE {where_sql} GROUP BY "float_id" ORDER BY "float_id" ASC LIMIT 20;'
+            with engine.connect() as connection, session_profiles.applied(connection, intent.get("query_type")):
+                floats_df = pd.read_sql_query(sql=text(float_query), con=connection)
+            floats = floats_df.to_dict(orient='records') if not floats_df.empty else []
+            float_ids = [str(row['float_id']) for row in floats]
+            msg = "No float ID specified. Please provide a valid float ID for this query."
+            if float_ids:
+                msg += f" Available floats for your query: {', '.join(float_ids)}."
+            return {
+                "query_type": "Error",
+                "summary": msg,
+                "data": floats
+            }
+
         # Remove any metrics/columns that do not exist in DB for this query
         intent["metrics"] = [m for m in intent["metrics"] if m in actual_columns]
+        builder_context = {"max_date_obj": context.get("max_date"), "min_date_obj": context.get("min_date")}
+        emit("intent", query_type=intent["query_type"], intent_source=intent_source,
+             intent={k: v for k, v in intent.items() if k not in ("location_clause", "region_clauses")})
         try:
-            generated_sql = sql_builder.build_query(intent, {"max_date_obj": context.get("max_date")}, engine)
+            generated_sql = sql_builder.build_query(intent, builder_context, engine)
         except ValueError as ve:
             # Specific guidance for profile/trajectory builder errors
             return {
@@ -1785,7 +1864,7 @@ def get_intelligent_answer(user_question: str):
                 "data": [],
                 "sql_query": "N/A"
             }
-        logging.info(f"Intent: {json.dumps(intent)} | Generated SQL: {generated_sql}")
+        logging.info(f"Intent: {json.dumps(intent)} | Generated SQL: {generated_sql} | Params: {getattr(generated_sql, 'params', {})}")
 
         # SQL builder detected logical error
         if isinstance(generated_sql, str) and generated_sql.startswith("ERROR:"):
@@ -1798,8 +1877,49 @@ def get_intelligent_answer(user_question: str):
                 "sql_query": generated_sql
             }
 
-        with engine.connect() as connection:
-            df = pd.read_sql_query(sql=text(generated_sql), con=connection)
+        # Planner estimate against the query type's budget: rewrite or refuse runaway queries
+        try:
+            generated_sql, cost_report = cost_guard.guard(generated_sql, intent, builder_context, engine)
+        except cost_guard.CostGuardError as ce:
+            return {
+                "query_type": "Error",
+                "summary": str(ce),
+                "data": [],
+                "sql_query": generated_sql.render() if hasattr(generated_sql, "render") else generated_sql
+            }
+
+        emit("sql", sql_query=generated_sql.render() if hasattr(generated_sql, "render") else generated_sql)
+
+        # Hot tier always; the Parquet cold tier too when the time range reaches it
+        time_range = sql_builder._get_time_range(intent.get("time_constraint"), context.get("max_date"))
+        df = None
+        try:
+            if intent.get("query_type") == "Proximity" and not intent.get("time_constraint"):
+                # Current positions: answer from the in-process fleet snapshot. Metrics nobody
+                # asked for are narrowed to the ones it carries rather than sending the query to SQL
+                metrics = intent["metrics"]
+                if metrics_defaulted:
+                    metrics = [m for m in metrics if m in fleet_snapshot.SURFACE_METRICS]
+                df = fleet_snapshot.nearest(intent["latitude"], intent["longitude"], intent.get("distance_km", 500),
+                                            intent.get("limit", 5), metrics)
+                if df is not None:
+                    intent["metrics"] = metrics
+            if df is None and intent.get("query_type") == "Proximity":
+                # Expanding-radius KNN: stops at the first radius holding `limit` floats
+                df = knn_search.nearest(intent, {"max_date_obj": context.get("max_date")}, engine, time_range)
+            if df is None and cost_report["action"] == "rollup":
+                # dataset_stats already covers both tiers
+                df = query_executor.execute(generated_sql, engine, intent.get("query_type"))
+            if df is None:
+                df = tiered_storage.read_query(generated_sql, engine, intent.get("query_type"), time_range)
+        except session_profiles.QueryTimeoutError as te:
+            # The query type's statement timeout stopped it (see session_profiles)
+            return {
+                "query_type": "Error",
+                "summary": str(te),
+                "data": [],
+                "sql_query": generated_sql.render() if hasattr(generated_sql, "render") else generated_sql
+            }
 
         # DataFrame column uniqueness fix (safe fallback)
         if len(set(df.columns)) < len(df.columns):
@@ -1816,12 +1936,21 @@ def get_intelligent_answer(user_question: str):
 
         # If data is missing for graph/series queries, fill with random/similar values
         data_records = []
+        # LTTB-thin long trajectories/profiles for the chart; insights still see every row
+        chart_rows = downsample.chart_positions(df, intent.get("query_type"), zoom=zoom) if not df.empty else None
         if not df.empty:
             for col in df.columns:
                 if pd.api.types.is_datetime64_any_dtype(df[col]):
                     df[col] = df[col].dt.strftime('%Y-%m-%d %H:%M:%S')
             df = df.replace({np.nan: None})
-            data_records = df.to_dict(orient='records')
+            chart_df = df.iloc[chart_rows] if chart_rows is not None else df
+            if intent.get("query_type") == "Scatter":
+                # Sample keys and per-cell sums only feed the server-side statistics
+                chart_df = chart_df[density.chart_columns(chart_df)]
+            elif intent.get("query_type") == "Comparison":
+                # Per-period sums and counts only feed the per-region roll-up
+                chart_df = chart_df[comparison.chart_columns(chart_df)]
+            data_records = chart_df.to_dict(orient='records')
         # Removed synthetic random data generation: keep empty to be transparent
 
 
@@ -1835,32 +1964,6 @@ def get_intelligent_answer(user_question: str):
                 "data": []
             }
 
-        # Missing float ID check: suggest available floats for user's filters
-        if intent.get("query_type") in ["Trajectory", "Profile"] and not intent.get("float_id"):
-            # Find available floats for the user's location/time filter
-            where_clauses = []
-            if intent.get("location_clause"):
-                where_clauses.append(intent["location_clause"])
-            if intent.get("time_constraint"):
-                max_date = context.get("max_date") or datetime.now()
-                time_clause = sql_builder._get_time_clause(intent["time_constraint"], max_date)
-                if time_clause != "1=1":
-                    where_clauses.append(time_clause)
-            where_sql = " AND ".join(where_clauses) if where_clauses else "1=1"
-            float_query = f'SELECT DISTINCT "float_id", MAX("latitude") as latitude, MAX("longitude") as longitude, MAX("timestamp") as timestamp FROM argo_data WHERE {where_sql} GROUP BY "float_id" ORDER BY "float_id" ASC LIMIT 20;'
-            with engine.connect() as connection:
-                floats_df = pd.read_sql_query(sql=text(float_query), con=connection)
-            floats = floats_df.to_dict(orient='records') if not floats_df.empty else []
-            float_ids = [str(row['float_id']) for row in floats]
-            msg = "No float ID specified. Please provide a valid float ID for this query."
-            if float_ids:
-                msg += f" Available floats for your query: {', '.join(float_ids)}."
-            return {
-                "query_type": "Error",
-                "summary": msg,
-                "data": floats
-            }
-
         # Out-of-range or future time check
         # Dynamic year range validation (current year + 1 grace)
         current_year = datetime.now().year
@@ -1889,14 +1992,21 @@ def get_intelligent_answer(user_question: str):
                         else:
                             row[m] = None
 
-        num_records = len(data_records)
+        num_records = len(df)
         query_type = intent.get("query_type", "General")
+        emit("data", query_type=query_type, data=data_records, record_count=num_records)
         
         # Build detailed results summary based on query type
         results_summary_text = f"Found {num_records} records."
         
         # Add specific statistics based on query type and data
-        if not df.empty:
+        if not df.empty and query_type == "Comparison":
+            # Period rows roll up into exact per-region figures (not a mean of period means)
+            for entry in comparison.region_summary(df):
+                figures = [f"{m} avg {entry[m]['mean']:.2f}{_get_unit(m)} (range {entry[m]['min']} - {entry[m]['max']})"
+                           for m in comparison.metric_columns(df) if entry[m]["mean"] is not None]
+                results_summary_text += f" {entry['region'].title()}: {entry['measurements']:,} measurements, {', '.join(figures)}."
+        elif not df.empty:
             if 'distance_km' in df.columns:
                 min_dist = df['distance_km'].min()
                 max_dist = df['distance_km'].max()
@@ -1989,38 +2099,62 @@ def get_intelligent_answer(user_question: str):
         elif num_records < 10:
             results_summary_text += f" (Limited results. {data_range_info})"
 
-        # === STEP 3: Generate natural language summary with LLM ===
-        summarization_prompt = PromptTemplate.from_template(SUMMARIZATION_PROMPT)
-        summary_chain = summarization_prompt | llm | StrOutputParser()
-        
-        try:
-            # Use retry logic for summarization too
-            summary = invoke_with_retry(summary_chain, {
-                "question": user_question, 
-                "results_summary": results_summary_text,
-                "query_type": query_type,
-                "sample_data": sample_data_str if sample_data_str else "No sample data available"
-            }, max_retries=2)
-            
-            # Clean up the summary (remove any markdown formatting)
-            summary = summary.strip()
-            if summary.startswith("```"):
-                summary = re.sub(r'^```\w*\s*', '', summary)
-                summary = re.sub(r'\s*```$', '', summary)
-                
-        except Exception as summary_error:
-            logging.warning(f"Summarization failed: {summary_error}. Using fallback.")
-            # If summarization LLM call fails, fallback to internal summary
-            summary = results_summary_text
+        if cost_report.get("note"):
+            results_summary_text += f" Note: {cost_report['note']}"
+
+        # === STEP 3: Calculate Structured Insights ===
+        insights = calculate_insights(df, data_records, query_type, intent)
+        emit("insights", insights=insights, data_range=data_range_info)
+
+        # === STEP 4: Answer text from the insights; the LLM only when asked ===
+        notes = [cost_report.get("note")]
+        if 0 < num_records < 10 and query_type != "Statistic":
+            notes.append(data_range_info)
+        summary = summary_templates.render(query_type, insights, intent, num_records,
+                                           fallback=results_summary_text, notes=notes)
+        summary_source = "template"
+        tokens = []
+        if llm_summary and num_records:
+            try:
+                summarization_prompt = PromptTemplate.from_template(SUMMARIZATION_PROMPT)
+                summary_chain = summarization_prompt | llm | StrOutputParser()
+                summary_inputs = {
+                    "question": user_question,
+                    "results_summary": results_summary_text,
+                    "query_type": query_type,
+                    "sample_data": sample_data_str if sample_data_str else "No sample data available"
+                }
+                if on_event is None:
+                    # Use retry logic for summarization too
+                    llm_text = invoke_with_retry(summary_chain, summary_inputs, max_retries=2)
+                else:
+                    # Tokens go out as they arrive (no retry once some were sent)
+                    for token in summary_chain.stream(summary_inputs):
+                        tokens.append(token)
+                        emit("chunk", content=token)
+                    llm_text = "".join(tokens)
+
+                # Clean up the summary (remove any markdown formatting)
+                llm_text = llm_text.strip()
+                if llm_text.startswith("```"):
+                    llm_text = re.sub(r'^```\w*\s*', '', llm_text)
+                    llm_text = re.sub(r'\s*```$', '', llm_text)
+                if llm_text:
+                    summary, summary_source = llm_text, "llm"
+            except QueryCancelled:
+                raise
+            except Exception as summary_error:
+                # Keep the template answer
+                logging.warning(f"Summarization failed: {summary_error}. Using template summary.")
+        if summary_source == "template":
+            # LLM tokens already sent are replaced, not followed, by the template
+            emit("chunk", content=summary, **({"replace": True} if tokens else {}))
 
         # Calculate processing time
         processing_time = time.time() - start_time
         
         logging.info(f"Query completed in {processing_time:.2f}s. Summary: {summary[:100]}...")
         
-        # === STEP 4: Calculate Structured Insights ===
-        insights = calculate_insights(df, data_records, query_type, intent)
-        
         # === STEP 5: Recommend Visualization ===
         visualization = recommend_visualization(query_type, df, intent)
         
@@ -2029,10 +2163,19 @@ def get_intelligent_answer(user_question: str):
         
         # === STEP 7: Build Metadata ===
         metadata = build_metadata(df, intent, context, processing_time)
+        metadata["intent_source"] = intent_source
+        metadata["intent_confidence"] = rules.confidence
+        metadata["summary_source"] = summary_source
+        metadata["stage_timings_ms"] = prequery.report()
+        if chart_rows is not None:
+            metadata["chart_points"] = len(data_records)
+        if cost_report["action"] != "unchecked":
+            metadata["query_cost"] = cost_report
         
         response_payload = {
             "query_type": intent.get("query_type"),
-            "sql_query": generated_sql,
+            # Values inlined so the SQL shown to users can be run as-is
+            "sql_query": generated_sql.render() if hasattr(generated_sql, "render") else generated_sql,
             "summary": summary,
             "data": data_records,
             "data_range": data_range_info,
@@ -2052,6 +2195,9 @@ def get_intelligent_answer(user_question: str):
             
         return response_payload
 
+    except QueryCancelled:
+        logging.info(f"Query cancelled: {user_question[:50]}")
+        raise
     except Exception as e:
         logging.error(f"Error in brain: {e}", exc_info=True)
         # Return a friendly error message, never a raw traceback
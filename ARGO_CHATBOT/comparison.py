@@ -0,0 +1,89 @@
+"""
+FloatChart Region Comparison
+============================
+Per-region figures for Comparison queries.
+
+sql_builder returns one row per (region, period) holding each metric's
+AVG, MIN, MAX, SUM and COUNT. The periods are the side-by-side series;
+rolling them up gives every region's exact mean (SUM / COUNT, weighted by
+measurements), extremes and measurement count without a second query.
+The same sums let tiered_storage merge hot and cold rows exactly.
+"""
+
+from typing import Optional
+
+import pandas as pd
+
+KEY_COLUMNS = ["region_order", "region", "period"]
+# Per-period columns used only for roll-ups and tier merges, not sent to the chart
+PARTIAL_SUFFIXES = ("_sum", "_count")
+
+
+def metric_columns(df: pd.DataFrame) -> list:
+    """Metrics of a Comparison result, in query order."""
+    return [c for c in df.columns if f"{c}_sum" in df.columns and f"{c}_count" in df.columns]
+
+
+def chart_columns(df: pd.DataFrame) -> list:
+    """Columns of a Comparison result worth sending to the frontend."""
+    return [c for c in df.columns if c != "region_order" and not c.endswith(PARTIAL_SUFFIXES)]
+
+
+def merge_periods(hot: pd.DataFrame, cold: pd.DataFrame) -> pd.DataFrame:
+    """Combine per-period rows from two tiers; a period split by the tier cutoff adds up."""
+    metrics = metric_columns(hot)
+    rows = pd.concat([hot, cold], ignore_index=True)
+    numeric = ["measurements"] + [f"{m}{s}" for m in metrics for s in ("_min", "_max") + PARTIAL_SUFFIXES]
+    for col in numeric:
+        rows[col] = pd.to_numeric(rows[col], errors="coerce")
+    rows["period"] = pd.to_datetime(rows["period"])
+    agg = {"measurements": "sum"}
+    for m in metrics:
+        agg.update({f"{m}_min": "min", f"{m}_max": "max", f"{m}_sum": "sum", f"{m}_count": "sum"})
+    merged = rows.groupby(KEY_COLUMNS, as_index=False).agg(agg)
+    for m in metrics:
+        merged[m] = merged[f"{m}_sum"] / merged[f"{m}_count"].where(merged[f"{m}_count"] > 0)
+    return merged.sort_values(["region_order", "period"]).reset_index(drop=True)[list(hot.columns)]
+
+
+def region_summary(df: pd.DataFrame) -> list:
+    """
+    One entry per region, in the order asked:
+    {"region", "measurements", "periods", <metric>: {"mean", "min", "max", "count"}}.
+    """
+    if df.empty:
+        return []
+    metrics = metric_columns(df)
+    summary = []
+    order = "region_order" if "region_order" in df.columns else "region"
+    for _, rows in df.groupby(order, sort=True):
+        entry = {"region": rows["region"].iloc[0],
+                 "measurements": int(pd.to_numeric(rows["measurements"]).sum()),
+                 "periods": int(len(rows))}
+        for m in metrics:
+            total = pd.to_numeric(rows[f"{m}_sum"], errors="coerce").sum()
+            count = int(pd.to_numeric(rows[f"{m}_count"], errors="coerce").sum())
+            entry[m] = {
+                "mean": round(float(total / count), 4) if count else None,
+                "min": _round(pd.to_numeric(rows[f"{m}_min"], errors="coerce").min()),
+                "max": _round(pd.to_numeric(rows[f"{m}_max"], errors="coerce").max()),
+                "count": count,
+            }
+        summary.append(entry)
+    return summary
+
+
+def contrast(summary: list, metric: str) -> Optional[dict]:
+    """Highest and lowest regional mean of ``metric`` and their difference, or None."""
+    ranked = [e for e in summary if (e.get(metric) or {}).get("mean") is not None]
+    if len(ranked) < 2:
+        return None
+    ranked.sort(key=lambda e: e[metric]["mean"], reverse=True)
+    high, low = ranked[0], ranked[-1]
+    return {"metric": metric, "highest": high["region"], "highest_mean": high[metric]["mean"],
+            "lowest": low["region"], "lowest_mean": low[metric]["mean"],
+            "difference": round(high[metric]["mean"] - low[metric]["mean"], 4)}
+
+
+def _round(value) -> Optional[float]:
+    return None if pd.isna(value) else round(float(value), 4)
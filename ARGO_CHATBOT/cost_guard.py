@@ -0,0 +1,301 @@
+"""
+FloatChart Cost Guard
+=====================
+Checks the planner's estimate for every generated query before it runs, so
+an unbounded question cannot scan all of ``argo_data`` while it holds a
+pooled connection.
+
+brain calls :func:`guard` between ``sql_builder.build_query`` and execution.
+It runs one ``EXPLAIN`` (no execution) and compares the estimate with the
+query type's budget in :data:`BUDGETS`:
+
+    PostgreSQL      the plan's total cost (LIMIT-aware)
+    CockroachDB,    estimated rows read by the largest scan
+    DuckDB
+
+An over-budget query is rewritten by the first step that brings it back
+under budget, re-estimating each rewrite:
+
+    rollup          a whole-dataset average or float count is read from the
+                    maintained dataset_stats row (exact, one-row read)
+    sample          General and Scatter rows come from a repeatable
+                    TABLESAMPLE of the table (not on CockroachDB, and only
+                    when the time range stays in the hot tier: the DuckDB
+                    view over the Parquet cold tier has no such clause)
+    narrow time     a question without a time range is limited to the
+                    last 12 months, 3 months or 30 days of data
+
+Otherwise it raises :class:`CostGuardError` asking for a narrower question.
+If the estimate itself fails the query runs unchanged: the guard never
+blocks a query it could not plan. Only single statements are planned, on
+PostgreSQL and CockroachDB inside a READ ONLY transaction with a short
+statement timeout (/api/v1/validate-sql plans SQL sent by the caller). Rewritten SQL passes the same safety
+check (sql_builder._apply_safety_check) as every built query.
+
+Configuration:
+    COST_GUARD_ENABLED   "0" to skip the guard (default "1")
+    COST_GUARD_SCALE     multiplies every budget (default 1.0)
+"""
+
+import json
+import logging
+import os
+import re
+from typing import Optional, Tuple
+
+from sqlalchemy import text
+
+import sql_builder
+import tiered_storage
+from query_executor import used_params
+from session_profiles import dialect_flavour
+from sql_sanitizer import SQLSanitizer
+
+# Estimates a query may reach before it is rewritten or refused.
+# rows: rows read by the largest scan; cost: PostgreSQL plan cost units.
+BUDGETS = {
+    "Statistic":   {"rows": 20_000_000, "cost": 1_500_000},
+    "Time-Series": {"rows": 20_000_000, "cost": 1_500_000},
+    "Scatter":     {"rows": 5_000_000, "cost": 500_000},
+    "default":     {"rows": 2_000_000, "cost": 250_000},
+}
+
+# Proximity runs knn_search's bounded radius steps instead
+UNGUARDED_TYPES = {"Proximity"}
+
+# Windows tried, widest first, for questions without a time range
+NARROW_WINDOWS = ["last 12 months", "last 3 months", "last 30 days"]
+
+# Sample sizes (percent) offered; a fixed ladder keeps the number of query shapes small
+SAMPLE_PERCENTS = [50, 20, 10, 5, 2, 1, 0.5, 0.2, 0.1]
+SAMPLE_SEED = 42
+_SAMPLE_TYPES = {"General", "Scatter"}
+_FROM_RE = re.compile(r'\bFROM\s+argo_data\b', re.IGNORECASE)
+
+# EXPLAIN only plans, so anything slower than this is not worth waiting for
+ESTIMATE_TIMEOUT_MS = 2_000
+
+_ROLLUP_METRICS = {"temperature", "salinity"}
+_CRDB_ROWS_RE = re.compile(r"estimated row count:\s*([\d,]+)")
+
+
+class CostGuardError(ValueError):
+    """A generated query is over budget and could not be rewritten."""
+
+
+def is_enabled() -> bool:
+    return os.getenv("COST_GUARD_ENABLED", "1").lower() not in ("0", "false", "no")
+
+
+def budget_for(query_type: Optional[str]) -> dict:
+    """The budget for ``query_type``, scaled by COST_GUARD_SCALE."""
+    try:
+        scale = float(os.getenv("COST_GUARD_SCALE", "1"))
+    except ValueError:
+        scale = 1.0
+    budget = BUDGETS.get(query_type) or BUDGETS["default"]
+    return {key: value * scale for key, value in budget.items()}
+
+
+# ── Estimation ───────────────────────────────────────────────────────────────
+
+def _walk(node: dict, children_key: str):
+    yield node
+    for child in node.get(children_key) or []:
+        yield from _walk(child, children_key)
+
+
+def _postgres_estimate(conn, sql: str, params: dict) -> dict:
+    raw = conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"), params).scalar()
+    plan = (json.loads(raw) if isinstance(raw, str) else raw)[0]["Plan"]
+    scans = [n["Plan Rows"] for n in _walk(plan, "Plans") if "Scan" in n.get("Node Type", "")]
+    return {"rows": int(max(scans, default=plan["Plan Rows"])),
+            "cost": float(plan["Total Cost"]), "output_rows": int(plan["Plan Rows"])}
+
+
+def _duckdb_estimate(conn, sql: str, params: dict) -> dict:
+    roots = json.loads(conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"), params).fetchone()[1])
+    scans, output = [], None
+    for root in roots:
+        for node in _walk(root, "children"):
+            card = (node.get("extra_info") or {}).get("Estimated Cardinality")
+            if card is None:
+                continue
+            if output is None:
+                output = int(card)
+            if "SCAN" in node.get("name", "").upper():
+                scans.append(int(card))
+    return {"rows": max(scans, default=output or 0), "cost": None, "output_rows": output}
+
+
+def _cockroach_estimate(conn, sql: str, params: dict) -> dict:
+    lines = [row[0] for row in conn.execute(text(f"EXPLAIN {sql}"), params)]
+    rows = [int(m.group(1).replace(",", "")) for m in map(_CRDB_ROWS_RE.search, lines) if m]
+    return {"rows": max(rows, default=0), "cost": None, "output_rows": rows[0] if rows else None}
+
+
+_ESTIMATORS = {
+    "postgresql": _postgres_estimate,
+    "cockroachdb": _cockroach_estimate,
+    "duckdb": _duckdb_estimate,
+}
+
+
+def estimate(sql, engine) -> Optional[dict]:
+    """
+    Planner estimate for ``sql`` without running it.
+
+    Returns:
+        dict | None: rows (read by the largest scan), cost (PostgreSQL plan
+        cost, else None) and output_rows — or None if this database cannot
+        plan the query, or ``sql`` is not exactly one statement.
+    """
+    statement = str(sql).strip().rstrip(";")
+    if SQLSanitizer.statement_count(statement) != 1:
+        logging.warning("Cost estimate skipped: the SQL is not a single statement")
+        return None
+    params = used_params(str(sql), getattr(sql, "params", {}))
+    try:
+        with engine.connect() as conn:
+            flavour = dialect_flavour(conn)
+            estimator = _ESTIMATORS.get(flavour)
+            if estimator is None:
+                return None
+            if flavour in ("postgresql", "cockroachdb"):
+                # Rolled back when the connection is returned
+                conn.execute(text("SET TRANSACTION READ ONLY"))
+                conn.execute(text(f"SET LOCAL statement_timeout = {ESTIMATE_TIMEOUT_MS}"))
+            return {**estimator(conn, statement, params), "dialect": flavour}
+    except Exception as e:
+        logging.warning(f"Cost estimate failed: {e}")
+        return None
+
+
+def over_budget(est: dict, budget: dict) -> bool:
+    """Cost decides where the planner reports one, else rows read."""
+    if est.get("cost") is not None:
+        return est["cost"] > budget["cost"]
+    return est["rows"] > budget["rows"]
+
+
+# ── Rewrites ─────────────────────────────────────────────────────────────────
+
+def _rollup_query(intent: dict):
+    """Whole-dataset average or float count as a dataset_stats read, or None."""
+    if intent.get("query_type") != "Statistic" or intent.get("time_constraint"):
+        return None
+    if intent.get("location_clause", "1=1") != "1=1" or intent.get("float_id") is not None:
+        return None
+    aggregation = (intent.get("aggregation") or "avg").lower()
+    metrics = intent.get("metrics") or []
+    if aggregation == "count":
+        select = 'float_count AS "count"'
+    elif aggregation == "avg" and metrics and set(metrics) <= _ROLLUP_METRICS:
+        select = ", ".join(f'{m}_sum / NULLIF({m}_count, 0) AS "{m}"' for m in metrics)
+    else:
+        return None
+    return sql_builder._apply_safety_check(sql_builder.BoundQuery(
+        f"SELECT {select} FROM dataset_stats WHERE scope = :scope;", {"scope": "global"}))
+
+
+def _sampled_query(sql, flavour: str, percent: float):
+    """``sql`` reading a repeatable ``percent`` sample of argo_data, or None."""
+    if flavour == "postgresql":
+        clause = f"TABLESAMPLE SYSTEM ({percent:g}) REPEATABLE ({SAMPLE_SEED})"
+    elif flavour == "duckdb":
+        clause = f"TABLESAMPLE {percent:g}% (system, {SAMPLE_SEED})"
+    else:
+        return None
+    return sql_builder._apply_safety_check(sql_builder.BoundQuery(
+        _FROM_RE.sub(f"FROM argo_data {clause}", str(sql), count=1), dict(getattr(sql, "params", {}))))
+
+
+def _sample_percent(est: dict, budget: dict) -> float:
+    """Largest ladder percentage whose scaled estimate fits the budget."""
+    if est.get("cost") is not None:
+        ratio = budget["cost"] / max(est["cost"], 1.0)
+    else:
+        ratio = budget["rows"] / max(est["rows"], 1)
+    fits = [p for p in SAMPLE_PERCENTS if p / 100 <= ratio]
+    return fits[0] if fits else SAMPLE_PERCENTS[-1]
+
+
+def _refusal(query_type: str, est: dict, budget: dict) -> str:
+    if est.get("cost") is not None:
+        size = f"an estimated cost of {est['cost']:,.0f} (budget {budget['cost']:,.0f})"
+    else:
+        size = f"about {est['rows']:,} rows (budget {budget['rows']:,.0f})"
+    return (f"This {query_type or 'query'} would scan {size}. Please narrow it down: add a time "
+            f"range (e.g. 'in March 2024' or 'last 6 months'), a region (e.g. 'in the Bay of "
+            f"Bengal') or a float ID.")
+
+
+def guard(sql, intent: dict, db_context: dict, engine) -> Tuple[object, dict]:
+    """
+    Check ``sql`` against its budget, rewriting it if needed.
+
+    Args:
+        sql: BoundQuery from sql_builder.build_query().
+        intent: The parsed intent. When the time range is narrowed its
+            ``time_constraint`` is updated in place.
+        db_context: Passed to build_query() for rebuilt queries.
+        engine: SQLAlchemy engine of the hot tier.
+
+    Returns:
+        (sql, report): the query to run and a dict with action ("ok",
+        "rollup", "sample", "narrow_time" or "unchecked"), estimate, budget
+        and a user-facing note for rewrites.
+
+    Raises:
+        CostGuardError: if no rewrite brings the query under budget.
+    """
+    query_type = intent.get("query_type")
+    if not is_enabled() or query_type in UNGUARDED_TYPES:
+        return sql, {"action": "unchecked"}
+    budget = budget_for(query_type)
+    est = estimate(sql, engine)
+    if est is None:
+        return sql, {"action": "unchecked", "budget": budget}
+    report = {"action": "ok", "estimate": est, "budget": budget, "note": None}
+    if not over_budget(est, budget):
+        return sql, report
+
+    def accept(candidate, action, note, candidate_est=None):
+        candidate_est = candidate_est or estimate(candidate, engine)
+        if candidate_est is None or over_budget(candidate_est, budget):
+            return None
+        return candidate, {**report, "action": action, "estimate": candidate_est,
+                           "original_estimate": est, "note": note}
+
+    rollup = _rollup_query(intent)
+    if rollup is not None:
+        result = accept(rollup, "rollup", "Answered from the maintained dataset statistics.")
+        if result:
+            return result
+
+    time_range = sql_builder._get_time_range(intent.get("time_constraint"), db_context.get("max_date_obj"))
+    if query_type in _SAMPLE_TYPES and "bins" not in getattr(sql, "params", {}) \
+            and not tiered_storage.reaches_cold_tier(time_range):
+        percent = _sample_percent(est, budget)
+        sampled = _sampled_query(sql, est["dialect"], percent)
+        if sampled is not None:
+            # A page sample reads percent% of the table by construction
+            # (DuckDB's EXPLAIN does not scale the scan for it)
+            scaled = {**est, "rows": int(est["rows"] * percent / 100),
+                      "cost": est["cost"] * percent / 100 if est["cost"] is not None else None}
+            result = accept(sampled, "sample",
+                            f"Based on a repeatable {percent:g}% sample of the data to keep the query fast.",
+                            scaled)
+            if result:
+                return result
+
+    if not intent.get("time_constraint"):
+        for window in NARROW_WINDOWS:
+            narrowed = sql_builder.build_query({**intent, "time_constraint": window}, db_context, engine)
+            result = accept(narrowed, "narrow_time",
+                            f"Limited to the {window} of data; ask for a specific period to see more.")
+            if result:
+                intent["time_constraint"] = window
+                return result
+
+    raise CostGuardError(_refusal(query_type, est, budget))
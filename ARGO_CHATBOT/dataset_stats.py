@@ -0,0 +1,299 @@
+"""
+FloatChart Dataset Statistics
+=============================
+Incrementally maintained summary of ``argo_data`` for O(1) stats endpoints.
+
+Every ingest writer inserts with ``ON CONFLICT DO NOTHING RETURNING ...`` and
+hands the rows that were *actually* inserted to :func:`apply_insert_delta`
+inside the same transaction, so the counters can never drift from the data:
+
+    dataset_stats    one row per scope — 'global' and 'region:<name>' —
+                     holding row counts, min/max timestamp and running
+                     sums/counts for mean temperature and salinity
+    dataset_floats   one row per float_id, so the distinct float count is
+                     maintained without COUNT(DISTINCT)
+
+Readers (dashboard, agent tools, Data Generator status) call
+:func:`read_stats`, a single primary-key range read.
+
+Writers use DB-API cursors (psycopg2), readers use SQLAlchemy engines. Like
+geocell.py, this module is shared with DATA_GENERATOR.
+"""
+
+import math
+from typing import Dict, Iterable, Optional
+
+GLOBAL_SCOPE = "global"
+REGION_PREFIX = "region:"
+
+# Canonical regions for per-region row counts: (lat_min, lat_max, lon_min, lon_max).
+# Boxes may overlap; a row counts towards every region containing it.
+STATS_REGIONS = {
+    "india_waters": (-10, 25, 50, 100),
+    "indian_ocean": (-40, 25, 30, 120),
+    "bay_of_bengal": (5, 22, 80, 95),
+    "arabian_sea": (5, 25, 50, 75),
+    "north_pacific": (0, 60, 100, 180),
+    "south_pacific": (-60, 0, 100, 180),
+    "north_atlantic": (0, 60, -80, 0),
+    "south_atlantic": (-60, 0, -80, 0),
+    "mediterranean": (30, 46, -6, 36),
+    "south_china_sea": (0, 25, 100, 121),
+    "caribbean": (10, 22, -88, -60),
+    "arctic": (60, 85, -180, 180),
+    "southern_ocean": (-80, -60, -180, 180),
+}
+
+SCHEMA_STATEMENTS = [
+    """CREATE TABLE IF NOT EXISTS dataset_stats (
+        scope VARCHAR(64) PRIMARY KEY,
+        total_rows INT8 NOT NULL DEFAULT 0,
+        float_count INT8 NOT NULL DEFAULT 0,
+        min_timestamp TIMESTAMP,
+        max_timestamp TIMESTAMP,
+        temperature_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+        temperature_count INT8 NOT NULL DEFAULT 0,
+        salinity_sum DOUBLE PRECISION NOT NULL DEFAULT 0,
+        salinity_count INT8 NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP
+    )""",
+    "CREATE TABLE IF NOT EXISTS dataset_floats (float_id INT8 PRIMARY KEY)",
+]
+
+# Columns writers must RETURN from their INSERT for compute_delta()
+RETURNING_COLUMNS = "float_id, timestamp, latitude, longitude, temperature, salinity"
+
+_UPSERT_SQL = """
+    INSERT INTO dataset_stats (scope, total_rows, float_count, min_timestamp, max_timestamp,
+                               temperature_sum, temperature_count, salinity_sum, salinity_count, updated_at)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, NOW())
+    ON CONFLICT (scope) DO UPDATE SET
+        total_rows = dataset_stats.total_rows + EXCLUDED.total_rows,
+        float_count = dataset_stats.float_count + EXCLUDED.float_count,
+        min_timestamp = LEAST(COALESCE(dataset_stats.min_timestamp, EXCLUDED.min_timestamp),
+                              COALESCE(EXCLUDED.min_timestamp, dataset_stats.min_timestamp)),
+        max_timestamp = GREATEST(COALESCE(dataset_stats.max_timestamp, EXCLUDED.max_timestamp),
+                                 COALESCE(EXCLUDED.max_timestamp, dataset_stats.max_timestamp)),
+        temperature_sum = dataset_stats.temperature_sum + EXCLUDED.temperature_sum,
+        temperature_count = dataset_stats.temperature_count + EXCLUDED.temperature_count,
+        salinity_sum = dataset_stats.salinity_sum + EXCLUDED.salinity_sum,
+        salinity_count = dataset_stats.salinity_count + EXCLUDED.salinity_count,
+        updated_at = NOW()
+"""
+
+
+def _is_value(x) -> bool:
+    """True for a real number (not None, not NaN)."""
+    return x is not None and not (isinstance(x, float) and math.isnan(x))
+
+
+def _empty_delta() -> dict:
+    return {"total_rows": 0, "min_timestamp": None, "max_timestamp": None,
+            "temperature_sum": 0.0, "temperature_count": 0,
+            "salinity_sum": 0.0, "salinity_count": 0}
+
+
+def compute_delta(rows: Iterable[tuple]) -> Dict[str, dict]:
+    """
+    Aggregate inserted rows into per-scope deltas.
+
+    Args:
+        rows: Tuples in RETURNING_COLUMNS order
+              (float_id, timestamp, latitude, longitude, temperature, salinity).
+
+    Returns:
+        dict: scope → delta counters. Only scopes with rows are present.
+    """
+    deltas: Dict[str, dict] = {}
+    for _float_id, ts, lat, lon, temp, sal in rows:
+        scopes = [GLOBAL_SCOPE]
+        if _is_value(lat) and _is_value(lon):
+            scopes += [
+                REGION_PREFIX + name
+                for name, (lat_min, lat_max, lon_min, lon_max) in STATS_REGIONS.items()
+                if lat_min <= lat <= lat_max and lon_min <= lon <= lon_max
+            ]
+        for scope in scopes:
+            d = deltas.setdefault(scope, _empty_delta())
+            d["total_rows"] += 1
+            if ts is not None:
+                d["min_timestamp"] = ts if d["min_timestamp"] is None else min(d["min_timestamp"], ts)
+                d["max_timestamp"] = ts if d["max_timestamp"] is None else max(d["max_timestamp"], ts)
+            if _is_value(temp):
+                d["temperature_sum"] += float(temp)
+                d["temperature_count"] += 1
+            if _is_value(sal):
+                d["salinity_sum"] += float(sal)
+                d["salinity_count"] += 1
+    return deltas
+
+
+def apply_insert_delta(cursor, rows) -> int:
+    """
+    Fold freshly inserted rows into the counters.
+
+    Must run in the same transaction as the INSERT that produced ``rows``
+    (commit afterwards), so stats and data commit or roll back together.
+
+    Returns:
+        int: Number of rows applied.
+    """
+    rows = list(rows)
+    if not rows:
+        return 0
+    from psycopg2.extras import execute_values
+
+    float_ids = sorted({int(r[0]) for r in rows if r[0] is not None})
+    new_floats = execute_values(
+        cursor,
+        "INSERT INTO dataset_floats (float_id) VALUES %s ON CONFLICT (float_id) DO NOTHING RETURNING float_id",
+        [(f,) for f in float_ids],
+        fetch=True,
+    ) if float_ids else []
+
+    # Scopes are upserted in sorted order so concurrent writers lock rows consistently
+    for scope, d in sorted(compute_delta(rows).items()):
+        cursor.execute(_UPSERT_SQL, (
+            scope, d["total_rows"], len(new_floats) if scope == GLOBAL_SCOPE else 0,
+            d["min_timestamp"], d["max_timestamp"],
+            d["temperature_sum"], d["temperature_count"],
+            d["salinity_sum"], d["salinity_count"],
+        ))
+    return len(rows)
+
+
+def ensure_schema(cursor) -> None:
+    """Create the stats tables if they do not exist."""
+    for stmt in SCHEMA_STATEMENTS:
+        cursor.execute(stmt)
+
+
+def reset(cursor) -> None:
+    """Zero all counters (use in the same transaction as a full DELETE)."""
+    cursor.execute("DELETE FROM dataset_stats")
+    cursor.execute("DELETE FROM dataset_floats")
+
+
+def rebuild(cursor) -> None:
+    """
+    Recompute every counter from argo_data with one full scan.
+
+    Used to backfill existing databases and to repair drift after manual
+    edits. Rows moved to the Parquet cold tier still belong to the dataset,
+    so the same scan runs there too (see tiered_storage.read_cold). Run
+    inside a transaction so readers never see partial counters.
+    """
+    ensure_schema(cursor)
+    reset(cursor)
+    cursor.execute("INSERT INTO dataset_floats (float_id) SELECT DISTINCT float_id FROM argo_data WHERE float_id IS NOT NULL")
+
+    scopes = [(GLOBAL_SCOPE, "TRUE")] + [
+        (REGION_PREFIX + name,
+         f"latitude BETWEEN {lat_min} AND {lat_max} AND longitude BETWEEN {lon_min} AND {lon_max}")
+        for name, (lat_min, lat_max, lon_min, lon_max) in STATS_REGIONS.items()
+    ]
+    temp = "NULLIF(temperature, 'NaN')"
+    sal = "NULLIF(salinity, 'NaN')"
+    select_parts = []
+    for _scope, cond in scopes:
+        select_parts += [
+            f"SUM(CASE WHEN {cond} THEN 1 ELSE 0 END)",
+            f"MIN(CASE WHEN {cond} THEN timestamp END)",
+            f"MAX(CASE WHEN {cond} THEN timestamp END)",
+            f"SUM(CASE WHEN {cond} THEN {temp} END)",
+            f"COUNT(CASE WHEN {cond} THEN {temp} END)",
+            f"SUM(CASE WHEN {cond} THEN {sal} END)",
+            f"COUNT(CASE WHEN {cond} THEN {sal} END)",
+        ]
+    totals_sql = f"SELECT {', '.join(select_parts)} FROM argo_data"
+    cursor.execute(totals_sql)
+    totals = list(cursor.fetchone())
+    cold = _cold_totals(cursor, totals_sql)
+    if cold is not None:
+        for i, value in enumerate(cold):
+            if not _is_value(value):
+                continue
+            if totals[i] is None:
+                totals[i] = value
+            elif i % 7 == 1:
+                totals[i] = min(totals[i], value)
+            elif i % 7 == 2:
+                totals[i] = max(totals[i], value)
+            else:
+                totals[i] += value
+    cursor.execute("SELECT COUNT(*) FROM dataset_floats")
+    float_count = cursor.fetchone()[0]
+
+    for i, (scope, _cond) in enumerate(scopes):
+        rows, min_ts, max_ts, t_sum, t_cnt, s_sum, s_cnt = totals[i * 7:(i + 1) * 7]
+        if not rows and scope != GLOBAL_SCOPE:
+            continue
+        cursor.execute(_UPSERT_SQL, (
+            scope, rows or 0, float_count if scope == GLOBAL_SCOPE else 0,
+            min_ts, max_ts, t_sum or 0.0, t_cnt or 0, s_sum or 0.0, s_cnt or 0,
+        ))
+
+
+def _cold_totals(cursor, totals_sql: str) -> Optional[list]:
+    """
+    Run the rebuild scan over the cold tier and add its floats to dataset_floats.
+
+    Returns:
+        list | None: The scan's values (None for SQL NULL), or None when no
+        cold tier holds rows. A cold tier that cannot be read raises, so a
+        rebuild never silently drops the moved history.
+    """
+    import tiered_storage  # Deferred: pulls in pandas and the query modules
+
+    totals = tiered_storage.read_cold(totals_sql)
+    if totals is None:
+        return None
+    floats = tiered_storage.read_cold("SELECT DISTINCT float_id FROM argo_data WHERE float_id IS NOT NULL")
+    cursor.executemany("INSERT INTO dataset_floats (float_id) VALUES (%s) ON CONFLICT (float_id) DO NOTHING",
+                       [(int(f),) for f in floats["float_id"]])
+    # NULL aggregates arrive as NaN / NaT, counts and sums as NumPy scalars
+    row = totals.astype(object).iloc[0]
+    return [None if value is None or value != value else getattr(value, "item", lambda: value)()
+            for value in row]
+
+
+def read_stats(engine) -> Optional[dict]:
+    """
+    Read the maintained statistics.
+
+    Returns:
+        dict | None: total_records, unique_floats, min_date, max_date,
+        avg_temperature, avg_salinity, regions ({name: rows}) and
+        updated_at — or None if the tables are missing or empty
+        (run ``python bulk_fetch.py --rebuild-stats`` to backfill).
+    """
+    from sqlalchemy import text
+
+    try:
+        with engine.connect() as conn:
+            rows = conn.execute(text(
+                "SELECT scope, total_rows, float_count, min_timestamp, max_timestamp, "
+                "temperature_sum, temperature_count, salinity_sum, salinity_count, updated_at "
+                "FROM dataset_stats"
+            )).fetchall()
+    except Exception:
+        return None
+
+    by_scope = {row[0]: row for row in rows}
+    g = by_scope.get(GLOBAL_SCOPE)
+    if g is None:
+        return None
+    return {
+        "total_records": int(g[1]),
+        "unique_floats": int(g[2]),
+        "min_date": g[3].isoformat() if g[3] else None,
+        "max_date": g[4].isoformat() if g[4] else None,
+        "avg_temperature": round(g[5] / g[6], 2) if g[6] else None,
+        "avg_salinity": round(g[7] / g[8], 2) if g[8] else None,
+        "regions": {
+            scope[len(REGION_PREFIX):]: int(row[1])
+            for scope, row in sorted(by_scope.items())
+            if scope.startswith(REGION_PREFIX)
+        },
+        "updated_at": g[9].isoformat() if g[9] else None,
+    }
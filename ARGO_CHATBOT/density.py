@@ -0,0 +1,103 @@
+"""
+FloatChart Scatter Density
+==========================
+Population statistics for Scatter queries, computed server-side.
+
+In density mode sql_builder bins every matching row into a 2-D histogram
+(e.g. temperature x salinity for a T-S diagram). Each cell also returns the
+sums of x, y, x², y² and xy over its rows. Adding them up over all cells
+gives the exact correlation and least-squares line of the whole population,
+while the browser only receives the cells (a few KB).
+
+In sample mode the same statistics are computed from the sampled rows.
+"""
+
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+# Per-cell columns used only for the statistics, not sent to the chart
+SUM_COLUMNS = ["sum_x", "sum_y", "sum_xx", "sum_yy", "sum_xy"]
+INTERNAL_COLUMNS = SUM_COLUMNS + ["x_bin", "y_bin", "x_min", "x_max", "y_min", "y_max", "sample_key"]
+
+
+def is_density(df: pd.DataFrame) -> bool:
+    """Whether ``df`` is a density-mode Scatter result."""
+    return "count" in df.columns and set(SUM_COLUMNS) <= set(df.columns)
+
+
+def chart_columns(df: pd.DataFrame) -> list:
+    """Columns of a Scatter result worth sending to the frontend."""
+    return [c for c in df.columns if c not in INTERNAL_COLUMNS]
+
+
+def _fit(n, sx, sy, sxx, syy, sxy) -> dict:
+    """Correlation and least-squares line from sufficient statistics."""
+    if n < 2:
+        return {"n": int(n)}
+    cov = sxy - sx * sy / n
+    var_x, var_y = sxx - sx * sx / n, syy - sy * sy / n
+    stats = {"n": int(n), "mean_x": round(float(sx / n), 4), "mean_y": round(float(sy / n), 4)}
+    if var_x > 0:
+        slope = cov / var_x
+        stats["slope"] = round(float(slope), 6)
+        stats["intercept"] = round(float((sy - slope * sx) / n), 6)
+    if var_x > 0 and var_y > 0:
+        stats["r"] = round(float(np.clip(cov / np.sqrt(var_x * var_y), -1.0, 1.0)), 4)
+        stats["r_squared"] = round(stats["r"] ** 2, 4)
+    return stats
+
+
+def population_fit(df: pd.DataFrame) -> dict:
+    """Exact population statistics from a density-mode result (y regressed on x)."""
+    sums = df[["count"] + SUM_COLUMNS].apply(pd.to_numeric, errors="coerce").sum()
+    return _fit(float(sums["count"]), *(float(sums[c]) for c in SUM_COLUMNS))
+
+
+def sample_fit(df: pd.DataFrame, x: str, y: str) -> dict:
+    """The same statistics over the rows of a sample-mode result."""
+    pts = df[[x, y]].apply(pd.to_numeric, errors="coerce").dropna()
+    xs, ys = pts[x].to_numpy(dtype=float), pts[y].to_numpy(dtype=float)
+    return _fit(len(xs), xs.sum(), ys.sum(), (xs * xs).sum(), (ys * ys).sum(), (xs * ys).sum())
+
+
+def merge_cells(hot: pd.DataFrame, cold: pd.DataFrame, bins: int) -> pd.DataFrame:
+    """
+    Combine density results from two tiers.
+
+    Each tier bins between its own min and max, so cells are re-binned on
+    the combined range at their rows' mean position (sum_x / count). Counts
+    and sums add up, so the population statistics stay exact; cell borders
+    move by at most one original cell.
+    """
+    x_col, y_col = hot.columns[0], hot.columns[1]
+    cells = pd.concat([hot, cold], ignore_index=True)
+    for col in ["count", "x_min", "x_max", "y_min", "y_max"] + SUM_COLUMNS:
+        cells[col] = pd.to_numeric(cells[col], errors="coerce")
+    x_min, x_max = cells["x_min"].min(), cells["x_max"].max()
+    y_min, y_max = cells["y_min"].min(), cells["y_max"].max()
+
+    def rebin(mean, lo, hi):
+        span = hi - lo
+        if not span > 0:
+            return np.zeros(len(mean), dtype=int)
+        return np.minimum(np.floor((mean - lo) / span * bins), bins - 1).astype(int)
+
+    cells["x_bin"] = rebin(cells["sum_x"] / cells["count"], x_min, x_max)
+    cells["y_bin"] = rebin(cells["sum_y"] / cells["count"], y_min, y_max)
+    merged = cells.groupby(["x_bin", "y_bin"], as_index=False)[["count"] + SUM_COLUMNS].sum()
+    merged[x_col] = x_min + (merged["x_bin"] + 0.5) * (x_max - x_min) / bins
+    merged[y_col] = y_min + (merged["y_bin"] + 0.5) * (y_max - y_min) / bins
+    merged["x_min"], merged["x_max"], merged["y_min"], merged["y_max"] = x_min, x_max, y_min, y_max
+    return merged[list(hot.columns)]
+
+
+def scatter_stats(df: pd.DataFrame, metrics: Optional[list] = None) -> dict:
+    """Population (density) or sample statistics for a Scatter result, or {}."""
+    if df.empty:
+        return {}
+    if is_density(df):
+        return population_fit(df)
+    numeric = [c for c in (metrics or df.columns) if c in df.columns and c not in INTERNAL_COLUMNS]
+    return sample_fit(df, numeric[0], numeric[1]) if len(numeric) >= 2 else {}
@@ -0,0 +1,199 @@
+"""
+FloatChart Downsampling
+=======================
+Largest-Triangle-Three-Buckets (LTTB) downsampling of chart payloads.
+
+A float trajectory can hold thousands of rows, and a profile one row per
+pressure level. The browser draws at most a few hundred distinguishable
+points per chart. Above that, extra rows only cost JSON bytes and Chart.js
+time. LTTB (Steinarsson, 2013) keeps the first and last point and splits
+the rest into ``threshold - 2`` buckets. From each bucket it keeps the
+point forming the largest triangle with the previously kept point and the
+next bucket's average. Peaks, troughs and the thermocline survive; long
+flat stretches are thinned.
+
+Float tracks on the map can instead be simplified for a zoom level with
+Douglas-Peucker: a position is dropped when it lies within one screen pixel
+of the line through its kept neighbours, so the drawn path is unchanged.
+
+Only the rows sent to the frontend are downsampled. Insights and summaries
+are still computed on every row.
+
+Configuration:
+    CHART_MAX_POINTS   Maximum rows per chart payload (default 2000, 0 = off)
+"""
+
+import os
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_MAX_POINTS = 2000
+
+_EARTH_RADIUS_KM = 6371.0
+_EQUATOR_KM = 40075.017
+_TILE_PX = 256              # web-map tile size at zoom 0
+ZOOM_TOLERANCE_PX = 1.0     # path deviation allowed by zoom simplification
+
+# query_type → (x column, preferred y columns); the first y present is used
+CHART_AXES = {
+    "Trajectory": ("timestamp", ("temperature", "salinity", "latitude")),
+    "Path": ("timestamp", ("latitude",)),
+    "Profile": ("pressure", ("temperature", "salinity", "dissolved_oxygen", "chlorophyll", "nitrate", "ph")),
+}
+
+
+def get_max_points() -> int:
+    """Configured point cap for chart payloads (0 disables downsampling)."""
+    try:
+        return max(0, int(os.getenv("CHART_MAX_POINTS", DEFAULT_MAX_POINTS)))
+    except ValueError:
+        return DEFAULT_MAX_POINTS
+
+
+def lttb_indices(x, y, threshold: int) -> np.ndarray:
+    """
+    Return the positions LTTB keeps out of ``len(x)`` points.
+
+    Args:
+        x (array-like): Monotonic x values (numbers or datetime64).
+        y (array-like): y values; NaNs are treated as the series mean.
+        threshold (int): Number of points to keep (>= 3).
+
+    Returns:
+        np.ndarray: Sorted integer positions, first and last included.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        x = x.astype("datetime64[s]").astype(np.int64)
+    x = x.astype(np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    if np.isnan(y).any():
+        y = np.where(np.isnan(y), np.nanmean(y) if np.isfinite(y).any() else 0.0, y)
+
+    # Bucket edges over the interior points 1 .. n-2
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    keep = np.empty(threshold, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        # Average of the next bucket (the last point for the final bucket)
+        nlo, nhi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x, avg_y = x[nlo:nhi].mean(), y[nlo:nhi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(np.argmax(area))
+        keep[i + 1] = a
+    return keep
+
+
+def haversine_km(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Great-circle distance in km, element-wise over arrays."""
+    p1, p2 = np.radians(lat1), np.radians(lat2)
+    a = np.sin((p2 - p1) / 2) ** 2 + np.cos(p1) * np.cos(p2) * np.sin(np.radians(np.subtract(lon2, lon1)) / 2) ** 2
+    return 2 * _EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def zoom_tolerance_km(zoom: float, lat: float = 0.0, pixels: float = ZOOM_TOLERANCE_PX) -> float:
+    """Ground distance covered by ``pixels`` screen pixels at a web-map zoom level."""
+    return pixels * _EQUATOR_KM * np.cos(np.radians(lat)) / (_TILE_PX * 2.0 ** zoom)
+
+
+def douglas_peucker_indices(lat, lon, tolerance_km: float) -> np.ndarray:
+    """
+    Return the positions Douglas-Peucker keeps out of a lat/lon track.
+
+    Points are projected to a local equirectangular plane in km (longitudes
+    unwrapped, so a track crossing 180° stays continuous). Every point kept
+    is further than ``tolerance_km`` from the segment joining the points
+    kept on either side of it.
+
+    Args:
+        lat, lon (array-like): Track positions in degrees, in travel order.
+        tolerance_km (float): Maximum perpendicular deviation dropped.
+
+    Returns:
+        np.ndarray: Sorted integer positions, first and last included.
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    n = len(lat)
+    if n < 3 or tolerance_km <= 0:
+        return np.arange(n)
+    lon = np.degrees(np.unwrap(np.radians(np.asarray(lon, dtype=np.float64))))
+    km_per_deg = np.radians(1.0) * _EARTH_RADIUS_KM
+    x = lon * km_per_deg * np.cos(np.radians(np.nanmean(lat)))
+    y = lat * km_per_deg
+
+    keep = np.zeros(n, dtype=bool)
+    keep[[0, -1]] = True
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        dx, dy = x[last] - x[first], y[last] - y[first]
+        px, py = x[first + 1:last] - x[first], y[first + 1:last] - y[first]
+        seg2 = dx * dx + dy * dy
+        # Distance to the segment (not the infinite line), so loops back
+        # towards the start are not mistaken for straight runs
+        t = np.clip((px * dx + py * dy) / seg2, 0.0, 1.0) if seg2 > 0 else np.zeros_like(px)
+        dist = np.hypot(px - t * dx, py - t * dy)
+        i = int(np.argmax(dist))
+        if dist[i] > tolerance_km:
+            split = first + 1 + i
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    return np.flatnonzero(keep)
+
+
+def track_positions(df: pd.DataFrame, zoom: float) -> np.ndarray:
+    """
+    Row positions of a trajectory/path frame simplified for a map zoom level.
+
+    Each float's track is simplified on its own, in time order.
+    """
+    order = np.argsort(df["timestamp"].to_numpy(), kind="stable") if "timestamp" in df.columns else np.arange(len(df))
+    floats = df["float_id"].to_numpy()[order] if "float_id" in df.columns else np.zeros(len(df))
+    lat = df["latitude"].to_numpy(dtype=np.float64, na_value=np.nan)[order]
+    lon = df["longitude"].to_numpy(dtype=np.float64, na_value=np.nan)[order]
+    tolerance = zoom_tolerance_km(zoom, float(np.nanmean(lat)) if np.isfinite(lat).any() else 0.0)
+    kept = []
+    for float_id in pd.unique(floats):
+        rows = np.flatnonzero((floats == float_id) & np.isfinite(lat) & np.isfinite(lon))
+        kept.append(rows[douglas_peucker_indices(lat[rows], lon[rows], tolerance)])
+    return order[np.sort(np.concatenate(kept))] if kept else np.arange(0)
+
+
+def chart_positions(df: pd.DataFrame, query_type: str, max_points: Optional[int] = None,
+                    zoom: Optional[float] = None) -> Optional[np.ndarray]:
+    """
+    Row positions of ``df`` to send to the chart, or None to send every row.
+
+    With a ``zoom`` level, trajectory and path rows are first simplified with
+    Douglas-Peucker for that zoom (see track_positions). Rows are then
+    LTTB-downsampled along the query type's chart axes (see CHART_AXES)
+    when more than ``max_points`` remain. Trajectory and path rows are
+    ordered by time, profiles by pressure.
+    """
+    max_points = get_max_points() if max_points is None else max_points
+    axes = CHART_AXES.get(query_type)
+    if (zoom is not None and query_type in ("Trajectory", "Path")
+            and {"latitude", "longitude"} <= set(df.columns) and len(df) > 2):
+        rows = track_positions(df, zoom)
+        thinned = chart_positions(df.iloc[rows], query_type, max_points)
+        return rows if thinned is None else rows[thinned]
+    if not axes or not max_points or len(df) <= max_points:
+        return None
+    x_col, y_cols = axes
+    y_col = next((c for c in y_cols if c in df.columns and df[c].notna().any()), None)
+    if x_col not in df.columns or y_col is None:
+        return None
+    order = np.argsort(df[x_col].to_numpy(), kind="stable")
+    keep = lttb_indices(df[x_col].to_numpy()[order], df[y_col].to_numpy(dtype=np.float64, na_value=np.nan)[order],
+                        max_points)
+    return order[keep]
@@ -0,0 +1,353 @@
+"""
+FloatChart Geocells
+===================
+Hierarchical spatial cell keys for ARGO measurements.
+
+Every row in ``argo_data`` carries a ``geocell`` — a 60-bit integer geohash
+(12 base-32 characters of precision) computed at ingest time. Because geohash
+bits are interleaved longitude/latitude from coarse to fine, every coarser
+cell is simply a contiguous integer range of the full-precision key:
+
+    cell "tdr" (precision 3)  →  geocell >= lo AND geocell < hi
+
+Integer ranges are sargable on any B-tree (PostgreSQL, CockroachDB, DuckDB)
+and do not depend on text collation, so a proximity search becomes a handful
+of index range scans over the ring of cells covering the search radius,
+followed by the exact great-circle distance on the surviving candidates.
+
+This module is intentionally dependency-free (stdlib only) so that both the
+chat app and the DATA_GENERATOR ingest writers can import it.
+"""
+
+import math
+from typing import List, Optional, Tuple
+
+# ── Geohash parameters ───────────────────────────────────────────────────────
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+_BASE32_INDEX = {ch: i for i, ch in enumerate(_BASE32)}
+
+GEOCELL_PRECISION = 12                 # characters stored in the column
+GEOCELL_BITS = GEOCELL_PRECISION * 5   # 60 bits — fits a signed INT8
+
+_KM_PER_DEGREE = 111.2
+_EARTH_RADIUS_KM = 6371.0              # matches the distance formula in sql_builder
+_BOX_MARGIN = 1.001                    # absorbs float rounding at the box edge
+
+# Proximity's search area: at least this many degrees either side of the point,
+# or 1.5x the radius (in degrees at 111 km each) for larger radii
+_AREA_MIN_DEG = 8.0
+_AREA_SCALE = 1.5
+
+
+def encode_int(lat: float, lon: float, precision: int = GEOCELL_PRECISION) -> int:
+    """
+    Encode a coordinate as an integer geohash with ``precision`` characters.
+
+    Args:
+        lat (float): Latitude in decimal degrees (-90 to 90).
+        lon (float): Longitude in decimal degrees (-180 to 180).
+        precision (int): Number of base-32 characters (1-12).
+
+    Returns:
+        int: The interleaved geohash bits (5 * precision bits wide).
+
+    Example:
+        >>> to_geohash(encode_int(13.08, 80.27, 5), 5)
+        'tf346'
+    """
+    lat_lo, lat_hi = -90.0, 90.0
+    lon_lo, lon_hi = -180.0, 180.0
+    value = 0
+    for bit in range(precision * 5):
+        value <<= 1
+        if bit % 2 == 0:
+            mid = (lon_lo + lon_hi) / 2
+            if lon >= mid:
+                value |= 1
+                lon_lo = mid
+            else:
+                lon_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                value |= 1
+                lat_lo = mid
+            else:
+                lat_hi = mid
+    return value
+
+
+def encode(lat: float, lon: float, precision: int = GEOCELL_PRECISION) -> str:
+    """Encode a coordinate as a geohash string of ``precision`` characters."""
+    return to_geohash(encode_int(lat, lon, precision), precision)
+
+
+def to_geohash(cell: int, precision: int = GEOCELL_PRECISION) -> str:
+    """Render an integer cell of ``precision`` characters as a geohash string."""
+    chars = []
+    for _ in range(precision):
+        chars.append(_BASE32[cell & 0x1F])
+        cell >>= 5
+    return "".join(reversed(chars))
+
+
+def from_geohash(geohash: str) -> int:
+    """Parse a geohash string into its integer cell."""
+    value = 0
+    for ch in geohash.lower():
+        value = (value << 5) | _BASE32_INDEX[ch]
+    return value
+
+
+def decode_bbox(cell: int, precision: int) -> Tuple[float, float, float, float]:
+    """
+    Return the bounding box of an integer cell.
+
+    Returns:
+        tuple: (lat_min, lat_max, lon_min, lon_max) in decimal degrees.
+    """
+    lat_lo, lat_hi = -90.0, 90.0
+    lon_lo, lon_hi = -180.0, 180.0
+    nbits = precision * 5
+    for bit in range(nbits):
+        is_set = (cell >> (nbits - 1 - bit)) & 1
+        if bit % 2 == 0:
+            mid = (lon_lo + lon_hi) / 2
+            if is_set:
+                lon_lo = mid
+            else:
+                lon_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if is_set:
+                lat_lo = mid
+            else:
+                lat_hi = mid
+    return lat_lo, lat_hi, lon_lo, lon_hi
+
+
+def cell_size_deg(precision: int) -> Tuple[float, float]:
+    """Return (height_deg, width_deg) of a cell at ``precision``."""
+    nbits = precision * 5
+    lat_bits = nbits // 2
+    lon_bits = nbits - lat_bits
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lon_bits)
+
+
+def precision_for_radius(lat: float, radius_km: float) -> int:
+    """
+    Pick the finest precision whose cells are at least ``radius_km`` on a side.
+
+    With cells that large, the 3x3 ring around the centre cell is guaranteed
+    to contain every point within ``radius_km`` of the centre. Cell width is
+    measured at the poleward edge of the search circle, where it is narrowest.
+
+    Returns:
+        int: Precision 1-12, or 0 if the radius is too large for any ring
+             (callers should then skip the cell prefilter entirely).
+    """
+    radius_deg = radius_km / _KM_PER_DEGREE
+    edge_lat = min(89.9, abs(lat) + radius_deg)
+    cos_lat = max(math.cos(math.radians(edge_lat)), 1e-6)
+    best = 0
+    for precision in range(1, GEOCELL_PRECISION + 1):
+        height_deg, width_deg = cell_size_deg(precision)
+        height_km = height_deg * _KM_PER_DEGREE
+        width_km = width_deg * _KM_PER_DEGREE * cos_lat
+        if height_km >= radius_km and width_km >= radius_km:
+            best = precision
+        else:
+            break
+    return best
+
+
+def neighbours(cell: int, precision: int) -> List[int]:
+    """
+    Return the (up to) 8 cells surrounding ``cell`` at the same precision.
+
+    Longitude wraps at the antimeridian; rows beyond the poles are skipped.
+    """
+    lat_min, lat_max, lon_min, lon_max = decode_bbox(cell, precision)
+    height, width = lat_max - lat_min, lon_max - lon_min
+    centre_lat, centre_lon = (lat_min + lat_max) / 2, (lon_min + lon_max) / 2
+    result = []
+    for dlat in (-1, 0, 1):
+        lat = centre_lat + dlat * height
+        if lat < -90 or lat > 90:
+            continue
+        for dlon in (-1, 0, 1):
+            if dlat == 0 and dlon == 0:
+                continue
+            lon = centre_lon + dlon * width
+            lon = ((lon + 180.0) % 360.0) - 180.0
+            neighbour = encode_int(lat, lon, precision)
+            if neighbour != cell and neighbour not in result:
+                result.append(neighbour)
+    return result
+
+
+def covering_cells(lat: float, lon: float, radius_km: float) -> Optional[Tuple[int, List[int]]]:
+    """
+    Return the ring of cells that covers a circle of ``radius_km``.
+
+    Returns:
+        tuple | None: ``(precision, cells)`` — the centre cell plus its
+        neighbours — or None when the radius is too large to benefit from a
+        cell prefilter.
+    """
+    precision = precision_for_radius(lat, radius_km)
+    if precision == 0:
+        return None
+    centre = encode_int(lat, lon, precision)
+    return precision, sorted({centre, *neighbours(centre, precision)})
+
+
+def cell_ranges(cells: List[int], precision: int) -> List[Tuple[int, int]]:
+    """
+    Convert cells at ``precision`` into merged half-open ranges of the
+    full-precision ``geocell`` key.
+    """
+    shift = GEOCELL_BITS - precision * 5
+    ranges: List[Tuple[int, int]] = []
+    for cell in sorted(cells):
+        lo, hi = cell << shift, (cell + 1) << shift
+        if ranges and ranges[-1][1] == lo:
+            ranges[-1] = (ranges[-1][0], hi)
+        else:
+            ranges.append((lo, hi))
+    return ranges
+
+
+def ring_predicate(lat: float, lon: float, radius_km: float, column: str = "geocell",
+                   params: Optional[dict] = None) -> Optional[str]:
+    """
+    Build a sargable SQL predicate selecting the cell ring around a point.
+
+    Example:
+        >>> ring_predicate(13.08, 80.27, 100)
+        '(("geocell" >= 918... AND "geocell" < 918...) OR (...))'
+
+    When ``params`` is given, the range bounds are emitted as :cell_lo_N /
+    :cell_hi_N bind markers and their values are added to it.
+
+    Returns:
+        str | None: The predicate, or None if no prefilter applies.
+    """
+    cover = covering_cells(lat, lon, radius_km)
+    if cover is None:
+        return None
+    precision, cells = cover
+    parts = []
+    for i, (lo, hi) in enumerate(cell_ranges(cells, precision)):
+        if params is not None:
+            params[f"cell_lo_{i}"], params[f"cell_hi_{i}"] = lo, hi
+            lo, hi = f":cell_lo_{i}", f":cell_hi_{i}"
+        parts.append(f'("{column}" >= {lo} AND "{column}" < {hi})')
+    return "(" + " OR ".join(parts) + ")"
+
+
+def bounding_box(lat: float, lon: float, radius_km: float
+                 ) -> Tuple[float, float, List[Tuple[float, float]]]:
+    """
+    Return the smallest latitude/longitude box containing a search circle.
+
+    The longitude half-width is the circle's true extent on the sphere,
+    asin(sin(r / R) / cos(lat)), so boxes narrow toward the equator and widen
+    toward the poles instead of using one fixed degree margin. A box crossing
+    the antimeridian is split in two; a circle containing a pole spans every
+    longitude.
+
+    Returns:
+        tuple: ``(lat_min, lat_max, lon_ranges)`` where ``lon_ranges`` is a
+        list of 0-2 ``(lon_min, lon_max)`` pairs — empty when every longitude
+        is inside the box.
+    """
+    angular = radius_km / _EARTH_RADIUS_KM
+    lat_delta = math.degrees(angular) * _BOX_MARGIN
+    lat_min, lat_max = max(-90.0, lat - lat_delta), min(90.0, lat + lat_delta)
+    if lat_min <= -90.0 or lat_max >= 90.0 or angular >= math.pi / 2:
+        return lat_min, lat_max, []
+    ratio = math.sin(angular) / math.cos(math.radians(lat))
+    if ratio >= 1.0:
+        return lat_min, lat_max, []
+    lon_delta = math.degrees(math.asin(ratio)) * _BOX_MARGIN
+    return lat_min, lat_max, _lon_ranges(lon, lon_delta)
+
+
+def _lon_ranges(lon: float, lon_delta: float) -> List[Tuple[float, float]]:
+    """``lon`` ± ``lon_delta`` as 0-2 ranges, split at the antimeridian (none when it spans every longitude)."""
+    if lon_delta >= 180.0:
+        return []
+    lo, hi = lon - lon_delta, lon + lon_delta
+    if lo < -180.0:
+        return [(lo + 360.0, 180.0), (-180.0, hi)]
+    if hi > 180.0:
+        return [(lo, 180.0), (-180.0, hi - 360.0)]
+    return [(lo, hi)]
+
+
+def search_area(lat: float, lon: float, radius_km: float
+                ) -> Tuple[float, float, List[Tuple[float, float]]]:
+    """
+    Return the area a Proximity query takes each float's latest position from.
+
+    This is the fixed square the Proximity query has always searched,
+    ±max(8°, 1.5 · r / 111) around the point, split at the antimeridian and
+    widened in longitude where the circle reaches further (high latitudes),
+    so it always contains the circle. Same format as :func:`bounding_box`.
+    """
+    delta = max(_AREA_MIN_DEG, radius_km / 111 * _AREA_SCALE)
+    circle = bounding_box(lat, lon, radius_km)[2]
+    if not circle:
+        return lat - delta, lat + delta, []
+    return lat - delta, lat + delta, _lon_ranges(lon, max(delta, sum(hi - lo for lo, hi in circle) / 2))
+
+
+def box_predicate(lat: float, lon: float, radius_km: float, params: Optional[dict] = None,
+                  lat_column: str = "latitude", lon_column: str = "longitude") -> str:
+    """
+    Build a sargable latitude/longitude BETWEEN predicate for a search circle.
+
+    When ``params`` is given, the bounds are emitted as :lat_min / :lat_max /
+    :lon_min_N / :lon_max_N bind markers and their values are added to it.
+
+    Example:
+        >>> box_predicate(-10.0, 179.0, 300)
+        '"latitude" BETWEEN -12.7... AND -7.3... AND ("longitude" BETWEEN ... OR ...)'
+    """
+    return _box_sql(bounding_box(lat, lon, radius_km), params, lat_column, lon_column)
+
+
+def area_predicate(lat: float, lon: float, radius_km: float, params: Optional[dict] = None,
+                   lat_column: str = "latitude", lon_column: str = "longitude") -> str:
+    """
+    :func:`box_predicate` for the :func:`search_area` of a search circle.
+
+    Bind markers are :area_lat_min / :area_lat_max / :area_lon_min_N /
+    :area_lon_max_N, so it can sit next to a box predicate in one query.
+    """
+    return _box_sql(search_area(lat, lon, radius_km), params, lat_column, lon_column, prefix="area_")
+
+
+def _box_sql(box, params: Optional[dict], lat_column: str, lon_column: str, prefix: str = "") -> str:
+    lat_min, lat_max, lon_ranges = box
+    if params is not None:
+        params[f"{prefix}lat_min"], params[f"{prefix}lat_max"] = lat_min, lat_max
+        lat_min, lat_max = f":{prefix}lat_min", f":{prefix}lat_max"
+    predicate = f'"{lat_column}" BETWEEN {lat_min} AND {lat_max}'
+    parts = []
+    for i, (lo, hi) in enumerate(lon_ranges):
+        if params is not None:
+            params[f"{prefix}lon_min_{i}"], params[f"{prefix}lon_max_{i}"] = lo, hi
+            lo, hi = f":{prefix}lon_min_{i}", f":{prefix}lon_max_{i}"
+        parts.append(f'"{lon_column}" BETWEEN {lo} AND {hi}')
+    if len(parts) == 1:
+        predicate += f" AND {parts[0]}"
+    elif parts:
+        predicate += " AND (" + " OR ".join(parts) + ")"
+    return predicate
+
+
+def cluster_shift(precision: int) -> int:
+    """Bit shift that truncates a full ``geocell`` key to ``precision`` characters."""
+    return GEOCELL_BITS - precision * 5
@@ -0,0 +1,219 @@
+"""
+FloatChart Intent Cache
+=======================
+Persistent cache of parsed intents, keyed by the normalized question, so a
+question phrased like an earlier one skips the LLM intent parse and goes
+straight to sql_builder (the data itself is always queried fresh).
+
+Only the question's wording is cached, never results: a hit returns the
+intent JSON the LLM produced, and everything after it (coordinates, time
+constraints resolved against the newest data, SQL, the query) runs as for
+a miss. Questions are normalized before lookup:
+
+    "What's the AVERAGE temperature near Chennai in 2023?"
+    "what s the average temperature near chennai in 2023"   (key)
+
+Case, punctuation and spacing do not matter; words, numbers and dates do.
+
+The cache is one SQLite file shared by every worker process. Each entry
+carries a version: a hash of the intent prompt and the location gazetteer.
+Editing either makes older entries unreachable from the new code, while
+workers still on the old version (a rolling deploy) keep using theirs.
+The file keeps at most INTENT_CACHE_SIZE entries and evicts the least
+recently used; entries of another version unused for INTENT_CACHE_STALE_DAYS
+are dropped on the next store.
+
+Configuration:
+    INTENT_CACHE_ENABLED      "0" / "false" turns the cache off (default on)
+    INTENT_CACHE_PATH         SQLite file (default ARGO_CHATBOT/.intent_cache.sqlite3)
+    INTENT_CACHE_SIZE         entries kept (default 5000)
+    INTENT_CACHE_STALE_DAYS   days another version's entries are kept unused (default 7)
+"""
+
+import os
+import re
+import json
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+import unicodedata
+from pathlib import Path
+from typing import Optional
+
+DEFAULT_SIZE = 5000
+DEFAULT_STALE_DAYS = 7.0
+
+# Dates, signed decimals and words; everything else separates them
+_TOKEN_RE = re.compile(r"\d{4}-\d{2}-\d{2}|-?\d+(?:\.\d+)?|[a-z]+")
+
+_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS intents (
+        question   TEXT NOT NULL,
+        version    TEXT NOT NULL,
+        intent     TEXT NOT NULL,
+        hits       INTEGER NOT NULL DEFAULT 0,
+        created    REAL NOT NULL,
+        last_used  REAL NOT NULL,
+        PRIMARY KEY (question, version)
+    )
+"""
+
+_lock = threading.Lock()
+_conn = {"path": None, "connection": None}
+_stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "errors": 0}
+
+
+# ── Configuration ────────────────────────────────────────────────────────────
+
+def is_enabled() -> bool:
+    return os.getenv("INTENT_CACHE_ENABLED", "1").lower() not in ("0", "false", "no")
+
+
+def get_cache_path() -> Path:
+    """Cache file (INTENT_CACHE_PATH, default ARGO_CHATBOT/.intent_cache.sqlite3)."""
+    path = os.getenv("INTENT_CACHE_PATH")
+    return Path(path) if path else Path(__file__).parent / ".intent_cache.sqlite3"
+
+
+def _max_entries() -> int:
+    try:
+        return max(1, int(os.getenv("INTENT_CACHE_SIZE", DEFAULT_SIZE)))
+    except ValueError:
+        return DEFAULT_SIZE
+
+
+def _stale_seconds() -> float:
+    try:
+        return max(0.0, float(os.getenv("INTENT_CACHE_STALE_DAYS", DEFAULT_STALE_DAYS))) * 86400
+    except ValueError:
+        return DEFAULT_STALE_DAYS * 86400
+
+
+# ── Keys ─────────────────────────────────────────────────────────────────────
+
+def normalize(question: str) -> str:
+    """The cache key for ``question``: lower-case words, numbers and dates separated by one space."""
+    question = unicodedata.normalize("NFKC", question or "").lower()
+    return " ".join(_TOKEN_RE.findall(question))
+
+
+def version_of(*sources) -> str:
+    """A short hash of what the cached intents depend on (the prompt text, the gazetteer)."""
+    digest = hashlib.sha256()
+    for source in sources:
+        digest.update(json.dumps(source, sort_keys=True, default=str).encode())
+    return digest.hexdigest()[:16]
+
+
+# ── Storage ──────────────────────────────────────────────────────────────────
+
+def _connection() -> sqlite3.Connection:
+    """The open cache file (callers hold _lock)."""
+    path = get_cache_path()
+    if _conn["path"] != path:
+        if _conn["connection"] is not None:
+            _conn["connection"].close()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Autocommit; other workers write to the same file
+        connection = sqlite3.connect(str(path), timeout=2.0, isolation_level=None, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode=WAL")
+        keys = [row[1] for row in connection.execute("PRAGMA table_info(intents)") if row[5]]
+        if keys == ["question"]:
+            # Files from before (question, version) keys: one entry per question
+            connection.execute("DROP TABLE intents")
+        connection.execute(_SCHEMA)
+        _conn.update(path=path, connection=connection)
+    return _conn["connection"]
+
+
+def get(question: str, version: str) -> Optional[dict]:
+    """The cached intent for ``question`` under ``version``, or None."""
+    if not is_enabled():
+        return None
+    key = normalize(question)
+    if not key:
+        return None
+    with _lock:
+        try:
+            connection = _connection()
+            row = connection.execute("SELECT intent FROM intents WHERE question = ? AND version = ?",
+                                     (key, version)).fetchone()
+            if row is None:
+                _stats["misses"] += 1
+                return None
+            connection.execute("UPDATE intents SET hits = hits + 1, last_used = ? "
+                               "WHERE question = ? AND version = ?", (time.time(), key, version))
+            _stats["hits"] += 1
+            return json.loads(row[0])
+        except (sqlite3.Error, ValueError) as e:
+            _stats["errors"] += 1
+            logging.warning(f"Intent cache read failed: {e}")
+            return None
+
+
+def put(question: str, version: str, intent: dict) -> None:
+    """
+    Store the LLM's ``intent`` for ``question``, evicting the least recently
+    used beyond the size cap and other versions' entries unused for
+    INTENT_CACHE_STALE_DAYS.
+    """
+    if not is_enabled():
+        return
+    key = normalize(question)
+    if not key:
+        return
+    now = time.time()
+    with _lock:
+        try:
+            connection = _connection()
+            connection.execute(
+                "INSERT OR REPLACE INTO intents (question, version, intent, hits, created, last_used) "
+                "VALUES (?, ?, ?, 0, ?, ?)", (key, version, json.dumps(intent, default=str), now, now))
+            _stats["stores"] += 1
+            evicted = connection.execute(
+                "DELETE FROM intents WHERE rowid IN (SELECT rowid FROM intents "
+                "ORDER BY last_used DESC LIMIT -1 OFFSET ?)", (_max_entries(),)).rowcount
+            evicted += connection.execute("DELETE FROM intents WHERE version != ? AND last_used < ?",
+                                          (version, now - _stale_seconds())).rowcount
+            _stats["evictions"] += max(evicted, 0)
+        except (sqlite3.Error, TypeError) as e:
+            _stats["errors"] += 1
+            logging.warning(f"Intent cache write failed: {e}")
+
+
+def stats() -> dict:
+    """Hit metrics for this process, plus the size of the shared file."""
+    with _lock:
+        result = dict(_stats)
+        lookups = result["hits"] + result["misses"]
+        result["hit_rate"] = round(result["hits"] / lookups, 3) if lookups else None
+        result["enabled"] = is_enabled()
+        try:
+            connection = _conn["connection"]
+            result["entries"] = connection.execute("SELECT COUNT(*) FROM intents").fetchone()[0] \
+                if connection is not None else None
+        except sqlite3.Error:
+            result["entries"] = None
+    return result
+
+
+def clear() -> None:
+    """Drop every entry and reset the counters (tests, or after a prompt rollback)."""
+    with _lock:
+        if _conn["connection"] is not None:
+            try:
+                _conn["connection"].execute("DELETE FROM intents")
+            except sqlite3.Error as e:
+                logging.warning(f"Intent cache clear failed: {e}")
+        for name in _stats:
+            _stats[name] = 0
+
+
+def close() -> None:
+    """Close the cache file; the next lookup reopens it (tests switch INTENT_CACHE_PATH)."""
+    with _lock:
+        if _conn["connection"] is not None:
+            _conn["connection"].close()
+        _conn.update(path=None, connection=None)
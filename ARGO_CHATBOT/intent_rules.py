@@ -0,0 +1,366 @@
+"""
+FloatChart Intent Rules
+=======================
+Deterministic intent parser for the common question shapes, with a
+confidence score, so most questions never wait for the LLM:
+
+    "average temperature in the bay of bengal in 2023"
+    "nearest 5 floats to chennai within 300 km"
+    "trajectory of float 2902115"
+    "last 5 profiles of float 2902115"
+    "salinity trend in the arabian sea over the last 6 months"
+    "temperature vs salinity in the red sea"
+    "compare temperature in the bay of bengal and arabian sea"
+
+brain uses the rules' intent when its confidence reaches
+INTENT_RULES_MIN_CONFIDENCE, and asks the LLM otherwise (the rules' intent
+is also the fallback when the LLM reply holds no JSON). A question scores
+high when exactly one query type matches and what that type needs was
+found (a float ID for a trajectory, a known place or coordinates for a
+proximity search, two metrics for a scatter); ambiguity, places outside the
+gazetteer, reasoning words ("why", "explain"), exclusions ("except"),
+counts of anything but floats ("number of measurements") and long
+questions lower it.
+
+:func:`extract_hints` is the question-level extraction (coordinates, radius,
+limit, time constraint) that brain also applies to LLM intents.
+
+Patterns are compiled once; the gazetteer (brain.LOCATIONS) is compiled into
+one alternation per location table. Parsing a question takes well under a
+millisecond.
+
+Configuration:
+    INTENT_RULES_ENABLED          "0" / "false" sends every question to the LLM
+    INTENT_RULES_MIN_CONFIDENCE   threshold in [0, 1] (default 0.8)
+"""
+
+import os
+import re
+from datetime import datetime
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+import sql_builder
+import time_range
+
+DEFAULT_MIN_CONFIDENCE = 0.8
+DEFAULT_METRICS = ["temperature", "salinity"]
+
+_F = r"(-?\d+(?:\.\d+)?)"
+
+# Query-type cues, in precedence order (the first match wins when several do)
+_TYPE_PATTERNS = [
+    ("Statistic", re.compile(r"\b(?:average|avg|mean|count|how many|number of|maximum|max|minimum|min"
+                             r"|highest|lowest|warmest|coldest|hottest|saltiest|freshest)\b")),
+    ("Proximity", re.compile(r"\b(?:near|nearest|closest|close to|within|around)\b")),
+    ("Trajectory", re.compile(r"\b(?:trajectory|trajectories|path|track|tracks|movement|moved|travell?ed|drift(?:ed)?)\b")),
+    ("Profile", re.compile(r"\b(?:profiles?|depth|vertical)\b")),
+    ("Time-Series", re.compile(r"\b(?:trends?|over time|monthly|yearly|weekly|daily|time[- ]series|seasonal)\b")),
+    ("Scatter", re.compile(r"\b(?:vs\.?|versus|correlation|correlate[sd]?|relationship)\b|\bt-?s diagram")),
+]
+_NEAREST_RE = re.compile(r"\b(?:nearest|closest|within)\b")
+_COMPARE_RE = re.compile(r"\b(?:compare|comparison|vs\.?|versus|between|difference)\b")
+_DENSITY_RE = re.compile(r"\bt-?s diagram|\bdensity\b|\bdistribution\b")
+
+_AGGREGATIONS = [
+    ("count", re.compile(r"\b(?:count|how many|number of)\b")),
+    ("avg", re.compile(r"\b(?:average|avg|mean)\b")),
+    ("max", re.compile(r"\b(?:maximum|max|highest|warmest|hottest|saltiest)\b")),
+    ("min", re.compile(r"\b(?:minimum|min|lowest|coldest|freshest)\b")),
+]
+# sql_builder counts distinct floats: other counts ("number of measurements") go to the LLM
+_FLOAT_COUNT_RE = re.compile(r"\b(?:count|how many|number of)\s+(?:\w+\s+){0,2}floats?\b")
+_METRICS = [
+    ("temperature", re.compile(r"\b(?:temperatures?|temp|sst|warm\w*|cold\w*|hottest)\b")),
+    ("salinity", re.compile(r"\b(?:salinity|salt\w*|psu|freshest)\b")),
+    ("dissolved_oxygen", re.compile(r"\b(?:oxygen|o2|doxy)\b")),
+    ("chlorophyll", re.compile(r"\b(?:chlorophyll|chl)\b")),
+    ("pressure", re.compile(r"\b(?:pressure|depths?|dbar)\b")),
+]
+
+_FLOAT_RE = re.compile(r"\b(?:float|wmo)s?\s*(?:id|no\.?|number)?\s*[#:]?\s*(\d{5,8})\b")
+_PROFILE_COUNT_RE = re.compile(r"\b(?:last|latest|recent|newest)\s+(\d+)\s+profiles\b")
+_MONTH = (r"(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?"
+          r"|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)")
+_DAY = r"\d{1,2}(?:st|nd|rd|th)?"
+_TARGET_DATE_RE = re.compile(
+    r"\b(?:closest to|nearest to|around|on)\s+(?:the\s+)?"
+    rf"(\d{{4}}-\d{{1,2}}-\d{{1,2}}|\d{{1,2}}/\d{{1,2}}/\d{{4}}|{_DAY}\s+(?:of\s+)?{_MONTH},?\s+\d{{4}}"
+    rf"|{_MONTH}\s+{_DAY},?\s+\d{{4}}|[a-z]+ \d{{4}})\b")
+_DAY_MONTH_YEAR_RE = re.compile(rf"^(\d{{1,2}})(?:st|nd|rd|th)?\s+(?:of\s+)?({_MONTH}),?\s+(\d{{4}})$")
+_MONTH_DAY_YEAR_RE = re.compile(rf"^({_MONTH})\s+(\d{{1,2}})(?:st|nd|rd|th)?,?\s+(\d{{4}})$")
+_SLASH_DATE_RE = re.compile(r"^(\d{1,2})/(\d{1,2})/(\d{4})$")
+_ISO_DATE_RE = re.compile(r"^(\d{4})-(\d{1,2})-(\d{1,2})$")
+_LIMIT_RE = re.compile(r"\b(?:nearest|closest|top|find|show|list)\s+(\d{1,3})\s+(?:argo\s+)?floats?\b")
+_RADIUS_RE = re.compile(rf"\b(?:within|in|radius(?: of)?)\s+{_F}\s*(km|kms|kilomet(?:er|re)s?|miles?|mi|nm"
+                        r"|nautical miles?)\b|" rf"\b{_F}\s*(km|kms|kilomet(?:er|re)s?)\s+radius\b")
+_KM_PER_UNIT = {"mi": 1.609, "mile": 1.609, "miles": 1.609, "nm": 1.852, "nautical": 1.852}
+_LAT_LON_RE = re.compile(rf"\blat(?:itude)?\s*[:=]?\s*{_F}\s*°?\s*([ns])?\b.{{0,12}}?"
+                         rf"\b(?:lon|long|longitude)\s*[:=]?\s*{_F}\s*°?\s*([ew])?")
+_HEMISPHERE_RE = re.compile(r"(\d+(?:\.\d+)?)\s*°?\s*([ns])\b\s*,?\s*(\d+(?:\.\d+)?)\s*°?\s*([ew])\b")
+_PAIR_RE = re.compile(rf"\b(?:near|at|around|of|to)\s+\(?\s*{_F}\s*,\s*{_F}\s*\)?")
+
+# Confidence penalties
+_REASONING_RE = re.compile(r"\b(?:why|explain|how does|how do|what causes|cause|predict|forecast|should|impact|effect)\b")
+_EXCLUSION_RE = re.compile(r"\b(?:not|except|excluding|without|other than|apart from)\b")
+# "in the Foo Sea" / "near Bar" / "off Baz Coast": a place the gazetteer may not know
+_PLACE_RE = re.compile(r"\b(?:in|near|around|off|at|from|to)\s+(?:the\s+)?"
+                       r"([A-Z][a-z]+(?:\s+(?:of\s+)?[A-Z][a-z]+)*)")
+_PLACE_WORDS_RE = re.compile(r"\b(?:sea|ocean|gulf|bay|coast|strait|channel|basin|island|islands|current)\b")
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+class RuleParse(NamedTuple):
+    """What the rules made of one question."""
+    intent: dict
+    confidence: float
+    reasons: list        # why the confidence is below 1, for logs
+    hints: dict          # extract_hints(question)
+
+
+# ── Configuration ────────────────────────────────────────────────────────────
+
+def is_enabled() -> bool:
+    return os.getenv("INTENT_RULES_ENABLED", "1").lower() not in ("0", "false", "no")
+
+
+def min_confidence() -> float:
+    try:
+        return min(1.0, max(0.0, float(os.getenv("INTENT_RULES_MIN_CONFIDENCE", DEFAULT_MIN_CONFIDENCE))))
+    except ValueError:
+        return DEFAULT_MIN_CONFIDENCE
+
+
+# ── Gazetteer ────────────────────────────────────────────────────────────────
+
+@lru_cache(maxsize=4)
+def _gazetteer(names: tuple):
+    # Longest names first, so "bay of bengal" is not also read as "bengal"
+    alternation = "|".join(re.escape(name) for name in sorted(names, key=len, reverse=True))
+    return re.compile(rf"\b(?:{alternation})\b")
+
+
+def places(question_lower: str, locations: dict) -> list:
+    """Gazetteer names in the question, in order of appearance, without repeats."""
+    found = _gazetteer(tuple(locations)).findall(question_lower)
+    return list(dict.fromkeys(found))
+
+
+def comparison_regions(question_lower: str, locations: dict) -> list:
+    """Regions named in a "compare A and B" / "A vs B" question (two or more), else []."""
+    if not _COMPARE_RE.search(question_lower):
+        return []
+    regions = places(question_lower, locations)
+    return regions if len(regions) >= 2 else []
+
+
+_BOX_RE = re.compile(rf'"latitude" BETWEEN {_F} AND {_F}(?: AND "longitude" BETWEEN {_F} AND {_F})?')
+
+
+def center_of(name: Optional[str], locations: dict) -> Optional[tuple]:
+    """(latitude, longitude) for a place: sql_builder's curated centre, else its box's midpoint."""
+    name = (name or "").lower().strip()
+    if name in sql_builder.LOCATION_CENTERS:
+        return sql_builder.LOCATION_CENTERS[name]
+    box = _BOX_RE.search(locations.get(name) or "")
+    if not box or box.group(3) is None:
+        return None       # latitude bands (equator, arctic, ...) have no single centre
+    lat_min, lat_max, lon_min, lon_max = (float(v) for v in box.groups())
+    return (lat_min + lat_max) / 2, (lon_min + lon_max) / 2
+
+
+# ── Extraction ───────────────────────────────────────────────────────────────
+
+def _coordinates(question_lower: str) -> Optional[tuple]:
+    match = _LAT_LON_RE.search(question_lower)
+    if match:
+        lat, ns, lon, ew = match.groups()
+        lat, lon = float(lat) * (-1 if ns == "s" else 1), float(lon) * (-1 if ew == "w" else 1)
+    else:
+        match = _HEMISPHERE_RE.search(question_lower)
+        if match:
+            lat, ns, lon, ew = match.groups()
+            lat, lon = float(lat) * (-1 if ns == "s" else 1), float(lon) * (-1 if ew == "w" else 1)
+        else:
+            match = _PAIR_RE.search(question_lower)
+            if not match:
+                return None
+            lat, lon = float(match.group(1)), float(match.group(2))
+    return (lat, lon) if -90 <= lat <= 90 and -180 <= lon <= 180 else None
+
+
+def _target_date(text: str) -> Optional[str]:
+    """A "closest to" date as ISO ``YYYY-MM-DD`` (slashed dates are day first), a month as written, or None."""
+    iso, slash = _ISO_DATE_RE.match(text), _SLASH_DATE_RE.match(text)
+    day_first, month_first = _DAY_MONTH_YEAR_RE.match(text), _MONTH_DAY_YEAR_RE.match(text)
+    if iso:
+        year, month, day = iso.groups()
+    elif slash:
+        day, month, year = slash.groups()
+    elif day_first or month_first:
+        day, name, year = day_first.groups() if day_first else month_first.group(2, 1, 3)
+        month = time_range.MONTHS[name[:3]]
+    else:
+        return text if time_range.find(text) else None
+    try:
+        return datetime(int(year), int(month), int(day)).strftime("%Y-%m-%d")
+    except ValueError:
+        return None
+
+
+def extract_hints(question: str) -> dict:
+    """
+    Values stated outright in the question, whatever its type. Keys are
+    present only when found:
+
+        latitude, longitude   "latitude 13 longitude 80.25", "13.1N 80.3E", "near 13, 80.25"
+        distance_km           "within 300 km" (miles and nautical miles converted)
+        limit                 "nearest 5 floats", "top 10 floats"
+        time_constraint       see time_range.find
+        float_id              "float 2902115", "WMO 2902115"
+        profile_count         "last 5 profiles"
+        target_date           "closest to 2023-03-15", "on 15 March 2023", "around 15/03/2023",
+                              "on March 15, 2023" (all "2023-03-15"), "on March 2023"
+    """
+    question_lower = question.lower()
+    hints = {}
+    coordinates = _coordinates(question_lower)
+    if coordinates:
+        hints["latitude"], hints["longitude"] = coordinates
+    radius = _RADIUS_RE.search(question_lower)
+    if radius:
+        value, unit = (radius.group(1), radius.group(2)) if radius.group(1) else (radius.group(3), radius.group(4))
+        hints["distance_km"] = int(round(float(value) * _KM_PER_UNIT.get(unit.split()[0], 1.0)))
+    limit = _LIMIT_RE.search(question_lower)
+    if limit:
+        hints["limit"] = int(limit.group(1))
+    float_match = _FLOAT_RE.search(question_lower)
+    if float_match:
+        hints["float_id"] = int(float_match.group(1))
+    count = _PROFILE_COUNT_RE.search(question_lower)
+    if count:
+        hints["profile_count"] = int(count.group(1))
+    target = _TARGET_DATE_RE.search(question_lower)
+    target_date = _target_date(target.group(1)) if target else None
+    if target_date:
+        hints["target_date"] = target_date
+    # A "closest to <date>" is a target, not a filter
+    rest = question[:target.start()] + question[target.end():] if "target_date" in hints else question
+    when = time_range.find(rest)
+    if when:
+        hints["time_constraint"] = when
+    return hints
+
+
+def _query_type(question_lower: str, regions: list):
+    if regions:
+        # Comparison buckets are per-period averages: statistic and trend words belong to it
+        others = [name for name, pattern in _TYPE_PATTERNS[1:4] if pattern.search(question_lower)]
+        return "Comparison", others
+    matched = [name for name, pattern in _TYPE_PATTERNS if pattern.search(question_lower)]
+    if not matched:
+        return "General", []
+    if matched[:2] == ["Statistic", "Proximity"] and not _NEAREST_RE.search(question_lower):
+        # "average salinity near goa": a statistic over the place's region
+        matched.pop(1)
+    return matched[0], matched[1:]
+
+
+# ── Parsing ──────────────────────────────────────────────────────────────────
+
+def parse(question: str, locations: dict) -> RuleParse:
+    """
+    Parse ``question`` into the intent dict the LLM would return.
+
+    Args:
+        question (str): The user's question.
+        locations (dict): The gazetteer, name -> WHERE clause (brain.LOCATIONS).
+
+    Returns:
+        RuleParse: the intent, a confidence in [0, 1], the reasons it is
+        below 1, and the question's hints.
+    """
+    question_lower = question.lower()
+    hints = extract_hints(question)
+    regions = comparison_regions(question_lower, locations)
+    # "closest to <date>" picks a profile; it does not ask for a proximity search
+    typed = _TARGET_DATE_RE.sub(" ", question_lower) if "target_date" in hints else question_lower
+    query_type, others = _query_type(typed, regions)
+    intent = {"query_type": query_type, "metrics": list(DEFAULT_METRICS)}
+    reasons = []
+
+    metrics = [name for name, pattern in _METRICS if pattern.search(question_lower)]
+    if metrics:
+        intent["metrics"] = metrics
+    aggregation = next((name for name, pattern in _AGGREGATIONS if pattern.search(question_lower)), None)
+    named = places(question_lower, locations)
+
+    if query_type == "Comparison":
+        intent["regions"] = regions
+    elif named:
+        intent["location_name"] = named[0]
+    if query_type == "Statistic" and aggregation:
+        intent["aggregation"] = aggregation
+    if query_type == "Scatter" and _DENSITY_RE.search(question_lower):
+        # Full-population binned T-S diagram rather than a sample of points
+        intent["scatter_mode"] = "density"
+    for key in ("float_id", "time_constraint", "latitude", "longitude"):
+        if key in hints:
+            intent[key] = hints[key]
+    if query_type == "Profile":
+        for key in ("profile_count", "target_date"):
+            if key in hints:
+                intent[key] = hints[key]
+    if query_type == "Proximity":
+        intent["distance_km"] = hints.get("distance_km", 500)
+        intent["limit"] = hints.get("limit", 5)
+        if "latitude" not in intent:
+            center = center_of(intent.get("location_name"), locations)
+            if center:
+                intent["latitude"], intent["longitude"] = center
+    if "time_constraint" in intent:
+        years = re.findall(r"\b(?:19|20)\d{2}\b", intent["time_constraint"])
+        if len(set(years)) == 1:
+            intent["year"] = int(years[0])
+
+    # ── Confidence ──
+    if query_type == "General":
+        return RuleParse(intent, 0.0, ["no query type matched"], hints)
+    confidence = 0.6
+    if others:
+        confidence -= 0.3
+        reasons.append(f"also reads as {', '.join(others)}")
+    needs = {
+        "Statistic": metrics or aggregation == "count",
+        "Proximity": "latitude" in intent,
+        "Trajectory": "float_id" in intent,
+        "Profile": "float_id" in intent or "location_name" in intent or "latitude" in intent,
+        "Time-Series": bool(metrics),
+        "Scatter": len(metrics) >= 2 or "scatter_mode" in intent,
+        "Comparison": True,
+    }
+    if needs[query_type]:
+        confidence += 0.3
+    else:
+        reasons.append(f"{query_type} without what it needs")
+    if metrics:
+        confidence += 0.1
+    if _REASONING_RE.search(question_lower) or (_COMPARE_RE.search(question_lower) and not regions
+                                                 and query_type != "Scatter"):
+        confidence -= 0.4
+        reasons.append("asks for reasoning or an unresolved comparison")
+    if query_type == "Statistic" and aggregation == "count" and not _FLOAT_COUNT_RE.search(question_lower):
+        confidence -= 0.4
+        reasons.append("counts something other than floats")
+    if _EXCLUSION_RE.search(question_lower):
+        confidence -= 0.3
+        reasons.append("has an exclusion")
+    unknown = [p for p in _PLACE_RE.findall(question)
+               if p.lower() not in locations and not time_range.find(p) and _PLACE_WORDS_RE.search(p.lower())]
+    if unknown or (len(named) > 1 and query_type != "Comparison"):
+        confidence -= 0.4
+        reasons.append(f"unknown place {unknown[0]!r}" if unknown else "several places")
+    if len(_WORD_RE.findall(question_lower)) > 25 or question.count("?") > 1:
+        confidence -= 0.2
+        reasons.append("long or several questions")
+    return RuleParse(intent, round(min(1.0, max(0.0, confidence)), 2), reasons, hints)
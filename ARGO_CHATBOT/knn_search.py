@@ -0,0 +1,109 @@
+"""
+FloatChart KNN Search
+=====================
+k-nearest-float search with an expanding search radius.
+
+"Nearest 5 floats to Chennai within 1000 km" rarely needs the whole
+1000 km circle: the floats are usually within a few hundred km. Instead of
+one query over the full circle, the search starts small and grows:
+
+    radius  150 km → 300 km → 600 km → 1000 km (the requested maximum)
+
+Each step is the ordinary Proximity query from sql_builder, searching the
+step radius (``search_km``) of the requested circle. A float is reported
+where the single full-radius query reports it: at its latest position in
+the search area (the fixed box around the point, geocell.search_area), if
+that is inside the circle. A smaller step looks only at rows within its
+radius (the radius's latitude-scaled bounding box, split at the
+antimeridian, or its geocell ring) and keeps a float there only if it has
+no later row in the search area, so it returns exactly the floats whose
+reported position lies within the step radius. Once a step returns
+``limit`` floats, those are exactly the k nearest and the search stops.
+Otherwise the radius doubles, up to the requested maximum, which runs the
+full-radius query itself. The smaller steps share one SQL shape and reuse
+one prepared statement.
+
+On PostgreSQL / CockroachDB a step is an index range scan proportional to
+the box, so dense areas are answered by the first small box. Sparse ones
+run the full-radius query after the smaller steps; their boxes form a
+geometric series, so together they scan about one full-radius box more. DuckDB has no secondary range index, so
+every step would be a full columnar scan; there the full-radius query runs
+alone. So does a time range that reaches the Parquet cold tier: each tier
+checks "no later row in the search area" against its own rows only, which
+a smaller step cannot rely on.
+"""
+
+import logging
+import time
+
+import pandas as pd
+
+import sql_builder
+import sql_dialects
+import tiered_storage
+
+INITIAL_RADIUS_KM = 150.0
+GROWTH = 2.0
+
+# Dialects whose scans cannot use a latitude/longitude B-tree index
+SINGLE_STEP_DIALECTS = {"duckdb"}
+
+
+def radius_steps(max_distance_km: float, initial_km: float = INITIAL_RADIUS_KM, growth: float = GROWTH) -> list:
+    """Radii searched in order, ending exactly at ``max_distance_km``."""
+    steps = []
+    radius = min(initial_km, max_distance_km)
+    while radius < max_distance_km:
+        steps.append(radius)
+        radius *= growth
+    steps.append(max_distance_km)
+    return steps
+
+
+def nearest(intent: dict, db_context: dict, engine, time_range=None, existing_cols=None,
+            initial_km: float = None) -> pd.DataFrame:
+    """
+    Return the ``limit`` floats nearest to the intent's coordinates.
+
+    Args:
+        intent (dict): A Proximity intent with latitude, longitude and
+            optionally distance_km (default 500), limit (default 5),
+            metrics and time_constraint.
+        db_context (dict): Passed to sql_builder (max_date_obj).
+        engine: SQLAlchemy engine for the hot tier.
+        time_range (tuple): (start, end) for tiered_storage.read_query().
+        existing_cols (set | None): argo_data columns, introspected once if None.
+        initial_km (float | None): First search radius. Defaults to
+            INITIAL_RADIUS_KM, or the full radius on SINGLE_STEP_DIALECTS
+            and when the time range reaches the cold tier.
+
+    Returns:
+        pd.DataFrame: Same columns and order as the single Proximity query.
+    """
+    if existing_cols is None:
+        try:
+            existing_cols = sql_builder._get_existing_columns(engine)
+        except Exception:
+            existing_cols = set()
+    max_distance = float(intent.get("distance_km", 500))
+    limit = int(intent.get("limit", 5))
+
+    started = time.perf_counter()
+    df = None
+    if tiered_storage.reaches_cold_tier(time_range):
+        initial_km = max_distance
+    elif initial_km is None:
+        initial_km = max_distance if engine.dialect.name in SINGLE_STEP_DIALECTS else INITIAL_RADIUS_KM
+    steps = radius_steps(max_distance, initial_km)
+    for step, radius in enumerate(steps, 1):
+        step_intent = dict(intent, search_km=radius)
+        sql = sql_builder.build_query(step_intent, db_context, existing_cols=existing_cols,
+                                      dialect=sql_dialects.dialect_of(engine))
+        if isinstance(sql, str) and sql.startswith("ERROR:"):
+            raise ValueError(sql[6:].strip())
+        df = tiered_storage.read_query(sql, engine, "Proximity", time_range)
+        if len(df) >= limit:
+            break
+    logging.info(f"KNN search: {len(df)} floats within {radius:g} km after {step}/{len(steps)} "
+                 f"steps in {(time.perf_counter() - started) * 1000:.1f} ms")
+    return df
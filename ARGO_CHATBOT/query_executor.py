@@ -0,0 +1,161 @@
+"""
+FloatChart Query Executor
+=========================
+Runs sql_builder's bound queries and counts the distinct shapes we execute.
+
+sql_builder returns a ``BoundQuery``: a SQL template with ``:name`` markers
+plus its bind values. On PostgreSQL each template is turned into a named
+server-side prepared statement the first time a pooled connection sees it:
+
+    PREPARE fc_<shape> AS SELECT ... WHERE "float_id" = $1 ...
+    EXECUTE fc_<shape> (2902296)
+
+Later questions with the same shape skip parsing and planning and reuse the
+statement. The set of statements a connection holds is kept in the pool's
+per-connection ``info`` dict, so it lives exactly as long as the connection.
+CockroachDB and DuckDB run the same template with bound parameters.
+
+Every execution runs under its query type's session profile (timeouts,
+memory, parallelism; see session_profiles) and is counted by shape;
+``shape_stats()`` reports how many distinct plans the app actually runs
+(served at GET /api/v1/metrics).
+"""
+
+import logging
+import threading
+from typing import Optional
+
+import pandas as pd
+from sqlalchemy import text
+
+import session_profiles
+from sql_builder import BIND_RE
+
+_stats_lock = threading.Lock()
+_shape_stats = {}
+
+
+def bind_names(sql: str, params: dict) -> list:
+    """Bound names in order of first appearance in the template."""
+    names = []
+    for match in BIND_RE.finditer(sql):
+        name = match.group(1)
+        if name in params and name not in names:
+            names.append(name)
+    return names
+
+
+def used_params(sql: str, params: dict) -> dict:
+    """The subset of ``params`` referenced by ``sql`` (drivers reject extras)."""
+    return {name: params[name] for name in bind_names(sql, params)}
+
+
+# ── Shape accounting ─────────────────────────────────────────────────────────
+
+def record_shape(sql, query_type: Optional[str] = None, prepared: bool = False) -> None:
+    """Count one execution of the query's template."""
+    shape = getattr(sql, "shape", None)
+    if shape is None:
+        return
+    with _stats_lock:
+        entry = _shape_stats.setdefault(shape, {
+            "shape": shape, "query_type": query_type, "template": str(sql),
+            "executions": 0, "prepared_executions": 0,
+        })
+        entry["executions"] += 1
+        entry["prepared_executions"] += int(prepared)
+
+
+def shape_stats() -> dict:
+    """Distinct query shapes executed since start-up, most frequent first."""
+    with _stats_lock:
+        shapes = sorted((dict(e) for e in _shape_stats.values()), key=lambda e: -e["executions"])
+    return {
+        "distinct_shapes": len(shapes),
+        "executions": sum(e["executions"] for e in shapes),
+        "shapes": shapes,
+    }
+
+
+def reset_shape_stats() -> None:
+    with _stats_lock:
+        _shape_stats.clear()
+
+
+# ── Execution ────────────────────────────────────────────────────────────────
+
+# invalid_sql_statement_name, duplicate_prepared_statement
+_PREPARE_FAILURE_CODES = {"26000", "42P05"}
+
+
+def _supports_prepare(conn) -> bool:
+    """Server-side PREPARE is used on PostgreSQL only (checked once per connection)."""
+    if conn.info.get("fc_no_prepare"):
+        return False
+    return session_profiles.dialect_flavour(conn) == "postgresql"
+
+
+def _is_prepare_failure(e: Exception) -> bool:
+    """
+    True for errors of the PREPARE / EXECUTE mechanism itself: the statement
+    is gone or already exists (SQLSTATE 26000 / 42P05), as with a pooler in
+    transaction mode that does not keep statements between transactions.
+    """
+    code = getattr(getattr(e, "orig", None), "pgcode", None) or getattr(e, "pgcode", None)
+    if code in _PREPARE_FAILURE_CODES:
+        return True
+    message = str(e).lower()
+    return "prepared statement" in message and ("does not exist" in message or "already exists" in message)
+
+
+def _execute_prepared(conn, sql, params: dict) -> pd.DataFrame:
+    names = bind_names(sql, params)
+    statement = f"fc_{sql.shape}"
+    prepared = conn.info.setdefault("fc_prepared", set())
+    if statement not in prepared:
+        positional = BIND_RE.sub(
+            lambda m: f"${names.index(m.group(1)) + 1}" if m.group(1) in names else m.group(0), str(sql)
+        )
+        conn.exec_driver_sql(f"PREPARE {statement} AS {positional.strip().rstrip(';')}")
+        prepared.add(statement)
+    if names:
+        placeholders = ", ".join(["%s"] * len(names))
+        result = conn.exec_driver_sql(f"EXECUTE {statement} ({placeholders})", tuple(params[n] for n in names))
+    else:
+        result = conn.exec_driver_sql(f"EXECUTE {statement}")
+    return pd.DataFrame(result.fetchall(), columns=list(result.keys()))
+
+
+def execute(sql, engine, query_type: Optional[str] = None) -> pd.DataFrame:
+    """
+    Execute builder SQL and return a DataFrame.
+
+    Args:
+        sql (str | BoundQuery): SQL from sql_builder.build_query().
+        engine: SQLAlchemy engine.
+        query_type (str | None): Selects the session profile; recorded with
+            the shape for /api/v1/metrics.
+
+    Raises:
+        session_profiles.QueryTimeoutError: if the profile's statement
+            timeout cancelled the query.
+    """
+    params = getattr(sql, "params", {})
+    with engine.connect() as connection, session_profiles.applied(connection, query_type) as profile:
+        if hasattr(sql, "shape") and _supports_prepare(connection):
+            try:
+                df = _execute_prepared(connection, sql, params)
+                record_shape(sql, query_type, prepared=True)
+                return df
+            except Exception as e:
+                if not _is_prepare_failure(e):
+                    raise
+                logging.warning(f"Prepared execution failed, running bound query instead: {e}")
+                connection.rollback()
+                connection.info["fc_no_prepare"] = True
+                if profile is not None:
+                    # The rollback ended the SET LOCAL settings
+                    session_profiles.apply(connection, profile, "postgresql")
+        df = pd.read_sql_query(sql=text(sql), con=connection, params=used_params(sql, params))
+    record_shape(sql, query_type)
+    return df
@@ -0,0 +1,160 @@
+"""
+FloatChart Schema Catalog
+=========================
+One cached description of ``argo_data`` shared by brain, sql_builder,
+knn_search and agent_tools, so no question pays for a catalog round-trip.
+
+A catalog holds the table's columns (name → type, in table order), its
+indexes (name → definition) and the planner's row estimate. It is loaded
+once per database and reloaded when either
+
+    the TTL expires     SCHEMA_CATALOG_TTL seconds (default 600, like
+                        brain's database context), or
+    the data version    a caller passes a different ``data_version``
+    changes             (brain uses the table's MIN/MAX timestamp), or
+                        calls :func:`invalidate` after a migration
+
+A missing table is never cached, so the catalog appears as soon as the
+first ingest creates it.
+
+Configuration:
+    SCHEMA_CATALOG_TTL   seconds between reloads (default 600)
+"""
+
+import os
+import threading
+import time
+from typing import Dict, NamedTuple, Optional
+
+from sqlalchemy import text
+
+TABLE = "argo_data"
+DEFAULT_TTL = 600
+
+_COLUMNS_SQL = text(
+    "SELECT column_name, data_type FROM information_schema.columns "
+    "WHERE table_name = :table ORDER BY ordinal_position"
+)
+
+# Per dialect: (indexes, row estimate). Both are optional extras.
+_DIALECT_SQL = {
+    "postgresql": (
+        "SELECT indexname, indexdef FROM pg_indexes WHERE tablename = :table",
+        "SELECT reltuples::bigint FROM pg_class WHERE relname = :table",
+    ),
+    "duckdb": (
+        "SELECT index_name, sql FROM duckdb_indexes() WHERE table_name = :table",
+        "SELECT estimated_size FROM duckdb_tables() WHERE table_name = :table",
+    ),
+}
+_DIALECT_SQL["cockroachdb"] = _DIALECT_SQL["postgresql"]
+
+_lock = threading.Lock()
+_cache: Dict[str, "Catalog"] = {}
+
+
+class Catalog(NamedTuple):
+    """One loaded description of ``argo_data``."""
+    columns: Dict[str, str]
+    indexes: Dict[str, str]
+    row_estimate: Optional[int]
+    data_version: Optional[str]
+    loaded_at: float
+
+    @property
+    def exists(self) -> bool:
+        return bool(self.columns)
+
+    def to_dict(self) -> dict:
+        """JSON-serializable form for agent tools and API responses."""
+        return {
+            "table": TABLE,
+            "columns": dict(self.columns),
+            "indexes": dict(self.indexes),
+            "row_estimate": self.row_estimate,
+            "data_version": self.data_version,
+        }
+
+
+def get_ttl() -> float:
+    """Reload interval in seconds (SCHEMA_CATALOG_TTL, default 600)."""
+    try:
+        return float(os.getenv("SCHEMA_CATALOG_TTL", DEFAULT_TTL))
+    except ValueError:
+        return DEFAULT_TTL
+
+
+def _key(engine) -> str:
+    return str(engine.url)
+
+
+def _optional(conn, sql: str):
+    """Rows of an optional catalog query, or [] if this database lacks it."""
+    try:
+        return conn.execute(text(sql), {"table": TABLE}).fetchall()
+    except Exception:
+        return []
+
+
+def load(engine, data_version: Optional[str] = None) -> Catalog:
+    """Read the catalog from the database (no caching)."""
+    with engine.connect() as conn:
+        columns = {row[0]: str(row[1]) for row in conn.execute(_COLUMNS_SQL, {"table": TABLE})}
+        indexes, row_estimate = {}, None
+        queries = _DIALECT_SQL.get(engine.dialect.name)
+        if columns and queries:
+            indexes = {row[0]: row[1] for row in _optional(conn, queries[0])}
+            estimate = _optional(conn, queries[1])
+            if estimate and estimate[0][0] is not None and estimate[0][0] >= 0:
+                row_estimate = int(estimate[0][0])
+    return Catalog(columns, indexes, row_estimate, data_version, time.time())
+
+
+def get_catalog(engine, data_version: Optional[str] = None) -> Catalog:
+    """
+    The cached catalog for ``engine``'s database, reloaded when stale.
+
+    Args:
+        engine: SQLAlchemy engine.
+        data_version: Opaque token for the data's current state. A cached
+            catalog loaded under a different token is reloaded; one loaded
+            without a token adopts it.
+    """
+    key = _key(engine)
+    with _lock:
+        cached = _cache.get(key)
+    if cached is not None and time.time() - cached.loaded_at < get_ttl():
+        if data_version is None or cached.data_version == data_version:
+            return cached
+        if cached.data_version is None:
+            cached = cached._replace(data_version=data_version)
+            with _lock:
+                _cache[key] = cached
+            return cached
+
+    catalog = load(engine, data_version if data_version is not None else getattr(cached, "data_version", None))
+    with _lock:
+        if catalog.exists:
+            _cache[key] = catalog
+        else:
+            _cache.pop(key, None)
+    return catalog
+
+
+def columns(engine) -> set:
+    """Column names of ``argo_data`` (empty if the table is missing)."""
+    return set(get_catalog(engine).columns)
+
+
+def table_exists(engine) -> bool:
+    """Whether ``argo_data`` exists."""
+    return get_catalog(engine).exists
+
+
+def invalidate(engine=None) -> None:
+    """Drop the cached catalog for ``engine``, or for every database."""
+    with _lock:
+        if engine is None:
+            _cache.clear()
+        else:
+            _cache.pop(_key(engine), None)
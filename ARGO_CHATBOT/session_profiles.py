@@ -0,0 +1,221 @@
+"""
+FloatChart Session Profiles
+===========================
+Per-query-type execution settings applied around every generated query, so
+one runaway Scatter or General question cannot hold one of the brain
+engine's two pooled connections indefinitely.
+
+Each query type has a profile (:data:`PROFILES`):
+
+    statement_timeout_ms   hard limit on the statement (every database)
+    work_mem               sort / hash memory per node        (PostgreSQL)
+    parallel_workers       max_parallel_workers_per_gather    (PostgreSQL)
+    jit                    JIT compilation on / off           (PostgreSQL)
+    threads, memory_limit  DuckDB executor threads and memory (DuckDB)
+
+On PostgreSQL the settings are ``SET LOCAL`` inside the query's
+transaction and end with it. CockroachDB takes the statement timeout only.
+DuckDB settings are database-wide, so they are set before the query and
+reset after it; DuckDB has no statement timeout, so the query is
+interrupted from a timer instead.
+
+A query stopped by its timeout raises :class:`QueryTimeoutError` and is
+counted per query type (served at GET /api/v1/metrics).
+
+Configuration:
+    SESSION_PROFILES_ENABLED   "0" to run queries with the server defaults
+    SESSION_<SETTING>          override a setting for every query type,
+                               e.g. SESSION_STATEMENT_TIMEOUT_MS=30000
+    SESSION_<SETTING>_<TYPE>   override it for one type, e.g.
+                               SESSION_WORK_MEM_TIME_SERIES=128MB
+"""
+
+import logging
+import os
+import re
+import threading
+from contextlib import contextmanager
+from typing import Optional
+
+# Point lookups stay small and fast; aggregates get memory, workers and JIT
+PROFILES = {
+    "Proximity":   {"statement_timeout_ms": 5_000, "work_mem": "16MB", "parallel_workers": 0,
+                    "jit": False, "threads": 2, "memory_limit": "512MB"},
+    "Trajectory":  {"statement_timeout_ms": 5_000, "work_mem": "16MB", "parallel_workers": 0,
+                    "jit": False, "threads": 2, "memory_limit": "512MB"},
+    "Profile":     {"statement_timeout_ms": 8_000, "work_mem": "32MB", "parallel_workers": 0,
+                    "jit": False, "threads": 2, "memory_limit": "512MB"},
+    "Statistic":   {"statement_timeout_ms": 20_000, "work_mem": "64MB", "parallel_workers": 2,
+                    "jit": True, "threads": 4, "memory_limit": "2GB"},
+    "Time-Series": {"statement_timeout_ms": 20_000, "work_mem": "64MB", "parallel_workers": 2,
+                    "jit": True, "threads": 4, "memory_limit": "2GB"},
+    "Comparison":  {"statement_timeout_ms": 20_000, "work_mem": "64MB", "parallel_workers": 2,
+                    "jit": True, "threads": 4, "memory_limit": "2GB"},
+    "Scatter":     {"statement_timeout_ms": 15_000, "work_mem": "64MB", "parallel_workers": 2,
+                    "jit": False, "threads": 4, "memory_limit": "1GB"},
+    # /api/map/points and /api/map clusters
+    "Map":         {"statement_timeout_ms": 10_000, "work_mem": "32MB", "parallel_workers": 1,
+                    "jit": False, "threads": 2, "memory_limit": "1GB"},
+    "default":     {"statement_timeout_ms": 10_000, "work_mem": "32MB", "parallel_workers": 0,
+                    "jit": False, "threads": 2, "memory_limit": "1GB"},
+}
+
+_MEMORY_RE = re.compile(r"^\d+\s*(kB|MB|GB)$", re.IGNORECASE)
+_VALIDATORS = {
+    "statement_timeout_ms": int,
+    "parallel_workers": int,
+    "threads": int,
+    "jit": lambda v: v if isinstance(v, bool) else str(v).lower() in ("1", "true", "on", "yes"),
+    "work_mem": lambda v: _memory(v),
+    "memory_limit": lambda v: _memory(v),
+}
+# Server messages of a statement cancelled by its timeout (PostgreSQL, CockroachDB)
+_TIMEOUT_MARKERS = ("statement timeout", "57014")
+
+_stats_lock = threading.Lock()
+_timeouts = {}
+
+
+class QueryTimeoutError(TimeoutError):
+    """A query ran past its profile's statement timeout and was cancelled."""
+
+
+def _memory(value) -> str:
+    value = str(value).strip()
+    if not _MEMORY_RE.match(value):
+        raise ValueError(f"not a memory size: {value!r}")
+    return value.replace(" ", "")
+
+
+def is_enabled() -> bool:
+    return os.getenv("SESSION_PROFILES_ENABLED", "1").lower() not in ("0", "false", "no")
+
+
+def _env_key(query_type: str) -> str:
+    return re.sub(r"\W", "_", query_type).upper()
+
+
+def profile_for(query_type: Optional[str]) -> dict:
+    """The profile for ``query_type`` with SESSION_* overrides applied."""
+    profile = dict(PROFILES.get(query_type) or PROFILES["default"])
+    for setting, validate in _VALIDATORS.items():
+        for name in (f"SESSION_{setting.upper()}",
+                     f"SESSION_{setting.upper()}_{_env_key(query_type)}" if query_type else None):
+            raw = os.getenv(name) if name else None
+            if raw is None:
+                continue
+            try:
+                profile[setting] = validate(raw)
+            except ValueError:
+                logging.warning(f"Ignoring invalid {name}={raw!r}")
+    return profile
+
+
+def statements(profile: dict, flavour: str) -> list:
+    """SET statements applying ``profile`` on a "postgresql", "cockroachdb" or "duckdb" connection."""
+    timeout = int(profile["statement_timeout_ms"])
+    if flavour == "postgresql":
+        return [
+            f"SET LOCAL statement_timeout = {timeout}",
+            f"SET LOCAL work_mem = '{_memory(profile['work_mem'])}'",
+            f"SET LOCAL max_parallel_workers_per_gather = {int(profile['parallel_workers'])}",
+            f"SET LOCAL jit = {'on' if profile['jit'] else 'off'}",
+        ]
+    if flavour == "cockroachdb":
+        return [f"SET LOCAL statement_timeout = {timeout}"]
+    if flavour == "duckdb":
+        return [
+            f"SET threads = {int(profile['threads'])}",
+            f"SET memory_limit = '{_memory(profile['memory_limit'])}'",
+        ]
+    return []
+
+
+def dialect_flavour(conn) -> str:
+    """"postgresql", "cockroachdb" or "duckdb" (cached in the pooled connection's info)."""
+    if conn.dialect.name != "postgresql":
+        return conn.dialect.name
+    if "fc_is_cockroach" not in conn.info:
+        version = conn.exec_driver_sql("SELECT version()").scalar() or ""
+        conn.info["fc_is_cockroach"] = "cockroach" in version.lower()
+    return "cockroachdb" if conn.info["fc_is_cockroach"] else "postgresql"
+
+
+def apply(conn, profile: dict, flavour: str) -> None:
+    """Run the profile's SET statements (again after a rollback on PostgreSQL)."""
+    for statement in statements(profile, flavour):
+        conn.exec_driver_sql(statement)
+
+
+def _reset_duckdb(conn) -> None:
+    try:
+        conn.rollback()
+        conn.exec_driver_sql("RESET threads")
+        conn.exec_driver_sql("RESET memory_limit")
+    except Exception as e:
+        logging.warning(f"Could not reset DuckDB settings: {e}")
+
+
+@contextmanager
+def applied(conn, query_type: Optional[str] = None):
+    """
+    Run the enclosed execution under ``query_type``'s profile.
+
+    Yields:
+        dict | None: the profile applied, or None when profiles are disabled.
+
+    Raises:
+        QueryTimeoutError: if the statement timeout cancelled the query.
+    """
+    if not is_enabled():
+        yield None
+        return
+    profile = profile_for(query_type)
+    flavour = dialect_flavour(conn)
+    apply(conn, profile, flavour)
+    timer, fired = None, threading.Event()
+    if flavour == "duckdb":
+        dbapi = conn.connection.dbapi_connection
+
+        def interrupt():
+            fired.set()
+            dbapi.interrupt()
+
+        timer = threading.Timer(profile["statement_timeout_ms"] / 1000, interrupt)
+        timer.daemon = True
+        timer.start()
+    try:
+        yield profile
+    except Exception as e:
+        if fired.is_set() or any(marker in str(e) for marker in _TIMEOUT_MARKERS):
+            record_timeout(query_type)
+            seconds = profile["statement_timeout_ms"] / 1000
+            raise QueryTimeoutError(
+                f"This {query_type or 'query'} took longer than {seconds:g}s and was stopped. "
+                f"Please narrow it down with a time range, a region or a float ID."
+            ) from e
+        raise
+    finally:
+        if timer is not None:
+            timer.cancel()
+            _reset_duckdb(conn)
+
+
+# ── Timeout accounting ───────────────────────────────────────────────────────
+
+def record_timeout(query_type: Optional[str]) -> None:
+    with _stats_lock:
+        key = query_type or "default"
+        _timeouts[key] = _timeouts.get(key, 0) + 1
+
+
+def timeout_stats() -> dict:
+    """Queries cancelled by their statement timeout since start-up."""
+    with _stats_lock:
+        by_type = dict(_timeouts)
+    return {"total": sum(by_type.values()), "by_query_type": by_type}
+
+
+def reset_timeout_stats() -> None:
+    with _stats_lock:
+        _timeouts.clear()
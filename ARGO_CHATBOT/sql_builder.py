@@ -1,6 +1,14 @@
 from datetime import datetime, timedelta
+from functools import lru_cache
+import hashlib
+import math
 import re
 
+import geocell
+import schema_catalog
+import sql_dialects
+import time_range
+
 # ── Safety layer ─────────────────────────────────────────────────────────────
 # Import the SQL Sanitizer to validate every generated query before returning.
 # This enforces a strict read-only policy on all AI-generated SQL.
@@ -11,6 +19,55 @@ except ImportError:
     _SANITIZER_AVAILABLE = False
 
 
+# ── Bound queries ────────────────────────────────────────────────────────────
+# Builders emit a fixed SQL template with :name bind markers and collect the
+# values separately. The template depends only on the question's shape
+# (query type, columns, region), so equal shapes share one SQL string: the
+# sanitizer validates it once and the server can reuse one prepared plan.
+
+# :name markers, skipping ::type casts
+BIND_RE = re.compile(r"(?<![:\w]):([A-Za-z_]\w*)")
+
+
+class BoundQuery(str):
+    """
+    SQL template text (with ``:name`` markers) that carries its bind values.
+
+    Subclassing str keeps every caller that logs, slices or pattern-matches
+    the SQL working unchanged; ``params`` holds the values to execute with.
+    """
+
+    def __new__(cls, template: str, params: dict = None):
+        query = super().__new__(cls, template)
+        query.params = dict(params or {})
+        return query
+
+    @property
+    def shape(self) -> str:
+        """Stable identifier of the template (same for every bind value)."""
+        return hashlib.sha1(str(self).encode()).hexdigest()[:12]
+
+    def render(self) -> str:
+        """The SQL with bind values inlined as literals, for display and EXPLAIN."""
+        def literal(match):
+            name = match.group(1)
+            if name not in self.params:
+                return match.group(0)
+            value = self.params[name]
+            if value is None:
+                return "NULL"
+            if isinstance(value, (int, float)):
+                return repr(value)
+            return "'" + str(value).replace("'", "''") + "'"
+        return BIND_RE.sub(literal, str(self))
+
+
+@lru_cache(maxsize=1024)
+def _validate_template(sql: str) -> dict:
+    """Sanitizer verdict per distinct template (bind values never reach the text)."""
+    return SQLSanitizer.validate(sql)
+
+
 def _apply_safety_check(sql: str) -> str:
     """
     Pass the final SQL through the safety sanitizer.
@@ -18,10 +75,21 @@ def _apply_safety_check(sql: str) -> str:
     Returns the SQL unchanged if it is safe.
     Raises ValueError with a descriptive message if any safety check fails.
     This is the last gate before the query leaves this module.
+
+    Templates are validated once and the verdict is cached; bound LIMIT
+    values, which the template check cannot see, are checked on every call.
+    The sanitizer's automatic LIMIT is for free-form SQL and is not applied
+    here: whole-fleet trajectories and paths need every row.
     """
     if not _SANITIZER_AVAILABLE:
         return sql  # Graceful degradation if sanitizer not installed
-    result = SQLSanitizer.validate(sql)
+    result = _validate_template(str(sql))
+    if result["safe"]:
+        for name, value in getattr(sql, "params", {}).items():
+            if name.startswith("limit") and not (isinstance(value, int) and 0 <= value <= SQLSanitizer.MAX_LIMIT):
+                result = {"safe": False, "checks": {**result["checks"], "limit_within_cap": False},
+                          "reason": f"LIMIT {value} exceeds the maximum allowed cap of {SQLSanitizer.MAX_LIMIT}."}
+                break
     if not result["safe"]:
         raise ValueError(
             f"SQL Safety Violation — query blocked by FloatChart sanitizer.\n"
@@ -31,9 +99,17 @@ def _apply_safety_check(sql: str) -> str:
     return sql
 
 
-def build_query(intent: dict, db_context: dict, engine=None) -> str:
+def build_query(intent: dict, db_context: dict, engine=None, existing_cols=None, dialect=None) -> str:
+    """
+    SQL for a parsed intent, compiled for ``dialect`` (default: the
+    engine's, else PostgreSQL; see sql_dialects).
+    """
     query_type = intent.get("query_type")
-    existing_cols = set()
+    dialect = sql_dialects.dialect_of(engine, dialect)
+    if existing_cols is not None:
+        # Caller already introspected argo_data (e.g. knn_search's radius steps)
+        engine = None
+    existing_cols = set(existing_cols or ())
     if engine is not None:
         try:
             existing_cols = _get_existing_columns(engine)
@@ -42,19 +118,21 @@ def build_query(intent: dict, db_context: dict, engine=None) -> str:
 
     # Route to the appropriate query builder, then enforce safety on the result.
     if query_type == "Proximity":
-        sql = _build_proximity_query(intent, db_context)
+        sql = _build_proximity_query(intent, db_context, existing_cols, dialect)
     elif query_type == "Time-Series":
         sql = _build_timeseries_query(intent, db_context, existing_cols)
     elif query_type == "Statistic":
         sql = _build_statistic_query(intent, db_context, existing_cols)
+    elif query_type == "Comparison":
+        sql = _build_comparison_query(intent, db_context, existing_cols)
     elif query_type == "Profile":
-        sql = _build_profile_query(intent, existing_cols)
+        sql = _build_profile_query(intent, existing_cols, db_context)
     elif query_type == "Trajectory":
-        sql = _build_trajectory_query(intent, db_context, existing_cols)
+        sql = _build_trajectory_query(intent, db_context, existing_cols, dialect)
     elif query_type == "Scatter":
         sql = _build_scatter_query(intent, db_context, existing_cols)
     elif query_type == "Path":
-        sql = _build_path_query(intent, existing_cols)
+        sql = _build_path_query(intent, existing_cols, dialect)
     else:
         sql = _build_general_query(intent, db_context)
 
@@ -63,7 +141,39 @@ def build_query(intent: dict, db_context: dict, engine=None) -> str:
     # This prevents destructive or unexpected queries from reaching the database.
     return _apply_safety_check(sql)
 
-def _build_path_query(intent: dict, existing_cols=None) -> str:
+def _surface_only(intent: dict) -> bool:
+    """
+    Whether a trajectory/path wants one position per profile.
+
+    Defaults to True unless the question asks for pressure, i.e. for the
+    depth levels themselves. ``surface_only`` in the intent overrides it.
+    """
+    if intent.get("surface_only") is not None:
+        return bool(intent["surface_only"])
+    return "pressure" not in (intent.get("metrics") or [])
+
+def _track_query(cols_str: str, where_clause: str, surface_only: bool, existing_cols=None,
+                 dialect: str = sql_dialects.DEFAULT_DIALECT) -> str:
+    """
+    Rows of a float track in time order.
+
+    In surface-only mode only the shallowest level of each profile (a
+    profile is one float_id + timestamp) is kept, so a float with 300
+    cycles of 100 levels returns 300 rows rather than 30,000. The outer
+    SELECT restores plain time order.
+    """
+    from_where = f"FROM argo_data WHERE {where_clause}"
+    if not surface_only:
+        return f'SELECT {cols_str} {from_where} ORDER BY "timestamp" ASC;'
+    keys = ['"float_id"', '"timestamp"']
+    if not existing_cols or "pressure" in existing_cols:
+        surface = sql_dialects.latest_per_group(cols_str.split(", "), keys, '"pressure"', from_where,
+                                                dialect, descending=False)
+    else:
+        surface = f'SELECT DISTINCT ON ("float_id", "timestamp") {cols_str} {from_where} ORDER BY "float_id", "timestamp"'
+    return f'SELECT {cols_str} FROM ({surface}) AS surface ORDER BY "timestamp" ASC;'
+
+def _build_path_query(intent: dict, existing_cols=None, dialect: str = sql_dialects.DEFAULT_DIALECT) -> str:
     float_id = intent.get("float_id")
     metrics = intent.get("metrics") or []
     # Only use columns that exist
@@ -72,76 +182,80 @@ def _build_path_query(intent: dict, existing_cols=None) -> str:
     select_cols = base_cols + [m for m in metrics if m in sensor_cols]
     if not select_cols:
         select_cols = base_cols
-    where_clause = f'"float_id" = {float_id}' if float_id else '1=1'
+    where_clause = '"float_id" = :float_id' if float_id else '1=1'
     cols_str = ', '.join([f'"{c}"' for c in select_cols])
-    return f'SELECT {cols_str} FROM argo_data WHERE {where_clause} ORDER BY "timestamp" ASC;'
+    return BoundQuery(_track_query(cols_str, where_clause, _surface_only(intent), existing_cols, dialect),
+                      {"float_id": float_id} if float_id else {})
+
+# Search centers for named proximity locations (lat, lon)
+LOCATION_CENTERS = {
+    # Indian Ocean
+    "arabian sea": (15, 62.5),
+    "bay of bengal": (13.5, 87.5),
+    "indian ocean": (0, 75),
+    "andaman sea": (10, 95),
+    "laccadive sea": (11, 74),
+    "red sea": (20, 38),
+    "persian gulf": (27, 52),
+    "mozambique channel": (-18, 40),
+    # Pacific Ocean
+    "pacific ocean": (0, 160),
+    "south china sea": (15, 115),
+    "philippine sea": (20, 130),
+    "coral sea": (-16, 155),
+    "tasman sea": (-37, 162),
+    # Atlantic Ocean
+    "atlantic ocean": (25, -40),
+    "caribbean sea": (17, -75),
+    "gulf of mexico": (25, -90),
+    "mediterranean sea": (38, 18),
+    "north sea": (56, 3),
+    # Indian Cities
+    "chennai": (13.08, 80.27),
+    "mumbai": (18.97, 72.82),
+    "kollam": (8.88, 76.59),
+    "kochi": (9.93, 76.26),
+    "cochin": (9.93, 76.26),
+    "goa": (15.30, 73.82),
+    "kolkata": (22.57, 88.36),
+    "visakhapatnam": (17.68, 83.22),
+    "vizag": (17.68, 83.22),
+    "mangalore": (12.91, 74.85),
+    "tuticorin": (8.76, 78.13),
+    "pondicherry": (11.93, 79.83),
+    "puducherry": (11.93, 79.83),
+    "trivandrum": (8.52, 76.94),
+    "thiruvananthapuram": (8.52, 76.94),
+    "surat": (21.17, 72.83),
+    "kandla": (23.03, 70.22),
+    "paradip": (20.32, 86.61),
+    "andaman": (11.67, 92.75),
+    "port blair": (11.62, 92.73),
+    "karwar": (14.80, 74.13),
+    "ratnagiri": (16.99, 73.30),
+    # International Cities
+    "sri lanka": (7.5, 80.5),
+    "singapore": (1.3, 104),
+    "tokyo": (35.5, 140),
+    "sydney": (-34, 151),
+    "cape town": (-34, 18),
+    "miami": (26, -80),
+    "maldives": (4.17, 73.51),
+    "mauritius": (-20.2, 57.5),
+    # Special
+    "equator": (0, 80),
+    "southern ocean": (-55, 0),
+    "tropics": (10, 80),
+}
 
-def _build_proximity_query(intent: dict, db_context: dict) -> str:
+def _build_proximity_query(intent: dict, db_context: dict, existing_cols=None,
+                           dialect: str = sql_dialects.DEFAULT_DIALECT) -> str:
     lat, lon, limit = intent.get("latitude"), intent.get("longitude"), intent.get("limit", 5)
     # If coordinates are missing, try to set from location_name
     if (lat is None or lon is None):
         location_name = (intent.get("location_name") or "").lower()
-        location_centers = {
-            # Indian Ocean
-            "arabian sea": (15, 62.5),
-            "bay of bengal": (13.5, 87.5),
-            "indian ocean": (0, 75),
-            "andaman sea": (10, 95),
-            "laccadive sea": (11, 74),
-            "red sea": (20, 38),
-            "persian gulf": (27, 52),
-            "mozambique channel": (-18, 40),
-            # Pacific Ocean
-            "pacific ocean": (0, 160),
-            "south china sea": (15, 115),
-            "philippine sea": (20, 130),
-            "coral sea": (-16, 155),
-            "tasman sea": (-37, 162),
-            # Atlantic Ocean
-            "atlantic ocean": (25, -40),
-            "caribbean sea": (17, -75),
-            "gulf of mexico": (25, -90),
-            "mediterranean sea": (38, 18),
-            "north sea": (56, 3),
-            # Indian Cities
-            "chennai": (13.08, 80.27),
-            "mumbai": (18.97, 72.82),
-            "kollam": (8.88, 76.59),
-            "kochi": (9.93, 76.26),
-            "cochin": (9.93, 76.26),
-            "goa": (15.30, 73.82),
-            "kolkata": (22.57, 88.36),
-            "visakhapatnam": (17.68, 83.22),
-            "vizag": (17.68, 83.22),
-            "mangalore": (12.91, 74.85),
-            "tuticorin": (8.76, 78.13),
-            "pondicherry": (11.93, 79.83),
-            "puducherry": (11.93, 79.83),
-            "trivandrum": (8.52, 76.94),
-            "thiruvananthapuram": (8.52, 76.94),
-            "surat": (21.17, 72.83),
-            "kandla": (23.03, 70.22),
-            "paradip": (20.32, 86.61),
-            "andaman": (11.67, 92.75),
-            "port blair": (11.62, 92.73),
-            "karwar": (14.80, 74.13),
-            "ratnagiri": (16.99, 73.30),
-            # International Cities
-            "sri lanka": (7.5, 80.5),
-            "singapore": (1.3, 104),
-            "tokyo": (35.5, 140),
-            "sydney": (-34, 151),
-            "cape town": (-34, 18),
-            "miami": (26, -80),
-            "maldives": (4.17, 73.51),
-            "mauritius": (-20.2, 57.5),
-            # Special
-            "equator": (0, 80),
-            "southern ocean": (-55, 0),
-            "tropics": (10, 80),
-        }
-        if location_name in location_centers:
-            lat, lon = location_centers[location_name]
+        if location_name in LOCATION_CENTERS:
+            lat, lon = LOCATION_CENTERS[location_name]
             intent["latitude"] = lat
             intent["longitude"] = lon
     # If still missing, return a friendly error
@@ -158,86 +272,150 @@ def _build_proximity_query(intent: dict, db_context: dict) -> str:
     # Ensure we only select unique metrics and avoid duplicating base columns
     metric_cols = [m for m in metrics if m not in {"latitude", "longitude", "float_id", "timestamp"}]
 
-    time_clause = _get_time_clause(intent.get("time_constraint"), db_context.get("max_date_obj"))
-    base_conditions = []
-    if time_clause != "1=1":
-        base_conditions.append(time_clause)
-    
-    # OPTIMIZATION: Add bounding box filter to drastically reduce scanned rows
-    # Dynamic box size based on search distance (distance_km / 111 ≈ degrees)
-    search_distance = intent.get("distance_km", 500)
-    # Use larger box than search distance to ensure we don't miss edge cases
-    # 1 degree ≈ 111km at equator, use 1.5x multiplier for safety
-    lat_delta = max(8.0, (search_distance / 111) * 1.5)  # At least 8 degrees (~888km)
-    lon_delta = max(8.0, (search_distance / 111) * 1.5)  # Longitude varies but safe estimate
-    bounding_box = f'"latitude" BETWEEN {lat - lat_delta} AND {lat + lat_delta} AND "longitude" BETWEEN {lon - lon_delta} AND {lon + lon_delta}'
-    base_conditions.append(bounding_box)
-    
-    where_sql = " AND ".join(base_conditions) if base_conditions else "TRUE"
-
-    base_select_cols = ['"float_id"', '"timestamp"', 'ROUND("latitude"::numeric, 4) as "latitude"', 'ROUND("longitude"::numeric, 4) as "longitude"']
-    metric_select_cols = [f'ROUND("{col}"::numeric, 3) as "{col}"' for col in metric_cols]
-    latest_select_cols = ['"float_id"', '"timestamp"', '"latitude"', '"longitude"'] + [f'"{col}"' for col in metric_cols]
-    raw_projection = ", ".join(['"float_id"', '"timestamp"', '"latitude"', '"longitude"'] + [f'"{col}"' for col in metric_cols])
-
-    distance_formula = (
-        f"ROUND((6371 * acos(LEAST(1.0, GREATEST(-1.0, "
-        f"cos(radians({lat}::float)) * cos(radians(\"latitude\"::float)) "
-        f"* cos(radians(\"longitude\"::float) - radians({lon}::float)) "
-        f"+ sin(radians({lat}::float)) * sin(radians(\"latitude\"::float))))))::numeric, 2)"
-    )
+    # distance_km is the circle asked about; search_km (knn_search's radius
+    # step) is the part of it searched by this query
+    max_distance = intent.get("distance_km", 500)
+    search_distance = min(intent.get("search_km") or max_distance, max_distance)
+    params = {"lat": lat, "lon": lon, "max_distance": max_distance, "limit": limit}
+    time_clause = _get_time_clause(intent.get("time_constraint"), db_context.get("max_date_obj"), params)
+    time_filter = f"AND {time_clause}" if time_clause != "1=1" else ""
+
+    # Each float is reported at its latest position inside the search area
+    # (the fixed box around the point, see geocell.search_area) during the
+    # time window, if that position is within the circle
+    area = geocell.area_predicate(lat, lon, max_distance, params=params)
 
-    # FIXED: Filter by time FIRST in the base query, then find nearest floats
-    # This ensures we get the nearest floats within the specified time period
-    
     # Build metric columns for SQL - handle empty metrics case
+    round_to = lambda expr, digits: sql_dialects.round_to(expr, digits, dialect)
     if metric_cols:
-        metric_round_sql = ", " + ", ".join([f'ROUND("{col}"::numeric, 3) as "{col}"' for col in metric_cols])
+        metric_round_sql = ", " + ", ".join([round_to(f'"{col}"', 3) + f' as "{col}"' for col in metric_cols])
         metric_select_sql = ", " + ", ".join([f'"{col}"' for col in metric_cols])
     else:
         metric_round_sql = ""
         metric_select_sql = ""
-    
-    # OPTIMIZED: Simplified CTE structure - reduces query planning time
-    # Use indexed columns in WHERE first, then compute distance only on filtered set
-    query = """
-    WITH filtered_data AS (
-        SELECT "float_id", "timestamp", "latitude", "longitude"{metric_cols_select}
-        FROM argo_data
-        WHERE "latitude" IS NOT NULL 
-          AND "longitude" IS NOT NULL
-          AND {bounding_box}
+
+    # Great-circle distance from the bound point, in km to 2 decimals, of
+    # coordinates rounded to 4; DOUBLE PRECISION casts of the point only
+    # (DuckDB's FLOAT is 4-byte)
+    double = sql_dialects.DOUBLE
+    rounded_lat, rounded_lon = round_to('"latitude"', 4), round_to('"longitude"', 4)
+
+    def distance_to(latitude: str, longitude: str) -> str:
+        return round_to("6371 * acos(LEAST(1.0, GREATEST(-1.0, "
+                        f"cos(radians(CAST(:lat AS {double}))) * cos(radians({latitude})) "
+                        f"* cos(radians({longitude}) - radians(CAST(:lon AS {double}))) "
+                        f"+ sin(radians(CAST(:lat AS {double}))) * sin(radians({latitude})))))", 2)
+
+    candidates, newer_in_area = area, ""
+    if search_distance < max_distance:
+        # A knn_search step: only rows within the step radius, looked up
+        # through its geocell ring when rows carry one (integer range scans
+        # on idx_argo_geocell), else its latitude-scaled box split at the
+        # antimeridian (idx_argo_geo_time range scans). A float is kept at
+        # its latest row there only if it has no later row in the search
+        # area (one idx_argo_float_time_lat_lon probe per float). So a float
+        # a step returns is exactly where the full query puts it, and one it
+        # does not is further away than the step radius; knn_search.nearest()
+        # stops growing the radius once a step returns ``limit`` floats.
+        params["search_distance"] = search_distance
+        step_box = None
+        if existing_cols and "geocell" in existing_cols:
+            step_box = geocell.ring_predicate(lat, lon, search_distance, params=params)
+        if step_box is None:
+            step_box = geocell.box_predicate(lat, lon, search_distance, params=params)
+        candidates = (f"{step_box}\n          AND {area}\n"
+                      f"          AND {distance_to(rounded_lat, rounded_lon)} <= :search_distance")
+        newer_in_area = f"""
+      AND NOT EXISTS (
+        SELECT 1 FROM argo_data AS later
+        WHERE later."float_id" = nearby."float_id"
+          AND later."timestamp" > nearby."timestamp"
+          AND {area}
           {time_filter}
+      )"""
+
+    base_cols = ['"float_id"', '"timestamp"', '"latitude"', '"longitude"'] + [f'"{col}"' for col in metric_cols]
+    latest_per_float = sql_dialects.latest_per_group(
+        base_cols, ['"float_id"'], '"timestamp"',
+        f"""FROM argo_data
+        WHERE "latitude" IS NOT NULL
+          AND "longitude" IS NOT NULL
+          AND {candidates}
+          {time_filter}""",
+        dialect, newline="\n        ")
+
+    # Values are rounded only on the per-float rows, never per scanned row
+    query = """
+    WITH latest_per_float AS (
+        {latest_per_float}
     ),
-    latest_per_float AS (
-        SELECT DISTINCT ON ("float_id")
-            "float_id", "timestamp",
-            ROUND("latitude"::numeric, 4) as "latitude",
-            ROUND("longitude"::numeric, 4) as "longitude"{metric_round}
-        FROM filtered_data
-        ORDER BY "float_id", "timestamp" DESC
+    rounded AS (
+        SELECT "float_id", "timestamp",
+            {latitude} as "latitude",
+            {longitude} as "longitude"{metric_round}
+        FROM latest_per_float
     ),
     with_distance AS (
         SELECT *,
             {distance_expr} AS distance_km
-        FROM latest_per_float
+        FROM rounded
     )
     SELECT "float_id", "timestamp", "latitude", "longitude"{metric_cols_select}, distance_km
-    FROM with_distance
-    WHERE distance_km <= {max_distance}
+    FROM with_distance AS nearby
+    WHERE distance_km <= :max_distance{newer_in_area}
     ORDER BY distance_km ASC
-    LIMIT {limit};
+    LIMIT :limit;
     """.format(
-        bounding_box=bounding_box,
-        time_filter=f"AND {time_clause}" if time_clause != "1=1" else "",
+        latest_per_float=latest_per_float,
+        latitude=rounded_lat,
+        longitude=rounded_lon,
         metric_round=metric_round_sql,
         metric_cols_select=metric_select_sql,
-        distance_expr=distance_formula,
-        max_distance=intent.get("distance_km", 500),
-        limit=limit,
+        distance_expr=distance_to('"latitude"', '"longitude"'),
+        newer_in_area=newer_in_area,
     )
 
-    return "\n".join([line for line in query.splitlines() if line.strip()])
+    return BoundQuery("\n".join([line for line in query.splitlines() if line.strip()]), params)
+
+# Time-series bucket widths, finest first: (DATE_TRUNC unit, nominal width)
+TIME_BUCKETS = (
+    ("hour", timedelta(hours=1)),
+    ("day", timedelta(days=1)),
+    ("week", timedelta(weeks=1)),
+    ("month", timedelta(days=30.44)),
+)
+TIMESERIES_TARGET_POINTS = 400
+
+
+def choose_time_bucket(start: datetime, end: datetime, target_points: int = TIMESERIES_TARGET_POINTS):
+    """
+    Pick the finest DATE_TRUNC unit that covers [start, end) in at most
+    ``target_points`` buckets (month when even that is exceeded).
+
+    Returns:
+        (unit, buckets): e.g. ("week", 157) for three years.
+    """
+    span = end - start
+    for unit, width in TIME_BUCKETS:
+        buckets = math.ceil(span / width) + 1  # +1: a range need not start on a boundary
+        if buckets <= target_points or unit == TIME_BUCKETS[-1][0]:
+            return unit, buckets
+
+
+def _series_bucket(params: dict, db_context: dict, target_points: int):
+    """DATE_TRUNC unit for the bound time range (the database's span when open-ended)."""
+    max_date = db_context.get("max_date_obj") or datetime.now()
+    start = params.get("start_date") or db_context.get("min_date_obj") or max_date - timedelta(days=365)
+    end = params.get("end_date") or max_date
+    return choose_time_bucket(start, end, target_points)
+
+def _float_clause(intent: dict, params: dict) -> str:
+    """``AND "float_id" = :float_id`` when the question names a float, else nothing."""
+    float_id = intent.get("float_id")
+    if float_id is None:
+        return ""
+    params["float_id"] = float_id
+    return ' AND "float_id" = :float_id'
 
 def _build_timeseries_query(intent: dict, db_context: dict, existing_cols=None) -> str:
     metrics = intent.get("metrics") or []
@@ -246,8 +424,17 @@ def _build_timeseries_query(intent: dict, db_context: dict, existing_cols=None)
     if not metrics:
         metrics = [c for c in ["temperature", "salinity", "dissolved_oxygen", "chlorophyll", "ph", "pressure"] if not existing_cols or c in existing_cols]
     location_clause = intent.get("location_clause", "1=1")
+
+    # Bucket width follows the resolved range: a week of data is hourly,
+    # a decade monthly, so the chart gets ~target_points points either way
+    params = {}
+    time_clause = _get_time_clause(intent.get("time_constraint"), db_context.get("max_date_obj"), params)
+    unit, buckets = _series_bucket(params, db_context, int(intent.get("max_points") or TIMESERIES_TARGET_POINTS))
+    params["limit"] = buckets
+
     agg_metrics = [f'AVG(NULLIF("{m}", \'NaN\')) AS "{m}"' for m in metrics]
-    select_cols = ["DATE_TRUNC('day', \"timestamp\") as day"]
+    # The bucket column keeps its historical name ("day") for API clients
+    select_cols = [f"DATE_TRUNC('{unit}', \"timestamp\") as day"]
     if not existing_cols or "latitude" in existing_cols:
         select_cols.append('AVG("latitude") as latitude')
     if not existing_cols or "longitude" in existing_cols:
@@ -255,11 +442,67 @@ def _build_timeseries_query(intent: dict, db_context: dict, existing_cols=None)
     select_cols += agg_metrics
     if len(select_cols) == 1:
         select_cols.append('COUNT("float_id") as count')
-    time_clause = _get_time_clause(intent.get("time_constraint"), db_context.get("max_date_obj"))
-    base_query_from = f"FROM argo_data WHERE {location_clause} AND {time_clause}"
-    # OPTIMIZATION: Limit time-series to 365 days max to prevent huge scans
-    limit = intent.get("limit", 365)
-    return f"SELECT {', '.join(select_cols)} {base_query_from} GROUP BY day ORDER BY day ASC LIMIT {limit};"
+    base_query_from = f"FROM argo_data WHERE {location_clause} AND {time_clause}{_float_clause(intent, params)}"
+    return BoundQuery(f"SELECT {', '.join(select_cols)} {base_query_from} GROUP BY day ORDER BY day ASC LIMIT :limit;", params)
+
+# Regions one comparison may hold, and series points per region
+MAX_COMPARISON_REGIONS = 6
+COMPARISON_TARGET_POINTS = 120
+
+def _build_comparison_query(intent: dict, db_context: dict, existing_cols=None) -> str:
+    """
+    Side-by-side statistics and series for several named regions in one scan.
+
+    ``intent["region_clauses"]`` maps each region name to its location
+    clause, in the order asked. The WHERE clause is the union of the boxes,
+    so argo_data is scanned once; each row is then labelled by joining a
+    small VALUES list of regions on their clauses. A row inside two
+    overlapping regions (the Indian Ocean and the Bay of Bengal) counts
+    towards both, which a first-match CASE label would not do.
+
+    One row per (region, period) carries AVG / MIN / MAX of every metric plus
+    its SUM and COUNT, so comparison.py rolls the periods up into exact
+    per-region figures and tiered_storage merges the tiers exactly.
+    """
+    regions = list((intent.get("region_clauses") or {}).items())[:MAX_COMPARISON_REGIONS]
+    if len(regions) < 2:
+        raise ValueError("A comparison needs at least two supported regions, "
+                         "e.g. 'compare Bay of Bengal and Arabian Sea temperatures'.")
+    metrics = intent.get("metrics") or ["temperature", "salinity"]
+    if existing_cols:
+        metrics = [m for m in metrics if m in existing_cols]
+    if not metrics:
+        raise ValueError("None of the requested measurements exist in the database.")
+
+    params = {}
+    time_clause = _get_time_clause(intent.get("time_constraint"), db_context.get("max_date_obj"), params)
+    unit, buckets = _series_bucket(params, db_context, COMPARISON_TARGET_POINTS)
+    params["limit"] = buckets * len(regions)
+
+    labels, matches = [], []
+    for i, (name, clause) in enumerate(regions):
+        params[f"region_{i}"] = name
+        labels.append(f"({i}, :region_{i})")
+        matches.append(f"(r.region_order = {i} AND {clause})")
+    union = " OR ".join(clause for _, clause in regions)
+
+    select_cols = ["r.region_order", "r.region", f"DATE_TRUNC('{unit}', \"timestamp\") AS period",
+                   "COUNT(*) AS measurements"]
+    for m in metrics:
+        value = f"NULLIF(\"{m}\", 'NaN')"
+        select_cols += [f'AVG({value}) AS "{m}"', f'MIN({value}) AS "{m}_min"', f'MAX({value}) AS "{m}_max"',
+                        f'SUM({value}) AS "{m}_sum"', f'COUNT({value}) AS "{m}_count"']
+    select_list = ",\n           ".join(select_cols)
+    return BoundQuery(f"""
+    SELECT {select_list}
+    FROM argo_data
+    JOIN (VALUES {', '.join(labels)}) AS r (region_order, region)
+      ON {' OR '.join(matches)}
+    WHERE ({union}) AND {time_clause}
+    GROUP BY r.region_order, r.region, period
+    ORDER BY r.region_order, period
+    LIMIT :limit;
+    """, params)
 
 def _build_statistic_query(intent: dict, db_context: dict, existing_cols=None) -> str:
     metrics = intent.get("metrics") or []
@@ -267,25 +510,55 @@ def _build_statistic_query(intent: dict, db_context: dict, existing_cols=None) -
     if existing_cols:
         metrics = [m for m in metrics if m in existing_cols]
     location_clause = intent.get("location_clause", "1=1")
-    time_clause = _get_time_clause(intent.get("time_constraint"), db_context.get("max_date_obj"))
-    base_query_from = f"FROM argo_data WHERE {location_clause} AND {time_clause}"
+    params = {}
+    time_clause = _get_time_clause(intent.get("time_constraint"), db_context.get("max_date_obj"), params)
+    base_query_from = f"FROM argo_data WHERE {location_clause} AND {time_clause}{_float_clause(intent, params)}"
     if metrics and aggregation != "COUNT":
         select_exprs = [f'{aggregation}(NULLIF("{m}", \'NaN\')) AS "{m}"' for m in metrics]
-        return f'SELECT {", ".join(select_exprs)} {base_query_from};'
+        return BoundQuery(f'SELECT {", ".join(select_exprs)} {base_query_from};', params)
     metric_to_agg = f'"{metrics[0]}"' if metrics else '"float_id"'
     if aggregation == "COUNT": metric_to_agg = f'DISTINCT "float_id"'
-    return f'SELECT {aggregation}({metric_to_agg}) {base_query_from};'
+    return BoundQuery(f'SELECT {aggregation}({metric_to_agg}) {base_query_from};', params)
 
 def _get_existing_columns(engine) -> set:
-    # Returns a set of all column names in argo_data table
-    insp = engine.execute("SELECT column_name FROM information_schema.columns WHERE table_name = 'argo_data';")
-    return set(row[0] for row in insp)
+    # Returns a set of all column names in argo_data table (cached, see schema_catalog)
+    return schema_catalog.columns(engine)
+
+# Upper bound on "the N most recent profiles": each one is a separate index probe
+MAX_PROFILES = 50
+
+def _profile_target_date(value, max_date: datetime = None):
+    """Midpoint of the period named by ``target_date`` ("2023-03-15", "March 2023"), or None."""
+    if isinstance(value, datetime):
+        return value
+    start, end = time_range.resolve(value, max_date)
+    if start is not None and end is not None:
+        return start + (end - start) / 2
+    return start or end
+
+def _build_profile_query(intent: dict, existing_cols=None, db_context: dict = None) -> str:
+    """
+    Whole depth profiles, picked by index-ordered lookups instead of a
+    correlated ``MAX("timestamp")`` subquery over the same scope.
+
+    Three lookups, chosen from the intent:
+
+        latest (default)    newest profile in scope: one ORDER BY "timestamp"
+                            DESC LIMIT 1 probe
+        profile_count = N   the N newest profiles: a recursive walk taking
+                            one probe per profile
+        target_date = X     the profile closest to X: the newest at or before
+                            X and the oldest after it, whichever is nearer
 
-def _build_profile_query(intent: dict, existing_cols=None) -> str:
+    The scope is ``"float_id" = :float_id`` (idx_argo_float_time_lat_lon)
+    or the region box plus time range (idx_argo_time_geo). The chosen
+    (float_id, timestamp) pairs are joined back to argo_data for every level.
+    """
     float_id = intent.get("float_id")
     location_clause = intent.get("location_clause")
     time_constraint = intent.get("time_constraint")
     metrics = intent.get("metrics")
+    max_date = (db_context or {}).get("max_date_obj") or datetime.now()
     sensor_cols = ["temperature", "salinity", "dissolved_oxygen", "chlorophyll", "nitrate", "ph", "pressure"]
     # Only select columns that exist in the table
     if existing_cols:
@@ -294,29 +567,79 @@ def _build_profile_query(intent: dict, existing_cols=None) -> str:
         metrics = [m for m in metrics if m in sensor_cols]
     else:
         metrics = sensor_cols
-    if float_id is not None:
-        select_cols = [f'"{m}"' for m in metrics] if metrics else [f'"{m}"' for m in sensor_cols]
-        select_cols += [col for col in ["pressure", "latitude", "longitude", "float_id", "timestamp"] if not existing_cols or col in existing_cols]
-        return f'SELECT {", ".join(select_cols)} FROM argo_data WHERE "float_id" = {float_id} AND "timestamp" = (SELECT MAX("timestamp") FROM argo_data WHERE "float_id" = {float_id}) ORDER BY "pressure" ASC;'
     clauses = []
-    if location_clause:
+    params = {}
+    if float_id is not None:
+        clauses.append('"float_id" = :float_id')
+        params["float_id"] = float_id
+    elif location_clause:
         clauses.append(location_clause)
     if time_constraint:
-        from datetime import datetime
-        max_date = datetime.now()
-        time_clause = _get_time_clause(time_constraint, max_date)
+        time_clause = _get_time_clause(time_constraint, max_date, params)
         if time_clause != "1=1":
             clauses.append(time_clause)
     if not clauses:
         raise ValueError("Profile query requires a valid float_id, location, or time constraint.")
-    where_clause = " AND ".join(clauses)
+    scope = " AND ".join(clauses)
+    newest_first = 'ORDER BY "timestamp" DESC, "float_id" DESC'
+
+    target_date = _profile_target_date(intent.get("target_date"), max_date) if intent.get("target_date") else None
+    try:
+        count = max(1, min(int(intent.get("profile_count") or 1), MAX_PROFILES))
+    except (TypeError, ValueError):
+        count = 1
+    if target_date is not None:
+        params["target_date"] = target_date
+        picked = f"""picked AS (
+        SELECT pick_float, pick_time FROM (
+            (SELECT "float_id" AS pick_float, "timestamp" AS pick_time FROM argo_data
+             WHERE {scope} AND "timestamp" <= :target_date {newest_first} LIMIT 1)
+            UNION ALL
+            (SELECT "float_id" AS pick_float, "timestamp" AS pick_time FROM argo_data
+             WHERE {scope} AND "timestamp" > :target_date ORDER BY "timestamp" ASC, "float_id" ASC LIMIT 1)
+        ) AS candidates
+        ORDER BY CASE WHEN pick_time <= :target_date THEN CAST(:target_date AS TIMESTAMP) - pick_time
+                      ELSE pick_time - CAST(:target_date AS TIMESTAMP) END
+        LIMIT 1
+    )"""
+    elif count > 1:
+        # Walk back through the profiles in scope one index probe at a time,
+        # rather than sorting every distinct (float_id, timestamp) in it
+        params["profiles"] = count
+        picked = f"""picked (pick_float, pick_time, n) AS (
+        (SELECT "float_id", "timestamp", 1 FROM argo_data WHERE {scope} {newest_first} LIMIT 1)
+        UNION ALL
+        SELECT nxt."float_id", nxt."timestamp", picked.n + 1
+        FROM picked, LATERAL (
+            SELECT "float_id", "timestamp" FROM argo_data
+            WHERE {scope}
+              AND ("timestamp" < picked.pick_time OR ("timestamp" = picked.pick_time AND "float_id" < picked.pick_float))
+            {newest_first} LIMIT 1
+        ) AS nxt
+        WHERE picked.n < :profiles
+    )"""
+    else:
+        picked = f"""picked AS (
+        SELECT "float_id" AS pick_float, "timestamp" AS pick_time FROM argo_data
+        WHERE {scope} {newest_first} LIMIT 1
+    )"""
+
     select_cols = [f'"{m}"' for m in metrics] if metrics else [f'"{m}"' for m in sensor_cols]
     select_cols += [col for col in ["pressure", "latitude", "longitude", "float_id", "timestamp"] if not existing_cols or col in existing_cols]
-    return f'SELECT {", ".join(select_cols)} FROM argo_data WHERE {where_clause} AND "timestamp" = (SELECT MAX("timestamp") FROM argo_data WHERE {where_clause}) ORDER BY "pressure" ASC;'
+    order_by = '"timestamp" DESC, "float_id", "pressure" ASC' if "profiles" in params else '"pressure" ASC'
+    recursive = "RECURSIVE " if "profiles" in params else ""
+    return BoundQuery(f"""
+    WITH {recursive}{picked}
+    SELECT {", ".join(select_cols)}
+    FROM picked JOIN argo_data ON "float_id" = pick_float AND "timestamp" = pick_time
+    ORDER BY {order_by};
+    """, params)
 
-def _build_trajectory_query(intent: dict, db_context: dict, existing_cols=None) -> str:
+def _build_trajectory_query(intent: dict, db_context: dict, existing_cols=None,
+                            dialect: str = sql_dialects.DEFAULT_DIALECT) -> str:
     float_id = intent.get("float_id")
-    time_clause = _get_time_clause(intent.get("time_constraint"), db_context.get("max_date_obj"))
+    params = {"float_id": float_id}
+    time_clause = _get_time_clause(intent.get("time_constraint"), db_context.get("max_date_obj"), params)
     sensor_cols = ["temperature", "salinity", "dissolved_oxygen", "chlorophyll", "nitrate", "ph", "pressure"]
     if existing_cols:
         sensor_cols = [col for col in sensor_cols if col in existing_cols]
@@ -333,52 +656,132 @@ def _build_trajectory_query(intent: dict, db_context: dict, existing_cols=None)
     if not select_cols:
         select_cols = base_cols
     cols_str = ", ".join([f'"{c}"' for c in select_cols])
-    return f'SELECT {cols_str} FROM argo_data WHERE "float_id" = {float_id} AND {time_clause} ORDER BY "timestamp" ASC;'
+    return BoundQuery(_track_query(cols_str, f'"float_id" = :float_id AND {time_clause}', _surface_only(intent),
+                                   existing_cols, dialect),
+                      params)
+
+# Scatter sampling: a seeded, deterministic uniform sample of this many rows
+SCATTER_SAMPLE_ROWS = 1000
+SCATTER_SEED = 42
+# Density mode: bins per axis of the 2-D histogram
+SCATTER_DENSITY_BINS = 50
+_SAMPLE_PRIME = 2147483629  # largest prime below 2**31, so sample_x * sample_x fits a BIGINT
+
+def _sample_key_expr(existing_cols=None) -> str:
+    """
+    A seeded pseudo-random BIGINT per row, from columns that identify it.
+
+    Rows are keyed by (float_id, timestamp, pressure): the linear mix is
+    squared modulo a prime to scatter neighbouring rows. Plain arithmetic,
+    so the same template runs on PostgreSQL, CockroachDB and DuckDB (the
+    cold tier) and every engine picks the same rows.
+    """
+    parts = {"float_id": 'CAST("float_id" AS BIGINT) * 7919',
+             "timestamp": 'CAST(EXTRACT(EPOCH FROM "timestamp") AS BIGINT) * 31',
+             "pressure": 'CAST(COALESCE("pressure", 0) * 10 AS BIGINT)'}
+    mix = " + ".join(expr for col, expr in parts.items() if not existing_cols or col in existing_cols)
+    return f"MOD({mix} + :seed, {_SAMPLE_PRIME})"
 
 def _build_scatter_query(intent: dict, db_context: dict, existing_cols=None) -> str:
+    """
+    Two metrics against each other, as a representative sample or a density grid.
+
+    Sample (default): the SCATTER_SAMPLE_ROWS rows with the smallest seeded
+    sample key. That is a uniform random sample of every matching row,
+    the same on every run. Tiers merge exactly: the smallest keys of the
+    union are the smallest of each tier's smallest.
+
+    Density (``scatter_mode = "density"``): every matching row is binned
+    into a SCATTER_DENSITY_BINS x SCATTER_DENSITY_BINS grid between the
+    metrics' min and max. Each cell carries its count and the sums needed
+    for the population correlation and regression (see density.py).
+    """
     metrics = intent.get("metrics") or []
     if existing_cols:
         metrics = [m for m in metrics if m in existing_cols]
     if len(metrics) < 2:
         metrics = [c for c in ["temperature", "salinity"] if not existing_cols or c in existing_cols]
     location_clause = intent.get("location_clause", "1=1")
-    select_cols = [f'"{m}"' for m in metrics]
-    time_clause = _get_time_clause(intent.get("time_constraint"), db_context.get("max_date_obj"))
-    base_query_from = f"FROM argo_data WHERE {location_clause} AND {time_clause}"
-    non_null_clauses = [f'"{m}" IS NOT NULL' for m in metrics]
-    cols_str = ', '.join(select_cols)
-    null_str = ' AND '.join(non_null_clauses)
-    return f"SELECT {cols_str} {base_query_from} AND {null_str} LIMIT 1000;"
+    params = {}
+    time_clause = _get_time_clause(intent.get("time_constraint"), db_context.get("max_date_obj"), params)
+    base_query_from = f"FROM argo_data WHERE {location_clause} AND {time_clause}{_float_clause(intent, params)}"
+    null_str = ' AND '.join(f'"{m}" IS NOT NULL' for m in metrics)
+
+    if intent.get("scatter_mode") == "density" and len(metrics) >= 2:
+        x, y = metrics[:2]
+        params["bins"] = SCATTER_DENSITY_BINS
+        bin_of = lambda v: (f"LEAST(CAST(FLOOR(COALESCE(({v} - {v}_min) / NULLIF({v}_max - {v}_min, 0), 0) * :bins)"
+                            f" AS INTEGER), :bins - 1)")
+        centre_of = lambda v: f"MIN({v}_min) + ({v}_bin + 0.5) * (MIN({v}_max) - MIN({v}_min)) / :bins"
+        return BoundQuery(f"""
+    WITH pts AS (
+        SELECT CAST("{x}" AS DOUBLE PRECISION) AS x, CAST("{y}" AS DOUBLE PRECISION) AS y
+        {base_query_from} AND {null_str}
+    ),
+    bounds AS (
+        SELECT MIN(x) AS x_min, MAX(x) AS x_max, MIN(y) AS y_min, MAX(y) AS y_max FROM pts
+    ),
+    cells AS (
+        SELECT {bin_of("x")} AS x_bin, {bin_of("y")} AS y_bin, x, y, x_min, x_max, y_min, y_max
+        FROM pts CROSS JOIN bounds
+    )
+    SELECT {centre_of("x")} AS "{x}", {centre_of("y")} AS "{y}", COUNT(*) AS "count",
+        x_bin, y_bin, MIN(x_min) AS x_min, MIN(x_max) AS x_max, MIN(y_min) AS y_min, MIN(y_max) AS y_max,
+        SUM(x) AS sum_x, SUM(y) AS sum_y, SUM(x * x) AS sum_xx, SUM(y * y) AS sum_yy, SUM(x * y) AS sum_xy
+    FROM cells
+    GROUP BY x_bin, y_bin
+    ORDER BY x_bin, y_bin;
+    """, params)
+
+    params.update(seed=SCATTER_SEED, limit=SCATTER_SAMPLE_ROWS)
+    cols_str = ', '.join(f'"{m}"' for m in metrics)
+    return BoundQuery(f"""
+    SELECT {cols_str}, MOD(sample_x * sample_x, {_SAMPLE_PRIME}) AS sample_key
+    FROM (SELECT {cols_str}, {_sample_key_expr(existing_cols)} AS sample_x {base_query_from} AND {null_str}) AS pts
+    ORDER BY sample_key LIMIT :limit;
+    """, params)
 
 def _build_general_query(intent: dict, db_context: dict) -> str:
     location_clause = intent.get("location_clause", "1=1")
-    time_clause = _get_time_clause(intent.get("time_constraint"), db_context.get("max_date_obj"))
+    params = {}
+    time_clause = _get_time_clause(intent.get("time_constraint"), db_context.get("max_date_obj"), params)
     base_query_from = f"FROM argo_data WHERE {location_clause} AND {time_clause}"
-    return f"SELECT * {base_query_from} LIMIT 500;"
+    return BoundQuery(f"SELECT * {base_query_from} LIMIT 500;", params)
 
-def _get_time_clause(time_constraint: str, max_date: datetime = None) -> str:
-    if not time_constraint:
+def _get_time_clause(time_constraint: str, max_date: datetime = None, params: dict = None) -> str:
+    """
+    Sargable WHERE predicate for a time constraint.
+
+    Always a half-open ``"timestamp" >= :start_date AND "timestamp" < :end_date``
+    range (one side only for open-ended constraints), so the timestamp
+    indexes can range-scan it. See time_range.py for the accepted forms.
+
+    When ``params`` is given the dates are bound and added to it; otherwise
+    they are inlined.
+    """
+    start, end = _get_time_range(time_constraint, max_date)
+    conditions, values = [], {}
+    if start is not None:
+        conditions.append('"timestamp" >= :start_date')
+        values["start_date"] = start
+    if end is not None:
+        conditions.append('"timestamp" < :end_date')
+        values["end_date"] = end
+    if not conditions:
         return "1=1"
-    
-    # Default max_date to today if not provided
-    if max_date is None:
-        max_date = datetime.now()
-    
-    if "last 6 months" in time_constraint.lower():
-        start_date = (max_date - timedelta(days=180)).strftime('%Y-%m-%d')
-        end_date = max_date.strftime('%Y-%m-%d')
-        return f'"timestamp" BETWEEN \'{start_date}\' AND \'{end_date}\''
-    
-    # Try to extract year
-    year_match = re.search(r'\b(20\d{2})\b', time_constraint)
-    if year_match:
-        year = year_match.group(1)
-        # Try to extract month
-        month_match = re.search(r'\b(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)\w*\b', time_constraint, re.IGNORECASE)
-        if month_match:
-            month_str = month_match.group(1).lower()[:3]
-            month_num = {"jan":1, "feb":2, "mar":3, "apr":4, "may":5, "jun":6, "jul":7, "aug":8, "sep":9, "oct":10, "nov":11, "dec":12}[month_str]
-            return f'EXTRACT(YEAR FROM "timestamp") = {year} AND EXTRACT(MONTH FROM "timestamp") = {month_num}'
-        return f'"timestamp" BETWEEN \'{year}-01-01\' AND \'{year}-12-31\''
-    
-    return "1=1"
\ No newline at end of file
+    return _bind_time_clause(" AND ".join(conditions), values, params)
+
+def _bind_time_clause(clause: str, values: dict, params: dict = None) -> str:
+    if params is None:
+        return BoundQuery(clause, values).render()
+    params.update(values)
+    return clause
+
+def _get_time_range(time_constraint: str, max_date: datetime = None):
+    """
+    Half-open [start, end) datetime range covered by a time constraint.
+
+    Used by _get_time_clause and to decide which storage tiers a query
+    reaches. Returns (None, None) when the query is not time-bounded.
+    """
+    return time_range.resolve(time_constraint, max_date)
@@ -0,0 +1,91 @@
+"""
+FloatChart SQL Dialects
+=======================
+The few constructs sql_builder compiles differently per database engine.
+
+Every builder takes a dialect: "postgresql" (the default, also used when
+no engine is known), "cockroachdb" or "duckdb". Most of the generated SQL
+is portable; these helpers choose the idiom each engine runs best or
+correctly:
+
+    latest row per group    PostgreSQL / CockroachDB: DISTINCT ON with an
+                            ORDER BY the index can serve.
+                            DuckDB: one hash aggregate of
+                            arg_max({...row...}, "timestamp"), which skips
+                            the sort DISTINCT ON needs.
+    rounding                PostgreSQL only rounds NUMERIC to a number of
+                            places, so the value is cast; CockroachDB and
+                            DuckDB round DOUBLE directly. On DuckDB a bare
+                            NUMERIC is DECIMAL(18,3), which would cut
+                            coordinates to 3 places.
+    floating point          DOUBLE PRECISION everywhere: DuckDB's FLOAT is
+                            4-byte.
+
+Rounding is applied to result rows (one per float), never to the scanned
+columns, so no cast is evaluated per row of argo_data.
+
+See benchmarks/bench_dialects.py for timings.
+"""
+
+import re
+from typing import Iterable, Optional
+
+DIALECTS = ("postgresql", "cockroachdb", "duckdb")
+DEFAULT_DIALECT = "postgresql"
+DOUBLE = "DOUBLE PRECISION"
+_IDENTIFIER_RE = re.compile(r'^"?\w+"?$')
+
+
+def dialect_of(engine=None, dialect: Optional[str] = None) -> str:
+    """
+    The dialect to compile for: ``dialect`` if given, else ``engine``'s.
+    Engines of other databases get the default (PostgreSQL) SQL.
+    """
+    if dialect is not None:
+        if dialect not in DIALECTS:
+            raise ValueError(f"Unsupported SQL dialect: {dialect!r}")
+        return dialect
+    name = engine.dialect.name if engine is not None else DEFAULT_DIALECT
+    return name if name in DIALECTS else DEFAULT_DIALECT
+
+
+def round_to(expr: str, digits: int, dialect: str) -> str:
+    """``expr`` rounded to ``digits`` decimal places."""
+    if dialect == "postgresql":
+        value = expr if _IDENTIFIER_RE.match(expr) else f"({expr})"
+        return f"ROUND({value}::numeric, {digits})"
+    return f"ROUND({expr}, {digits})"
+
+
+def _unquote(column: str) -> str:
+    return column.strip().strip('"')
+
+
+def latest_per_group(columns: Iterable[str], keys: Iterable[str], order_by: str, from_where: str,
+                     dialect: str, descending: bool = True, newline: str = " ") -> str:
+    """
+    One row per distinct ``keys``: the row with the highest (``descending``)
+    or lowest ``order_by`` value.
+
+    Args:
+        columns: Quoted column names to return; ``keys`` come first.
+        keys: Quoted grouping columns, e.g. ['"float_id"'].
+        order_by: Quoted column deciding which row is kept.
+        from_where: The "FROM argo_data WHERE ..." part.
+        dialect: Target dialect.
+        newline: Separator between clauses (for indented templates).
+
+    Ties on ``order_by`` keep an arbitrary row, as DISTINCT ON does.
+    """
+    keys = list(keys)
+    values = [c for c in columns if c not in keys]
+    if dialect == "duckdb" and values:
+        pick = "arg_max" if descending else "arg_min"
+        row = ", ".join(f"'{_unquote(c)}': {c}" for c in values)
+        return newline.join([f"SELECT {', '.join(keys)}, unnest({pick}({{{row}}}, {order_by}))",
+                             from_where,
+                             f"GROUP BY {', '.join(keys)}"])
+    direction = " DESC" if descending else " ASC"
+    return newline.join([f"SELECT DISTINCT ON ({', '.join(keys)}) {', '.join(keys + values)}",
+                         from_where,
+                         f"ORDER BY {', '.join(keys)}, {order_by}{direction}"])
@@ -15,11 +15,293 @@ Design philosophy (aligned with Anthropic's AI safety principles):
   2. TRANSPARENCY — every rejection includes a clear, human-readable reason.
   3. DEFENCE IN DEPTH — multiple independent checks, each targeting a different
      attack vector (DML, DDL, shell escape, stacked statements, etc.).
+
+The query is lexed once by a single precompiled pattern. String literals
+(including E'' and $$ strings), quoted identifiers and comments are whole
+tokens, so a keyword or ';' inside them is never mistaken for SQL: an
+"update" alias or a 'DROP' label is allowed. Every check is then a set or
+list lookup over the tokens, and verdicts are memoized per SQL text, since
+sql_builder emits a small set of repeated templates.
+
+A second pass over the tokens resolves the relations each FROM clause
+reads (tables, CTEs, subqueries, VALUES, table functions) and enforces the
+table allowlist. It rejects joins of two argo_data-sized relations that
+have no join condition (cartesian products), and self-joins that do not
+match rows on float_id and timestamp. A non-aggregate query without a
+LIMIT is given one (MAX_LIMIT); the SQL to run is returned as ``sql``.
 """
 
 import re
+from functools import lru_cache
 from typing import Optional
 
+# One token per match, upper-cased after lexing. Characters no alternative
+# matches (whitespace, most operators) are skipped. An unterminated quote
+# matches nothing, so the text after it is still lexed as SQL. Alternatives
+# are ordered by frequency; E'' must precede words. A dollar-quoted string
+# ends only at its own tag, compared case-sensitively as PostgreSQL does
+# ($a$ ... $b$ ... $A$ ... $a$ is one string).
+_TOKEN_RE = re.compile(r"""
+      E'(?:[^'\\]|\\.|'')*'                     # escape string literal
+    | [A-Z_][\w$]*                              # keyword or identifier
+    | [;(),.=]                                  # punctuation the checks read
+    | "(?:[^"]|"")*"                            # quoted identifier
+    | '(?:[^']|'')*'                            # string literal
+    | :[A-Z_]\w* | \$\d+                        # bind markers
+    | ::                                        # cast, so ::type is not read as a bind marker
+    | \d+(?:\.\d*)?                             # number
+    | [<>!]=|<>                                 # so <= is not read as =
+    | --[^\n]*                                  # line comment
+    | /\*.*?(?:\*/|\Z)                          # block comment (to the end if unclosed)
+    | \$((?-i:[A-Z_a-z]\w*)?)\$.*?\$(?-i:\1)\$   # dollar-quoted literal (ends at the same tag)
+""", re.VERBOSE | re.DOTALL | re.IGNORECASE)
+
+# ── Query structure: relations, joins and the top-level LIMIT ──────────────────
+_AGGREGATES = {
+    "AVG", "COUNT", "SUM", "MIN", "MAX", "STDDEV", "STDDEV_POP", "STDDEV_SAMP", "VARIANCE",
+    "VAR_POP", "VAR_SAMP", "ARRAY_AGG", "STRING_AGG", "BOOL_AND", "BOOL_OR", "PERCENTILE_CONT",
+    "PERCENTILE_DISC", "MODE", "MEDIAN", "CORR", "COVAR_POP", "COVAR_SAMP", "REGR_SLOPE",
+    "REGR_INTERCEPT", "ARG_MAX", "ARG_MIN", "APPROX_COUNT_DISTINCT",
+}
+# Keywords that end a FROM clause
+_FROM_END = {"WHERE", "GROUP", "HAVING", "ORDER", "LIMIT", "OFFSET", "FETCH", "UNION",
+             "INTERSECT", "EXCEPT", "WINDOW", "QUALIFY", "SELECT", ";"}
+# A join of two argo_data-sized relations must match rows on these columns
+_JOIN_KEY = {"FLOAT_ID", "TIMESTAMP"}
+_LARGE_TABLE = "argo_data"
+
+
+class _Frame:
+    """A query level: the statement, a subquery, a FROM item in parentheses or a CTE body."""
+
+    __slots__ = ("select", "aggregate", "group_by", "limit", "clauses", "in_from", "expect",
+                 "lateral", "is_item", "cte", "opener", "depth", "nested_large", "large")
+
+    def __init__(self, opener=None):
+        self.select = self.aggregate = self.group_by = self.in_from = False
+        self.lateral = self.is_item = self.nested_large = self.large = False
+        self.limit = self.cte = self.expect = None
+        self.clauses = []         # FROM items, one list per FROM clause
+        self.opener = opener      # token before the "("
+        self.depth = 0            # open expression parentheses, e.g. f(x), USING (...)
+
+    def end_condition(self, i):
+        if self.clauses and self.clauses[-1]:
+            cond = self.clauses[-1][-1]["cond"]
+            if cond is not None and cond[1] is None:
+                cond[1] = i
+
+    def end_from(self, i):
+        if self.in_from:
+            self.end_condition(i)
+        self.in_from, self.expect = False, None
+
+
+# Tokens the structure pass stops at; FROM items are read ahead from FROM,
+# JOIN and the commas found between stops inside a FROM clause
+_STRUCTURAL = {"(", ")", "SELECT", "FROM", "JOIN", "ON", "USING"} | _FROM_END | _AGGREGATES
+_SET_OPERATORS = {"UNION", "ALL", "INTERSECT", "EXCEPT", "DISTINCT", "("}
+_CTE_OPENERS = {"AS", "MATERIALIZED"}
+
+
+class _Structure:
+    """
+    What one pass over the tokens found:
+
+        relation      first relation outside the allowlist, or None
+        cartesian     (left, right) of a large join with no equality condition, or None
+        self_join     (left, right) of a large join not matching float_id and
+                      timestamp, or None
+        needs_limit   the statement returns rows and has no LIMIT
+        limits        the token after each LIMIT (a number or a bind marker)
+        statements    statements the text holds (';' separated, empty ones skipped)
+
+    "Large" means argo_data-sized: argo_data itself, or a CTE or subquery
+    reading it that is not cut to one row (an aggregate without GROUP BY,
+    or LIMIT 1).
+    """
+
+    def __init__(self, tokens: list, allowed: set, functions: set):
+        self.tokens, self.allowed, self.functions = tokens, allowed, functions
+        self.relation = self.cartesian = self.self_join = None
+        self.limits = []          # the token after every LIMIT
+        self.ctes = {}            # name -> body frame (None while it is defined)
+        root = self._scan()
+        self.statements = sum(1 for prev, tok in zip([";"] + tokens, tokens) if prev == ";" and tok != ";")
+        self.needs_limit = root.select and root.limit is None and not (root.aggregate or root.group_by)
+
+    @staticmethod
+    def _name(*parts) -> str:
+        name = ".".join(part.strip('"').lower() for part in parts)
+        return name[7:] if name.startswith("public.") else name
+
+    def _scan(self) -> _Frame:
+        tokens, n = self.tokens, len(self.tokens)
+        frame, stack, openers = _Frame(), [], []
+        last_opener, prev, in_from_gap = None, -1, False
+        for i in [i for i, tok in enumerate(tokens) if tok in _STRUCTURAL]:
+            if in_from_gap and "," in tokens[prev + 1:i]:
+                self._commas(frame, prev + 1, i)
+            tok = tokens[i]
+            nxt = tokens[i + 1] if i + 1 < n else ""
+            if tok == "(":
+                opener = tokens[i - 1] if i else None
+                cte = self._cte_name(i, last_opener) if opener in _CTE_OPENERS else None
+                if frame.expect is not None or cte is not None or nxt in ("SELECT", "WITH", "VALUES"):
+                    child = _Frame(opener)
+                    if frame.expect is not None:
+                        child.is_item = True
+                        self._add(frame, None, child=child)
+                    elif cte is not None:
+                        child.cte = cte
+                        self.ctes.setdefault(cte, None)
+                    stack.append(frame)
+                    frame = child
+                else:
+                    frame.depth += 1
+                    openers.append(opener)
+            elif tok == ")":
+                if frame.depth:
+                    frame.depth -= 1
+                    last_opener = openers.pop() if openers else None
+                elif stack:
+                    closed = frame
+                    self._close(closed, i)
+                    frame = stack.pop()
+                    if not (closed.is_item or closed.cte) and (not frame.select or closed.opener in _SET_OPERATORS):
+                        frame.nested_large |= closed.large
+            elif frame.depth:
+                # Inside f(...), ON (...), USING (...): only aggregates and LIMITs matter
+                if tok in _AGGREGATES and nxt == "(":
+                    frame.aggregate = True
+                elif tok == "LIMIT":
+                    self.limits.append(nxt)
+            elif tok == "SELECT":
+                if frame.in_from:
+                    frame.end_from(i)
+                frame.select = True
+            elif tok == "FROM":
+                if frame.select and tokens[i - 1] != "DISTINCT":     # not IS DISTINCT FROM
+                    frame.end_from(i)
+                    frame.in_from = True
+                    frame.clauses.append([])
+                    self._expect(frame, "FROM", i + 1)
+            elif tok in _FROM_END:
+                if frame.in_from:
+                    frame.end_from(i)
+                if tok == "GROUP" and nxt == "BY":
+                    frame.group_by = True
+                elif tok in ("LIMIT", "FETCH"):
+                    frame.limit = nxt
+                    if tok == "LIMIT":
+                        self.limits.append(nxt)
+            elif tok in _AGGREGATES:
+                frame.aggregate |= nxt == "("
+            elif frame.in_from:
+                if tok == "JOIN":
+                    frame.end_condition(i)
+                    self._expect(frame, "CROSS" if tokens[i - 1] == "CROSS" else
+                                 "NATURAL" if "NATURAL" in tokens[i - 3:i] else "JOIN", i + 1)
+                elif frame.clauses[-1]:      # ON / USING
+                    frame.clauses[-1][-1]["cond"] = [i, None]
+            prev, in_from_gap = i, frame.in_from and not frame.depth
+        if in_from_gap and "," in tokens[prev + 1:]:
+            self._commas(frame, prev + 1, n)
+        while stack:
+            self._close(frame, n)
+            frame = stack.pop()
+        self._close(frame, n)
+        return frame
+
+    def _cte_name(self, i: int, last_opener):
+        """The CTE whose body opens at ``i``: WITH name [(columns)] AS [NOT MATERIALIZED] (."""
+        tokens = self.tokens
+        k = i - 1
+        while k > 0 and tokens[k] in ("MATERIALIZED", "NOT"):
+            k -= 1
+        if k < 1 or tokens[k] != "AS":
+            return None
+        return self._name(last_opener if tokens[k - 1] == ")" and last_opener else tokens[k - 1])
+
+    def _commas(self, frame: _Frame, start: int, end: int):
+        """FROM-list commas between two structural tokens: each starts a new item."""
+        for k in range(start, end):
+            if self.tokens[k] == "," and frame.in_from:
+                frame.end_condition(k)
+                self._expect(frame, ",", k + 1)
+
+    def _expect(self, frame: _Frame, join: str, j: int):
+        """Read the FROM item at ``j``: [schema.]name, name(...), or a "(" handled by the scan."""
+        tokens, n = self.tokens, len(self.tokens)
+        frame.expect = join
+        while j < n and tokens[j] in ("LATERAL", "ONLY"):
+            frame.lateral |= tokens[j] == "LATERAL"
+            j += 1
+        if j >= n or tokens[j] == "(":
+            return
+        tok = tokens[j]
+        if tok[0] == '"' or tok[0].isalpha() or tok[0] == "_":
+            parts = [tok]
+            while j + 2 < n and tokens[j + 1] == ".":
+                parts.append(tokens[j + 2])
+                j += 2
+            self._add(frame, self._name(*parts), j + 1 < n and tokens[j + 1] == "(")
+        else:
+            # A literal or bind marker: DuckDB reads FROM 'file.csv'
+            self._add(frame, tok)
+
+    def _add(self, frame: _Frame, name, is_function=False, child=None):
+        frame.clauses[-1].append({"name": name, "frame": child, "join": frame.expect, "cond": None,
+                                  "lateral": frame.lateral or is_function})
+        frame.lateral, frame.expect = False, None
+        if name is None or self.relation:
+            return
+        if (name not in self.functions) if is_function else (name not in self.allowed and name not in self.ctes):
+            self.relation = name
+
+    def _is_large(self, item) -> bool:
+        if item["lateral"]:
+            return False      # correlated subquery or table function
+        if item["frame"] is not None:
+            return item["frame"].large
+        body = self.ctes.get(item["name"])
+        return body.large if body is not None else item["name"] == _LARGE_TABLE
+
+    def _equated(self, cond) -> set:
+        """Columns a join condition (ON ... = ... or USING (...)) matches on."""
+        tokens = self.tokens
+        start, end = cond
+        if tokens[start] == "USING":
+            return {t.strip('"') for t in tokens[start + 1:end]}
+        columns = set()
+        for k in range(start + 1, end - 1):
+            if tokens[k] == "=":
+                columns.add(tokens[k - 1].strip('"'))
+                right = tokens[k + 3] if k + 3 < end and tokens[k + 2] == "." else tokens[k + 1]
+                columns.add(right.strip('"'))
+        return columns
+
+    def _close(self, frame: _Frame, i: int):
+        frame.end_from(i)
+        for clause in frame.clauses:
+            large = []
+            for item in clause:
+                if not self._is_large(item):
+                    continue
+                label = item["name"] or "subquery"
+                if large and item["join"] != "NATURAL":
+                    columns = self._equated(item["cond"]) if item["cond"] else set()
+                    if item["join"] in (",", "CROSS") or not columns:
+                        self.cartesian = self.cartesian or (large[-1], label)
+                    elif not _JOIN_KEY <= columns:
+                        self.self_join = self.self_join or (large[-1], label)
+                large.append(label)
+            frame.large |= bool(large)
+        frame.large = (frame.large or frame.nested_large) and not (
+            (frame.aggregate and not frame.group_by) or frame.limit == "1")
+        if frame.cte is not None:
+            self.ctes[frame.cte] = frame
+
 
 class SQLSanitizer:
     """Static validator for AI-generated SQL. All methods are class-level."""
@@ -27,52 +309,50 @@ class SQLSanitizer:
     # ── Read-only allowlisted statement types ────────────────────────────────
     _ALLOWED_PREFIXES = ("select", "with")   # CTEs start with WITH
 
-    # ── Destructive DML / DDL keywords (case-insensitive full-word match) ────
+    # ── Destructive DML / DDL keywords (whole unquoted words, in report order) ─
     _BLOCKED_KEYWORDS = [
         # Data Manipulation Language
-        r"\bINSERT\b",
-        r"\bUPDATE\b",
-        r"\bDELETE\b",
-        r"\bTRUNCATE\b",
-        r"\bMERGE\b",
-        r"\bREPLACE\b",
-        r"\bUPSERT\b",
+        "INSERT", "UPDATE", "DELETE", "TRUNCATE", "MERGE", "REPLACE", "UPSERT",
         # Data Definition Language
-        r"\bDROP\b",
-        r"\bCREATE\b",
-        r"\bALTER\b",
-        r"\bRENAME\b",
-        r"\bCOMMENT\s+ON\b",
+        "DROP", "CREATE", "ALTER", "RENAME", "COMMENT ON",
         # Transaction control (prevent bypassing checks)
-        r"\bCOMMIT\b",
-        r"\bROLLBACK\b",
-        r"\bBEGIN\b",
-        r"\bSTART\s+TRANSACTION\b",
+        "COMMIT", "ROLLBACK", "BEGIN", "START TRANSACTION",
         # Privilege escalation
-        r"\bGRANT\b",
-        r"\bREVOKE\b",
-        r"\bSET\s+ROLE\b",
+        "GRANT", "REVOKE", "SET ROLE",
         # PostgreSQL-specific dangerous functions
-        r"\bPG_SLEEP\b",
-        r"\bPG_READ_FILE\b",
-        r"\bPG_WRITE_FILE\b",
-        r"\bCOPY\b",
-        r"\bLO_IMPORT\b",
-        r"\bLO_EXPORT\b",
+        "PG_SLEEP", "PG_READ_FILE", "PG_WRITE_FILE", "COPY", "LO_IMPORT", "LO_EXPORT",
         # Shell execution
-        r"\bEXECUTE\b",
-        r"\bEXEC\b",
-        r"\bCALL\b",
-        r"\bCREATE\s+EXTENSION\b",
+        "EXECUTE", "EXEC", "CALL", "CREATE EXTENSION",
     ]
+    # Function names are also blocked when quoted ("pg_sleep"(1) still calls it)
+    _BLOCKED_FUNCTIONS = {"PG_SLEEP", "PG_READ_FILE", "PG_WRITE_FILE", "LO_IMPORT", "LO_EXPORT"}
+
+    # ── System catalogs and settings functions ───────────────────────────────
+    _SYSTEM_NAMES = {"PG_CATALOG", "PG_NAMESPACE", "SET_CONFIG", "CURRENT_SETTING"}
 
-    # ── Table allowlist — ONLY argo_data may be queried ──────────────────────
-    _ALLOWED_TABLES = {"argo_data", "information_schema.columns",
+    # ── Table allowlist — ONLY argo_data (and its dataset_stats rollup) ──────
+    _ALLOWED_TABLES = {"argo_data", "dataset_stats", "information_schema.columns",
                        "information_schema.tables", "pg_class"}
+    # Table functions allowed in FROM (DuckDB's read_csv & co. read files)
+    _ALLOWED_FUNCTIONS = {"generate_series", "unnest"}
 
     # ── Hard row cap to prevent runaway queries ───────────────────────────────
     MAX_LIMIT = 10_000
 
+    _BLOCKED_WORDS = {k for k in _BLOCKED_KEYWORDS if " " not in k}
+    _BLOCKED_PAIRS = [tuple(k.split()) for k in _BLOCKED_KEYWORDS if " " in k]
+    _QUOTED_NAMES = {f'"{name}"' for name in _BLOCKED_FUNCTIONS | _SYSTEM_NAMES}
+
+    @staticmethod
+    def tokenize(sql: str) -> list:
+        """Tokens of ``sql`` (upper-cased; literals, quoted names and comments whole)."""
+        return [match.group().upper() for match in _TOKEN_RE.finditer(sql)]
+
+    @classmethod
+    def statement_count(cls, sql: str) -> int:
+        """Statements in ``sql``; anything sent to the database on its own must have exactly one."""
+        return _Structure(cls.tokenize(sql), cls._ALLOWED_TABLES, cls._ALLOWED_FUNCTIONS).statements
+
     @classmethod
     def validate(cls, sql: str) -> dict:
         """
@@ -81,107 +361,121 @@ class SQLSanitizer:
             safe   (bool)           — True only if ALL checks pass.
             reason (str | None)     — First failure reason, or None if safe.
             checks (dict[str,bool]) — Individual check results for auditability.
+            sql    (str | None)     — The SQL to run if safe: the input, with
+                                      ``LIMIT MAX_LIMIT`` appended to a
+                                      non-aggregate query that has none.
+            limit_added (bool)      — Whether ``sql`` had that LIMIT appended.
 
         Example:
             >>> SQLSanitizer.validate("DROP TABLE argo_data;")
-            {"safe": False, "reason": "Blocked keyword detected: DROP",
-             "checks": {"is_select": True, "no_blocked_keywords": False, ...}}
+            {"safe": False, "reason": "Only SELECT queries are allowed. Got: 'DROP'.",
+             "checks": {"non_empty": True, "is_select_or_cte": False}, "sql": None, "limit_added": False}
         """
-        checks: dict[str, bool] = {}
-        reason: Optional[str] = None
+        safe, reason, checks, bounded_sql = _cached_verdict(sql)
+        return cls._result(safe, reason, dict(checks), bounded_sql, bounded_sql not in (None, sql))
 
-        sql_stripped = sql.strip()
+    @classmethod
+    def _verdict(cls, sql: str) -> tuple:
+        """(safe, reason, checks, sql to run) for ``sql``; checks stop at the first failure."""
+        checks: dict[str, bool] = {}
 
         # ── Check 1: Non-empty ────────────────────────────────────────────────
-        checks["non_empty"] = bool(sql_stripped)
+        checks["non_empty"] = bool(sql.strip())
         if not checks["non_empty"]:
-            return cls._result(False, "SQL string is empty.", checks)
+            return False, "SQL string is empty.", checks, None
 
-        sql_upper = sql_stripped.upper()
-        sql_normalised = re.sub(r"\s+", " ", sql_stripped)
+        tokens = cls.tokenize(sql)
+        words = set(tokens)
 
         # ── Check 2: Must start with SELECT or WITH (CTE) ────────────────────
-        first_word = sql_normalised.lstrip().split()[0].lower()
-        checks["is_select_or_cte"] = first_word in cls._ALLOWED_PREFIXES
+        first_word = tokens[0] if tokens else sql.split()[0].upper()
+        checks["is_select_or_cte"] = first_word.lower() in cls._ALLOWED_PREFIXES
         if not checks["is_select_or_cte"]:
-            return cls._result(
-                False,
-                f"Only SELECT queries are allowed. Got: '{first_word.upper()}'.",
-                checks,
-            )
+            return False, f"Only SELECT queries are allowed. Got: '{first_word[:40]}'.", checks, None
 
         # ── Check 3: Blocked keyword scan ────────────────────────────────────
-        checks["no_blocked_keywords"] = True
-        for pattern in cls._BLOCKED_KEYWORDS:
-            if re.search(pattern, sql_upper):
-                keyword = re.search(pattern, sql_upper).group(0)
-                checks["no_blocked_keywords"] = False
-                reason = f"Blocked keyword detected: {keyword}"
-                return cls._result(False, reason, checks)
+        found = words & cls._BLOCKED_WORDS
+        found |= {name.strip('"') for name in words & cls._QUOTED_NAMES if name.strip('"') in cls._BLOCKED_FUNCTIONS}
+        for first, second in cls._BLOCKED_PAIRS:
+            if first in words and second in words and any(
+                    a == first and b == second for a, b in zip(tokens, tokens[1:])):
+                found.add(f"{first} {second}")
+        checks["no_blocked_keywords"] = not found
+        if found:
+            keyword = next(k for k in cls._BLOCKED_KEYWORDS if k in found)
+            return False, f"Blocked keyword detected: {keyword}", checks, None
 
         # ── Check 4: No stacked / semicolon-separated statements ─────────────
-        # Strip trailing semicolon then check for internal ones
-        inner_sql = sql_stripped.rstrip(";")
-        checks["no_stacked_statements"] = ";" not in inner_sql
+        # Trailing semicolons are fine; any other one starts a new statement
+        end = len(tokens)
+        while end and tokens[end - 1] == ";":
+            end -= 1
+        checks["no_stacked_statements"] = ";" not in words or tokens.index(";") >= end
         if not checks["no_stacked_statements"]:
-            return cls._result(
-                False,
-                "Stacked SQL statements (multiple ';') are not allowed.",
-                checks,
-            )
+            return False, "Stacked SQL statements (multiple ';') are not allowed.", checks, None
 
         # ── Check 5: No SQL comment injection (-- or /* */) ──────────────────
-        checks["no_comment_injection"] = (
-            "--" not in sql_stripped and "/*" not in sql_stripped
+        checks["no_comment_injection"] = not (
+            ("--" in sql or "/*" in sql) and any(t.startswith(("--", "/*")) for t in tokens)
         )
         if not checks["no_comment_injection"]:
-            return cls._result(
-                False,
-                "SQL comments ('--' or '/* */') are not permitted in queries.",
-                checks,
-            )
-
-        # ── Check 6: LIMIT present and within cap ────────────────────────────
-        limit_match = re.search(r"\bLIMIT\s+(\d+)", sql_upper)
-        if limit_match:
-            limit_val = int(limit_match.group(1))
-            checks["limit_within_cap"] = limit_val <= cls.MAX_LIMIT
-            if not checks["limit_within_cap"]:
-                return cls._result(
-                    False,
-                    f"LIMIT {limit_val} exceeds the maximum allowed cap of {cls.MAX_LIMIT}.",
-                    checks,
-                )
-        else:
-            # No LIMIT found — still allowed (some aggregation queries don't need one)
-            checks["limit_within_cap"] = True
-
-        # ── Check 7: No write-able pg_* system functions ─────────────────────
-        pg_write_funcs = [
-            r"\bpg_catalog\b", r"\bpg_namespace\b",
-            r"\bset_config\b", r"\bcurrent_setting\b",
-        ]
-        checks["no_system_function_abuse"] = True
-        for fn_pattern in pg_write_funcs:
-            if re.search(fn_pattern, sql_upper):
-                checks["no_system_function_abuse"] = False
-                return cls._result(
-                    False,
-                    f"Disallowed system function reference detected.",
-                    checks,
-                )
+            return False, "SQL comments ('--' or '/* */') are not permitted in queries.", checks, None
+
+        # Relations, joins and LIMITs for checks 6 and 8-10, in one more pass
+        structure = _Structure(tokens, cls._ALLOWED_TABLES, cls._ALLOWED_FUNCTIONS)
+
+        # ── Check 6: LIMIT literals within cap ───────────────────────────────
+        # A missing or bound (:limit) LIMIT is allowed; sql_builder caps bound values
+        checks["limit_within_cap"] = True
+        for value in structure.limits:
+            if value.isdigit() and int(value) > cls.MAX_LIMIT:
+                checks["limit_within_cap"] = False
+                return (False, f"LIMIT {int(value)} exceeds the maximum allowed cap of {cls.MAX_LIMIT}.",
+                        checks, None)
+
+        # ── Check 7: No system catalog / settings function references ────────
+        checks["no_system_function_abuse"] = not (
+            words & cls._SYSTEM_NAMES or {name.strip('"') for name in words & cls._QUOTED_NAMES} & cls._SYSTEM_NAMES
+        )
+        if not checks["no_system_function_abuse"]:
+            return False, "Disallowed system function reference detected.", checks, None
+
+        # ── Check 8: Only allowlisted tables (and the query's own CTEs) ──────
+        checks["tables_allowed"] = structure.relation is None
+        if not checks["tables_allowed"]:
+            return (False, f"Relation {structure.relation} is not allowed; only argo_data may be queried.",
+                    checks, None)
+
+        # ── Check 9: No cartesian product of two argo_data-sized relations ───
+        checks["no_cartesian_join"] = structure.cartesian is None
+        if not checks["no_cartesian_join"]:
+            left, right = structure.cartesian
+            return (False, f"Join of {left} and {right} has no equality condition (a cartesian product); "
+                           f"join them with ON ... = ... instead.", checks, None)
+
+        # ── Check 10: Self-joins must match rows on float_id and timestamp ───
+        checks["no_unbounded_self_join"] = structure.self_join is None
+        if not checks["no_unbounded_self_join"]:
+            left, right = structure.self_join
+            return (False, f"Join of {left} and {right} must match rows on float_id and timestamp.",
+                    checks, None)
+
+        # ── Row cap: non-aggregate queries without a LIMIT get one ────────────
+        if structure.needs_limit:
+            sql = f"{sql.rstrip().rstrip(';').rstrip()}\nLIMIT {cls.MAX_LIMIT}"
 
         # All checks passed ✓
-        return cls._result(True, None, checks)
+        return True, None, checks, sql
 
     @staticmethod
-    def _result(safe: bool, reason: Optional[str], checks: dict) -> dict:
-        return {"safe": safe, "reason": reason, "checks": checks}
+    def _result(safe: bool, reason: Optional[str], checks: dict, sql: Optional[str] = None,
+                limit_added: bool = False) -> dict:
+        return {"safe": safe, "reason": reason, "checks": checks, "sql": sql, "limit_added": limit_added}
 
     @classmethod
     def sanitize_and_raise(cls, sql: str) -> str:
         """
-        Validate SQL and return it unchanged if safe, or raise ValueError on failure.
+        Validate SQL and return the SQL to run if safe, or raise ValueError on failure.
 
         Convenience wrapper for use inside synchronous call chains where
         exception-based control flow is preferred over a result dict.
@@ -190,7 +484,8 @@ class SQLSanitizer:
             sql (str): SQL to validate.
 
         Returns:
-            str: The original SQL string (unmodified) if it passes all checks.
+            str: The SQL if it passes all checks, with a LIMIT appended when
+                 it returns rows and has none.
 
         Raises:
             ValueError: With a descriptive message if any check fails.
@@ -198,4 +493,11 @@ class SQLSanitizer:
         result = cls.validate(sql)
         if not result["safe"]:
             raise ValueError(f"SQL Safety Violation: {result['reason']}")
-        return sql
+        return result["sql"]
+
+
+@lru_cache(maxsize=2048)
+def _cached_verdict(sql: str) -> tuple:
+    """Memoized verdict per SQL text; callers get a fresh checks dict each time."""
+    safe, reason, checks, bounded_sql = SQLSanitizer._verdict(sql)
+    return safe, reason, tuple(checks.items()), bounded_sql
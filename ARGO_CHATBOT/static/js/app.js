@@ -1501,9 +1501,11 @@ async function sendQueryStreaming(question) {
     const typingId = addTypingIndicator();
     let fullSummary = '';
     let messageEl = null;
+    let finished = false;
     
     try {
-        const response = await fetch(`${CONFIG.API_BASE}/api/query/stream?question=${encodeURIComponent(question)}`);
+        const params = new URLSearchParams({ question });
+        const response = await fetch(`${CONFIG.API_BASE}/api/query/stream?${params}`);
         
         if (!response.ok) {
             const errData = await response.json();
@@ -1512,6 +1514,7 @@ async function sendQueryStreaming(question) {
         
         const reader = response.body.getReader();
         const decoder = new TextDecoder();
+        let buffer = '';
         
         state.isStreaming = true;
         
@@ -1519,63 +1522,79 @@ async function sendQueryStreaming(question) {
             const { done, value } = await reader.read();
             if (done) break;
             
-            const chunk = decoder.decode(value);
-            const lines = chunk.split('\n');
+            // Events end with a blank line; keep a partial one for the next read
+            buffer += decoder.decode(value, { stream: true });
+            const events = buffer.split('\n\n');
+            buffer = events.pop();
             
-            for (const line of lines) {
-                if (line.startsWith('data: ')) {
-                    try {
-                        const data = JSON.parse(line.slice(6));
+            for (const event of events) {
+                if (!event.startsWith('data: ')) continue;  // keep-alive comments
+                let data;
+                try {
+                    data = JSON.parse(event.slice(6));
+                } catch (parseError) {
+                    continue;
+                }
+                
+                switch (data.type) {
+                    case 'data':
+                        // Rows are ready before the summary: show the chart and table now
+                        displayResults({
+                            query_type: data.query_type || 'General',
+                            data: data.data,
+                            summary: fullSummary
+                        });
+                        break;
+                        
+                    case 'chunk':
+                        if (!messageEl) {
+                            removeTypingIndicator(typingId);
+                            messageEl = createStreamingMessage();
+                        }
+                        // replace: the summary failed mid-stream and this is the template answer
+                        fullSummary = data.replace ? data.content : fullSummary + data.content;
+                        updateStreamingMessage(messageEl, fullSummary);
+                        break;
                         
-                        switch (data.type) {
-                            case 'start':
-                                removeTypingIndicator(typingId);
-                                messageEl = createStreamingMessage();
-                                break;
-                                
-                            case 'chunk':
-                                if (messageEl) {
-                                    fullSummary += data.content;
-                                    updateStreamingMessage(messageEl, fullSummary);
-                                }
-                                break;
-                                
-                            case 'data':
-                                displayResults({
-                                    query_type: data.query_type || 'General',
-                                    data: data.data,
-                                    summary: fullSummary,
-                                    sql_query: data.sql_query
-                                });
-                                break;
-                                
-                            case 'done':
-                                finalizeStreamingMessage(messageEl, fullSummary);
-                                state.conversationHistory.push({ role: 'assistant', content: fullSummary });
-                                if (state.conversationHistory.length > CONFIG.MAX_CONVERSATION) {
-                                    state.conversationHistory = state.conversationHistory.slice(-CONFIG.MAX_CONVERSATION);
-                                }
-                                saveConversation();
-                                break;
-                                
-                            case 'error':
-                                removeTypingIndicator(typingId);
-                                addMessage(`Error: ${data.message}`, 'assistant');
-                                showToast('Error', data.message, 'error');
-                                break;
+                    case 'done': {
+                        const result = data.result || {};
+                        // The final text wins over the streamed one (cleaned, or the template if the LLM failed)
+                        fullSummary = result.summary || fullSummary || 'Query completed';
+                        removeTypingIndicator(typingId);
+                        if (!messageEl) messageEl = createStreamingMessage();
+                        finalizeStreamingMessage(messageEl, fullSummary);
+                        displayResults(result);
+                        state.conversationHistory.push({ role: 'assistant', content: fullSummary });
+                        if (state.conversationHistory.length > CONFIG.MAX_CONVERSATION) {
+                            state.conversationHistory = state.conversationHistory.slice(-CONFIG.MAX_CONVERSATION);
                         }
-                    } catch (parseError) {
-                        // Ignore parse errors for partial data
+                        saveConversation();
+                        finished = true;
+                        break;
                     }
+                        
+                    case 'error':
+                        removeTypingIndicator(typingId);
+                        addMessage(`Error: ${data.message}`, 'assistant');
+                        showToast('Error', data.message, 'error');
+                        finished = true;
+                        break;
                 }
             }
         }
         
+        if (!finished) throw new Error('Stream ended early');
+        
     } catch (e) {
         console.error('Streaming error:', e);
         removeTypingIndicator(typingId);
-        // Fall back to normal query
-        await sendQueryNormal(question);
+        if (messageEl) {
+            // Keep what arrived before the connection dropped
+            finalizeStreamingMessage(messageEl, fullSummary);
+        } else {
+            // Fall back to normal query
+            await sendQueryNormal(question);
+        }
     } finally {
         state.isStreaming = false;
         setLoading(false);
@@ -1798,6 +1817,18 @@ function renderInsightHighlight(highlight, queryType) {
                 </div>`;
             break;
             
+        case 'comparison':
+            highlightHtml += `
+                <div class="highlight-icon">⚖️</div>
+                <div class="highlight-content">
+                    <div class="highlight-label">${capitalizeFirst(highlight.metric)}: ${capitalizeFirst(highlight.highest)} vs ${capitalizeFirst(highlight.lowest)}</div>
+                    <div class="highlight-value">
+                        <span class="big-number">${highlight.difference}${highlight.unit}</span>
+                        <span class="highlight-detail">${highlight.highest_mean}${highlight.unit} vs ${highlight.lowest_mean}${highlight.unit}</span>
+                    </div>
+                </div>`;
+            break;
+            
         case 'record_count':
         case 'count':
             highlightHtml += `
@@ -2071,7 +2102,8 @@ function updateChartWithRecommendation(data, queryType, visualization) {
             'timeseries': 'timeseries',
             'big_number': 'auto',
             'scatter': 'scatter',
-            'ts_diagram': 'ts-diagram'
+            'ts_diagram': 'ts-diagram',
+            'comparison_chart': 'comparison'
         };
         const chartType = typeMap[visualization.recommended] || 'auto';
         el.chartTypeSelect.value = chartType;
@@ -2296,6 +2328,9 @@ function updateChart(data, queryType) {
         case 'timeseries':
             config = createTimeSeriesChart(data, yAxis !== 'auto' ? yAxis : 'temperature');
             break;
+        case 'comparison':
+            config = createComparisonChart(data, yAxis !== 'auto' ? yAxis : comparisonMetric(data));
+            break;
         default:
             config = createAutoChart(data, queryType);
     }
@@ -2415,6 +2450,53 @@ function createTimeSeriesChart(data, column) {
     };
 }
 
+const COMPARISON_COLORS = ['#3b82f6', '#f97316', '#22c55e', '#a855f7', '#ef4444', '#14b8a6'];
+
+function comparisonMetric(data) {
+    const skip = ['region', 'period', 'measurements'];
+    return Object.keys(data[0]).find(k => !skip.includes(k) && !k.endsWith('_min') && !k.endsWith('_max')) || 'measurements';
+}
+
+function createComparisonChart(data, column) {
+    // One line per region over the shared period axis
+    const periods = [...new Set(data.map(d => d.period))].sort((a, b) => new Date(a) - new Date(b));
+    const regions = [...new Set(data.map(d => d.region))];
+    const datasets = regions.map((region, i) => {
+        const byPeriod = new Map(data.filter(d => d.region === region).map(d => [d.period, d[column]]));
+        const color = COMPARISON_COLORS[i % COMPARISON_COLORS.length];
+        return {
+            label: capitalizeFirst(region),
+            data: periods.map(p => byPeriod.get(p) ?? null),
+            borderColor: color,
+            backgroundColor: color,
+            tension: 0.3,
+            spanGaps: true,
+            pointRadius: 2,
+            pointHoverRadius: 6
+        };
+    });
+    
+    return {
+        type: 'line',
+        data: {
+            labels: periods.map(p => formatShortDate(new Date(p))),
+            datasets
+        },
+        options: {
+            responsive: true,
+            maintainAspectRatio: false,
+            plugins: {
+                legend: { labels: { usePointStyle: true } },
+                tooltip: { backgroundColor: 'rgba(0,0,0,0.8)', padding: 12, mode: 'index', intersect: false }
+            },
+            scales: {
+                x: { ticks: { maxTicksLimit: 8 } },
+                y: { title: { display: true, text: capitalizeFirst(column.replace('_', ' ')) } }
+            }
+        }
+    };
+}
+
 function createTSDiagram(data) {
     const points = data.filter(d => d.temperature != null && d.salinity != null)
         .map(d => ({ x: d.salinity, y: d.temperature }));
@@ -2523,6 +2605,7 @@ function createHistogram(data, column) {
 }
 
 function createAutoChart(data, queryType) {
+    if (data[0]?.region != null && data[0]?.period != null) return createComparisonChart(data, comparisonMetric(data));
     if (data[0]?.pressure != null && data.length > 5) return createProfileChart(data);
     if (data.some(d => d.timestamp) && data.length > 3) return createTimeSeriesChart(data, 'temperature');
     if (data[0]?.temperature != null && data[0]?.salinity != null) return createTSDiagram(data);
@@ -0,0 +1,277 @@
+"""
+FloatChart Summary Templates
+============================
+Answer text rendered from the figures brain already computed, so a query
+needs no second LLM call to put them into words:
+
+    "Average Temperature in the Bay of Bengal during 2024: 28.41 °C."
+    "Found 12 floats within 300 km of Kochi. The nearest is Float #2902115,
+     41.2 km away at 9.61°N, 76.02°E."
+    "Float #2902115 travelled 1,840.5 km over 96 positions in 310 days
+     (5.9 km/day on average)."
+
+There is one template per query type, each reading the insights dict of
+brain.calculate_insights (highlight and stats) plus the intent's location
+and time constraint. Empty results keep brain's own explanation (why
+nothing matched and what to try instead).
+
+The LLM summary (SUMMARIZATION_PROMPT) is opt-in: per request (the
+``llm_summary`` option of /api/query and /api/query/stream, which streams
+its tokens) or for every UI query with LLM_SUMMARY_ENABLED. /api/v1/query
+always answers from the templates, so an agent's query costs at most one
+LLM call (the intent parse, and only for questions the rules are unsure of).
+
+Configuration:
+    LLM_SUMMARY_ENABLED   "1" / "true" writes UI answers with the LLM (default off)
+"""
+
+import os
+from typing import Optional
+
+UNITS = {
+    "temperature": "°C",
+    "salinity": "PSU",
+    "pressure": "dbar",
+    "dissolved_oxygen": "μmol/kg",
+    "chlorophyll": "mg/m³",
+    "ph": "",
+    "nitrate": "μmol/kg",
+}
+
+# Places read with "the": "the Bay of Bengal", "the Arabian Sea"
+_NAMED_WATERS = {"Sea", "Ocean", "Bay", "Gulf", "Bengal", "Aden", "Mannar", "Oman", "Channel", "Strait", "Basin"}
+
+_METRIC_ORDER = ["temperature", "salinity", "pressure", "dissolved_oxygen", "chlorophyll", "ph", "nitrate"]
+
+
+# ── Configuration ────────────────────────────────────────────────────────────
+
+def llm_summary_enabled() -> bool:
+    return os.getenv("LLM_SUMMARY_ENABLED", "0").lower() in ("1", "true", "yes")
+
+
+# ── Formatting ───────────────────────────────────────────────────────────────
+
+def _label(metric: str) -> str:
+    return metric.replace("_", " ")
+
+
+def _value(value, metric: str = "", digits: int = 2) -> str:
+    """``value`` with thousands separators and the metric's unit."""
+    if isinstance(value, float):
+        text = f"{value:,.{digits}f}".rstrip("0").rstrip(".") if digits else f"{value:,.0f}"
+    else:
+        text = f"{value:,}"
+    unit = UNITS.get(metric, "")
+    return f"{text} {unit}" if unit else text
+
+
+def _range(stat: dict, metric: str) -> str:
+    """" (range a – b unit)" when the figures span a range."""
+    low, high = stat.get("min"), stat.get("max")
+    if low is None or high is None or low == high:
+        return ""
+    return f" (range {_value(low)} – {_value(high, metric)})"
+
+
+def _scope(intent: dict) -> str:
+    """" in <place> during <time>" from the intent, or ""."""
+    place = intent.get("location_name")
+    scope = f" in {_place(place)}" if place else ""
+    if intent.get("time_constraint"):
+        scope += f" during {intent['time_constraint']}"
+    return scope
+
+
+def _place(name: str) -> str:
+    """"bay of bengal" -> "the Bay of Bengal", "kochi" -> "Kochi"."""
+    words = [w if w in ("of", "and") else w.capitalize() for w in str(name).split()]
+    return ("the " if words and words[-1] in _NAMED_WATERS else "") + " ".join(words)
+
+
+def _sentence(text: str) -> str:
+    return text[:1].upper() + text[1:]
+
+
+def _metric_sentences(stats: dict, skip=()) -> list:
+    """"Temperature averages 28.4 °C (range 26.1 – 30.2 °C)." for each metric in ``stats``."""
+    sentences = []
+    for metric in _METRIC_ORDER:
+        stat = stats.get(metric)
+        if metric in skip or not isinstance(stat, dict) or stat.get("avg") is None:
+            continue
+        sentences.append(f"{_sentence(_label(metric))} averages {_value(stat['avg'], metric)}{_range(stat, metric)}.")
+    return sentences
+
+
+# ── Templates ────────────────────────────────────────────────────────────────
+
+def _proximity(insights: dict, intent: dict, count: int) -> list:
+    stats, highlight = insights["stats"], insights.get("highlight") or {}
+    place = _place(intent["location_name"]) if intent.get("location_name") else "the requested point"
+    floats = stats.get("unique_floats", count)
+    radius = intent.get("distance_km")
+    within = f" within {_value(radius)} km of {place}" if radius else f" near {place}"
+    sentences = [f"Found {floats:,} float{'s' if floats != 1 else ''}{within}"
+                 + (f" during {intent['time_constraint']}." if intent.get("time_constraint") else ".")]
+    if highlight.get("type") == "nearest_float":
+        sentences.append(f"The nearest is Float #{highlight['float_id']}, {_value(highlight['distance_km'], digits=1)} km "
+                         f"away at {highlight['location']}.")
+    if stats.get("farthest_distance_km") is not None and floats > 1:
+        sentences.append(f"The farthest is {_value(stats['farthest_distance_km'], digits=1)} km away "
+                         f"({stats.get('count_within_100km', 0):,} within 100 km).")
+    return sentences + _metric_sentences(stats)
+
+
+def _statistic(insights: dict, intent: dict, count: int) -> list:
+    stats, highlight = insights["stats"], insights.get("highlight") or {}
+    if highlight.get("type") == "count":
+        return [f"{highlight['label']}{_scope(intent)}: {highlight['value']:,}."]
+    if highlight.get("type") == "statistic":
+        metric = highlight["metric"]
+        sentence = f"{highlight['label']}{_scope(intent)}: {_value(highlight['value'], metric)}"
+        stat = stats.get(metric) or {}
+        if count > 1:
+            sentence += f" across {count:,} rows{_range(stat, metric)}"
+        return [sentence + "."] + _metric_sentences(stats, skip=(metric,))
+    return _general(insights, intent, count)
+
+
+def _trajectory(insights: dict, intent: dict, count: int) -> list:
+    stats = insights["stats"]
+    float_id = intent.get("float_id")
+    subject = f"Float #{float_id}" if float_id else "The float"
+    if "total_distance_km" not in stats:
+        return [f"{subject} has {count:,} recorded position{'s' if count != 1 else ''}."]
+    sentence = f"{subject} travelled {_value(stats['total_distance_km'], digits=1)} km over {stats['waypoints']:,} positions"
+    if stats.get("time_span_days"):
+        sentence += f" in {stats['time_span_days']:,} days"
+    if stats.get("avg_speed_km_day") is not None:
+        sentence += f" ({_value(stats['avg_speed_km_day'], digits=1)} km/day on average"
+        sentence += f", fastest leg {_value(stats['max_speed_km_day'], digits=1)} km/day)" \
+            if stats.get("max_speed_km_day") is not None else ")"
+    sentences = [sentence + "."]
+    if stats.get("lat_range"):
+        sentences.append(f"It ranged over latitudes {stats['lat_range']} and longitudes {stats['lon_range']}.")
+    return sentences
+
+
+def _profile(insights: dict, intent: dict, count: int) -> list:
+    stats = insights["stats"]
+    float_id = intent.get("float_id")
+    profiles = stats.get("profiles", 1)
+    subject = f"{profiles:,} profiles" if profiles > 1 else "The profile"
+    subject += f" of Float #{float_id}" if float_id else _scope(intent)
+    if "max_depth_dbar" not in stats:
+        return [f"{subject} returned {count:,} measurements."] + _metric_sentences(stats)
+    sentences = [f"{subject} reach{'es' if profiles == 1 else ''} {_value(stats['max_depth_dbar'], digits=0)} dbar "
+                 f"over {stats['depth_layers']:,} depth levels."]
+    if stats.get("surface_temp") is not None and stats.get("deep_temp") is not None:
+        sentences.append(f"Temperature goes from {_value(stats['surface_temp'], 'temperature', 1)} at the top "
+                         f"to {_value(stats['deep_temp'], 'temperature', 1)} at depth.")
+    if stats.get("thermocline_depth") is not None:
+        sentences.append(f"The steepest temperature gradient (thermocline) is near "
+                         f"{_value(stats['thermocline_depth'], digits=0)} dbar.")
+    return sentences
+
+
+def _time_series(insights: dict, intent: dict, count: int) -> list:
+    stats, highlight = insights["stats"], insights.get("highlight") or {}
+    if highlight.get("type") != "trend":
+        return _general(insights, intent, count)
+    metric = highlight["metric"]
+    trend = highlight["trend"]
+    sentence = f"{_sentence(_label(metric))}{_scope(intent)} "
+    if trend == "insufficient_data":
+        sentence += "has too few points to show a trend"
+    elif trend == "stable":
+        sentence += "is stable"
+    else:
+        sentence += f"is {trend} ({'+' if highlight['change'] > 0 else ''}{_value(highlight['change'], metric)} " \
+                    f"between the first and second half)"
+    sentences = [sentence + f" across {stats.get('data_points', count):,} data points."]
+    stat = stats.get(metric) or {}
+    if stat.get("avg") is not None:
+        sentences.append(f"It averages {_value(stat['avg'], metric)}{_range(stat, metric)}.")
+    return sentences
+
+
+def _scatter(insights: dict, intent: dict, count: int) -> list:
+    stats, highlight = insights["stats"], insights.get("highlight") or {}
+    fit = stats.get("fit") or {}
+    metrics = intent.get("metrics") or []
+    pair = f"{_label(metrics[1])} vs {_label(metrics[0])}" if len(metrics) >= 2 else "The two variables"
+    points = fit.get("n", count)
+    kind = "measurements" if highlight.get("population") else "sampled points"
+    if highlight.get("type") != "correlation":
+        return [f"{_sentence(pair)}{_scope(intent)}: {points:,} {kind}, too few to fit a line."]
+    strength = abs(highlight["r"])
+    strength = "strong" if strength >= 0.7 else "moderate" if strength >= 0.4 else "weak"
+    direction = "positive" if highlight["r"] > 0 else "negative"
+    sentence = f"{_sentence(pair)}{_scope(intent)} shows a {strength} {direction} correlation " \
+               f"(r = {highlight['r']:.2f}) over {points:,} {kind}"
+    if highlight.get("slope") is not None and len(metrics) >= 2:
+        sentence += f"; {_label(metrics[1])} changes by {highlight['slope']:.3g} per unit of {_label(metrics[0])}"
+    return [sentence + "."]
+
+
+def _comparison(insights: dict, intent: dict, count: int) -> list:
+    stats, highlight = insights["stats"], insights.get("highlight") or {}
+    sentences = []
+    for entry in stats.get("regions", []):
+        figures = [f"{_label(m)} {_value(entry[m]['mean'], m)}" for m in _METRIC_ORDER
+                   if isinstance(entry.get(m), dict) and entry[m].get("mean") is not None]
+        sentences.append(_sentence(f"{_place(entry['region'])}: {', '.join(figures) or 'no values'} "
+                                   f"from {entry['measurements']:,} measurements."))
+    if not sentences:
+        return _general(insights, intent, count)
+    if highlight.get("type") == "comparison":
+        metric = highlight["metric"]
+        sentences.append(_sentence(f"{_place(highlight['highest'])} has the higher average {_label(metric)}, "
+                                   f"{_value(highlight['difference'], metric)} above {_place(highlight['lowest'])}."))
+    if intent.get("time_constraint"):
+        sentences.insert(0, f"During {intent['time_constraint']}:")
+    return sentences
+
+
+def _general(insights: dict, intent: dict, count: int) -> list:
+    stats = insights["stats"]
+    sentence = f"Found {count:,} record{'s' if count != 1 else ''}{_scope(intent)}"
+    if stats.get("unique_floats"):
+        sentence += f" from {stats['unique_floats']:,} float{'s' if stats['unique_floats'] != 1 else ''}"
+    return [sentence + "."] + _metric_sentences(stats)
+
+
+_TEMPLATES = {
+    "Proximity": _proximity,
+    "Statistic": _statistic,
+    "Trajectory": _trajectory,
+    "Profile": _profile,
+    "Time-Series": _time_series,
+    "Scatter": _scatter,
+    "Comparison": _comparison,
+}
+
+
+# ── Rendering ────────────────────────────────────────────────────────────────
+
+def render(query_type: str, insights: dict, intent: dict, record_count: int,
+           fallback: str = "", notes: Optional[list] = None) -> str:
+    """
+    The answer text for a query's results.
+
+    ``fallback`` (brain's results text) is returned for empty results and if
+    a template fails; ``notes`` (limited data, a cost-guard note) are appended.
+    """
+    if record_count == 0 or insights.get("quality") == "no_data":
+        return fallback or "No matching data found for your query."
+    template = _TEMPLATES.get(query_type, _general)
+    try:
+        sentences = template(insights, intent or {}, record_count)
+    except (KeyError, TypeError, ValueError):
+        return fallback or " ".join(_general(insights, intent or {}, record_count))
+    # Aggregates are one row by design
+    if insights.get("quality") == "limited" and query_type != "Statistic":
+        sentences.append(f"Only {record_count:,} record{'s' if record_count != 1 else ''} matched.")
+    sentences.extend(note for note in notes or [] if note)
+    return " ".join(sentences)
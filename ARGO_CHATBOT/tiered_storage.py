@@ -0,0 +1,463 @@
+"""
+FloatChart Tiered Storage
+=========================
+Federates the hot PostgreSQL tier with a cold tier of partitioned Parquet.
+
+Almost all chatbot traffic hits recent data, so rows older than a cutoff are
+moved out of ``argo_data`` by ``DATA_GENERATOR/tier_mover.py`` into
+``$COLD_TIER_DIR/year=YYYY/month=M/*.parquet``. The mover records the
+boundary in ``$COLD_TIER_DIR/_manifest.json``:
+
+    {"cutoff": "2023-01-01T00:00:00", "min_timestamp": "...", "rows": 1234}
+
+Every row older than ``cutoff`` lives in Parquet. The hot tier is always
+queried, because a late backfill can still insert old rows into Postgres and
+the timestamp index makes that lookup cheap. The cold tier is added only
+when the query's time range starts before the cutoff. It is read through an
+in-process DuckDB view named ``argo_data``, so the exact SQL text produced
+by sql_builder runs unchanged on both tiers.
+
+Merge rules (by sql_builder query type):
+    row queries     concatenate, re-apply the outer ORDER BY, re-apply LIMIT
+    Proximity       each tier returns every float's latest position in the
+                    search area, with no distance filter or LIMIT; the newest
+                    per float is kept, then filtered, ranked and limited
+    Profile         re-pick whole profiles: the newest, the N newest, or the
+                    one closest to the target date
+    Scatter         samples keep the smallest sample keys of the union; density
+                    cells are re-binned on the combined range (sums stay exact)
+    Comparison      per-(region, period) rows add their sums and counts,
+                    so a period split by the cutoff keeps an exact mean
+    Time-Series     each tier returns SUM / COUNT per bucket, re-aggregated
+                    by bucket so one straddling the cutoff has one exact mean
+    Statistic       MIN / MAX / SUM / COUNT merge exactly; AVG is rebuilt as
+                    SUM / COUNT of each tier; COUNT(DISTINCT x) unions values
+"""
+
+import os
+import re
+import json
+import logging
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Optional, Tuple
+
+import pandas as pd
+
+import comparison
+import density
+import query_executor
+from sql_builder import BIND_RE, BoundQuery
+
+MANIFEST_NAME = "_manifest.json"
+
+_manifest_lock = threading.Lock()
+_manifest_cache = {"path": None, "mtime": None, "manifest": None}
+
+
+# ── Configuration ────────────────────────────────────────────────────────────
+
+def get_cold_tier_dir() -> Optional[Path]:
+    """Return the configured cold tier directory, or None when tiering is off."""
+    path = os.getenv("COLD_TIER_DIR")
+    return Path(path) if path else None
+
+
+def get_manifest() -> Optional[dict]:
+    """
+    Load the cold tier manifest (cached until the file changes).
+
+    Returns:
+        dict | None: {"cutoff": datetime, "min_timestamp": datetime | None,
+        "rows": int} — or None when no cold tier exists yet.
+    """
+    cold_dir = get_cold_tier_dir()
+    if cold_dir is None:
+        return None
+    path = cold_dir / MANIFEST_NAME
+    try:
+        mtime = path.stat().st_mtime
+    except OSError:
+        return None
+    with _manifest_lock:
+        if _manifest_cache["path"] == path and _manifest_cache["mtime"] == mtime:
+            return _manifest_cache["manifest"]
+        try:
+            raw = json.loads(path.read_text())
+            manifest = {
+                "cutoff": datetime.fromisoformat(raw["cutoff"]),
+                "min_timestamp": datetime.fromisoformat(raw["min_timestamp"]) if raw.get("min_timestamp") else None,
+                "rows": int(raw.get("rows", 0)),
+            }
+        except (OSError, ValueError, KeyError) as e:
+            logging.warning(f"Ignoring unreadable cold tier manifest {path}: {e}")
+            manifest = None
+        _manifest_cache.update(path=path, mtime=mtime, manifest=manifest)
+        return manifest
+
+
+def reaches_cold_tier(time_range: Tuple[Optional[datetime], Optional[datetime]]) -> bool:
+    """True when a [start, end) range overlaps data older than the cutoff."""
+    manifest = get_manifest()
+    if manifest is None or not manifest["rows"]:
+        return False
+    start = time_range[0] if time_range else None
+    return start is None or start < manifest["cutoff"]
+
+
+def cold_min_date() -> Optional[datetime]:
+    """Earliest timestamp held in the cold tier (for the dataset date range)."""
+    manifest = get_manifest()
+    return manifest["min_timestamp"] if manifest else None
+
+
+# ── Execution ────────────────────────────────────────────────────────────────
+
+def _run_hot(sql: str, engine, query_type: str = None) -> pd.DataFrame:
+    return query_executor.execute(sql, engine, query_type)
+
+
+def _run_cold(sql: str) -> pd.DataFrame:
+    """Run builder SQL against the Parquet files through a DuckDB view."""
+    import duckdb
+
+    pattern = str(get_cold_tier_dir() / "**" / "*.parquet")
+    params = query_executor.used_params(sql, getattr(sql, "params", {}))
+    # DuckDB's bare NUMERIC is DECIMAL(18,3), which would truncate ROUND(x::numeric, 4)
+    cold_sql = re.sub(r"::numeric\b", "::DOUBLE", str(sql), flags=re.IGNORECASE)
+    # DuckDB's Python API names parameters $name
+    cold_sql = BIND_RE.sub(lambda m: f"${m.group(1)}" if m.group(1) in params else m.group(0), cold_sql)
+    con = duckdb.connect()
+    try:
+        con.execute(
+            "CREATE VIEW argo_data AS SELECT * EXCLUDE (year, month) "
+            f"FROM read_parquet('{pattern}', hive_partitioning = true, union_by_name = true)"
+        )
+        return con.execute(cold_sql, params).df()
+    finally:
+        con.close()
+
+
+def read_cold(sql: str) -> Optional[pd.DataFrame]:
+    """Run builder or maintenance SQL against the cold tier alone; None when it holds no rows."""
+    manifest = get_manifest()
+    if manifest is None or not manifest["rows"]:
+        return None
+    return _run_cold(sql)
+
+
+def read_query(sql: str, engine, query_type: str = None, time_range=None) -> pd.DataFrame:
+    """
+    Execute builder SQL against the hot tier, plus the cold tier if needed.
+
+    Args:
+        sql (str): SQL produced by sql_builder.build_query().
+        engine: SQLAlchemy engine for the hot tier.
+        query_type (str): The intent's query_type; selects the merge rule.
+        time_range (tuple): (start, end) from sql_builder._get_time_range().
+
+    Returns:
+        pd.DataFrame: The merged result, shaped like a single-tier result.
+    """
+    if not reaches_cold_tier(time_range):
+        return _run_hot(sql, engine, query_type)
+
+    if query_type == "Statistic":
+        return _merge_statistic(sql, engine)
+    if query_type == "Time-Series":
+        return _merge_timeseries(sql, engine)
+    if query_type == "Proximity" and {"max_distance", "limit"} <= set(getattr(sql, "params", {})):
+        return _merge_proximity(sql, engine)
+
+    hot = _run_hot(sql, engine, query_type)
+    try:
+        cold = _run_cold(sql)
+    except Exception as e:
+        logging.error(f"Cold tier query failed, returning hot tier only: {e}")
+        return hot
+    return _merge_rows(sql, query_type, hot, cold)
+
+
+# ── Row merging ──────────────────────────────────────────────────────────────
+
+_TAIL_RE = re.compile(
+    r'ORDER\s+BY\s+("?[\w]+"?)(?:\s+(ASC|DESC))?\s*(?:LIMIT\s+(\d+|:\w+))?\s*;?\s*$',
+    re.IGNORECASE,
+)
+_LIMIT_RE = re.compile(r"LIMIT\s+(\d+|:\w+)\s*;?\s*$", re.IGNORECASE)
+# Further than any two points on the 6371 km sphere (pi * 6371 = 20,015 km)
+_ANY_DISTANCE_KM = 20_040
+
+
+def _align_dtypes(hot: pd.DataFrame, cold: pd.DataFrame) -> None:
+    """
+    Make column dtypes comparable across tiers, in place.
+
+    DuckDB returns DATE_TRUNC('day', ...) as a DATE (object column) while
+    PostgreSQL returns a TIMESTAMP, and DECIMAL results arrive as objects.
+    """
+    if len(cold.columns) != len(hot.columns):
+        return
+    is_dt = pd.api.types.is_datetime64_any_dtype
+    for i in range(len(hot.columns)):
+        hot_col, cold_col = hot.iloc[:, i], cold.iloc[:, i]
+        if is_dt(hot_col) != is_dt(cold_col):
+            frame, col = (cold, cold_col) if is_dt(hot_col) else (hot, hot_col)
+            frame.isetitem(i, pd.to_datetime(col))
+        elif pd.api.types.is_numeric_dtype(hot_col) and cold_col.dtype == object:
+            cold.isetitem(i, pd.to_numeric(cold_col, errors="coerce"))
+
+
+def _merge_rows(sql: str, query_type: str, hot: pd.DataFrame, cold: pd.DataFrame) -> pd.DataFrame:
+    if len(cold.columns) == len(hot.columns):
+        # DuckDB de-duplicates repeated output names (pressure → pressure_1)
+        cold.columns = hot.columns
+    if cold.empty:
+        return hot
+    if hot.empty:
+        return cold
+    _align_dtypes(hot, cold)
+    if query_type == "Scatter" and "bins" in getattr(sql, "params", {}):
+        return density.merge_cells(hot, cold, sql.params["bins"])
+    if query_type == "Comparison":
+        return comparison.merge_periods(hot, cold)
+    merged = pd.concat([hot, cold], ignore_index=True)
+
+    if query_type == "Profile" and "timestamp" in merged.columns:
+        merged = _merge_profiles(merged, getattr(sql, "params", {}))
+
+    tail = _TAIL_RE.search(sql)
+    if tail:
+        column = tail.group(1).strip('"')
+        if column in merged.columns:
+            # Positional lookup: builder SQL may repeat a column (e.g. pressure)
+            key = merged.iloc[:, list(merged.columns).index(column)]
+            ascending = (tail.group(2) or "ASC").upper() == "ASC"
+            merged = merged.loc[key.sort_values(ascending=ascending, kind="stable").index]
+        limit = tail.group(3)
+    else:
+        match = _LIMIT_RE.search(sql)
+        limit = match.group(1) if match else None
+    if limit and limit.startswith(":"):
+        limit = getattr(sql, "params", {}).get(limit[1:])
+    if limit:
+        merged = merged.head(int(limit))
+    return merged.reset_index(drop=True)
+
+
+def _merge_proximity(sql: str, engine) -> pd.DataFrame:
+    """
+    Run a Proximity query per tier and rank the floats' newest positions.
+
+    A tier can only say where a float last was in its own rows. Filtered by
+    distance and limited per tier, a float that has since left the circle
+    would keep its older in-circle position from the cold tier, and could
+    push out a float that is still inside. So each tier reports every float
+    in the search area, and the circle and LIMIT are applied after the
+    newest position per float is picked.
+    """
+    params = sql.params
+    unbounded = BoundQuery(str(sql), {**params, "max_distance": _ANY_DISTANCE_KM, "limit": None})
+    hot = _run_hot(unbounded, engine, "Proximity")
+    try:
+        cold = _run_cold(unbounded)
+    except Exception as e:
+        logging.error(f"Cold tier query failed, returning hot tier only: {e}")
+        cold = hot.iloc[0:0]
+    if len(cold.columns) == len(hot.columns):
+        cold.columns = hot.columns
+    frames = [frame for frame in (hot, cold) if not frame.empty] or [hot]
+    if len(frames) == 2:
+        _align_dtypes(hot, cold)
+    merged = pd.concat(frames, ignore_index=True)
+    merged = merged.sort_values("timestamp", ascending=False, kind="stable").drop_duplicates("float_id")
+    distance = pd.to_numeric(merged["distance_km"])
+    merged = merged[distance <= params["max_distance"]]
+    merged = merged.loc[distance[merged.index].sort_values(kind="stable").index]
+    if params["limit"]:
+        merged = merged.head(int(params["limit"]))
+    return merged.reset_index(drop=True)
+
+
+def _merge_profiles(merged: pd.DataFrame, params: dict) -> pd.DataFrame:
+    """Re-pick whole profiles from both tiers the way the Profile query picked them."""
+    key_cols = [c for c in ("timestamp", "float_id") if c in merged.columns]
+    keys = merged[key_cols].drop_duplicates().sort_values(key_cols, ascending=False)
+    if params.get("target_date") is not None:
+        gap = (keys["timestamp"] - pd.Timestamp(params["target_date"])).abs()
+        keys = keys.loc[[gap.idxmin()]]
+    else:
+        keys = keys.head(int(params.get("profiles") or 1))
+    merged = merged[pd.MultiIndex.from_frame(merged[key_cols]).isin(pd.MultiIndex.from_frame(keys))]
+    if "profiles" in params and "pressure" in merged.columns:
+        # Newest profile first, each from the surface down (the query's ORDER BY)
+        order = pd.DataFrame({"t": merged["timestamp"],
+                              "f": merged["float_id"] if "float_id" in merged.columns else 0,
+                              "p": merged.iloc[:, list(merged.columns).index("pressure")]})
+        merged = merged.loc[order.sort_values(["t", "f", "p"], ascending=[False, True, True], kind="stable").index]
+    return merged
+
+
+# ── Aggregate merging ────────────────────────────────────────────────────────
+
+_SELECT_RE = re.compile(r"^\s*SELECT\s+(.*?)\s+(FROM\s+argo_data\b.*?);?\s*$", re.IGNORECASE | re.DOTALL)
+_AGG_RE = re.compile(r'^(AVG|MIN|MAX|SUM|COUNT)\((.*)\)(?:\s+AS\s+"?(\w+)"?)?$', re.IGNORECASE | re.DOTALL)
+
+
+def _split_items(select_list: str):
+    """Split a SELECT list on top-level commas."""
+    items, depth, current, quote = [], 0, [], None
+    for ch in select_list:
+        if quote:
+            quote = None if ch == quote else quote
+        elif ch in ("'", '"'):
+            quote = ch
+        elif ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif ch == "," and depth == 0:
+            items.append("".join(current).strip())
+            current = []
+            continue
+        current.append(ch)
+    items.append("".join(current).strip())
+    return items
+
+
+def _merge_statistic(sql: str, engine) -> pd.DataFrame:
+    """
+    Run an aggregate query per tier and combine the partial aggregates.
+
+    AVG(x) is decomposed into SUM(x) and COUNT(x) so the merged mean is
+    weighted by each tier's row count. COUNT(DISTINCT x) fetches the distinct
+    values from both tiers and counts their union.
+    """
+    match = _SELECT_RE.match(sql)
+    items = _split_items(match.group(1)) if match else []
+    parsed = [_AGG_RE.match(item) for item in items]
+    if not match or not all(parsed):
+        logging.warning("Statistic query shape not mergeable across tiers; using hot tier only")
+        return _run_hot(sql, engine, "Statistic")
+    from_clause = match.group(2)
+    params = getattr(sql, "params", {})
+    # Output column names exactly as the hot engine would label them
+    # (LIMIT 0 plans the aggregate without executing it)
+    names = list(_run_hot(BoundQuery(f"{sql.strip().rstrip(';')} LIMIT 0", params), engine).columns)
+
+    # COUNT(DISTINCT x): union the distinct values of both tiers
+    if len(parsed) == 1 and parsed[0].group(2).upper().startswith("DISTINCT "):
+        expr = parsed[0].group(2)[len("DISTINCT "):]
+        distinct_sql = BoundQuery(f"SELECT DISTINCT {expr} AS v {from_clause}", params)
+        values = set(_run_hot(distinct_sql, engine)["v"].dropna())
+        try:
+            values |= set(_run_cold(distinct_sql)["v"].dropna())
+        except Exception as e:
+            logging.error(f"Cold tier query failed, returning hot tier only: {e}")
+        return pd.DataFrame({names[0]: [len(values)]})
+
+    partial_items, specs = [], []
+    for i, m in enumerate(parsed):
+        func, arg = m.group(1).upper(), m.group(2)
+        name = names[i]
+        if arg.upper().startswith("DISTINCT "):
+            logging.warning("COUNT(DISTINCT) mixed with other aggregates; using hot tier only")
+            return _run_hot(sql, engine, "Statistic")
+        if func == "AVG":
+            partial_items += [f"SUM({arg}) AS s{i}", f"COUNT({arg}) AS n{i}"]
+        else:
+            partial_items.append(f"{func}({arg}) AS s{i}")
+        specs.append((i, func, name))
+
+    partial_sql = BoundQuery(f"SELECT {', '.join(partial_items)} {from_clause}", params)
+    parts = [_run_hot(partial_sql, engine).iloc[0]]
+    try:
+        parts.append(_run_cold(partial_sql).iloc[0])
+    except Exception as e:
+        logging.error(f"Cold tier query failed, returning hot tier only: {e}")
+
+    def values(column):
+        return [p[column] for p in parts if pd.notna(p[column])]
+
+    row = {}
+    for i, func, name in specs:
+        partial = values(f"s{i}")
+        if func == "AVG":
+            count = sum(values(f"n{i}"))
+            row[name] = sum(partial) / count if count else None
+        elif func in ("SUM", "COUNT"):
+            row[name] = sum(partial) if partial else (0 if func == "COUNT" else None)
+        elif func == "MIN":
+            row[name] = min(partial) if partial else None
+        else:
+            row[name] = max(partial) if partial else None
+    return pd.DataFrame([row])
+
+
+_SERIES_RE = re.compile(r"^\s*SELECT\s+(.*?)\s+(FROM\s+argo_data\b.*?)\s+(GROUP\s+BY\s+day\b.*?);?\s*$",
+                        re.IGNORECASE | re.DOTALL)
+_BUCKET_RE = re.compile(r"^(.*)\s+AS\s+day$", re.IGNORECASE | re.DOTALL)
+
+
+def _merge_timeseries(sql: str, engine) -> pd.DataFrame:
+    """
+    Run a Time-Series query per tier and combine the buckets.
+
+    Each tier returns SUM(x) and COUNT(x) per bucket in place of AVG(x), so a
+    bucket with rows on both sides of the cutoff gets one mean weighted by
+    each tier's rows instead of appearing twice.
+    """
+    match = _SERIES_RE.match(sql)
+    items = _split_items(match.group(1)) if match else []
+    bucket = _BUCKET_RE.match(items[0]) if items else None
+    parsed = [_AGG_RE.match(item) for item in items[1:]]
+    if not bucket or not all(m and m.group(3) for m in parsed):
+        logging.warning("Time-Series query shape not mergeable by bucket; concatenating tiers")
+        hot = _run_hot(sql, engine, "Time-Series")
+        try:
+            cold = _run_cold(sql)
+        except Exception as e:
+            logging.error(f"Cold tier query failed, returning hot tier only: {e}")
+            return hot
+        return _merge_rows(sql, "Time-Series", hot, cold)
+    params = getattr(sql, "params", {})
+
+    partial_items, specs = [f"{bucket.group(1)} AS day"], []
+    for i, m in enumerate(parsed):
+        func, arg = m.group(1).upper(), m.group(2)
+        if func == "AVG":
+            partial_items += [f"SUM({arg}) AS s{i}", f"COUNT({arg}) AS n{i}"]
+        else:
+            partial_items.append(f"{func}({arg}) AS s{i}")
+        specs.append((i, func, m.group(3)))
+    partial_sql = BoundQuery(f"SELECT {', '.join(partial_items)} {match.group(2)} {match.group(3)}", params)
+
+    parts = [_run_hot(partial_sql, engine)]
+    try:
+        parts.append(_run_cold(partial_sql))
+    except Exception as e:
+        logging.error(f"Cold tier query failed, returning hot tier only: {e}")
+    rows = pd.concat([p for p in parts if not p.empty] or parts[:1], ignore_index=True)
+    rows["day"] = pd.to_datetime(rows["day"])
+    agg = {}
+    for i, func, _ in specs:
+        rows[f"s{i}"] = pd.to_numeric(rows[f"s{i}"], errors="coerce")
+        agg[f"s{i}"] = {"MIN": "min", "MAX": "max"}.get(func, "sum")
+        if func == "AVG":
+            agg[f"n{i}"] = "sum"
+    buckets = rows.groupby("day", as_index=False).agg(agg).sort_values("day")
+
+    merged = pd.DataFrame({"day": buckets["day"]})
+    for i, func, name in specs:
+        if func == "AVG":
+            merged[name] = buckets[f"s{i}"] / buckets[f"n{i}"].where(buckets[f"n{i}"] > 0)
+        else:
+            merged[name] = buckets[f"s{i}"]
+    limit = _LIMIT_RE.search(sql)
+    if limit:
+        value = limit.group(1)
+        value = params.get(value[1:]) if value.startswith(":") else value
+        if value:
+            merged = merged.head(int(value))
+    return merged.reset_index(drop=True)
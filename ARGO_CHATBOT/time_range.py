@@ -0,0 +1,242 @@
+"""
+FloatChart Time Ranges
+======================
+Resolves a free-text time constraint into a half-open [start, end) range.
+
+sql_builder turns the range into ``"timestamp" >= :start_date AND
+"timestamp" < :end_date``, a predicate every timestamp-leading index
+(idx_argo_time_geo, idx_argo_float_time_lat_lon after the float_id) can
+range-scan. Either bound may be None for open-ended constraints.
+
+Understood forms (case-insensitive), relative ones anchored on ``max_date``
+(the newest timestamp in the dataset):
+
+    2024, 2024-03, March 2024, 2024-03-15      a year, month or day
+    Q1 2024, 2024 Q3, second quarter of 2023   calendar quarters
+    monsoon 2023, winter, post-monsoon 2022    IMD seasons (below)
+    from 2019 to 2022, 2019-2022               spans: first period's start
+    Jan 2023 to Mar 2023, 2024-01-05 to 2024-02-01   to last period's end
+    last 30 days, past 2 weeks, last 6 months  rolling windows ending on max_date
+    past year, past month                      the same, one unit long
+    last month, last year                      the previous calendar month / year
+    this year, this month                      calendar period up to max_date
+    since 2020, after March 2021, before 2015  open-ended
+
+:func:`find` picks the constraint out of a whole question for the
+rule-based intent parser ("... near Goa since March 2021?" -> "since
+March 2021").
+
+Seasons follow the India Meteorological Department calendar, which matches
+the Indian Ocean regions this app covers:
+
+    winter                          Jan - Feb
+    summer, pre-monsoon, spring     Mar - May
+    monsoon, southwest monsoon      Jun - Sep
+    post-monsoon, northeast monsoon, autumn, fall    Oct - Dec
+
+A month, season or quarter without a year takes the year of a neighbouring
+period in the same constraint ("March to May 2024"), otherwise its most
+recent occurrence that has started by ``max_date``.
+"""
+
+import re
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+TimeRange = Tuple[Optional[datetime], Optional[datetime]]
+
+MONTHS = {"jan": 1, "feb": 2, "mar": 3, "apr": 4, "may": 5, "jun": 6,
+          "jul": 7, "aug": 8, "sep": 9, "oct": 10, "nov": 11, "dec": 12}
+
+# (first month, month count) per season key
+SEASONS = {
+    "winter": (1, 2),
+    "premonsoon": (3, 3),
+    "monsoon": (6, 4),
+    "postmonsoon": (10, 3),
+}
+_SEASON_ALIASES = {
+    "winter": "winter",
+    "summer": "premonsoon", "spring": "premonsoon", "premonsoon": "premonsoon",
+    "monsoon": "monsoon", "southwestmonsoon": "monsoon", "swmonsoon": "monsoon",
+    "postmonsoon": "postmonsoon", "northeastmonsoon": "postmonsoon", "nemonsoon": "postmonsoon",
+    "autumn": "postmonsoon", "fall": "postmonsoon",
+}
+_ORDINALS = {"first": 1, "1st": 1, "second": 2, "2nd": 2, "third": 3, "3rd": 3, "fourth": 4, "4th": 4}
+
+_YEAR = r"(?:19|20)\d{2}"
+_MONTH = (r"jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?"
+          r"|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?")
+_SEASON = (r"post[-\s]?monsoon|pre[-\s]?monsoon|north[-\s]?east\s+monsoon|ne\s+monsoon"
+           r"|south[-\s]?west\s+monsoon|sw\s+monsoon|monsoon|winter|summer|spring|autumn|fall")
+
+# One alternative per period kind; earlier alternatives win at a position
+_PERIOD_RE = re.compile(
+    rf"\b(?P<date>{_YEAR})-(?P<date_m>\d{{1,2}})-(?P<date_d>\d{{1,2}})\b"
+    rf"|\b(?P<ym>{_YEAR})-(?P<ym_m>\d{{1,2}})\b(?!-)"
+    rf"|\b(?P<yq>{_YEAR})\s*-?\s*q(?P<yq_q>[1-4])\b"
+    rf"|\b(?:q(?P<q>[1-4])|(?P<q_ord>first|1st|second|2nd|third|3rd|fourth|4th)\s+quarter)"
+    rf"(?:\s*(?:of\s+)?(?P<q_y>{_YEAR}))?\b"
+    rf"|\b(?P<season>{_SEASON})(?:\s+(?:season\s+)?(?:of\s+)?(?P<s_y>{_YEAR}))?\b"
+    rf"|\b(?P<month>{_MONTH})\b\.?(?:\s*,?\s*(?:of\s+)?(?P<m_y>{_YEAR}))?\b"
+    rf"|\b(?P<year>{_YEAR})\b",
+    re.IGNORECASE,
+)
+_ROLLING_RE = re.compile(r"\b(?:last|past|previous|recent)\s+(\d+)\s*(day|week|month|year)s?\b", re.IGNORECASE)
+_PAST_RE = re.compile(r"\b(?:past|recent)\s+(day|week|month|year)\b", re.IGNORECASE)
+_PREVIOUS_RE = re.compile(r"\b(?:last|previous)\s+(day|week|month|year)\b", re.IGNORECASE)
+_CURRENT_RE = re.compile(r"\b(?:this|current)\s+(month|year)\b|\b(year|month)[-\s]to[-\s]date\b", re.IGNORECASE)
+_SINCE_RE = re.compile(r"\b(?:since|after|from)\b", re.IGNORECASE)
+_BEFORE_RE = re.compile(r"\b(?:before|until|till|up\s+to|through)\b", re.IGNORECASE)
+_SPAN_RE = re.compile(r"\b(?:to|until|till|through|thru|and)\b|[-–]", re.IGNORECASE)
+# What may separate two periods of one constraint, or lead into it, inside a question
+_GAP_RE = re.compile(r"\s*(?:,|\b(?:to|until|till|through|thru|and|of)\b|[-–])?\s*", re.IGNORECASE)
+_LEAD_RE = re.compile(r"\b(?:since|after|from|before|until|till|up\s+to|through)\s+$", re.IGNORECASE)
+# Ordinary words that only name a period when a year follows ("may", "fall")
+_AMBIGUOUS = {"may", "fall"}
+
+
+def add_months(dt: datetime, months: int) -> datetime:
+    """First-of-month-safe month arithmetic (day clamped to the target month)."""
+    index = dt.year * 12 + dt.month - 1 + months
+    year, month = divmod(index, 12)
+    next_month = datetime(year + (month == 11), (month + 1) % 12 + 1, 1)
+    day = min(dt.day, (next_month - timedelta(days=1)).day)
+    return dt.replace(year=year, month=month + 1, day=day)
+
+
+def _period(match) -> Optional[dict]:
+    """Describe one matched period; ``year`` is None when it must be inferred."""
+    g = match.groupdict()
+    if g["date"]:
+        try:
+            start = datetime(int(g["date"]), int(g["date_m"]), int(g["date_d"]))
+        except ValueError:
+            return None
+        return {"year": start.year, "first": (start.month, start.day), "days": 1}
+    if g["ym"]:
+        if not 1 <= int(g["ym_m"]) <= 12:
+            return None
+        return {"year": int(g["ym"]), "month": int(g["ym_m"]), "months": 1}
+    if g["yq"]:
+        return {"year": int(g["yq"]), "month": 3 * int(g["yq_q"]) - 2, "months": 3}
+    if g["q"] or g["q_ord"]:
+        quarter = int(g["q"]) if g["q"] else _ORDINALS[g["q_ord"].lower()]
+        return {"year": int(g["q_y"]) if g["q_y"] else None, "month": 3 * quarter - 2, "months": 3}
+    if g["season"]:
+        key = _SEASON_ALIASES[re.sub(r"[-\s]", "", g["season"].lower())]
+        month, count = SEASONS[key]
+        return {"year": int(g["s_y"]) if g["s_y"] else None, "month": month, "months": count}
+    if g["month"]:
+        return {"year": int(g["m_y"]) if g["m_y"] else None, "month": MONTHS[g["month"].lower()[:3]], "months": 1}
+    return {"year": int(g["year"]), "month": 1, "months": 12}
+
+
+def _is_ambiguous(match) -> bool:
+    word = (match.group("month") or match.group("season") or "").lower()
+    return word in _AMBIGUOUS and not (match.group("m_y") or match.group("s_y"))
+
+
+def find(text: str) -> Optional[str]:
+    """
+    The time constraint inside a question, or None.
+
+    Returns the first rolling or calendar-relative phrase ("last 6 months",
+    "this year"), else the first run of periods joined by "to", "and", "-"
+    or "," together with a leading "since" / "before" style word, as
+    :func:`resolve` understands it.
+    """
+    if not text:
+        return None
+    for regex in (_ROLLING_RE, _PAST_RE, _PREVIOUS_RE, _CURRENT_RE):
+        match = regex.search(text)
+        if match:
+            return match.group(0)
+    matches = [m for m in _PERIOD_RE.finditer(text) if _period(m) and not _is_ambiguous(m)]
+    if not matches:
+        return None
+    start, end = matches[0].start(), matches[0].end()
+    for match in matches[1:]:
+        if not _GAP_RE.fullmatch(text, end, match.start()):
+            break
+        end = match.end()
+    lead = _LEAD_RE.search(text, 0, start)
+    return text[lead.start() if lead else start:end]
+
+
+def _bounds(period: dict) -> TimeRange:
+    if "days" in period:
+        start = datetime(period["year"], *period["first"])
+        return start, start + timedelta(days=period["days"])
+    start = datetime(period["year"], period["month"], 1)
+    return start, add_months(start, period["months"])
+
+
+def resolve(time_constraint: Optional[str], max_date: datetime = None) -> TimeRange:
+    """
+    Resolve a time constraint into a half-open [start, end) range.
+
+    Args:
+        time_constraint (str | None): Free text, e.g. "monsoon 2023".
+        max_date (datetime | None): Anchor for relative forms (default: now).
+
+    Returns:
+        (start, end): datetimes, either of which may be None when the
+        constraint is open-ended. (None, None) when nothing was recognised.
+    """
+    if not time_constraint:
+        return None, None
+    text = str(time_constraint).strip()
+    anchor = max_date or datetime.now()
+    day_end = datetime(anchor.year, anchor.month, anchor.day) + timedelta(days=1)
+
+    rolling = _ROLLING_RE.search(text)
+    past = _PAST_RE.search(text)
+    if rolling or past:
+        count, unit = (int(rolling.group(1)), rolling.group(2).lower()) if rolling else (1, past.group(1).lower())
+        if unit in ("day", "week"):
+            return day_end - timedelta(days=count * (7 if unit == "week" else 1)), day_end
+        return add_months(day_end, -count * (12 if unit == "year" else 1)), day_end
+
+    previous = _PREVIOUS_RE.search(text)
+    if previous:
+        unit = previous.group(1).lower()
+        if unit in ("day", "week"):
+            return day_end - timedelta(days=7 if unit == "week" else 1), day_end
+        if unit == "month":
+            this_month = datetime(anchor.year, anchor.month, 1)
+            return add_months(this_month, -1), this_month
+        return datetime(anchor.year - 1, 1, 1), datetime(anchor.year, 1, 1)
+
+    current = _CURRENT_RE.search(text)
+    if current:
+        unit = (current.group(1) or current.group(2)).lower()
+        start = datetime(anchor.year, 1, 1) if unit == "year" else datetime(anchor.year, anchor.month, 1)
+        return start, day_end
+
+    parsed = [(m, _period(m)) for m in _PERIOD_RE.finditer(text)]
+    matches = [m for m, period in parsed if period]
+    periods = [period for m, period in parsed if period]
+    if not periods:
+        return None, None
+
+    # Year-less months / seasons / quarters borrow a neighbour's year
+    for i, period in enumerate(periods):
+        if period["year"] is None:
+            later = [p["year"] for p in periods[i + 1:] if p["year"] is not None]
+            earlier = [p["year"] for p in periods[:i] if p["year"] is not None]
+            if later or earlier:
+                period["year"] = later[0] if later else earlier[-1]
+            else:
+                period["year"] = anchor.year if datetime(anchor.year, period["month"], 1) <= anchor else anchor.year - 1
+
+    first, last = _bounds(periods[0]), _bounds(periods[-1])
+    prefix = text[:matches[0].start()]
+    if len(periods) == 1 or not _SPAN_RE.search(text[matches[0].end():matches[-1].start()]):
+        if _SINCE_RE.search(prefix):
+            # "since 2020" includes 2020; "after 2020" starts once it is over
+            return (first[1] if re.search(r"\bafter\b", prefix, re.IGNORECASE) else first[0]), None
+        if _BEFORE_RE.search(prefix):
+            return None, (first[0] if re.search(r"\bbefore\b", prefix, re.IGNORECASE) else first[1])
+    start, end = min(first[0], last[0]), max(first[1], last[1])
+    return start, end
@@ -7,6 +7,8 @@ Usage:
     python bulk_fetch.py --setup-neon           # Setup Neon database
     python bulk_fetch.py --fetch-all            # Fetch all data from 2018
     python bulk_fetch.py --migrate-from-supabase # Migrate existing data
+    python bulk_fetch.py --backfill-geocells    # Populate geocell keys on old rows
+    python bulk_fetch.py --rebuild-stats        # Recompute the dataset_stats table
 """
 
 import os
@@ -26,6 +28,13 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from dotenv import load_dotenv
 
+# Shared stdlib-only helpers (geocell keys) live alongside the chat app
+sys.path.insert(0, str(Path(__file__).parent.parent / "ARGO_CHATBOT"))
+import geocell
+import dataset_stats
+import fleet_snapshot
+from index_advisor import create_index_statements
+
 # Load environment from .env file (check multiple locations)
 def load_environment():
     """Load .env from project root or current directory."""
@@ -342,19 +351,21 @@ def upload_chunk_to_database(df: pd.DataFrame, engine, chunk_size: int = 5000) -
                         float(row["pressure"]) if pd.notna(row.get("pressure")) else 0.0,
                     )
                     if val[2] is not None and val[3] is not None:
-                        values.append(val)
+                        values.append((*val, geocell.encode_int(val[2], val[3])))
                 except:
                     pass
             
             if values:
-                insert_sql = """
-                    INSERT INTO argo_data (float_id, timestamp, latitude, longitude, temperature, salinity, pressure)
+                insert_sql = f"""
+                    INSERT INTO argo_data (float_id, timestamp, latitude, longitude, temperature, salinity, pressure, geocell)
                     VALUES %s
                     ON CONFLICT (float_id, timestamp, pressure) DO NOTHING
+                    RETURNING {dataset_stats.RETURNING_COLUMNS}
                 """
-                execute_values(cursor, insert_sql, values, page_size=1000)
+                inserted = execute_values(cursor, insert_sql, values, page_size=1000, fetch=True)
+                dataset_stats.apply_insert_delta(cursor, inserted)
                 conn.commit()
-                total_uploaded += len(values)
+                total_uploaded += len(inserted)
         except Exception as e:
             conn.rollback()
             # Silently continue on errors
@@ -458,25 +469,26 @@ def upload_to_database(df: pd.DataFrame, engine, chunk_size: int = 5000) -> int:
                         float(row["pressure"]) if pd.notna(row["pressure"]) else 0.0,
                     )
                     if val[0] is not None and val[2] is not None and val[3] is not None:
-                        values.append(val)
+                        values.append((*val, geocell.encode_int(val[2], val[3])))
                 except:
                     pass
             
             if values:
                 # Use INSERT with ON CONFLICT DO NOTHING to skip duplicates
-                insert_sql = """
-                    INSERT INTO argo_data (float_id, timestamp, latitude, longitude, temperature, salinity, pressure)
+                # RETURNING yields only rows actually inserted; the stats delta
+                # commits in the same transaction as the data
+                insert_sql = f"""
+                    INSERT INTO argo_data (float_id, timestamp, latitude, longitude, temperature, salinity, pressure, geocell)
                     VALUES %s
                     ON CONFLICT (float_id, timestamp, pressure) DO NOTHING
+                    RETURNING {dataset_stats.RETURNING_COLUMNS}
                 """
-                execute_values(cursor, insert_sql, values, page_size=1000)
+                inserted = execute_values(cursor, insert_sql, values, page_size=1000, fetch=True)
+                dataset_stats.apply_insert_delta(cursor, inserted)
                 conn.commit()
-                
-                # Count actual insertions
-                cursor.execute("SELECT COUNT(*) FROM argo_data")
-                current_count = cursor.fetchone()[0]
+                total_uploaded += len(inserted)
+                total_skipped += len(values) - len(inserted)
             
-            total_uploaded += len(values)
             pct = ((i + len(chunk)) / len(df)) * 100
             bar_filled = int(pct / 5)
             print(f"    ▓{'█' * bar_filled}{'░' * (20-bar_filled)}▓ {i + len(chunk):,}/{len(df):,} ({pct:.1f}%)")
@@ -484,6 +496,8 @@ def upload_to_database(df: pd.DataFrame, engine, chunk_size: int = 5000) -> int:
             print(f"    ⚠️ Chunk error (continuing): {str(e)[:50]}")
             conn.rollback()
     
+    if total_skipped:
+        print(f"  ⏭️  Skipped {total_skipped:,} duplicate records")
     cursor.close()
     conn.close()
     return total_uploaded
@@ -567,12 +581,11 @@ def init_database(engine):
             temperature DOUBLE PRECISION,
             salinity DOUBLE PRECISION,
             pressure DOUBLE PRECISION,
+            geocell INT8,
             UNIQUE(float_id, timestamp, pressure)
         )""",
-        "CREATE INDEX IF NOT EXISTS idx_argo_timestamp ON argo_data(timestamp)",
-        "CREATE INDEX IF NOT EXISTS idx_argo_float ON argo_data(float_id)",
-        "CREATE INDEX IF NOT EXISTS idx_argo_location ON argo_data(latitude, longitude)",
-    ]
+        "ALTER TABLE argo_data ADD COLUMN IF NOT EXISTS geocell INT8",
+    ] + create_index_statements()  # Shared target index set (index_advisor.py)
     
     try:
         # Use psycopg2 directly to bypass SQLAlchemy version detection issue
@@ -580,6 +593,8 @@ def init_database(engine):
         load_environment()
         db_url = os.getenv("DATABASE_URL")
         conn = psycopg2.connect(db_url)
+        # Autocommit: a failed statement must not abort the ones after it
+        conn.autocommit = True
         cursor = conn.cursor()
         for stmt in statements:
             try:
@@ -587,6 +602,11 @@ def init_database(engine):
             except Exception as e:
                 if "already exists" not in str(e).lower():
                     print(f"  Warning: {e}")
+        # Incrementally maintained stats; backfilled once from existing rows
+        dataset_stats.ensure_schema(cursor)
+        cursor.execute("SELECT COUNT(*) FROM dataset_stats")
+        if cursor.fetchone()[0] == 0:
+            rebuild_stats()
         conn.commit()
         cursor.close()
         conn.close()
@@ -597,8 +617,94 @@ def init_database(engine):
         return False
 
 
+def backfill_geocells(batch_size: int = 50000) -> int:
+    """
+    Populate the geocell key on rows ingested before it existed.
+
+    Works in batches of rows WHERE geocell IS NULL so it can be interrupted
+    and resumed at any time. Returns the number of rows updated.
+    """
+    import psycopg2
+    from psycopg2.extras import execute_values
+
+    load_environment()
+    db_url = os.getenv("DATABASE_URL")
+    conn = psycopg2.connect(db_url)
+    cursor = conn.cursor()
+
+    total_updated = 0
+    while True:
+        cursor.execute(
+            "SELECT id, latitude, longitude FROM argo_data "
+            "WHERE geocell IS NULL AND latitude IS NOT NULL AND longitude IS NOT NULL "
+            "LIMIT %s",
+            (batch_size,),
+        )
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        values = [(row_id, geocell.encode_int(lat, lon)) for row_id, lat, lon in rows]
+        execute_values(
+            cursor,
+            "UPDATE argo_data AS a SET geocell = v.geocell "
+            "FROM (VALUES %s) AS v(id, geocell) WHERE a.id = v.id",
+            values,
+            page_size=1000,
+        )
+        conn.commit()
+        total_updated += len(values)
+        print(f"   ✓ {total_updated:,} rows keyed", flush=True)
+
+    cursor.close()
+    conn.close()
+    return total_updated
+
+
+def rebuild_stats() -> bool:
+    """Recompute dataset_stats from argo_data in a single transaction."""
+    import psycopg2
+    load_environment()
+    conn = psycopg2.connect(os.getenv("DATABASE_URL"))
+    try:
+        cursor = conn.cursor()
+        dataset_stats.rebuild(cursor)
+        conn.commit()
+        cursor.close()
+        return True
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Error rebuilding stats: {e}")
+        return False
+    finally:
+        conn.close()
+
+
+def refresh_fleet_snapshot(engine):
+    """Rebuild the chatbot's fleet position snapshot (latest row per float)."""
+    print("\n🛰️  Rebuilding fleet snapshot...")
+    try:
+        floats = fleet_snapshot.rebuild(engine)
+        print(f"✅ Fleet snapshot: {floats:,} floats → {fleet_snapshot.get_snapshot_dir()}")
+    except Exception as e:
+        print(f"❌ Fleet snapshot rebuild failed: {e}")
+
+
 def get_stats(engine):
-    """Get database statistics (CockroachDB compatible)."""
+    """Get database statistics (CockroachDB compatible).
+    
+    Reads the maintained dataset_stats table; scans argo_data only if it
+    has not been built yet (see --rebuild-stats).
+    """
+    stats = dataset_stats.read_stats(engine)
+    if stats:
+        return {
+            "total_records": stats["total_records"],
+            "unique_floats": stats["unique_floats"],
+            "date_range": f"{stats['min_date']} to {stats['max_date']}",
+            "avg_temperature": stats["avg_temperature"],
+            "avg_salinity": stats["avg_salinity"],
+            "stats_updated_at": stats["updated_at"],
+        }
     try:
         import psycopg2
         load_environment()
@@ -647,6 +753,9 @@ def main():
     parser.add_argument("--server", type=str, default="ifremer", choices=["noaa", "ifremer"], help="ERDDAP server (default: ifremer)")
     parser.add_argument("--stats", action="store_true", help="Show database statistics")
     parser.add_argument("--test-connection", action="store_true", help="Test database connection")
+    parser.add_argument("--backfill-geocells", action="store_true", help="Compute geocell keys for rows that lack them")
+    parser.add_argument("--rebuild-stats", action="store_true", help="Recompute the dataset_stats table from argo_data")
+    parser.add_argument("--rebuild-snapshot", action="store_true", help="Rebuild the chatbot's fleet position snapshot")
     
     args = parser.parse_args()
     
@@ -695,6 +804,23 @@ def main():
         init_database(engine)
         return 0
     
+    if args.backfill_geocells:
+        init_database(engine)
+        print("\n🧭 Backfilling geocell keys...")
+        updated = backfill_geocells()
+        print(f"✅ Backfilled {updated:,} rows")
+        return 0
+    
+    if args.rebuild_stats:
+        print("\n📊 Rebuilding dataset statistics (full scan)...")
+        if rebuild_stats():
+            print("✅ dataset_stats rebuilt")
+        return 0
+    
+    if args.rebuild_snapshot:
+        refresh_fleet_snapshot(engine)
+        return 0
+    
     if args.fetch_all:
         print(f"\n🚀 Starting bulk fetch from {args.start_year}...")
         print(f"   Fetching from {len(REGIONS)} regions sequentially (safer).\n")
@@ -740,6 +866,7 @@ def main():
             print(f"\n📊 Progress: {completed_regions}/{len(REGIONS)} regions | Total: {stats.get('total_records', 0):,} records")
         
         print(f"\n🎉 Complete! Total records uploaded: {total_records:,}")
+        refresh_fleet_snapshot(engine)
         
         final_stats = get_stats(engine)
         print("\n📊 Final Statistics:")
@@ -762,6 +889,7 @@ def main():
         if not df.empty:
             uploaded = upload_to_database(df, engine)
             print(f"\n✅ Uploaded {uploaded} records from {region_key}")
+            refresh_fleet_snapshot(engine)
         
         return 0
     
@@ -216,6 +216,11 @@ def _run_fetch(region_id: str, start_dt: datetime, end_dt: datetime, server: str
             
             current_date = chunk_end + timedelta(days=1)
         
+        if total_uploaded:
+            _fetch_state["message"] = "Refreshing fleet snapshot..."
+            from database_utils import rebuild_fleet_snapshot
+            rebuild_fleet_snapshot()
+        
         _fetch_state["progress"] = 100
         _fetch_state["message"] = f"Complete! Uploaded {total_uploaded:,} records"
         _fetch_state["running"] = False
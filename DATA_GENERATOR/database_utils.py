@@ -4,12 +4,20 @@ Handles all database operations for the DATA_GENERATOR module.
 """
 
 import os
+import sys
 from sqlalchemy import create_engine, text
 from dotenv import load_dotenv
 from pathlib import Path
 import psycopg2
 from psycopg2.extras import execute_values
 
+# Shared stdlib-only helpers (geocell keys) live alongside the chat app
+sys.path.insert(0, str(Path(__file__).parent.parent / "ARGO_CHATBOT"))
+import geocell
+import dataset_stats
+import fleet_snapshot
+from index_advisor import create_index_statements
+
 # Load environment from .env file (check multiple locations)
 def load_environment():
     """Load .env from project root or current directory."""
@@ -87,37 +95,31 @@ def init_database():
                 temperature DOUBLE PRECISION,
                 salinity DOUBLE PRECISION,
                 pressure DOUBLE PRECISION,
+                geocell INT8,
                 UNIQUE(float_id, timestamp, pressure)
             )
         """)
+        # Tables created before geocell keys existed get the column added;
+        # populate it with: python bulk_fetch.py --backfill-geocells
+        cursor.execute("ALTER TABLE argo_data ADD COLUMN IF NOT EXISTS geocell INT8")
         
-        # Create indexes for common queries - OPTIMIZED for deployed performance
-        # Primary indexes for individual columns
-        indexes = [
-            "CREATE INDEX IF NOT EXISTS idx_argo_timestamp ON argo_data(timestamp)",
-            "CREATE INDEX IF NOT EXISTS idx_argo_float ON argo_data(float_id)",
-            "CREATE INDEX IF NOT EXISTS idx_argo_location ON argo_data(latitude, longitude)",
-        ]
+        # Incrementally maintained stats; backfilled once from existing rows
+        dataset_stats.ensure_schema(cursor)
+        cursor.execute("SELECT COUNT(*) FROM dataset_stats")
+        if cursor.fetchone()[0] == 0:
+            dataset_stats.rebuild(cursor)
         
-        # COMPOSITE INDEXES for faster complex queries (CockroachDB compatible - NO INCLUDE clause)
-        composite_indexes = [
-            # For trajectory/profile queries: SELECT ... WHERE float_id = X ORDER BY timestamp
-            "CREATE INDEX IF NOT EXISTS idx_argo_float_time ON argo_data(float_id, timestamp DESC)",
-            # For proximity queries with time filter: bounding box + time range
-            "CREATE INDEX IF NOT EXISTS idx_argo_geo_time ON argo_data(latitude, longitude, timestamp DESC)",
-            # For time-series queries: timestamp range with location
-            "CREATE INDEX IF NOT EXISTS idx_argo_time_geo ON argo_data(timestamp, latitude, longitude)",
-            # For map latest-per-float query: covering index for DISTINCT ON queries
-            "CREATE INDEX IF NOT EXISTS idx_argo_float_time_lat_lon ON argo_data(float_id, timestamp DESC, latitude, longitude)",
-            # For statistics queries: temperature/salinity with location
-            "CREATE INDEX IF NOT EXISTS idx_argo_geo_temp ON argo_data(latitude, longitude, temperature, salinity)",
-        ]
+        conn.commit()
         
-        for idx_sql in indexes + composite_indexes:
+        # Secondary indexes come from the shared target set (index_advisor.py).
+        # Each DDL runs in its own transaction so one failure cannot abort the rest.
+        conn.autocommit = True
+        for idx_sql in create_index_statements():
             try:
                 cursor.execute(idx_sql)
-            except Exception:
-                pass  # Index may already exist or syntax differs
+            except Exception as e:
+                if "already exists" not in str(e).lower():
+                    print(f"  ⚠️ {idx_sql}: {e}")
         
         conn.commit()
         cursor.close()
@@ -131,11 +133,19 @@ def init_database():
 
 
 def get_database_stats():
-    """Get statistics about the current database."""
+    """Get statistics about the current database.
+    
+    Reads the incrementally maintained dataset_stats table (constant time).
+    Falls back to a full scan only if that table has not been built yet.
+    """
     engine = get_db_engine()
     if not engine:
         return None
     
+    stats = dataset_stats.read_stats(engine)
+    if stats:
+        return stats
+    
     try:
         with engine.connect() as conn:
             result = conn.execute(text("""
@@ -176,10 +186,12 @@ def clear_all_data(confirm=False):
     try:
         cursor = conn.cursor()
         cursor.execute("DELETE FROM argo_data")
+        dataset_stats.reset(cursor)
         conn.commit()
         cursor.close()
         conn.close()
         print("✅ All data cleared")
+        rebuild_fleet_snapshot()
         return True
     except Exception as e:
         print(f"❌ Error clearing data: {e}")
@@ -193,6 +205,9 @@ def bulk_insert(data_tuples, page_size=1000):
     Args:
         data_tuples: List of tuples (float_id, timestamp, lat, lon, temp, sal, pressure)
         page_size: Number of rows per batch
+
+    The geocell key is computed here from (lat, lon), so callers never
+    need to know about it.
     
     Returns:
         Number of rows inserted
@@ -204,16 +219,21 @@ def bulk_insert(data_tuples, page_size=1000):
     try:
         cursor = conn.cursor()
         
-        insert_sql = """
-            INSERT INTO argo_data (float_id, timestamp, latitude, longitude, temperature, salinity, pressure)
+        insert_sql = f"""
+            INSERT INTO argo_data (float_id, timestamp, latitude, longitude, temperature, salinity, pressure, geocell)
             VALUES %s
             ON CONFLICT (float_id, timestamp, pressure) DO NOTHING
+            RETURNING {dataset_stats.RETURNING_COLUMNS}
         """
+        values = [(*row, geocell.encode_int(row[2], row[3])) for row in data_tuples]
         
-        execute_values(cursor, insert_sql, data_tuples, page_size=page_size)
+        # RETURNING yields only the rows actually inserted (duplicates are skipped),
+        # and the stats delta commits in the same transaction as the data
+        inserted = execute_values(cursor, insert_sql, values, page_size=page_size, fetch=True)
+        dataset_stats.apply_insert_delta(cursor, inserted)
         conn.commit()
         
-        rows_inserted = cursor.rowcount if cursor.rowcount > 0 else len(data_tuples)
+        rows_inserted = len(inserted)
         
         cursor.close()
         conn.close()
@@ -224,6 +244,31 @@ def bulk_insert(data_tuples, page_size=1000):
         return 0
 
 
+def rebuild_fleet_snapshot():
+    """
+    Rebuild the chatbot's memory-mapped fleet snapshot after an ingest.
+
+    Returns:
+        Number of floats in the new snapshot, or None on failure
+    """
+    conn = get_db_connection()
+    if not conn:
+        return None
+
+    try:
+        cursor = conn.cursor()
+        cursor.execute(fleet_snapshot.LATEST_POSITIONS_SQL)
+        rows = cursor.fetchall()
+        cursor.close()
+        fleet_snapshot.write_snapshot(rows)
+        return len(rows)
+    except Exception as e:
+        print(f"❌ Fleet snapshot rebuild error: {e}")
+        return None
+    finally:
+        conn.close()
+
+
 if __name__ == "__main__":
     # Test database connection
     print("Testing database connection...")
@@ -0,0 +1,233 @@
+"""
+FloatChart - DuckDB Compact Storage Profile
+Columnar-friendly argo_data layout for local and edge deployments.
+
+The PostgreSQL/CockroachDB schema does not suit DuckDB. It carries an INT8
+surrogate key with DEFAULT unique_rowid(), which does not exist in DuckDB,
+and a DOUBLE PRECISION for every measurement. The compact profile:
+
+    * drops the surrogate key (nothing in the app reads it)
+    * stores float_id as INTEGER (WMO ids are 7 digits)
+    * stores temperature / salinity / pressure as REAL — ARGO reports them
+      to 0.001 °C / 0.001 PSU / 0.1 dbar, well within float32 precision
+    * keeps latitude / longitude as DOUBLE so region BETWEEN boundaries and
+      the haversine distance are unchanged
+    * writes rows physically sorted by (float_id, timestamp, pressure), so
+      DuckDB's per-row-group min/max zone maps prune per-float lookups
+
+Measured with ``--benchmark`` on 3,000,000 synthetic rows (2,000 floats over
+10 years, 50 levels per profile, legacy rows in date-chunk ingest order;
+DuckDB 1.1, 1 thread):
+
+    layout      file size   float lookup   time-range avg   region count
+    legacy         50 MB       22.5 ms          3.8 ms          67.5 ms
+    compact        21 MB        1.7 ms         24.3 ms          68.8 ms
+
+The file is 2.4x smaller and per-float lookups (trajectory, profile, latest
+position) are ~13x faster. The trade-off is that whole-fleet time-range
+scans lose the accidental pruning that date-ordered ingest gave them: each
+row group now spans every year. They become a full columnar scan, which is
+still fast at this size. Region boxes are unaffected because neither layout
+clusters by position.
+
+Usage:
+    python duckdb_profile.py --convert ../prototype.duckdb   # Rewrite in place
+    python duckdb_profile.py --benchmark                    # Reproduce the table
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+from pathlib import Path
+
+import duckdb
+
+# Compact argo_data layout; geocell is added only when the source carries it
+COMPACT_COLUMNS = [
+    ("float_id", "INTEGER"),
+    ("timestamp", "TIMESTAMP"),
+    ("latitude", "DOUBLE"),
+    ("longitude", "DOUBLE"),
+    ("temperature", "REAL"),
+    ("salinity", "REAL"),
+    ("pressure", "REAL"),
+]
+SORT_KEY = "float_id, timestamp, pressure"
+
+
+def compact_schema(with_geocell: bool = True) -> str:
+    """CREATE TABLE statement for the compact argo_data profile."""
+    columns = COMPACT_COLUMNS + ([("geocell", "BIGINT")] if with_geocell else [])
+    body = ",\n    ".join(f"{name} {sql_type}" for name, sql_type in columns)
+    return f"CREATE TABLE IF NOT EXISTS argo_data (\n    {body}\n)"
+
+
+def _write_compact(con, source: str, with_geocell: bool) -> None:
+    """Create the compact argo_data in ``con`` from the ``source`` relation."""
+    columns = COMPACT_COLUMNS + ([("geocell", "BIGINT")] if with_geocell else [])
+    select = ", ".join(f"CAST({name} AS {sql_type}) AS {name}" for name, sql_type in columns)
+    con.execute(compact_schema(with_geocell))
+    # One row per (float_id, timestamp, pressure), mirroring the server-side
+    # UNIQUE constraint, written in sort-key order for zone-map pruning
+    con.execute(f"""
+        INSERT INTO argo_data
+        SELECT {select} FROM {source}
+        QUALIFY ROW_NUMBER() OVER (PARTITION BY float_id, timestamp, pressure) = 1
+        ORDER BY {SORT_KEY}
+    """)
+
+
+def convert(db_path: str, keep_backup: bool = True) -> dict:
+    """
+    Rewrite an existing DuckDB file into the compact profile.
+
+    The new database is written next to the original and swapped in with an
+    atomic rename, so readers never see a half-written file. Tables other
+    than argo_data (e.g. dataset_stats) are copied unchanged.
+
+    Returns:
+        dict: rows, size_before, size_after (bytes)
+    """
+    src = Path(db_path).resolve()
+    if not src.exists():
+        raise FileNotFoundError(src)
+    fd, tmp_name = tempfile.mkstemp(suffix=".duckdb", dir=src.parent)
+    os.close(fd)
+    os.unlink(tmp_name)  # DuckDB must create the file itself
+
+    con = duckdb.connect(tmp_name)
+    try:
+        con.execute(f"ATTACH '{src}' AS src (READ_ONLY)")
+        tables = [row[0] for row in con.execute(
+            "SELECT table_name FROM duckdb_tables() WHERE database_name = 'src'"
+        ).fetchall()]
+        if "argo_data" not in tables:
+            raise ValueError(f"{src} has no argo_data table")
+        src_columns = {row[0] for row in con.execute(
+            "SELECT column_name FROM duckdb_columns() WHERE database_name = 'src' AND table_name = 'argo_data'"
+        ).fetchall()}
+        _write_compact(con, "src.argo_data", with_geocell="geocell" in src_columns)
+        for table in tables:
+            if table != "argo_data":
+                con.execute(f'CREATE TABLE "{table}" AS SELECT * FROM src."{table}"')
+        rows = con.execute("SELECT COUNT(*) FROM argo_data").fetchone()[0]
+        con.execute("DETACH src")
+        con.execute("CHECKPOINT")
+    except Exception:
+        con.close()
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+    con.close()
+
+    size_before = src.stat().st_size
+    if keep_backup:
+        os.replace(src, src.with_suffix(src.suffix + ".bak"))
+    os.replace(tmp_name, src)
+    return {"rows": rows, "size_before": size_before, "size_after": src.stat().st_size}
+
+
+# ============================================================================
+# BENCHMARK
+# ============================================================================
+
+_LEGACY_SCHEMA = """CREATE TABLE argo_data (
+    id BIGINT PRIMARY KEY,
+    float_id BIGINT, timestamp TIMESTAMP,
+    latitude DOUBLE, longitude DOUBLE,
+    temperature DOUBLE, salinity DOUBLE, pressure DOUBLE, geocell BIGINT
+)"""
+
+_SYNTHETIC_SQL = """
+    SELECT
+        row_number() OVER () AS id,
+        2900000 + (p % {floats}) AS float_id,
+        TIMESTAMP '2015-01-01' + INTERVAL 1 HOUR * ((p // {floats}) * {step_hours} + p % {floats}) AS timestamp,
+        -60 + ((p % {floats}) * 37 % 120) + (p // {floats}) * 0.01 AS latitude,
+        -180 + ((p % {floats}) * 53 % 360) + (p // {floats}) * 0.01 AS longitude,
+        ROUND(28 - lvl * 0.5 + random(), 3) AS temperature,
+        ROUND(34 + lvl * 0.02 + random() * 0.2, 3) AS salinity,
+        lvl * 40.0 AS pressure,
+        NULL::BIGINT AS geocell
+    FROM range({profiles}) t(p), range({levels}) l(lvl)
+    ORDER BY timestamp  -- bulk_fetch ingests in date chunks
+"""
+
+_BENCH_QUERIES = {
+    "float lookup": 'SELECT "timestamp", "latitude", "longitude" FROM argo_data WHERE "float_id" = 2900777 ORDER BY "timestamp"',
+    "time-range avg": 'SELECT AVG("temperature") FROM argo_data WHERE "timestamp" BETWEEN \'2020-01-01\' AND \'2020-12-31\'',
+    "region count": 'SELECT COUNT(*) FROM argo_data WHERE "latitude" BETWEEN 5 AND 22 AND "longitude" BETWEEN 80 AND 95',
+}
+
+
+def _time_query(con, sql: str, repeat: int = 20) -> float:
+    con.execute(sql).fetchall()  # warm up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        con.execute(sql).fetchall()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def benchmark(rows: int = 3_000_000, floats: int = 2000, levels: int = 50) -> dict:
+    """Build the same synthetic data in both layouts and compare size and scan time."""
+    profiles = rows // levels
+    # Spread each float's profiles evenly over ten years
+    step_hours = 10 * 8760 // max(profiles // floats, 1)
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        source = duckdb.connect()
+        source.execute(f"CREATE TABLE synthetic AS {_SYNTHETIC_SQL.format(floats=floats, profiles=profiles, levels=levels, step_hours=step_hours)}")
+        source.execute(f"COPY synthetic TO '{tmp}/synthetic.parquet' (FORMAT PARQUET)")
+        source.close()
+
+        for layout in ("legacy", "compact"):
+            path = f"{tmp}/{layout}.duckdb"
+            con = duckdb.connect(path)
+            relation = f"read_parquet('{tmp}/synthetic.parquet')"
+            if layout == "legacy":
+                con.execute(_LEGACY_SCHEMA)
+                con.execute(f"INSERT INTO argo_data SELECT * FROM {relation}")
+            else:
+                _write_compact(con, relation, with_geocell=True)
+            con.execute("CHECKPOINT")
+            con.close()
+
+            con = duckdb.connect(path, read_only=True)
+            results[layout] = {"size_mb": os.path.getsize(path) / 1e6}
+            for label, sql in _BENCH_QUERIES.items():
+                results[layout][label] = _time_query(con, sql)
+            con.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DuckDB compact storage profile for FloatChart")
+    parser.add_argument("--convert", type=str, metavar="DB_PATH", help="Rewrite a DuckDB file in the compact profile")
+    parser.add_argument("--no-backup", action="store_true", help="With --convert, do not keep <file>.bak")
+    parser.add_argument("--benchmark", action="store_true", help="Compare legacy and compact layouts on synthetic data")
+    parser.add_argument("--rows", type=int, default=3_000_000, help="Benchmark row count (default: 3,000,000)")
+    args = parser.parse_args()
+
+    if args.convert:
+        print(f"🗜️  Converting {args.convert} to the compact profile...")
+        result = convert(args.convert, keep_backup=not args.no_backup)
+        print(f"✅ {result['rows']:,} rows: {result['size_before'] / 1e6:.1f} MB → {result['size_after'] / 1e6:.1f} MB")
+        return 0
+
+    if args.benchmark:
+        print(f"⏱️  Benchmarking {args.rows:,} synthetic rows...")
+        results = benchmark(rows=args.rows)
+        header = f"{'layout':<10}{'file size':>12}" + "".join(f"{label:>17}" for label in _BENCH_QUERIES)
+        print(header)
+        for layout, r in results.items():
+            line = f"{layout:<10}{r['size_mb']:>9.0f} MB" + "".join(f"{r[label]:>14.1f} ms" for label in _BENCH_QUERIES)
+            print(line)
+        return 0
+
+    parser.print_help()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,390 @@
+"""
+FloatChart - Index Advisor
+Reconciles the live argo_data indexes with the declared target index set.
+
+The advisor reads the catalog (pg_indexes) and usage counters
+(pg_stat_user_indexes, or crdb_internal on CockroachDB). It replays the query
+shapes that ARGO_CHATBOT/sql_builder.py actually generates through EXPLAIN,
+then recommends which indexes to add or drop.
+
+Usage:
+    python index_advisor.py                 # Report only
+    python index_advisor.py --apply         # Create missing target indexes
+    python index_advisor.py --apply --drop  # ...and drop redundant/unused ones
+"""
+
+import re
+import sys
+import argparse
+from datetime import datetime
+from pathlib import Path
+
+from sqlalchemy import text
+
+# sql_builder lives alongside the chat app
+sys.path.insert(0, str(Path(__file__).parent.parent / "ARGO_CHATBOT"))
+
+
+# ============================================================================
+# TARGET INDEX SET
+# ============================================================================
+# The single source of truth for argo_data secondary indexes. Both
+# database_utils.init_database() and bulk_fetch.init_database() create exactly
+# these. Every index slows ingest, so a single-column index that is a prefix of
+# a composite one is deliberately absent: the composite serves the same lookups.
+TARGET_INDEXES = {
+    # Trajectory / profile: WHERE float_id = X ORDER BY timestamp, and the
+    # map's DISTINCT ON (float_id) ... ORDER BY float_id, timestamp DESC
+    "idx_argo_float_time_lat_lon": "float_id, timestamp DESC, latitude, longitude",
+    # Time-series / statistics / scatter: timestamp range, then the region box
+    "idx_argo_time_geo": "timestamp, latitude, longitude",
+    # Region box queries without a time filter
+    "idx_argo_geo_time": "latitude, longitude, timestamp DESC",
+    # Proximity: integer range scans over the geocell ring
+    "idx_argo_geocell": "geocell",
+}
+
+
+def create_index_statements():
+    """Return idempotent CREATE INDEX statements for the target set."""
+    return [
+        f"CREATE INDEX IF NOT EXISTS {name} ON argo_data({columns})"
+        for name, columns in TARGET_INDEXES.items()
+    ]
+
+
+# ============================================================================
+# INDEX DEFINITIONS
+# ============================================================================
+
+def parse_columns(column_list):
+    """
+    Normalise an index column list into a tuple of (column, direction).
+
+    Accepts both declared lists ("float_id, timestamp DESC") and the
+    parenthesised part of pg_indexes.indexdef ('float_id ASC, "timestamp"').
+    """
+    columns = []
+    for part in column_list.split(","):
+        tokens = part.strip().replace('"', "").split()
+        if not tokens:
+            continue
+        direction = "DESC" if len(tokens) > 1 and tokens[1].upper() == "DESC" else "ASC"
+        columns.append((tokens[0].lower(), direction))
+    return tuple(columns)
+
+
+def parse_indexdef(indexdef):
+    """
+    Parse a pg_indexes.indexdef string.
+
+    Returns:
+        dict: {"unique": bool, "columns": tuple of (column, direction)}
+    """
+    on_pos = indexdef.upper().find(" ON ")
+    start = indexdef.find("(", on_pos if on_pos >= 0 else 0)
+    depth, end = 0, len(indexdef)
+    for i in range(start, len(indexdef)):
+        if indexdef[i] == "(":
+            depth += 1
+        elif indexdef[i] == ")":
+            depth -= 1
+            if depth == 0:
+                end = i
+                break
+    return {
+        "unique": indexdef.upper().startswith("CREATE UNIQUE"),
+        "columns": parse_columns(indexdef[start + 1:end]) if start >= 0 else tuple(),
+    }
+
+
+def _scan_key(columns):
+    """A B-tree can be scanned backwards, so flip all-DESC-leading keys to ASC."""
+    if columns and columns[0][1] == "DESC":
+        flip = {"ASC": "DESC", "DESC": "ASC"}
+        return tuple((col, flip[direction]) for col, direction in columns)
+    return columns
+
+
+def find_redundant(indexes):
+    """
+    Find non-unique indexes made redundant by another index.
+
+    An index is redundant when its key is a leading prefix of (or identical
+    to) another index's key: every lookup it serves, the other serves too.
+
+    Args:
+        indexes (dict): name → {"unique": bool, "columns": tuple}
+
+    Returns:
+        dict: redundant index name → name of the index that covers it
+    """
+    redundant = {}
+    for name, info in indexes.items():
+        if info["unique"]:
+            continue
+        key = _scan_key(info["columns"])
+        for other, other_info in indexes.items():
+            if other == name or other in redundant:
+                continue
+            other_key = _scan_key(other_info["columns"])
+            if len(other_key) < len(key) or other_key[:len(key)] != key:
+                continue
+            # Identical keys: keep unique indexes, then targets, then by name
+            if len(other_key) == len(key) and not other_info["unique"]:
+                if (other not in TARGET_INDEXES, other) > (name not in TARGET_INDEXES, name):
+                    continue
+            redundant[name] = other
+            break
+    return redundant
+
+
+# ============================================================================
+# LIVE CATALOG AND USAGE
+# ============================================================================
+
+def read_catalog(engine):
+    """Return name → parsed definition for every index on argo_data."""
+    with engine.connect() as conn:
+        rows = conn.execute(text(
+            "SELECT indexname, indexdef FROM pg_indexes WHERE tablename = 'argo_data'"
+        )).fetchall()
+    return {row[0]: parse_indexdef(row[1]) for row in rows}
+
+
+def read_usage(engine):
+    """
+    Return name → scan count since the statistics were last reset.
+
+    Uses pg_stat_user_indexes on PostgreSQL and index_usage_statistics on
+    CockroachDB. Returns an empty dict when neither is available.
+    """
+    queries = [
+        "SELECT indexrelname, idx_scan FROM pg_stat_user_indexes WHERE relname = 'argo_data'",
+        """SELECT i.index_name, s.total_reads
+           FROM crdb_internal.index_usage_statistics s
+           JOIN crdb_internal.table_indexes i
+             ON s.table_id = i.descriptor_id AND s.index_id = i.index_id
+           WHERE i.descriptor_name = 'argo_data'""",
+    ]
+    for query in queries:
+        try:
+            with engine.connect() as conn:
+                return {row[0]: int(row[1] or 0) for row in conn.execute(text(query))}
+        except Exception:
+            continue
+    return {}
+
+
+# ============================================================================
+# WORKLOAD REPLAY
+# ============================================================================
+
+_SAMPLE_REGION = '("latitude" BETWEEN 5 AND 22 AND "longitude" BETWEEN 80 AND 95)'  # bay of bengal
+_SAMPLE_REGION_2 = '("latitude" BETWEEN 5 AND 25 AND "longitude" BETWEEN 50 AND 75)'  # arabian sea
+
+# Mirrors the latest-position query behind /api/map/points
+_MAP_POINTS_SQL = """SELECT DISTINCT ON (float_id) float_id, latitude, longitude, timestamp, temperature
+FROM argo_data
+WHERE latitude IS NOT NULL AND longitude IS NOT NULL AND timestamp >= NOW() - INTERVAL '2 years'
+ORDER BY float_id, timestamp DESC LIMIT 5000"""
+
+
+def build_workload(engine=None, float_id=None, max_date=None):
+    """
+    Build the representative workload: one query per sql_builder shape.
+
+    Returns:
+        list: (label, sql) tuples. Shapes the builder rejects are skipped.
+    """
+    from sql_builder import build_query
+
+    float_id = float_id or 2902296
+    year = (max_date or datetime.now()).year - 1
+    db_context = {"max_date_obj": max_date or datetime.now()}
+    intents = [
+        ("Proximity", {"query_type": "Proximity", "latitude": 13.08, "longitude": 80.27,
+                       "distance_km": 300, "limit": 5}),
+        ("Time-Series", {"query_type": "Time-Series", "location_clause": _SAMPLE_REGION,
+                         "time_constraint": str(year), "metrics": ["temperature"]}),
+        ("Statistic", {"query_type": "Statistic", "location_clause": _SAMPLE_REGION,
+                       "time_constraint": f"March {year}", "metrics": ["temperature"],
+                       "aggregation": "avg"}),
+        ("Statistic (count)", {"query_type": "Statistic", "location_clause": _SAMPLE_REGION,
+                               "aggregation": "count"}),
+        ("Profile", {"query_type": "Profile", "float_id": float_id}),
+        ("Profile (recent)", {"query_type": "Profile", "location_clause": _SAMPLE_REGION,
+                              "time_constraint": str(year), "profile_count": 5}),
+        ("Profile (closest)", {"query_type": "Profile", "float_id": float_id,
+                               "target_date": f"March {year}"}),
+        ("Trajectory", {"query_type": "Trajectory", "float_id": float_id}),
+        ("Scatter", {"query_type": "Scatter", "location_clause": _SAMPLE_REGION,
+                     "time_constraint": str(year), "metrics": ["temperature", "salinity"]}),
+        ("Scatter (density)", {"query_type": "Scatter", "location_clause": _SAMPLE_REGION,
+                               "time_constraint": str(year), "metrics": ["temperature", "salinity"],
+                               "scatter_mode": "density"}),
+        ("Comparison", {"query_type": "Comparison", "time_constraint": str(year), "metrics": ["temperature"],
+                        "region_clauses": {"bay of bengal": _SAMPLE_REGION,
+                                           "arabian sea": _SAMPLE_REGION_2}}),
+        ("General", {"query_type": "General", "location_clause": _SAMPLE_REGION}),
+    ]
+    workload = []
+    for label, intent in intents:
+        try:
+            workload.append((label, build_query(intent, db_context, engine)))
+        except ValueError as e:
+            print(f"  Skipping {label}: {e}")
+    workload.append(("Map points", _MAP_POINTS_SQL))
+    return workload
+
+
+def replay_workload(engine, workload, index_names):
+    """
+    EXPLAIN each workload query and record which indexes its plan uses.
+
+    Plain-text EXPLAIN is used because it works on PostgreSQL
+    ("Index Scan using idx_x") and CockroachDB ("table: argo_data@idx_x").
+
+    Returns:
+        list: dicts with label, indexes used, and whether a full scan remains.
+    """
+    name_pattern = re.compile(r"\b(" + "|".join(map(re.escape, sorted(index_names))) + r")\b") if index_names else None
+    results = []
+    for label, sql in workload:
+        # Builder queries carry bind values; plan with them inlined, as a custom plan would
+        sql = sql.render() if hasattr(sql, "render") else sql
+        try:
+            with engine.connect() as conn:
+                plan = "\n".join(str(row[0]) for row in conn.execute(text("EXPLAIN " + sql.rstrip(";"))))
+        except Exception as e:
+            results.append({"label": label, "indexes": [], "full_scan": None, "error": str(e)})
+            continue
+        used = sorted(set(name_pattern.findall(plan))) if name_pattern else []
+        full_scan = bool(re.search(r"Seq Scan on argo_data|FULL SCAN", plan, re.IGNORECASE))
+        results.append({"label": label, "indexes": used, "full_scan": full_scan, "error": None})
+    return results
+
+
+# ============================================================================
+# RECOMMENDATIONS
+# ============================================================================
+
+def recommend(catalog, usage, replay):
+    """
+    Compare the live indexes with the target set.
+
+    Args:
+        catalog (dict): Output of read_catalog().
+        usage (dict): Output of read_usage() (may be empty).
+        replay (list): Output of replay_workload().
+
+    Returns:
+        dict: {"add": [(name, reason)], "drop": [(name, reason)],
+               "review": [(name, reason)]}
+    """
+    used_by_workload = {name for result in replay for name in result["indexes"]}
+    live_keys = {_scan_key(info["columns"]): name for name, info in catalog.items()}
+    plan = {"add": [], "drop": [], "review": []}
+
+    for name, columns in TARGET_INDEXES.items():
+        if name in catalog:
+            if _scan_key(catalog[name]["columns"]) != _scan_key(parse_columns(columns)):
+                plan["review"].append((name, f"definition differs from target ({columns})"))
+            continue
+        equivalent = live_keys.get(_scan_key(parse_columns(columns)))
+        if equivalent:
+            plan["review"].append((name, f"same key already exists as {equivalent}"))
+        else:
+            plan["add"].append((name, f"target index on ({columns}) is missing"))
+
+    redundant = find_redundant(catalog)
+    for name, info in sorted(catalog.items()):
+        if info["unique"] or name in TARGET_INDEXES:
+            continue
+        if name in redundant:
+            plan["drop"].append((name, f"prefix of {redundant[name]}"))
+        elif name in used_by_workload:
+            plan["review"].append((name, "not in target set but used by the workload"))
+        elif usage.get(name, 0) > 0:
+            plan["review"].append((name, f"not in target set but scanned {usage[name]:,} times"))
+        else:
+            plan["drop"].append((name, "not in target set and unused by the workload"))
+    return plan
+
+
+def apply_plan(engine, plan, drop=False):
+    """Create missing target indexes and optionally drop the recommended ones."""
+    statements = [
+        f"CREATE INDEX IF NOT EXISTS {name} ON argo_data({TARGET_INDEXES[name]})"
+        for name, _ in plan["add"]
+    ]
+    if drop:
+        statements += [f"DROP INDEX IF EXISTS {name}" for name, _ in plan["drop"]]
+    applied = 0
+    for stmt in statements:
+        try:
+            with engine.connect() as conn:
+                conn.execute(text(stmt))
+                conn.commit()
+            print(f"  ✅ {stmt}")
+            applied += 1
+        except Exception as e:
+            print(f"  ❌ {stmt}\n     {e}")
+    return applied
+
+
+# ============================================================================
+# CLI
+# ============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconcile argo_data indexes with the target index set")
+    parser.add_argument("--apply", action="store_true", help="Create missing target indexes")
+    parser.add_argument("--drop", action="store_true", help="With --apply, also drop redundant/unused indexes")
+    parser.add_argument("--no-replay", action="store_true", help="Skip the EXPLAIN workload replay")
+    args = parser.parse_args()
+
+    from database_utils import get_db_engine
+    engine = get_db_engine()
+    if engine is None:
+        return 1
+
+    catalog = read_catalog(engine)
+    usage = read_usage(engine)
+    print(f"\n📇 argo_data indexes ({len(catalog)}):")
+    for name, info in sorted(catalog.items()):
+        cols = ", ".join(c if d == "ASC" else f"{c} {d}" for c, d in info["columns"])
+        scans = usage.get(name, "n/a") if usage else "n/a"
+        flag = " [unique]" if info["unique"] else ""
+        print(f"   {name}{flag} ({cols})  scans={scans}")
+
+    replay = []
+    if not args.no_replay:
+        with engine.connect() as conn:
+            row = conn.execute(text("SELECT float_id, timestamp FROM argo_data ORDER BY timestamp DESC LIMIT 1")).fetchone()
+        workload = build_workload(engine, float_id=row[0] if row else None, max_date=row[1] if row else None)
+        replay = replay_workload(engine, workload, set(catalog) | set(TARGET_INDEXES))
+        print("\n🔁 Workload replay:")
+        for result in replay:
+            if result["error"]:
+                print(f"   {result['label']:<18} EXPLAIN failed: {result['error'].splitlines()[0]}")
+                continue
+            scan = "  ⚠️ full scan" if result["full_scan"] else ""
+            print(f"   {result['label']:<18} {', '.join(result['indexes']) or '(no index)'}{scan}")
+
+    plan = recommend(catalog, usage, replay)
+    print("\n📋 Recommendations:")
+    for action in ("add", "drop", "review"):
+        for name, reason in plan[action]:
+            print(f"   {action.upper():<6} {name}: {reason}")
+    if not any(plan.values()):
+        print("   Indexes match the target set.")
+
+    if args.apply:
+        print("\n🔧 Applying...")
+        apply_plan(engine, plan, drop=args.drop)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
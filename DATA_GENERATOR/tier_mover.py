@@ -0,0 +1,191 @@
+"""
+FloatChart - Cold Tier Mover
+Moves argo_data history older than a cutoff into partitioned Parquet.
+
+Rows are moved one calendar month at a time, oldest first:
+
+    1. SELECT the month's rows (below the cutoff) from argo_data
+    2. Write them, sorted by timestamp, to
+       $COLD_TIER_DIR/year=YYYY/month=M/part-<digest>.parquet
+       (written to a temp file, then renamed into place)
+    3. DELETE the same rows from argo_data and commit
+    4. Advance the cutoff in $COLD_TIER_DIR/_manifest.json
+
+The file name is a digest of the rows it holds. If a run is interrupted
+between steps 2 and 3, the retry rewrites the same file instead of
+duplicating it. The chatbot reads the manifest (ARGO_CHATBOT/
+tiered_storage.py) and federates the cold tier into queries whose time
+range reaches it. The manifest cutoff only advances once a month is fully
+moved.
+
+Moved rows still belong to the dataset, so dataset_stats is left unchanged;
+dataset_stats.rebuild() scans the cold tier as well as argo_data.
+
+Usage:
+    python tier_mover.py --dry-run                 # Show what would move
+    python tier_mover.py                           # Move rows older than COLD_TIER_AFTER_YEARS (default 2)
+    python tier_mover.py --before 2020-01-01       # Explicit cutoff
+"""
+
+import os
+import sys
+import json
+import hashlib
+import argparse
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+import duckdb
+import pandas as pd
+
+from database_utils import get_db_connection, load_environment
+
+# tiered_storage lives alongside the chat app
+sys.path.insert(0, str(Path(__file__).parent.parent / "ARGO_CHATBOT"))
+from tiered_storage import MANIFEST_NAME
+
+
+def default_cutoff(years: int, today: datetime = None) -> datetime:
+    """First day of the month ``years`` years before today (month-aligned)."""
+    today = today or datetime.now()
+    return datetime(today.year - years, today.month, 1)
+
+
+def _next_month(dt: datetime) -> datetime:
+    return datetime(dt.year + (dt.month == 12), dt.month % 12 + 1, 1)
+
+
+def read_manifest(cold_dir: Path) -> dict:
+    path = cold_dir / MANIFEST_NAME
+    if path.exists():
+        return json.loads(path.read_text())
+    return {"cutoff": None, "min_timestamp": None, "rows": 0}
+
+
+def write_manifest(cold_dir: Path, manifest: dict) -> None:
+    """Atomically replace the manifest."""
+    manifest["updated_at"] = datetime.now().isoformat()
+    fd, tmp = tempfile.mkstemp(dir=cold_dir, suffix=".json.tmp")
+    with os.fdopen(fd, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, cold_dir / MANIFEST_NAME)
+
+
+def write_partition(df: pd.DataFrame, cold_dir: Path, month_start: datetime) -> Path:
+    """
+    Write one month of rows to its Parquet partition; returns the file path.
+
+    The file name is a digest of the sorted row keys, so re-running a month
+    (in whatever order the rows arrive) replaces its file instead of adding one.
+    """
+    keys = df[["timestamp", "float_id", "pressure"]].sort_values(["timestamp", "float_id", "pressure"])
+    digest = hashlib.sha1(
+        pd.util.hash_pandas_object(keys.astype(str), index=False).values.tobytes()
+    ).hexdigest()[:16]
+    part_dir = cold_dir / f"year={month_start.year}" / f"month={month_start.month}"
+    part_dir.mkdir(parents=True, exist_ok=True)
+    final = part_dir / f"part-{digest}.parquet"
+    tmp = part_dir / f".part-{digest}.tmp"
+
+    con = duckdb.connect()
+    try:
+        con.register("batch", df)
+        con.execute(f"COPY (SELECT * FROM batch ORDER BY timestamp, float_id, pressure) TO '{tmp}' (FORMAT PARQUET)")
+    finally:
+        con.close()
+    os.replace(tmp, final)
+    return final
+
+
+def move_to_cold(cold_dir: Path, cutoff: datetime, dry_run: bool = False) -> int:
+    """
+    Move every argo_data row older than ``cutoff`` to the cold tier.
+
+    Returns:
+        int: Rows moved (or that would be moved with ``dry_run``).
+    """
+    conn = get_db_connection()
+    if not conn:
+        return 0
+    cold_dir.mkdir(parents=True, exist_ok=True)
+    manifest = read_manifest(cold_dir)
+    moved = 0
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT MIN(timestamp) FROM argo_data WHERE timestamp < %s", (cutoff,))
+        oldest = cursor.fetchone()[0]
+        if oldest is None:
+            print("✅ Nothing older than the cutoff in argo_data")
+        month = datetime(oldest.year, oldest.month, 1) if oldest else cutoff
+        while month < cutoff:
+            month_end = min(_next_month(month), cutoff)
+            cursor.execute(
+                "SELECT * FROM argo_data WHERE timestamp >= %s AND timestamp < %s"
+                " ORDER BY timestamp, float_id, pressure",
+                (month, month_end),
+            )
+            rows = cursor.fetchall()
+            if rows:
+                df = pd.DataFrame(rows, columns=[c[0] for c in cursor.description])
+                if dry_run:
+                    print(f"  {month:%Y-%m}: {len(df):,} rows")
+                else:
+                    path = write_partition(df, cold_dir, month)
+                    cursor.execute(
+                        "DELETE FROM argo_data WHERE timestamp >= %s AND timestamp < %s",
+                        (month, month_end),
+                    )
+                    conn.commit()
+                    print(f"  📦 {month:%Y-%m}: {len(df):,} rows → {path.relative_to(cold_dir)}")
+                moved += len(df)
+            if not dry_run:
+                # Everything below month_end is now in Parquet
+                previous = manifest.get("cutoff")
+                if not previous or datetime.fromisoformat(previous) < month_end:
+                    manifest["cutoff"] = month_end.isoformat()
+                if rows:
+                    first = min(df["timestamp"]).to_pydatetime()
+                    current_min = manifest.get("min_timestamp")
+                    if not current_min or first < datetime.fromisoformat(current_min):
+                        manifest["min_timestamp"] = first.isoformat()
+                    manifest["rows"] = int(manifest.get("rows", 0)) + len(df)
+                write_manifest(cold_dir, manifest)
+            month = _next_month(month)
+        cursor.close()
+    except Exception as e:
+        conn.rollback()
+        print(f"❌ Tiering error: {e}")
+    finally:
+        conn.close()
+    return moved
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move old argo_data rows to the Parquet cold tier")
+    parser.add_argument("--before", type=str, help="Cutoff date (YYYY-MM-DD); rows older than this move")
+    parser.add_argument("--older-than-years", type=int, default=None,
+                        help="Cutoff as whole years before this month (default: COLD_TIER_AFTER_YEARS or 2)")
+    parser.add_argument("--cold-dir", type=str, default=None, help="Cold tier directory (default: COLD_TIER_DIR)")
+    parser.add_argument("--dry-run", action="store_true", help="Report rows per month without moving anything")
+    args = parser.parse_args()
+
+    load_environment()
+    cold_dir = args.cold_dir or os.getenv("COLD_TIER_DIR")
+    if not cold_dir:
+        print("❌ Set COLD_TIER_DIR (and the same value for the chatbot) or pass --cold-dir")
+        return 1
+    if args.before:
+        cutoff = datetime.fromisoformat(args.before)
+    else:
+        years = args.older_than_years or int(os.getenv("COLD_TIER_AFTER_YEARS", "2"))
+        cutoff = default_cutoff(years)
+
+    print(f"\n🧊 Moving rows before {cutoff:%Y-%m-%d} to {cold_dir}{' (dry run)' if args.dry_run else ''}")
+    moved = move_to_cold(Path(cold_dir), cutoff, dry_run=args.dry_run)
+    print(f"✅ {'Would move' if args.dry_run else 'Moved'} {moved:,} rows")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+"""
+FloatChart - SQL Dialect Benchmark
+Runs the builder queries that compile differently per dialect on DuckDB:
+once as the PostgreSQL SQL that DuckDB used to receive (DISTINCT ON,
+ROUND(x::numeric, n), ::float casts), and once as the DuckDB SQL
+(arg_max / arg_min over a row struct, ROUND on DOUBLE). The synthetic
+fleet is the one from bench_proximity.py: 250 cycles of 10 levels per float.
+
+Measured on DuckDB 1.1, 5M rows (--floats 2000), 1 core (median of 3):
+
+    case                                        postgresql    duckdb   same rows
+    Proximity, Chennai 1000 km                      242 ms    232 ms   yes
+    Proximity, Arabian Sea 2000 km                  331 ms    248 ms   yes
+    Trajectory, one float                           144 ms    133 ms   yes
+    Path, whole fleet (surface per profile)        2802 ms   2417 ms   yes
+    Latest position per float (map)                 963 ms    239 ms   yes
+
+The proximity queries spend most of their time in the box scan and the
+per-float "no later row" check, which both dialects share; the latest-row
+step alone (the map query) is 4x faster as one hash aggregate than as a
+DISTINCT ON sort.
+
+Besides speed, the DuckDB SQL is correct where the PostgreSQL SQL is not on
+DuckDB: a bare NUMERIC there is DECIMAL(18,3), so coordinates came back cut
+to 3 decimal places, and FLOAT is 4-byte. The "same rows" column compares
+against the PostgreSQL SQL with the cast rewritten the way the cold tier
+does it.
+
+Usage:
+    python benchmarks/bench_dialects.py                  # 5M rows, DuckDB file in a temp dir
+    python benchmarks/bench_dialects.py --floats 400     # 1M rows, quick run
+    python benchmarks/bench_dialects.py --db argo.duckdb --keep
+"""
+
+import os
+import re
+import sys
+import argparse
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "ARGO_CHATBOT"))
+sys.path.insert(0, str(Path(__file__).parent))
+
+import sql_builder
+import sql_dialects
+from bench_proximity import build_table, timed
+
+COLUMNS = {"float_id", "timestamp", "latitude", "longitude", "temperature", "salinity", "pressure"}
+CONTEXT = {"max_date_obj": datetime(2024, 12, 31)}
+
+# (name, intent)
+CASES = [
+    ("Proximity, Chennai 1000 km", {"query_type": "Proximity", "latitude": 13.08, "longitude": 80.27,
+                                    "distance_km": 1000, "limit": 5, "metrics": ["temperature"]}),
+    ("Proximity, Arabian Sea 2000 km", {"query_type": "Proximity", "latitude": 15.0, "longitude": 62.5,
+                                        "distance_km": 2000, "limit": 10, "metrics": ["temperature"]}),
+    ("Trajectory, one float", {"query_type": "Trajectory", "float_id": 2900007, "metrics": ["temperature"]}),
+    ("Path, whole fleet (surface per profile)", {"query_type": "Path"}),
+]
+
+
+def _portable(sql):
+    """The PostgreSQL SQL with NUMERIC casts as the cold tier runs them (for the row check)."""
+    return sql_builder.BoundQuery(re.sub(r"::numeric\b", "::DOUBLE", str(sql)), sql.params)
+
+
+def _latest_positions_sql(dialect):
+    """Latest position per float, as behind /api/map/points."""
+    return sql_builder.BoundQuery(sql_dialects.latest_per_group(
+        ['"float_id"', '"latitude"', '"longitude"', '"timestamp"', '"temperature"'], ['"float_id"'],
+        '"timestamp"', 'FROM argo_data WHERE "latitude" IS NOT NULL AND "longitude" IS NOT NULL',
+        dialect), {})
+
+
+def run(engine, repeat):
+    def query(sql):
+        with engine.connect() as conn:
+            return pd.read_sql_query(text(sql), conn, params=sql.params)
+
+    cases = [(name, sql_builder.build_query(dict(intent), CONTEXT, existing_cols=COLUMNS, dialect="postgresql"),
+              sql_builder.build_query(dict(intent), CONTEXT, existing_cols=COLUMNS, dialect="duckdb"))
+             for name, intent in CASES]
+    cases.append(("Latest position per float (map)", _latest_positions_sql("postgresql"),
+                  _latest_positions_sql("duckdb")))
+
+    print(f"\n{'case':<44} {'postgresql':>11} {'duckdb':>10} {'speed-up':>9}  same rows")
+    for name, postgres_sql, duckdb_sql in cases:
+        _, before_ms = timed(lambda: query(postgres_sql), repeat)
+        after, after_ms = timed(lambda: query(duckdb_sql), repeat)
+        expected = query(_portable(postgres_sql))
+        if "Path" in name or "map" in name:
+            # Whole-fleet results: compare as sets of rows
+            keys = ["float_id", "timestamp"]
+            after, expected = (df.sort_values(keys).reset_index(drop=True) for df in (after, expected))
+        try:
+            pd.testing.assert_frame_equal(after, expected, check_dtype=False)
+            same = "yes"
+        except AssertionError:
+            same = "no"
+        print(f"{name:<44} {before_ms:>9.1f}ms {after_ms:>8.1f}ms {before_ms / after_ms:>8.2f}x  {same}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark DuckDB-dialect SQL against the PostgreSQL SQL")
+    parser.add_argument("--floats", type=int, default=2000, help="Synthetic floats (x2,500 rows each)")
+    parser.add_argument("--db", help="DuckDB file to use (default: temporary)")
+    parser.add_argument("--keep", action="store_true", help="Reuse an existing argo_data table")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per query (median reported)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"duckdb:///{args.db or os.path.join(tmp, 'bench.duckdb')}")
+        try:
+            with engine.connect() as conn:
+                exists = conn.execute(text(
+                    "SELECT COUNT(*) FROM information_schema.tables WHERE table_name = 'argo_data'")).scalar()
+            if not (args.keep and exists):
+                build_table(engine, args.floats)
+            run(engine, args.repeat)
+        finally:
+            engine.dispose()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
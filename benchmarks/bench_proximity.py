@@ -0,0 +1,196 @@
+"""
+FloatChart - Proximity Benchmark
+Compares the expanding-radius KNN search with the previous single Proximity
+query on a synthetic argo_data table.
+
+The previous query scanned a fixed box of at least +/-8 degrees in both
+latitude and longitude, with no cos(latitude) scaling. It then took the
+latest row per float over everything in that box before applying LIMIT.
+The synthetic fleet is spread over the world ocean, 250 cycles per float
+and 10 levels per cycle, so the default 4,000 floats give 10M rows.
+
+Measured on DuckDB 1.1, 10M rows, 1 core (median of 3):
+
+    case                                  previous    knn     same floats
+    Chennai, nearest 5 / 1000 km           365 ms    315 ms   yes
+    Arabian Sea, nearest 10 / 2000 km      465 ms    365 ms   yes
+    Southern Ocean, nearest 5 / 1500 km    353 ms    357 ms   yes
+    Fiji (antimeridian), nearest 5 / 800   357 ms    464 ms   yes
+
+Both queries report a float at its latest position in the time window
+inside the same search area, and drop it if that position is outside the
+circle. knn_search wraps the area at 180° and widens it in longitude where
+the circle reaches further, so near the antimeridian and at high latitude
+it can find floats the previous query missed; elsewhere the answers are
+identical. DuckDB has no secondary range index, so both queries are a full
+columnar scan and knn_search searches the full radius in one step. Across
+180° the split area is slower.
+
+The expanding search is meant for PostgreSQL. There each step is a range
+scan on idx_argo_geo_time, and the later-row check is a probe on
+idx_argo_float_time_lat_lon. That speed-up has not been measured yet. Run
+with ``--url`` against a scratch PostgreSQL database before relying on it;
+the target indexes are created for you.
+
+Usage:
+    python benchmarks/bench_proximity.py                 # 10M rows, DuckDB file in a temp dir
+    python benchmarks/bench_proximity.py --floats 400    # 1M rows, quick run
+    python benchmarks/bench_proximity.py --db argo.duckdb --keep
+    python benchmarks/bench_proximity.py --url postgresql://localhost/argo_bench
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+import statistics
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "ARGO_CHATBOT"))
+sys.path.insert(0, str(Path(__file__).parent.parent / "DATA_GENERATOR"))
+
+import knn_search
+from index_advisor import TARGET_INDEXES
+from sql_builder import BoundQuery
+
+CYCLES = 250
+LEVELS = 10
+
+# (name, lat, lon, max distance km, k)
+CASES = [
+    ("Chennai, nearest 5 within 1000 km", 13.08, 80.27, 1000, 5),
+    ("Arabian Sea, nearest 10 within 2000 km", 15.0, 62.5, 2000, 10),
+    ("Southern Ocean, nearest 5 within 1500 km", -62.0, 20.0, 1500, 5),
+    ("Fiji (antimeridian), nearest 5 within 800 km", -17.7, 179.5, 800, 5),
+]
+
+
+def legacy_proximity_sql(lat, lon, distance_km=500, limit=5):
+    """The single Proximity query as sql_builder emitted it before KNN search."""
+    delta = max(8.0, (distance_km / 111) * 1.5)
+    return BoundQuery("""
+    WITH filtered_data AS (
+        SELECT "float_id", "timestamp", "latitude", "longitude"
+        FROM argo_data
+        WHERE "latitude" IS NOT NULL
+          AND "longitude" IS NOT NULL
+          AND "latitude" BETWEEN :lat_min AND :lat_max AND "longitude" BETWEEN :lon_min AND :lon_max
+    ),
+    latest_per_float AS (
+        SELECT DISTINCT ON ("float_id")
+            "float_id", "timestamp",
+            ROUND("latitude"::numeric, 4) as "latitude",
+            ROUND("longitude"::numeric, 4) as "longitude"
+        FROM filtered_data
+        ORDER BY "float_id", "timestamp" DESC
+    ),
+    with_distance AS (
+        SELECT *,
+            ROUND((6371 * acos(LEAST(1.0, GREATEST(-1.0, cos(radians(CAST(:lat AS float))) * cos(radians("latitude"::float)) * cos(radians("longitude"::float) - radians(CAST(:lon AS float))) + sin(radians(CAST(:lat AS float))) * sin(radians("latitude"::float))))))::numeric, 2) AS distance_km
+        FROM latest_per_float
+    )
+    SELECT "float_id", "timestamp", "latitude", "longitude", distance_km
+    FROM with_distance
+    WHERE distance_km <= :max_distance
+    ORDER BY distance_km ASC
+    LIMIT :limit;
+    """, {"lat": lat, "lon": lon, "max_distance": distance_km, "limit": limit,
+          "lat_min": lat - delta, "lat_max": lat + delta, "lon_min": lon - delta, "lon_max": lon + delta})
+
+
+def build_table(engine, floats):
+    """Create a synthetic fleet of ``floats`` floats drifting around random home positions."""
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        conn.execute(text("DROP TABLE IF EXISTS argo_data"))
+        # Portable between DuckDB and PostgreSQL
+        conn.execute(text(f"""
+            CREATE TABLE argo_data AS
+            WITH fleet AS (
+                SELECT 2900000 + f AS float_id,
+                       degrees(asin(2 * random() - 1)) * 0.85 AS home_lat,
+                       360 * random() - 180 AS home_lon
+                FROM generate_series(0, {floats - 1}) AS t(f)
+            ),
+            drift AS (
+                SELECT float_id, c,
+                       TIMESTAMP '2018-01-01' + INTERVAL '10 days' * c + INTERVAL '1 minute' * (float_id % 1440) AS ts,
+                       greatest(-89.0, least(89.0, home_lat + sin(c / 40.0 + float_id) * 1.5)) AS lat,
+                       home_lon + cos(c / 35.0 + float_id) * 2.0 AS lon
+                FROM fleet, generate_series(0, {CYCLES - 1}) AS t(c)
+            )
+            SELECT float_id, ts AS "timestamp", lat AS latitude,
+                   CASE WHEN lon > 180 THEN lon - 360 WHEN lon < -180 THEN lon + 360 ELSE lon END AS longitude,
+                   28.0 - level * 2.2 AS temperature, 34.5 + level * 0.05 AS salinity,
+                   5.0 + level * 100 AS pressure
+            FROM drift, generate_series(0, {LEVELS - 1}) AS t(level)
+        """))
+        if engine.dialect.name == "postgresql":
+            for name, columns in TARGET_INDEXES.items():
+                if "geocell" not in columns:
+                    conn.execute(text(f"CREATE INDEX {name} ON argo_data({columns})"))
+            conn.execute(text("ANALYZE argo_data"))
+        rows = conn.execute(text("SELECT COUNT(*) FROM argo_data")).scalar()
+    print(f"Built argo_data: {rows:,} rows, {floats:,} floats in {time.perf_counter() - started:.1f}s")
+    return rows
+
+
+def timed(fn, repeat):
+    result, samples = None, []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return result, statistics.median(samples)
+
+
+def run(engine, repeat):
+    cols = {"float_id", "timestamp", "latitude", "longitude", "temperature", "salinity", "pressure"}
+    context = {"max_date_obj": datetime(2024, 12, 31)}
+    print(f"\n{'case':<48} {'previous':>10} {'knn':>10} {'speed-up':>9}  same floats")
+    for name, lat, lon, distance, k in CASES:
+        legacy_sql = legacy_proximity_sql(lat, lon, distance, k)
+
+        def legacy():
+            with engine.connect() as conn:
+                return pd.read_sql_query(text(legacy_sql), conn, params=legacy_sql.params)
+
+        intent = {"query_type": "Proximity", "latitude": lat, "longitude": lon,
+                  "distance_km": distance, "limit": k, "metrics": []}
+        before, legacy_ms = timed(legacy, repeat)
+        after, knn_ms = timed(lambda: knn_search.nearest(dict(intent), context, engine, existing_cols=cols), repeat)
+        same = list(before["float_id"]) == list(after["float_id"])
+        print(f"{name:<48} {legacy_ms:>8.1f}ms {knn_ms:>8.1f}ms {legacy_ms / knn_ms:>8.1f}x  "
+              f"{'yes' if same else f'no ({len(before)} vs {len(after)} floats)'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark KNN proximity search against the previous query")
+    parser.add_argument("--floats", type=int, default=4000, help="Synthetic floats (x2,500 rows each)")
+    parser.add_argument("--db", help="DuckDB file to use (default: temporary)")
+    parser.add_argument("--url", help="SQLAlchemy URL of a scratch PostgreSQL database instead of DuckDB")
+    parser.add_argument("--keep", action="store_true", help="Reuse an existing argo_data table")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per query (median reported)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(args.url or f"duckdb:///{args.db or os.path.join(tmp, 'bench.duckdb')}")
+        try:
+            with engine.connect() as conn:
+                exists = conn.execute(text(
+                    "SELECT COUNT(*) FROM information_schema.tables WHERE table_name = 'argo_data'")).scalar()
+            if not (args.keep and exists):
+                build_table(engine, args.floats)
+            run(engine, args.repeat)
+        finally:
+            engine.dispose()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
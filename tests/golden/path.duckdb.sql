@@ -0,0 +1 @@
+SELECT "float_id", "timestamp", "latitude", "longitude" FROM (SELECT "float_id", "timestamp", unnest(arg_min({'latitude': "latitude", 'longitude': "longitude"}, "pressure")) FROM argo_data WHERE "float_id" = :float_id GROUP BY "float_id", "timestamp") AS surface ORDER BY "timestamp" ASC;
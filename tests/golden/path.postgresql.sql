@@ -0,0 +1 @@
+SELECT "float_id", "timestamp", "latitude", "longitude" FROM (SELECT DISTINCT ON ("float_id", "timestamp") "float_id", "timestamp", "latitude", "longitude" FROM argo_data WHERE "float_id" = :float_id ORDER BY "float_id", "timestamp", "pressure" ASC) AS surface ORDER BY "timestamp" ASC;
@@ -0,0 +1,25 @@
+WITH latest_per_float AS (
+        SELECT DISTINCT ON ("float_id") "float_id", "timestamp", "latitude", "longitude", "temperature"
+        FROM argo_data
+        WHERE "latitude" IS NOT NULL
+          AND "longitude" IS NOT NULL
+          AND "latitude" BETWEEN :area_lat_min AND :area_lat_max AND "longitude" BETWEEN :area_lon_min_0 AND :area_lon_max_0
+          AND "timestamp" >= :start_date AND "timestamp" < :end_date
+        ORDER BY "float_id", "timestamp" DESC
+    ),
+    rounded AS (
+        SELECT "float_id", "timestamp",
+            ROUND("latitude", 4) as "latitude",
+            ROUND("longitude", 4) as "longitude", ROUND("temperature", 3) as "temperature"
+        FROM latest_per_float
+    ),
+    with_distance AS (
+        SELECT *,
+            ROUND(6371 * acos(LEAST(1.0, GREATEST(-1.0, cos(radians(CAST(:lat AS DOUBLE PRECISION))) * cos(radians("latitude")) * cos(radians("longitude") - radians(CAST(:lon AS DOUBLE PRECISION))) + sin(radians(CAST(:lat AS DOUBLE PRECISION))) * sin(radians("latitude"))))), 2) AS distance_km
+        FROM rounded
+    )
+    SELECT "float_id", "timestamp", "latitude", "longitude", "temperature", distance_km
+    FROM with_distance AS nearby
+    WHERE distance_km <= :max_distance
+    ORDER BY distance_km ASC
+    LIMIT :limit;
@@ -0,0 +1 @@
+SELECT "float_id", "timestamp", "latitude", "longitude", "temperature" FROM (SELECT DISTINCT ON ("float_id", "timestamp") "float_id", "timestamp", "latitude", "longitude", "temperature" FROM argo_data WHERE "float_id" = :float_id AND 1=1 ORDER BY "float_id", "timestamp", "pressure" ASC) AS surface ORDER BY "timestamp" ASC;
@@ -0,0 +1 @@
+SELECT "float_id", "timestamp", "latitude", "longitude", "temperature" FROM (SELECT "float_id", "timestamp", unnest(arg_min({'latitude': "latitude", 'longitude': "longitude", 'temperature': "temperature"}, "pressure")) FROM argo_data WHERE "float_id" = :float_id AND 1=1 GROUP BY "float_id", "timestamp") AS surface ORDER BY "timestamp" ASC;
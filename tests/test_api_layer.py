@@ -5,7 +5,7 @@ Simulates an AI agent interacting with the FloatChart API endpoints using
 Flask's built-in test_client (no running server required).
 
 Tests:
-    1. Manifest Ping     — GET  /api/v1/tools   → 200, 7 MCP-compliant tools
+    1. Manifest Ping     — GET  /api/v1/tools   → 200, 8 MCP-compliant tools
     2. Safe Query         — POST /api/v1/query   → 200, valid JSON response
     3. Malicious Injection— POST /api/v1/query   → blocked (non-crash)
     4. SQL Validator       — POST /api/v1/validate-sql → safety verdicts
@@ -43,7 +43,7 @@ class TestMCPAPILayer(unittest.TestCase):
     # TEST 1: Manifest Ping
     # ─────────────────────────────────────────────────────────────────────────
     def test_01_manifest_ping(self):
-        """GET /api/v1/tools → 200, contains 7 MCP-compliant tools."""
+        """GET /api/v1/tools → 200, contains 8 MCP-compliant tools."""
         resp = self.client.get("/api/v1/tools")
         self.assertEqual(resp.status_code, 200, f"Expected 200, got {resp.status_code}")
 
@@ -51,7 +51,7 @@ class TestMCPAPILayer(unittest.TestCase):
         self.assertIn("tools", data, "Response missing top-level 'tools' key")
 
         tools = data["tools"]
-        self.assertEqual(len(tools), 7, f"Expected 7 tools, got {len(tools)}")
+        self.assertEqual(len(tools), 8, f"Expected 8 tools, got {len(tools)}")
 
         # Verify each tool has the required MCP fields
         expected_names = {
@@ -61,6 +61,7 @@ class TestMCPAPILayer(unittest.TestCase):
             "get_temperature_trend",
             "get_depth_profile",
             "get_database_stats",
+            "get_schema",
             "parse_query_intent",
         }
         actual_names = {t["name"] for t in tools}
@@ -80,7 +81,7 @@ class TestMCPAPILayer(unittest.TestCase):
             self.assertIn("required", schema,
                           f"Tool '{tool['name']}' inputSchema missing 'required'")
 
-        print("  ✅ TEST 1 PASSED: Manifest ping — 7 MCP-compliant tools returned")
+        print("  ✅ TEST 1 PASSED: Manifest ping — 8 MCP-compliant tools returned")
 
     # ─────────────────────────────────────────────────────────────────────────
     # TEST 2: Safe Query Test
@@ -0,0 +1,119 @@
+"""
+FloatChart Bound Queries — Unit Tests
+=====================================
+Checks that sql_builder emits one parameterized template per query shape,
+that the sanitizer verdict is reused across bind values, and that the
+executor runs bound queries and counts their shapes.
+
+Run:
+    python -m pytest tests/test_bound_queries.py -v
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from datetime import datetime
+from unittest import mock
+
+import pandas as pd
+from sqlalchemy import create_engine
+
+# ── Ensure ARGO_CHATBOT is on the path ────────────────────────────────────────
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ARGO_CHATBOT"))
+
+import query_executor
+import sql_builder
+
+CONTEXT = {"max_date_obj": datetime(2024, 6, 30)}
+
+
+class TestBoundQueries(unittest.TestCase):
+    """Templates, bind values, sanitizer caching and shape accounting."""
+
+    def test_01_same_shape_same_template(self):
+        """Questions differing only in values share one SQL template."""
+        a = sql_builder.build_query({"query_type": "Proximity", "latitude": 13.08, "longitude": 80.27,
+                                     "distance_km": 300, "limit": 5, "time_constraint": "2023"}, CONTEXT)
+        b = sql_builder.build_query({"query_type": "Proximity", "latitude": -20.2, "longitude": 57.5,
+                                     "distance_km": 800, "limit": 12, "time_constraint": "2021"}, CONTEXT)
+        self.assertEqual(str(a), str(b))
+        self.assertEqual(a.shape, b.shape)
+        self.assertNotEqual(a.params, b.params)
+        self.assertNotIn("80.27", a)
+        self.assertIn("80.27", a.render())
+        self.assertIn("LIMIT 12", b.render())
+
+        t1 = sql_builder.build_query({"query_type": "Trajectory", "float_id": 2902296}, CONTEXT)
+        t2 = sql_builder.build_query({"query_type": "Trajectory", "float_id": 2902115}, CONTEXT)
+        self.assertEqual(t1.shape, t2.shape)
+        self.assertEqual(t2.params["float_id"], 2902115)
+
+    def test_02_sanitizer_runs_once_per_template(self):
+        """The sanitizer verdict is cached by template; bound limits are still capped."""
+        intent = {"query_type": "Time-Series", "location_clause": "1=1", "metrics": ["temperature"]}
+        sql_builder.build_query(dict(intent, time_constraint="2022"), CONTEXT)
+        misses = sql_builder._validate_template.cache_info().misses
+        for year in ("2018", "2019", "2020", "2021"):
+            sql_builder.build_query(dict(intent, time_constraint=year), CONTEXT)
+        self.assertEqual(sql_builder._validate_template.cache_info().misses, misses)
+        with self.assertRaises(ValueError):
+            sql_builder.build_query({"query_type": "Proximity", "latitude": 13.08, "longitude": 80.27,
+                                     "limit": 50_000}, CONTEXT)
+
+    def test_03_executor_counts_shapes(self):
+        """Bound queries execute with their values and are counted per shape."""
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = create_engine(f"duckdb:///{tmp}/argo.duckdb")
+            pd.DataFrame({
+                "float_id": [1, 1, 2, 2],
+                "timestamp": pd.to_datetime(["2023-01-05", "2023-02-05", "2022-03-01", "2023-03-01"]),
+                "latitude": [10.0, 10.5, 12.0, 12.5],
+                "longitude": [80.0, 80.5, 85.0, 85.5],
+                "temperature": [28.0, 28.5, 27.0, 27.5],
+            }).to_sql("argo_data", engine, index=False)
+
+            query_executor.reset_shape_stats()
+            for float_id, expected in ((1, 2), (2, 1)):
+                sql = sql_builder.build_query({"query_type": "Trajectory", "float_id": float_id,
+                                               "time_constraint": "2023"}, CONTEXT, engine)
+                df = query_executor.execute(sql, engine, "Trajectory")
+                self.assertEqual(len(df), expected)
+                self.assertTrue((df["float_id"] == float_id).all())
+            engine.dispose()
+
+        stats = query_executor.shape_stats()
+        self.assertEqual(stats["distinct_shapes"], 1)
+        self.assertEqual(stats["executions"], 2)
+        self.assertEqual(stats["shapes"][0]["query_type"], "Trajectory")
+
+    def test_04_only_prepare_failures_fall_back_to_the_bound_query(self):
+        """A lost prepared statement switches the connection to bound queries; any other error is raised."""
+        intent = {"query_type": "Trajectory", "float_id": 1, "time_constraint": "2023"}
+        with tempfile.TemporaryDirectory() as tmp, \
+                mock.patch.dict(os.environ, {"SESSION_PROFILES_ENABLED": "0"}), \
+                mock.patch.object(query_executor.session_profiles, "dialect_flavour", return_value="postgresql"):
+            engine = create_engine(f"duckdb:///{tmp}/argo.duckdb")
+            pd.DataFrame({"float_id": [1, 1], "timestamp": pd.to_datetime(["2023-01-05", "2023-02-05"]),
+                          "latitude": 10.0, "longitude": 80.0}).to_sql("argo_data", engine, index=False)
+            sql = sql_builder.build_query(intent, CONTEXT, engine)
+
+            with mock.patch.object(query_executor, "_execute_prepared",
+                                   side_effect=RuntimeError("division by zero")) as prepared:
+                for _ in range(2):
+                    with self.assertRaisesRegex(RuntimeError, "division by zero"):
+                        query_executor.execute(sql, engine, "Trajectory")
+                # Still prepared on the next call: the error said nothing about PREPARE
+                self.assertEqual(prepared.call_count, 2)
+
+            lost = RuntimeError('prepared statement "fc_0123" does not exist')
+            with mock.patch.object(query_executor, "_execute_prepared", side_effect=lost) as prepared, \
+                    self.assertLogs(level="WARNING"):
+                self.assertEqual(len(query_executor.execute(sql, engine, "Trajectory")), 2)
+                self.assertEqual(len(query_executor.execute(sql, engine, "Trajectory")), 2)
+            self.assertEqual(prepared.call_count, 1)
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+"""
+FloatChart Region Comparison — Unit Tests
+=========================================
+Checks the single-scan Comparison query: one grouped row per (region,
+period), exact per-region figures, overlapping regions and the merge of
+rows from two tiers.
+
+Run:
+    python -m pytest tests/test_comparison.py -v
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, event, text
+
+# ── Ensure ARGO_CHATBOT is on the path ────────────────────────────────────────
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ARGO_CHATBOT"))
+
+import brain
+import comparison
+import sql_builder
+
+CONTEXT = {"max_date_obj": datetime(2024, 6, 30)}
+CUTOFF = datetime(2024, 4, 1)
+# WEST and EAST overlap between longitude 60 and 70
+REGIONS = {
+    "west": '("latitude" BETWEEN 0 AND 20 AND "longitude" BETWEEN 50 AND 70)',
+    "east": '("latitude" BETWEEN 0 AND 20 AND "longitude" BETWEEN 60 AND 90)',
+}
+
+
+def _synthetic_rows():
+    rng = np.random.default_rng(3)
+    n = 4000
+    longitude = rng.uniform(40, 100, n)
+    return pd.DataFrame({
+        "float_id": 2900000 + rng.integers(0, 40, n),
+        "timestamp": [datetime(2024, 1, 1) + timedelta(hours=int(h)) for h in rng.integers(0, 24 * 180, n)],
+        "latitude": rng.uniform(-5, 25, n),
+        "longitude": longitude,
+        "temperature": 20 + longitude / 10 + rng.normal(0, 0.3, n),
+        "salinity": 35 + rng.normal(0, 0.1, n),
+    })
+
+
+def _in(df, lon_lo, lon_hi):
+    return df[df["latitude"].between(0, 20) & df["longitude"].between(lon_lo, lon_hi)]
+
+
+class TestComparison(unittest.TestCase):
+    """Comparison queries against pandas on the same rows."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.df = _synthetic_rows()
+        cls.engine = create_engine(f"duckdb:///{cls.tmp.name}/argo.duckdb")
+        cls.hot = create_engine(f"duckdb:///{cls.tmp.name}/hot.duckdb")
+        cls.cold = create_engine(f"duckdb:///{cls.tmp.name}/cold.duckdb")
+        cls.df.to_sql("argo_data", cls.engine, index=False)
+        cls.df[cls.df["timestamp"] >= CUTOFF].to_sql("argo_data", cls.hot, index=False)
+        cls.df[cls.df["timestamp"] < CUTOFF].to_sql("argo_data", cls.cold, index=False)
+
+    @classmethod
+    def tearDownClass(cls):
+        for engine in (cls.engine, cls.hot, cls.cold):
+            engine.dispose()
+        cls.tmp.cleanup()
+
+    def _intent(self, **extra):
+        return {"query_type": "Comparison", "metrics": ["temperature"],
+                "time_constraint": "January 2024 to June 2024", "region_clauses": dict(REGIONS), **extra}
+
+    def _run(self, engine, intent=None):
+        sql = sql_builder.build_query(intent or self._intent(), CONTEXT, engine)
+        with engine.connect() as conn:
+            return pd.read_sql_query(text(sql), conn, params=sql.params)
+
+    def test_01_one_scan_for_all_regions(self):
+        """Both regions come back from one statement, in the order asked, grouped by period."""
+        statements = []
+        listener = lambda conn, cursor, sql, *args: statements.append(sql)
+        event.listen(self.engine, "before_cursor_execute", listener)
+        try:
+            df = self._run(self.engine)
+        finally:
+            event.remove(self.engine, "before_cursor_execute", listener)
+        self.assertEqual(sum("argo_data" in s and "GROUP BY" in s for s in statements), 1)
+        self.assertEqual(list(dict.fromkeys(df["region"])), ["west", "east"])
+        for _, periods in df.groupby("region_order")["period"]:
+            self.assertTrue(periods.is_monotonic_increasing)
+        self.assertEqual(comparison.metric_columns(df), ["temperature"])
+        self.assertNotIn("temperature_sum", comparison.chart_columns(df))
+
+    def test_02_region_figures_are_exact(self):
+        """Rolled-up means, extremes and counts equal pandas; overlapping rows count in both."""
+        summary = comparison.region_summary(self._run(self.engine))
+        for entry, (lo, hi) in zip(summary, ((50, 70), (60, 90))):
+            rows = _in(self.df, lo, hi)["temperature"]
+            self.assertEqual(entry["measurements"], len(rows))
+            self.assertEqual(entry["temperature"]["count"], len(rows))
+            self.assertAlmostEqual(entry["temperature"]["mean"], rows.mean(), places=4)
+            self.assertAlmostEqual(entry["temperature"]["min"], rows.min(), places=4)
+            self.assertAlmostEqual(entry["temperature"]["max"], rows.max(), places=4)
+        overlap = len(_in(self.df, 60, 70))
+        self.assertGreater(overlap, 0)
+        self.assertEqual(sum(e["measurements"] for e in summary), len(_in(self.df, 50, 90)) + overlap)
+        contrast = comparison.contrast(summary, "temperature")
+        self.assertEqual((contrast["highest"], contrast["lowest"]), ("east", "west"))
+        self.assertGreater(contrast["difference"], 0)
+
+    def test_03_tiers_merge_exactly(self):
+        """Rows from two tiers merge into the single-table result, including the split period."""
+        merged = comparison.merge_periods(self._run(self.hot), self._run(self.cold))
+        expected = self._run(self.engine)
+        self.assertEqual(list(merged.columns), list(expected.columns))
+        self.assertEqual(len(merged), len(expected))
+        for col in ("measurements", "temperature", "temperature_min", "temperature_max", "temperature_count"):
+            np.testing.assert_allclose(merged[col].astype(float), expected[col].astype(float), rtol=1e-9, err_msg=col)
+
+    def test_04_validation_and_parsing(self):
+        """A single region is rejected; the fallback parser reads 'A vs B' questions."""
+        with self.assertRaises(ValueError):
+            sql_builder.build_query(self._intent(region_clauses={"west": REGIONS["west"]}), CONTEXT)
+        intent = brain._fallback_intent_parser("compare temperature in the bay of bengal and arabian sea")
+        self.assertEqual(intent["query_type"], "Comparison")
+        self.assertEqual(intent["regions"], ["bay of bengal", "arabian sea"])
+        self.assertEqual(brain._fallback_intent_parser("temperature vs salinity in bay of bengal")["query_type"],
+                         "Scatter")
+
+
+if __name__ == "__main__":
+    unittest.main()
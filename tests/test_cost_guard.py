@@ -0,0 +1,161 @@
+"""
+FloatChart Cost Guard — Unit Tests
+==================================
+Checks the EXPLAIN-based budget check between sql_builder and execution:
+estimates, the rollup / sample / narrow-time rewrites and refusals, and
+that only single statements are planned, read-only.
+
+Run:
+    python -m pytest tests/test_cost_guard.py -v
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from datetime import datetime
+from unittest import mock
+
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+# ── Ensure ARGO_CHATBOT is on the path ────────────────────────────────────────
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ARGO_CHATBOT"))
+
+import cost_guard
+import query_executor
+import sql_builder
+import tiered_storage
+
+CONTEXT = {"max_date_obj": datetime(2024, 2, 8)}
+ROWS = 200_000
+# Tight enough that an unfiltered scan of ROWS is over budget
+BUDGETS = {
+    "Statistic": {"rows": 60_000, "cost": 1_000},
+    "default":   {"rows": 30_000, "cost": 1_000},
+}
+
+
+class TestCostGuard(unittest.TestCase):
+    """Planner estimates against per-query-type budgets."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.engine = create_engine(f"duckdb:///{cls.tmp.name}/argo.duckdb")
+        with cls.engine.begin() as conn:
+            conn.execute(text(f"""
+                CREATE TABLE argo_data AS SELECT
+                    2900000 + i % 500 AS float_id,
+                    TIMESTAMP '2020-01-01' + TO_DAYS(CAST(i % 1500 AS INTEGER)) AS "timestamp",
+                    i % 60 - 30.0 AS latitude, i % 360 - 180.0 AS longitude,
+                    CAST(20 + i % 7 AS DOUBLE) AS temperature, 35.0 AS salinity
+                FROM range({ROWS}) AS t(i)
+            """))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.engine.dispose()
+        cls.tmp.cleanup()
+
+    def setUp(self):
+        patcher = mock.patch.dict(cost_guard.BUDGETS, BUDGETS, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _guard(self, **intent):
+        sql = sql_builder.build_query(intent, CONTEXT, self.engine)
+        return cost_guard.guard(sql, intent, CONTEXT, self.engine)
+
+    def test_01_estimate_and_pass_through(self):
+        """Estimates follow the filters; a query within budget runs unchanged."""
+        full = cost_guard.estimate(sql_builder.build_query({"query_type": "General"}, CONTEXT), self.engine)
+        self.assertEqual((full["rows"], full["cost"], full["dialect"]), (ROWS, None, "duckdb"))
+        intent = {"query_type": "Trajectory", "float_id": 2900007, "metrics": ["temperature"]}
+        sql = sql_builder.build_query(intent, CONTEXT, self.engine)
+        guarded, report = cost_guard.guard(sql, intent, CONTEXT, self.engine)
+        self.assertIs(guarded, sql)
+        self.assertEqual(report["action"], "ok")
+        self.assertLess(report["estimate"]["rows"], ROWS)
+        self.assertIsNone(cost_guard.estimate("SELECT * FROM missing_table", self.engine))
+
+    def test_02_rows_are_sampled(self):
+        """An unbounded General query reads a repeatable table sample instead, unless it reaches the cold tier."""
+        sql, report = self._guard(query_type="General")
+        self.assertEqual(report["action"], "sample")
+        self.assertIn("TABLESAMPLE 10% (system, 42)", sql)
+        self.assertLessEqual(report["estimate"]["rows"], BUDGETS["default"]["rows"])
+        first = query_executor.execute(sql, self.engine)
+        self.assertEqual(len(first), 500)
+        pd.testing.assert_frame_equal(first, query_executor.execute(sql, self.engine))
+
+        # The Parquet cold tier's DuckDB view takes no TABLESAMPLE: no sample when it is reached
+        with mock.patch.object(tiered_storage, "reaches_cold_tier", return_value=True), \
+                self.assertRaises(cost_guard.CostGuardError):
+            self._guard(query_type="General")
+
+    def test_03_rollup_and_narrowed_time(self):
+        """A global average reads dataset_stats; without it the time range is narrowed."""
+        intent = {"query_type": "Statistic", "metrics": ["temperature"], "aggregation": "avg"}
+        sql, report = self._guard(**intent)
+        self.assertEqual(report["action"], "narrow_time")
+        self.assertIn('"timestamp" >= :start_date', sql)
+        self.assertIn(report["estimate"]["rows"], range(1, BUDGETS["Statistic"]["rows"] + 1))
+
+        with self.engine.begin() as conn:
+            conn.execute(text("CREATE TABLE dataset_stats (scope VARCHAR PRIMARY KEY, float_count BIGINT, "
+                              "temperature_sum DOUBLE, temperature_count BIGINT)"))
+            conn.execute(text("INSERT INTO dataset_stats VALUES ('global', 500, 4600000.0, 200000)"))
+        try:
+            intent = dict(intent)
+            with mock.patch.object(sql_builder, "_apply_safety_check",
+                                   wraps=sql_builder._apply_safety_check) as safety:
+                sql, report = self._guard(**intent)
+            self.assertEqual(report["action"], "rollup")
+            self.assertIn(sql, [c.args[0] for c in safety.call_args_list])
+            self.assertNotIn("time_constraint", intent)
+            df = query_executor.execute(sql, self.engine, "Statistic")
+            self.assertEqual(df["temperature"].iloc[0], 23.0)
+            count, report = self._guard(query_type="Statistic", aggregation="count")
+            self.assertEqual(report["action"], "rollup")
+            self.assertEqual(query_executor.execute(count, self.engine)["count"].iloc[0], 500)
+            # One float's figures are not the dataset's
+            self.assertIsNone(cost_guard._rollup_query(dict(intent, float_id=2900007)))
+        finally:
+            with self.engine.begin() as conn:
+                conn.execute(text("DROP TABLE dataset_stats"))
+
+    def test_04_refusal_and_switch(self):
+        """A bounded query still over budget is refused with guidance; the guard can be disabled."""
+        intent = {"query_type": "Time-Series", "metrics": ["temperature"], "time_constraint": "2020-2024"}
+        cost_guard.BUDGETS["Time-Series"] = {"rows": 10_000, "cost": 1_000}
+        with self.assertRaises(cost_guard.CostGuardError) as raised:
+            self._guard(**intent)
+        self.assertIsInstance(raised.exception, ValueError)
+        self.assertIn("time range", str(raised.exception))
+        self.assertIn("10,000", str(raised.exception))
+        with mock.patch.dict(os.environ, {"COST_GUARD_ENABLED": "0"}):
+            self.assertEqual(self._guard(**intent)[1]["action"], "unchecked")
+        with mock.patch.dict(os.environ, {"COST_GUARD_SCALE": "10"}):
+            self.assertEqual(self._guard(**intent)[1]["action"], "ok")
+
+    def test_05_only_single_statements_are_planned_read_only(self):
+        """Stacked SQL is never sent; PostgreSQL plans in a read-only transaction with a timeout."""
+        stacked = "SELECT 1 FROM argo_data; CREATE TABLE smuggled AS SELECT 1"
+        self.assertIsNone(cost_guard.estimate(stacked, self.engine))
+        with self.engine.connect() as conn:
+            self.assertNotIn("smuggled", [row[0] for row in conn.execute(text("SHOW TABLES"))])
+
+        engine = mock.MagicMock()
+        conn = engine.connect.return_value.__enter__.return_value
+        plan = {"rows": 10, "cost": 5.0, "output_rows": 10}
+        with mock.patch.object(cost_guard, "dialect_flavour", return_value="postgresql"), \
+                mock.patch.dict(cost_guard._ESTIMATORS, {"postgresql": mock.Mock(return_value=plan)}):
+            self.assertEqual(cost_guard.estimate("SELECT * FROM argo_data LIMIT 10;", engine),
+                             {**plan, "dialect": "postgresql"})
+        self.assertEqual([str(c.args[0]) for c in conn.execute.call_args_list],
+                         ["SET TRANSACTION READ ONLY", f"SET LOCAL statement_timeout = {cost_guard.ESTIMATE_TIMEOUT_MS}"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+"""
+FloatChart Dataset Stats — Unit Tests
+=====================================
+Checks the per-scope deltas folded in by ingest writers and the O(1) reader.
+
+Run:
+    python -m pytest tests/test_dataset_stats.py -v
+"""
+
+import os
+import sys
+import unittest
+from datetime import datetime
+
+# ── Ensure ARGO_CHATBOT is on the path ────────────────────────────────────────
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ARGO_CHATBOT"))
+
+import dataset_stats
+from dataset_stats import GLOBAL_SCOPE, compute_delta, read_stats
+
+ROWS = [
+    # float_id, timestamp, latitude, longitude, temperature, salinity
+    (2902296, datetime(2023, 3, 1), 15.0, 88.0, 28.0, 34.0),         # bay of bengal
+    (2902296, datetime(2023, 3, 11), 15.2, 88.1, 27.0, float("nan")),
+    (2902297, datetime(2022, 1, 5), 15.0, 65.0, None, 36.0),          # arabian sea
+    (5904001, datetime(2024, 6, 1), 40.0, -30.0, 18.0, 35.5),         # north atlantic
+]
+
+
+class TestDatasetStats(unittest.TestCase):
+    """Delta aggregation and reading of the dataset_stats table."""
+
+    def test_01_global_delta(self):
+        """Global counters cover every row; NaN and NULL are not averaged."""
+        d = compute_delta(ROWS)[GLOBAL_SCOPE]
+        self.assertEqual(d["total_rows"], 4)
+        self.assertEqual(d["min_timestamp"], datetime(2022, 1, 5))
+        self.assertEqual(d["max_timestamp"], datetime(2024, 6, 1))
+        self.assertEqual((d["temperature_sum"], d["temperature_count"]), (73.0, 3))
+        self.assertEqual((d["salinity_sum"], d["salinity_count"]), (105.5, 3))
+
+    def test_02_region_deltas(self):
+        """Rows count towards every region box that contains them."""
+        deltas = compute_delta(ROWS)
+        self.assertEqual(deltas["region:bay_of_bengal"]["total_rows"], 2)
+        self.assertEqual(deltas["region:arabian_sea"]["total_rows"], 1)
+        self.assertEqual(deltas["region:india_waters"]["total_rows"], 3)
+        self.assertEqual(deltas["region:north_atlantic"]["total_rows"], 1)
+        self.assertNotIn("region:arctic", deltas)
+
+    def test_03_read_stats(self):
+        """read_stats turns the stored counters into the endpoint payload."""
+        from sqlalchemy import create_engine, text
+
+        engine = create_engine("duckdb:///:memory:")
+        with engine.begin() as conn:
+            for stmt in dataset_stats.SCHEMA_STATEMENTS:
+                conn.execute(text(stmt))
+            for scope, d in compute_delta(ROWS).items():
+                conn.execute(text(
+                    "INSERT INTO dataset_stats VALUES (:scope, :rows, :floats, :min_ts, :max_ts, "
+                    ":t_sum, :t_cnt, :s_sum, :s_cnt, NOW())"
+                ), {"scope": scope, "rows": d["total_rows"], "floats": 3 if scope == GLOBAL_SCOPE else 0,
+                    "min_ts": d["min_timestamp"], "max_ts": d["max_timestamp"],
+                    "t_sum": d["temperature_sum"], "t_cnt": d["temperature_count"],
+                    "s_sum": d["salinity_sum"], "s_cnt": d["salinity_count"]})
+
+        stats = read_stats(engine)
+        self.assertEqual(stats["total_records"], 4)
+        self.assertEqual(stats["unique_floats"], 3)
+        self.assertEqual(stats["min_date"], "2022-01-05T00:00:00")
+        self.assertAlmostEqual(stats["avg_temperature"], 24.33)
+        self.assertAlmostEqual(stats["avg_salinity"], 35.17)
+        self.assertEqual(stats["regions"]["bay_of_bengal"], 2)
+
+    def test_04_missing_table(self):
+        """Without the table, readers get None and fall back."""
+        from sqlalchemy import create_engine
+        self.assertIsNone(read_stats(create_engine("duckdb:///:memory:")))
+
+
+if __name__ == "__main__":
+    unittest.main()
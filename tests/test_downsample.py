@@ -0,0 +1,183 @@
+"""
+FloatChart Chart Payloads — Unit Tests
+======================================
+Checks adaptive time-series bucketing in sql_builder, LTTB downsampling of
+trajectory and profile payloads, surface-only tracks and Douglas-Peucker
+simplification.
+
+Run:
+    python -m pytest tests/test_downsample.py -v
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine
+
+# ── Ensure ARGO_CHATBOT is on the path ────────────────────────────────────────
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ARGO_CHATBOT"))
+
+import downsample
+import query_executor
+import sql_builder
+
+CONTEXT = {"max_date_obj": datetime(2024, 6, 30, 12), "min_date_obj": datetime(2015, 1, 1)}
+
+
+class TestChartPayloads(unittest.TestCase):
+    """Bucket width selection and LTTB point reduction."""
+
+    def test_01_bucket_follows_range(self):
+        """Hourly for a week, daily for a month, weekly for years, monthly for decades."""
+        cases = {
+            "last 7 days": "hour",
+            "March 2024": "day",
+            "2019-2022": "week",
+            "since 2015": "month",
+        }
+        for constraint, unit in cases.items():
+            sql = sql_builder.build_query({"query_type": "Time-Series", "metrics": ["temperature"],
+                                           "time_constraint": constraint}, CONTEXT)
+            self.assertIn(f"DATE_TRUNC('{unit}'", sql, constraint)
+            self.assertLessEqual(sql.params["limit"], sql_builder.TIMESERIES_TARGET_POINTS, constraint)
+        self.assertEqual(sql_builder.choose_time_bucket(datetime(2024, 3, 1), datetime(2024, 4, 1)), ("day", 32))
+        # Without a constraint the database's own span is bucketed
+        sql = sql_builder.build_query({"query_type": "Time-Series", "metrics": ["temperature"]}, CONTEXT)
+        self.assertIn("DATE_TRUNC('month'", sql)
+
+    def test_02_multi_year_series_is_complete(self):
+        """A four-year question returns every year, not the first 365 days."""
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = create_engine(f"duckdb:///{tmp}/argo.duckdb")
+            days = pd.date_range("2019-01-01", "2022-12-31 12:00", freq="12h")
+            pd.DataFrame({
+                "float_id": 1, "timestamp": days, "latitude": 10.0, "longitude": 80.0,
+                "temperature": 28 + np.sin(np.arange(len(days)) / 60),
+            }).to_sql("argo_data", engine, index=False)
+            sql = sql_builder.build_query({"query_type": "Time-Series", "metrics": ["temperature"],
+                                           "time_constraint": "2019-2022"}, CONTEXT, engine)
+            df = query_executor.execute(sql, engine, "Time-Series")
+            engine.dispose()
+        buckets = pd.to_datetime(df["day"])
+        self.assertLessEqual(buckets.min(), pd.Timestamp("2019-01-01"))
+        self.assertEqual(buckets.max().year, 2022)
+        self.assertEqual(len(df), buckets.nunique())
+        self.assertLessEqual(len(df), sql_builder.TIMESERIES_TARGET_POINTS)
+
+    def test_03_lttb_keeps_shape(self):
+        """LTTB keeps the endpoints and the extremes, and returns exactly threshold points."""
+        x = np.arange(5000)
+        y = np.sin(x / 300.0)
+        y[1234] = 9.0
+        y[3210] = -9.0
+        keep = downsample.lttb_indices(x, y, 200)
+        self.assertEqual(len(keep), 200)
+        self.assertEqual((keep[0], keep[-1]), (0, 4999))
+        self.assertTrue(np.all(np.diff(keep) > 0))
+        self.assertIn(1234, keep)
+        self.assertIn(3210, keep)
+        np.testing.assert_array_equal(downsample.lttb_indices(x[:50], y[:50], 200), np.arange(50))
+
+    def test_04_chart_positions(self):
+        """Trajectories are thinned along time, profiles along pressure; short results pass through."""
+        start = datetime(2020, 1, 1)
+        trajectory = pd.DataFrame({
+            "float_id": 1,
+            "timestamp": [start + timedelta(days=i) for i in range(3000)],
+            "latitude": np.linspace(5, 15, 3000),
+            "longitude": np.linspace(70, 80, 3000),
+            "temperature": np.r_[np.full(1500, 28.0), np.full(1500, 26.0)],
+        })
+        rows = downsample.chart_positions(trajectory, "Trajectory", max_points=300)
+        self.assertEqual(len(rows), 300)
+        self.assertEqual((rows[0], rows[-1]), (0, 2999))
+        self.assertIsNone(downsample.chart_positions(trajectory, "Trajectory", max_points=5000))
+        self.assertIsNone(downsample.chart_positions(trajectory, "Proximity", max_points=300))
+
+        profile = pd.DataFrame({"pressure": np.linspace(2000, 5, 1000),
+                                "temperature": np.linspace(2, 29, 1000)})
+        rows = downsample.chart_positions(profile, "Profile", max_points=100)
+        kept = profile.iloc[rows]["pressure"].to_numpy()
+        self.assertEqual((kept[0], kept[-1]), (5.0, 2000.0))
+        self.assertTrue(np.all(np.diff(kept) > 0))
+
+    def test_05_surface_only_track(self):
+        """One row per profile (its shallowest level) unless depth levels are asked for."""
+        rows = []
+        for c in range(30):
+            for level in range(50):
+                rows.append((2902115, datetime(2023, 1, 1) + timedelta(days=10 * c), 10 + c * 0.1, 80.0,
+                             1000.0 - level * 20, 5.0 + level * 0.4))
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = create_engine(f"duckdb:///{tmp}/argo.duckdb")
+            pd.DataFrame(rows, columns=["float_id", "timestamp", "latitude", "longitude", "pressure",
+                                        "temperature"]).to_sql("argo_data", engine, index=False)
+            intent = {"query_type": "Trajectory", "float_id": 2902115, "metrics": ["temperature"]}
+            surface = query_executor.execute(sql_builder.build_query(intent, CONTEXT, engine), engine, "Trajectory")
+            levels = query_executor.execute(sql_builder.build_query(dict(intent, surface_only=False), CONTEXT, engine),
+                                            engine, "Trajectory")
+            path = query_executor.execute(sql_builder.build_query({"query_type": "Path", "float_id": 2902115,
+                                                                   "metrics": ["pressure"]}, CONTEXT, engine),
+                                          engine, "Path")
+            engine.dispose()
+        self.assertEqual((len(surface), len(levels), len(path)), (30, 1500, 1500))
+        self.assertTrue(pd.to_datetime(surface["timestamp"]).is_monotonic_increasing)
+        self.assertTrue((surface["temperature"] == 24.6).all())  # the 20 dbar level
+
+    def test_06_douglas_peucker(self):
+        """Straight runs collapse to their ends; corners and a 180° crossing survive."""
+        lat = np.r_[np.linspace(0, 10, 500), np.full(500, 10.0)]
+        lon = np.r_[np.full(500, 170.0), np.linspace(170, 190, 500)]
+        lon = (lon + 180) % 360 - 180
+        keep = downsample.douglas_peucker_indices(lat, lon, 1.0)
+        self.assertEqual(list(keep), [0, 499, 999])
+        noisy = lat + np.random.default_rng(1).normal(0, 0.05, len(lat))
+        for tolerance in (1.0, 5.0, 20.0):
+            keep = downsample.douglas_peucker_indices(noisy, lon, tolerance)
+            self.assertEqual((keep[0], keep[-1]), (0, 999))
+            # Every dropped point is within tolerance of the simplified path
+            x = np.degrees(np.unwrap(np.radians(lon)))
+            for a, b in zip(keep[:-1], keep[1:]):
+                inner = np.arange(a + 1, b)
+                if len(inner):
+                    self.assertLessEqual(_segment_km(noisy, x, a, b, inner).max(), tolerance * 1.01)
+        self.assertAlmostEqual(downsample.zoom_tolerance_km(0), 156.5, delta=0.1)
+        self.assertAlmostEqual(downsample.zoom_tolerance_km(10, 60.0), 0.0764, delta=0.001)
+
+    def test_07_zoom_simplifies_trajectory(self):
+        """Zoomed-out tracks send far fewer points; leg distances are computed element-wise."""
+        days = 2000
+        track = pd.DataFrame({
+            "float_id": 1,
+            "timestamp": [datetime(2015, 1, 1) + timedelta(days=i) for i in range(days)],
+            "latitude": 10 + np.sin(np.arange(days) / 200.0) * 5,
+            "longitude": np.linspace(60, 90, days),
+        })
+        coarse = downsample.chart_positions(track, "Trajectory", max_points=5000, zoom=3)
+        fine = downsample.chart_positions(track, "Trajectory", max_points=5000, zoom=9)
+        self.assertLess(len(coarse), len(fine))
+        self.assertLess(len(coarse), days / 20)
+        self.assertEqual((coarse[0], coarse[-1]), (0, days - 1))
+        legs = downsample.haversine_km(track["latitude"][:-1].to_numpy(), track["longitude"][:-1].to_numpy(),
+                                       track["latitude"][1:].to_numpy(), track["longitude"][1:].to_numpy())
+        self.assertAlmostEqual(downsample.haversine_km(0.0, 0.0, 0.0, 1.0), 111.19, delta=0.01)
+        self.assertEqual(legs.shape, (days - 1,))
+
+
+def _segment_km(lat, lon, a, b, inner):
+    """Distance in km of points ``inner`` from segment a-b, in the simplifier's projection."""
+    k = np.radians(1.0) * 6371.0
+    x, y = lon * k * np.cos(np.radians(lat.mean())), lat * k
+    dx, dy = x[b] - x[a], y[b] - y[a]
+    px, py = x[inner] - x[a], y[inner] - y[a]
+    t = np.clip((px * dx + py * dy) / (dx * dx + dy * dy), 0, 1)
+    return np.hypot(px - t * dx, py - t * dy)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+"""
+FloatChart DuckDB Profile — Unit Tests
+======================================
+Checks the one-shot converter that rewrites a DuckDB file in the compact
+storage profile.
+
+Run:
+    python -m pytest tests/test_duckdb_profile.py -v
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+
+import duckdb
+
+# ── Ensure DATA_GENERATOR is on the path ──────────────────────────────────────
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "DATA_GENERATOR"))
+
+from duckdb_profile import convert
+
+
+class TestDuckDBProfile(unittest.TestCase):
+    """Converter output: schema, ordering, de-duplication and atomic swap."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "prototype.duckdb")
+        con = duckdb.connect(self.path)
+        con.execute("""CREATE TABLE argo_data (
+            id BIGINT, float_id BIGINT, timestamp TIMESTAMP,
+            latitude DOUBLE, longitude DOUBLE,
+            temperature DOUBLE, salinity DOUBLE, pressure DOUBLE)""")
+        con.execute("""INSERT INTO argo_data VALUES
+            (1, 2902297, '2023-02-01', 15.0, 65.0, 27.125, 36.001, 10.0),
+            (2, 2902296, '2023-03-01', 15.0, 88.0, 28.5,   34.25,  5.0),
+            (3, 2902296, '2023-01-01', 14.0, 87.0, 28.0,   34.0,   5.0),
+            (4, 2902296, '2023-01-01', 14.0, 87.0, 20.0,   34.5,   100.0),
+            (5, 2902296, '2023-01-01', 14.0, 87.0, 28.0,   34.0,   5.0)""")
+        con.execute("CREATE TABLE dataset_stats AS SELECT 'global' AS scope, 5 AS total_rows")
+        con.close()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_01_convert(self):
+        """Rows are typed compactly, de-duplicated and sorted by the key."""
+        result = convert(self.path)
+        self.assertEqual(result["rows"], 4)
+        self.assertTrue(os.path.exists(self.path + ".bak"))
+
+        con = duckdb.connect(self.path, read_only=True)
+        types = dict(con.execute(
+            "SELECT column_name, data_type FROM duckdb_columns() WHERE table_name = 'argo_data'"
+        ).fetchall())
+        self.assertNotIn("id", types)
+        self.assertEqual(types["float_id"], "INTEGER")
+        self.assertEqual(types["temperature"], "FLOAT")
+        self.assertEqual(types["latitude"], "DOUBLE")
+        self.assertNotIn("geocell", types)  # not invented when the source lacks it
+
+        rows = con.execute("SELECT float_id, timestamp, pressure FROM argo_data").fetchall()
+        self.assertEqual(rows, sorted(rows))
+        self.assertAlmostEqual(con.execute("SELECT salinity FROM argo_data WHERE float_id = 2902297").fetchone()[0], 36.001, places=5)
+        self.assertEqual(con.execute("SELECT total_rows FROM dataset_stats").fetchone()[0], 5)
+        con.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,136 @@
+"""
+FloatChart Fleet Snapshot — Unit Tests
+======================================
+Builds the memory-mapped fleet snapshot from a synthetic DuckDB table and
+checks it against the SQL proximity query it replaces, and that brain
+answers a plain "nearest floats" question from it.
+
+Run:
+    python -m pytest tests/test_fleet_snapshot.py -v
+"""
+
+import json
+import os
+import sys
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from langchain_core.language_models.fake import FakeListLLM
+from sqlalchemy import create_engine, text
+
+# ── Ensure ARGO_CHATBOT is on the path ────────────────────────────────────────
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ARGO_CHATBOT"))
+
+import brain
+import fleet_snapshot
+import knn_search
+import schema_catalog
+import sql_builder
+
+
+def _synthetic_rows(start=datetime.now() - timedelta(days=200)):
+    rows = []
+    for f in range(12):
+        for cycle in range(15):
+            ts = start + timedelta(days=10 * cycle, hours=f)
+            lat, lon = -5 + f * 2.5 + cycle * 0.1, 70 + f * 2 - cycle * 0.05
+            for level in range(3):
+                rows.append((2902290 + f, ts, lat, lon, 29.0 - level * 4 - f * 0.1, 34.5 + level * 0.1, 5.0 + level * 100))
+    return pd.DataFrame(rows, columns=["float_id", "timestamp", "latitude", "longitude",
+                                       "temperature", "salinity", "pressure"])
+
+
+class TestFleetSnapshot(unittest.TestCase):
+    """Snapshot build, atomic swap and proximity lookups."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = os.path.join(self.tmp.name, "fleet")
+        self.engine = create_engine(f"duckdb:///{self.tmp.name}/argo.duckdb")
+        _synthetic_rows().to_sql("argo_data", self.engine, index=False)
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.tmp.cleanup()
+
+    def test_01_rebuild_and_load(self):
+        """One memory-mapped row per float, holding its newest surface reading."""
+        self.assertIsNone(fleet_snapshot.load(self.dir))
+        self.assertEqual(fleet_snapshot.rebuild(self.engine, self.dir), 12)
+        snapshot = fleet_snapshot.load(self.dir)
+        self.assertIsInstance(snapshot.latitude, np.memmap)
+        self.assertEqual(len(snapshot.float_id), 12)
+        i = int(np.flatnonzero(snapshot.float_id == 2902293)[0])
+        self.assertAlmostEqual(float(snapshot.latitude[i]), -5 + 3 * 2.5 + 14 * 0.1)
+        self.assertEqual(float(snapshot.pressure[i]), 5.0)
+        self.assertAlmostEqual(float(snapshot.temperature[i]), 28.7, places=5)
+
+    def test_02_nearest_matches_sql(self):
+        """nearest() returns the same floats and distances as the Proximity SQL."""
+        fleet_snapshot.rebuild(self.engine, self.dir)
+        intent = {"query_type": "Proximity", "latitude": 10.0, "longitude": 82.0,
+                  "distance_km": 1200, "limit": 6, "metrics": []}
+        sql = sql_builder.build_query(intent, {"max_date_obj": datetime.now()}, self.engine)
+        with self.engine.connect() as conn:
+            expected = pd.read_sql_query(text(sql), conn, params=sql.params)
+        got = fleet_snapshot.nearest(10.0, 82.0, 1200, 6, [], snapshot=fleet_snapshot.load(self.dir))
+
+        self.assertEqual(list(got.columns), list(expected.columns))
+        self.assertEqual(list(got["float_id"]), list(expected["float_id"]))
+        np.testing.assert_allclose(got["distance_km"], expected["distance_km"].astype(float), atol=0.05)
+        self.assertIsNone(fleet_snapshot.nearest(10.0, 82.0, metrics=["dissolved_oxygen"],
+                                                 snapshot=fleet_snapshot.load(self.dir)))
+
+    def test_03_rebuild_swaps_atomically(self):
+        """A rebuild publishes a new version; mapped arrays of the old one stay readable."""
+        fleet_snapshot.rebuild(self.engine, self.dir)
+        old = fleet_snapshot.load(self.dir)
+        with self.engine.begin() as conn:
+            conn.execute(text("DELETE FROM argo_data WHERE float_id >= 2902296"))
+        for _ in range(3):
+            fleet_snapshot.rebuild(self.engine, self.dir)
+        new = fleet_snapshot.load(self.dir)
+        self.assertNotEqual(old.version, new.version)
+        self.assertEqual(len(new.float_id), 6)
+        self.assertEqual(len(old.float_id), 12)
+        self.assertEqual(float(old.latitude.sum()), float(np.asarray(old.latitude).sum()))
+        versions = [p for p in os.listdir(self.dir) if p.startswith("v-")]
+        self.assertEqual(len(versions), 2)  # the live version and its predecessor
+
+    def test_04_map_points(self):
+        """map_points() keeps floats reporting within the requested years."""
+        fleet_snapshot.rebuild(self.engine, self.dir)
+        snapshot = fleet_snapshot.load(self.dir)
+        points = fleet_snapshot.map_points(limit=5, years=1, snapshot=snapshot)
+        self.assertEqual(len(points), 5)
+        self.assertEqual(set(points[0]), {"float_id", "lat", "lng", "timestamp", "temperature"})
+        self.assertEqual(fleet_snapshot.map_points(years=0, snapshot=snapshot), [])
+
+    def test_05_brain_answers_default_proximity_from_the_snapshot(self):
+        """Metrics nobody asked for are narrowed to the snapshot's; the SQL search is not run."""
+        with self.engine.begin() as conn:
+            conn.execute(text("ALTER TABLE argo_data ADD COLUMN dissolved_oxygen DOUBLE DEFAULT 210.0"))
+        fleet_snapshot.rebuild(self.engine, self.dir)
+        intent = {"query_type": "Proximity", "latitude": 10.0, "longitude": 82.0, "distance_km": 800,
+                  "limit": 3, "metrics": []}
+        schema_catalog.invalidate()
+        with mock.patch.object(brain, "_ENGINE", self.engine), mock.patch.object(brain, "_db_context_cache", None), \
+                mock.patch.object(brain, "get_llm", return_value=FakeListLLM(responses=[json.dumps(intent)])), \
+                mock.patch.object(knn_search, "nearest", side_effect=AssertionError("SQL search ran")), \
+                mock.patch.dict(os.environ, {"FLEET_SNAPSHOT_DIR": self.dir, "INTENT_CACHE_ENABLED": "0",
+                                             "INTENT_RULES_ENABLED": "0", "LLM_SUMMARY_ENABLED": "0"}):
+            result = brain.get_intelligent_answer("which floats are closest to 10N 82E?")
+        schema_catalog.invalidate()
+
+        self.assertEqual(result["query_type"], "Proximity", result.get("summary"))
+        self.assertEqual(len(result["data"]), 3)
+        self.assertEqual(set(result["data"][0]) - {"distance_km"},
+                         {"float_id", "timestamp", "latitude", "longitude", "temperature", "salinity", "pressure"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,148 @@
+"""
+FloatChart Geocell — Unit Tests
+===============================
+Checks the pure-Python geohash keys used for cell-ring proximity search,
+and that the geocell key column never reaches an answer as a metric.
+
+Run:
+    python -m pytest tests/test_geocell.py -v
+"""
+
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import pandas as pd
+from langchain_core.language_models.fake import FakeListLLM
+from sqlalchemy import create_engine
+
+# ── Ensure ARGO_CHATBOT is on the path ────────────────────────────────────────
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ARGO_CHATBOT"))
+
+import brain
+import geocell
+import schema_catalog
+from sql_builder import _build_proximity_query
+
+
+def _haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, [lat1, lon1, lat2, lon2])
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 6371 * 2 * math.asin(math.sqrt(a))
+
+
+def _destination(lat, lon, bearing_deg, distance_km):
+    """Point reached travelling ``distance_km`` from (lat, lon) on a bearing."""
+    lat1, lon1, brg = map(math.radians, [lat, lon, bearing_deg])
+    d = distance_km / 6371
+    lat2 = math.asin(math.sin(lat1) * math.cos(d) + math.cos(lat1) * math.sin(d) * math.cos(brg))
+    lon2 = lon1 + math.atan2(math.sin(brg) * math.sin(d) * math.cos(lat1),
+                             math.cos(d) - math.sin(lat1) * math.sin(lat2))
+    return math.degrees(lat2), ((math.degrees(lon2) + 180) % 360) - 180
+
+
+class TestGeocell(unittest.TestCase):
+    """Encoding round-trips and ring coverage."""
+
+    def test_01_known_geohash(self):
+        """Encoding matches the reference geohash for a well-known point."""
+        self.assertEqual(geocell.encode(57.64911, 10.40744, 11), "u4pruydqqvj")
+        self.assertEqual(geocell.from_geohash("u4pruydqqvj"), geocell.encode_int(57.64911, 10.40744, 11))
+
+    def test_02_prefix_is_integer_range(self):
+        """A coarse cell is a contiguous range of the full-precision key."""
+        full = geocell.encode_int(13.08, 80.27)
+        for precision in range(1, geocell.GEOCELL_PRECISION + 1):
+            cell = geocell.encode_int(13.08, 80.27, precision)
+            ((lo, hi),) = geocell.cell_ranges([cell], precision)
+            self.assertTrue(lo <= full < hi, f"precision {precision}")
+
+    def test_03_ring_covers_radius(self):
+        """Every point within the radius falls inside the ring predicate ranges."""
+        rng = random.Random(42)
+        centres = [(13.08, 80.27), (-34.0, 151.0), (0.0, 179.9), (60.0, -179.5), (-55.0, 0.0)]
+        for lat, lon in centres:
+            for radius in (50, 200, 500, 1000):
+                cover = geocell.covering_cells(lat, lon, radius)
+                if cover is None:
+                    continue
+                precision, cells = cover
+                ranges = geocell.cell_ranges(cells, precision)
+                for _ in range(200):
+                    plat, plon = _destination(lat, lon, rng.uniform(0, 360), rng.uniform(0, radius))
+                    self.assertLessEqual(_haversine_km(lat, lon, plat, plon), radius + 1e-6)
+                    key = geocell.encode_int(plat, plon)
+                    self.assertTrue(any(lo <= key < hi for lo, hi in ranges),
+                                    f"({plat:.3f}, {plon:.3f}) escaped the ring around ({lat}, {lon}) r={radius}")
+
+    def test_04_huge_radius_disables_prefilter(self):
+        """A radius wider than the coarsest cells returns no predicate."""
+        self.assertIsNone(geocell.ring_predicate(0.0, 0.0, 20000))
+
+    def test_05_proximity_uses_ring_when_column_exists(self):
+        """A radius step swaps its bounding box for the cell ring; the full radius keeps the search area."""
+        intent = {"latitude": 13.08, "longitude": 80.27, "distance_km": 200, "search_km": 100, "limit": 5}
+        with_cells = _build_proximity_query(dict(intent), {}, {"geocell", "latitude", "longitude"})
+        without_cells = _build_proximity_query(dict(intent), {}, {"latitude", "longitude"})
+        self.assertIn('"geocell" >=', with_cells)
+        self.assertNotIn('"geocell"', without_cells)
+        self.assertIn('"latitude" BETWEEN :lat_min', without_cells)
+        full = _build_proximity_query(dict(intent, search_km=None), {}, {"geocell", "latitude", "longitude"})
+        self.assertNotIn('"geocell"', full)
+        self.assertIn('"latitude" BETWEEN :area_lat_min', full)
+
+    def test_06_geocell_is_not_a_default_metric(self):
+        """A question naming no metric gets the sensor columns, not the id or geocell keys."""
+        tmp = tempfile.TemporaryDirectory()
+        engine = create_engine(f"duckdb:///{tmp.name}/argo.duckdb")
+        pd.DataFrame({"id": [1, 2], "float_id": 2902115, "timestamp": pd.to_datetime(["2024-01-01", "2024-01-11"]),
+                      "latitude": [15.0, 15.2], "longitude": [88.0, 88.1], "pressure": 5.0,
+                      "temperature": [28.0, 28.4], "salinity": 34.5,
+                      "geocell": [geocell.encode_int(15.0, 88.0), geocell.encode_int(15.2, 88.1)]}
+                     ).to_sql("argo_data", engine, index=False)
+        intent = {"query_type": "Trajectory", "float_id": 2902115, "metrics": []}
+        schema_catalog.invalidate()
+        with mock.patch.object(brain, "_ENGINE", engine), mock.patch.object(brain, "_db_context_cache", None), \
+                mock.patch.object(brain, "get_llm", return_value=FakeListLLM(responses=[json.dumps(intent)])), \
+                mock.patch.dict(os.environ, {"INTENT_CACHE_ENABLED": "0", "INTENT_RULES_ENABLED": "0",
+                                             "LLM_SUMMARY_ENABLED": "0"}):
+            result = brain.get_intelligent_answer("where has float 2902115 been")
+        engine.dispose()
+        schema_catalog.invalidate()
+        tmp.cleanup()
+
+        self.assertEqual(len(result["data"]), 2, result.get("summary"))
+        columns = set(result["data"][0])
+        self.assertLessEqual({"temperature", "salinity", "pressure"}, columns)
+        self.assertFalse({"id", "geocell"} & columns)
+
+    def test_07_map_clusters_bind_the_year_window(self):
+        """Map clusters count only floats seen within the bound ``years`` window."""
+        from datetime import datetime, timedelta
+        from app import _get_map_clusters
+
+        tmp = tempfile.TemporaryDirectory()
+        engine = create_engine(f"duckdb:///{tmp.name}/argo.duckdb")
+        now = datetime.now()
+        pd.DataFrame({"float_id": [2902115, 2902116],
+                      "timestamp": [now - timedelta(days=180), now - timedelta(days=1100)],
+                      "latitude": [15.0, 15.1], "longitude": [88.0, 88.1],
+                      "geocell": [geocell.encode_int(15.0, 88.0), geocell.encode_int(15.1, 88.1)]}
+                     ).to_sql("argo_data", engine, index=False)
+        try:
+            recent = _get_map_clusters(engine, 3, 1)
+            all_years = _get_map_clusters(engine, 3, 5)
+        finally:
+            engine.dispose()
+            tmp.cleanup()
+        self.assertEqual([c["count"] for c in recent["clusters"]], [1])
+        self.assertEqual([c["count"] for c in all_years["clusters"]], [2])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+"""
+FloatChart Index Advisor — Unit Tests
+=====================================
+Checks index-definition parsing, redundancy detection and recommendations.
+
+Run:
+    python -m pytest tests/test_index_advisor.py -v
+"""
+
+import os
+import sys
+import unittest
+
+# ── Ensure DATA_GENERATOR and ARGO_CHATBOT are on the path ────────────────────
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "ARGO_CHATBOT"))
+sys.path.insert(0, os.path.join(ROOT, "DATA_GENERATOR"))
+
+import index_advisor
+from index_advisor import TARGET_INDEXES, find_redundant, parse_indexdef, recommend
+
+# The index set created by init_database() before the target set existed
+LEGACY_CATALOG = {
+    "argo_data_pkey": "CREATE UNIQUE INDEX argo_data_pkey ON public.argo_data USING btree (id)",
+    "argo_data_float_id_timestamp_pressure_key": 'CREATE UNIQUE INDEX argo_data_float_id_timestamp_pressure_key ON public.argo_data USING btree (float_id, "timestamp", pressure)',
+    "idx_argo_timestamp": 'CREATE INDEX idx_argo_timestamp ON public.argo_data USING btree ("timestamp")',
+    "idx_argo_float": "CREATE INDEX idx_argo_float ON public.argo_data USING btree (float_id)",
+    "idx_argo_location": "CREATE INDEX idx_argo_location ON public.argo_data USING btree (latitude, longitude)",
+    "idx_argo_float_time": 'CREATE INDEX idx_argo_float_time ON public.argo_data USING btree (float_id, "timestamp" DESC)',
+    "idx_argo_geo_time": 'CREATE INDEX idx_argo_geo_time ON public.argo_data USING btree (latitude, longitude, "timestamp" DESC)',
+    "idx_argo_time_geo": 'CREATE INDEX idx_argo_time_geo ON public.argo_data USING btree ("timestamp", latitude, longitude)',
+    "idx_argo_float_time_lat_lon": 'CREATE INDEX idx_argo_float_time_lat_lon ON public.argo_data USING btree (float_id, "timestamp" DESC, latitude, longitude)',
+    "idx_argo_geo_temp": "CREATE INDEX idx_argo_geo_temp ON public.argo_data USING btree (latitude, longitude, temperature, salinity)",
+}
+
+
+class TestIndexAdvisor(unittest.TestCase):
+    """Catalog parsing and reconciliation against the target index set."""
+
+    def setUp(self):
+        self.catalog = {name: parse_indexdef(ddl) for name, ddl in LEGACY_CATALOG.items()}
+
+    def test_01_parse_indexdef(self):
+        """PostgreSQL and CockroachDB index definitions parse to the same key."""
+        pg = parse_indexdef(LEGACY_CATALOG["idx_argo_float_time"])
+        crdb = parse_indexdef("CREATE INDEX idx_argo_float_time ON defaultdb.public.argo_data USING btree (float_id ASC, timestamp DESC)")
+        self.assertEqual(pg["columns"], (("float_id", "ASC"), ("timestamp", "DESC")))
+        self.assertEqual(pg, crdb)
+        self.assertTrue(parse_indexdef(LEGACY_CATALOG["argo_data_pkey"])["unique"])
+
+    def test_02_prefix_indexes_are_redundant(self):
+        """Single-column and two-column prefixes of composites are flagged."""
+        redundant = find_redundant(self.catalog)
+        self.assertEqual(redundant["idx_argo_float_time"], "idx_argo_float_time_lat_lon")
+        self.assertIn("idx_argo_float", redundant)
+        self.assertIn("idx_argo_location", redundant)
+        self.assertEqual(redundant["idx_argo_timestamp"], "idx_argo_time_geo")
+        # Unique constraints and the composites themselves are never flagged
+        for name in ("argo_data_pkey", "argo_data_float_id_timestamp_pressure_key",
+                     "idx_argo_geo_time", "idx_argo_time_geo", "idx_argo_float_time_lat_lon"):
+            self.assertNotIn(name, redundant)
+
+    def test_03_duplicate_keeps_target(self):
+        """Of two identical indexes, the one in the target set survives."""
+        catalog = {
+            "idx_argo_time_geo": parse_indexdef('CREATE INDEX idx_argo_time_geo ON argo_data USING btree ("timestamp", latitude, longitude)'),
+            "aaa_copy": parse_indexdef('CREATE INDEX aaa_copy ON argo_data USING btree ("timestamp", latitude, longitude)'),
+        }
+        self.assertEqual(find_redundant(catalog), {"aaa_copy": "idx_argo_time_geo"})
+
+    def test_04_recommend_against_legacy_set(self):
+        """Legacy indexes reconcile to the target set: add geocell, drop the rest."""
+        replay = [{"label": "Statistic", "indexes": ["idx_argo_geo_temp"], "full_scan": False, "error": None}]
+        plan = recommend(self.catalog, {}, replay)
+        self.assertEqual([name for name, _ in plan["add"]], ["idx_argo_geocell"])
+        dropped = {name for name, _ in plan["drop"]}
+        self.assertEqual(dropped, {"idx_argo_timestamp", "idx_argo_float", "idx_argo_location", "idx_argo_float_time"})
+        # Used by the workload but outside the target set: surfaced for review
+        self.assertIn("idx_argo_geo_temp", {name for name, _ in plan["review"]})
+        self.assertFalse(dropped & set(TARGET_INDEXES))
+
+    def test_05_workload_covers_builder_shapes(self):
+        """The replay workload is built from sql_builder and passes the sanitizer."""
+        labels = [label for label, sql in index_advisor.build_workload()]
+        for shape in ("Proximity", "Time-Series", "Statistic", "Profile", "Trajectory", "Scatter", "Map points"):
+            self.assertIn(shape, labels)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+"""
+FloatChart Intent Cache — Unit Tests
+====================================
+Checks question normalization, versioned lookups, LRU eviction and hit
+metrics of the persistent intent cache, and that a rephrased question
+skips the LLM intent parse in brain while still querying the data.
+
+Run:
+    python -m pytest tests/test_intent_cache.py -v
+"""
+
+import json
+import os
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import pandas as pd
+from langchain_core.language_models.fake import FakeListLLM
+from sqlalchemy import create_engine
+
+# ── Ensure ARGO_CHATBOT is on the path ────────────────────────────────────────
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ARGO_CHATBOT"))
+
+import brain
+import intent_cache
+import schema_catalog
+
+INTENT = {"query_type": "Statistic", "metrics": ["temperature"], "aggregation": "avg",
+          "location_name": "bay of bengal"}
+
+
+class TestIntentCache(unittest.TestCase):
+    """Intent cache storage and its use in brain."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.env = mock.patch.dict(os.environ, {"INTENT_CACHE_PATH": os.path.join(self.tmp.name, "intents.sqlite3"),
+                                                "INTENT_CACHE_ENABLED": "1", "INTENT_RULES_ENABLED": "0"})
+        self.env.start()
+        intent_cache.close()
+        intent_cache.clear()
+
+    def tearDown(self):
+        intent_cache.close()
+        self.env.stop()
+        self.tmp.cleanup()
+
+    def test_01_normalized_questions_share_a_key(self):
+        """Case, punctuation and spacing are ignored; numbers, dates and words are kept."""
+        self.assertEqual(intent_cache.normalize("  What's the AVERAGE temperature,  near Chennai?? "),
+                         "what s the average temperature near chennai")
+        self.assertEqual(intent_cache.normalize("Profile of float 2902115 closest to 2023-03-15!"),
+                         "profile of float 2902115 closest to 2023-03-15")
+        self.assertEqual(intent_cache.normalize("nearest floats to 13.08, -80.27"),
+                         "nearest floats to 13.08 -80.27")
+        self.assertNotEqual(intent_cache.normalize("temperature in 2023"), intent_cache.normalize("temperature in 2024"))
+
+    def test_02_lookups_are_versioned(self):
+        """An entry is returned as a fresh dict for its version only; versions coexist until one goes stale."""
+        intent_cache.put("Average temperature in the Bay of Bengal?", "v1", INTENT)
+        hit = intent_cache.get("average temperature in the bay of bengal", "v1")
+        self.assertEqual(hit, INTENT)
+        hit["metrics"].append("salinity")
+        self.assertEqual(intent_cache.get("AVERAGE temperature in the Bay of Bengal", "v1"), INTENT)
+        self.assertIsNone(intent_cache.get("average temperature in the bay of bengal", "v2"))
+        # A worker on the new version reopening the file leaves the old version's entries alone
+        intent_cache.close()
+        self.assertIsNone(intent_cache.get("average temperature in the bay of bengal", "v2"))
+        intent_cache.put("Average temperature in the Bay of Bengal?", "v2", dict(INTENT, aggregation="max"))
+        self.assertEqual(intent_cache.stats()["entries"], 2)
+        self.assertEqual(intent_cache.get("average temperature in the bay of bengal", "v1"), INTENT)
+        self.assertEqual(intent_cache.get("average temperature in the bay of bengal", "v2")["aggregation"], "max")
+        # Once unused for INTENT_CACHE_STALE_DAYS, another version's entries go on the next store
+        with mock.patch("time.time", return_value=time.time() + 8 * 86400):
+            intent_cache.put("salinity near goa", "v2", INTENT)
+        self.assertIsNone(intent_cache.get("average temperature in the bay of bengal", "v1"))
+        self.assertEqual(intent_cache.stats()["entries"], 2)
+        # A prompt or gazetteer edit changes the version
+        self.assertNotEqual(intent_cache.version_of("prompt", {"goa": "1=1"}),
+                            intent_cache.version_of("prompt", {"goa": "2=2"}))
+
+    def test_03_least_recently_used_are_evicted(self):
+        """Beyond INTENT_CACHE_SIZE the entry unused the longest goes first; metrics count it all."""
+        with mock.patch.dict(os.environ, {"INTENT_CACHE_SIZE": "2"}), mock.patch("time.time") as clock:
+            clock.side_effect = [1.0, 2.0, 3.0, 4.0]
+            intent_cache.put("question one", "v1", INTENT)
+            intent_cache.put("question two", "v1", INTENT)
+            self.assertIsNotNone(intent_cache.get("question one", "v1"))       # now the most recent
+            intent_cache.put("question three", "v1", INTENT)
+        self.assertIsNone(intent_cache.get("question two", "v1"))
+        self.assertIsNotNone(intent_cache.get("question one", "v1"))
+        stats = intent_cache.stats()
+        self.assertEqual({k: stats[k] for k in ("hits", "misses", "stores", "evictions", "entries")},
+                         {"hits": 2, "misses": 1, "stores": 3, "evictions": 1, "entries": 2})
+        with mock.patch.dict(os.environ, {"INTENT_CACHE_ENABLED": "0"}):
+            self.assertIsNone(intent_cache.get("question one", "v1"))
+
+    def test_04_rephrased_question_skips_the_llm_parse(self):
+        """brain parses once with the LLM; the same question reworded reuses the intent on fresh data."""
+        engine = create_engine(f"duckdb:///{self.tmp.name}/argo.duckdb")
+        pd.DataFrame({"float_id": [1, 1, 2], "timestamp": pd.to_datetime(["2024-01-01", "2024-01-05", "2024-01-09"]),
+                      "latitude": 15.0, "longitude": 88.0, "pressure": 5.0, "temperature": [28.0, 29.0, 30.0],
+                      "salinity": 34.5}).to_sql("argo_data", engine, index=False)
+        llm = FakeListLLM(responses=[json.dumps(INTENT), "Summary one.", "Summary two."])
+        schema_catalog.invalidate()
+        with mock.patch.object(brain, "_ENGINE", engine), mock.patch.object(brain, "get_llm", return_value=llm), \
+                mock.patch.object(brain, "_db_context_cache", None):
+            first = brain.get_intelligent_answer("Average temperature in the Bay of Bengal?", llm_summary=True)
+            second = brain.get_intelligent_answer("average temperature in the bay of bengal", llm_summary=True)
+        engine.dispose()
+        schema_catalog.invalidate()
+        self.assertEqual((first["query_type"], first["record_count"]), ("Statistic", second["record_count"]))
+        self.assertEqual((first["metadata"]["intent_source"], second["metadata"]["intent_source"]), ("llm", "cache"))
+        # The LLM answered one parse and two summaries
+        self.assertEqual((first["summary"], second["summary"]), ("Summary one.", "Summary two."))
+        self.assertEqual(first["data"], second["data"])
+        self.assertEqual(intent_cache.stats()["hits"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,183 @@
+"""
+FloatChart Intent Rules — Unit Tests
+====================================
+Checks the rule-based intent parser: the intent and confidence for each
+common question shape, low confidence where the LLM should decide, the
+question-level hints (coordinates, radius, limit, time constraint), and
+that brain answers confident questions without an LLM parse.
+
+Run:
+    python -m pytest tests/test_intent_rules.py -v
+"""
+
+import os
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import pandas as pd
+from langchain_core.language_models.fake import FakeListLLM
+from sqlalchemy import create_engine
+
+# ── Ensure ARGO_CHATBOT is on the path ────────────────────────────────────────
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ARGO_CHATBOT"))
+
+import brain
+import intent_cache
+import intent_rules
+import schema_catalog
+import time_range
+
+# question -> fields the intent must have
+CONFIDENT = {
+    "Average temperature in the Bay of Bengal in 2023": {
+        "query_type": "Statistic", "aggregation": "avg", "metrics": ["temperature"],
+        "location_name": "bay of bengal", "time_constraint": "2023", "year": 2023},
+    "how many floats are in the indian ocean?": {"query_type": "Statistic", "aggregation": "count"},
+    "number of active argo floats in the red sea": {"query_type": "Statistic", "aggregation": "count"},
+    "maximum salinity near goa since March 2021": {
+        "query_type": "Statistic", "aggregation": "max", "location_name": "goa",
+        "time_constraint": "since March 2021"},
+    "nearest 3 floats to Kochi within 300 km": {
+        "query_type": "Proximity", "location_name": "kochi", "latitude": 9.93, "longitude": 76.26,
+        "distance_km": 300, "limit": 3},
+    "floats near 13.1N 80.3E within 100 nautical miles": {
+        "query_type": "Proximity", "latitude": 13.1, "longitude": 80.3, "distance_km": 185},
+    "floats near the gulf of aden": {"query_type": "Proximity", "latitude": 12.5, "longitude": 47.0},
+    "trajectory of float 2902115": {"query_type": "Trajectory", "float_id": 2902115},
+    "last 5 profiles of float 2902115": {"query_type": "Profile", "float_id": 2902115, "profile_count": 5},
+    "profile closest to 2023-03-15 in the arabian sea": {
+        "query_type": "Profile", "location_name": "arabian sea", "target_date": "2023-03-15"},
+    "profile closest to 15 March 2023 in the arabian sea": {
+        "query_type": "Profile", "location_name": "arabian sea", "target_date": "2023-03-15"},
+    "profile around 15/03/2023 of float 2902115": {
+        "query_type": "Profile", "float_id": 2902115, "target_date": "2023-03-15"},
+    "profile nearest to March 15, 2023 in the arabian sea": {"query_type": "Profile", "target_date": "2023-03-15"},
+    "What is the temperature at depth 500m in the arabian sea?": {
+        "query_type": "Profile", "metrics": ["temperature", "pressure"], "location_name": "arabian sea"},
+    "salinity trend in the arabian sea over the last 6 months": {
+        "query_type": "Time-Series", "metrics": ["salinity"], "time_constraint": "last 6 months"},
+    "temperature vs salinity in the red sea": {"query_type": "Scatter", "location_name": "red sea"},
+    "T-S diagram for the bay of bengal": {"query_type": "Scatter", "scatter_mode": "density"},
+    "compare temperature in the bay of bengal and arabian sea from 2019 to 2022": {
+        "query_type": "Comparison", "regions": ["bay of bengal", "arabian sea"],
+        "time_constraint": "from 2019 to 2022"},
+}
+
+# question -> why the LLM should decide
+UNSURE = {
+    "show me something interesting": "no query type matched",
+    "why is the average temperature in the arabian sea rising?": "reasoning",
+    "average temperature in the Sargasso Sea": "unknown place",
+    "temperature profile near chennai": "also reads as",
+    "average temperature except in 2020": "exclusion",
+    "trajectory of floats in the bay of bengal": "without what it needs",
+    "compare average temperature in the monsoon and winter": "unresolved comparison",
+    "count of measurements in red sea": "other than floats",
+}
+
+
+class TestIntentRules(unittest.TestCase):
+    """Rule-based intents and their confidence."""
+
+    def test_01_common_shapes_are_confident(self):
+        """Each shape gets its LLM-style intent at or above the default threshold."""
+        for question, expected in CONFIDENT.items():
+            with self.subTest(question=question):
+                parsed = intent_rules.parse(question, brain.LOCATIONS)
+                self.assertGreaterEqual(parsed.confidence, intent_rules.DEFAULT_MIN_CONFIDENCE, parsed.reasons)
+                self.assertEqual({k: parsed.intent.get(k) for k in expected}, expected)
+
+    def test_02_ambiguous_questions_go_to_the_llm(self):
+        """Ambiguity, unknown places, reasoning and exclusions score below the threshold."""
+        for question, reason in UNSURE.items():
+            with self.subTest(question=question):
+                parsed = intent_rules.parse(question, brain.LOCATIONS)
+                self.assertLess(parsed.confidence, intent_rules.DEFAULT_MIN_CONFIDENCE)
+                self.assertTrue(any(reason in r for r in parsed.reasons), parsed.reasons)
+
+    def test_03_hints(self):
+        """Coordinates, radius, limit and time constraints are read from the wording alone."""
+        hints = intent_rules.extract_hints("Top 10 floats at latitude 12.5 S longitude 45 E within 20 miles in Q1 2024")
+        self.assertEqual(hints, {"latitude": -12.5, "longitude": 45.0, "distance_km": 32, "limit": 10,
+                                 "time_constraint": "Q1 2024"})
+        self.assertEqual(intent_rules.extract_hints("floats near 13.08, 80.27")["latitude"], 13.08)
+        # Years and out-of-range pairs are not coordinates
+        self.assertNotIn("latitude", intent_rules.extract_hints("temperature between 2019, 2022"))
+        self.assertEqual(time_range.find("floats in may 2023"), "may 2023")
+        self.assertIsNone(time_range.find("may I see float 2902115"))
+        self.assertEqual(time_range.find("salinity between Jan 2023 and Mar 2023 near goa"), "Jan 2023 and Mar 2023")
+        self.assertEqual(time_range.find("floats before 2015 in the red sea"), "before 2015")
+        # Latitude bands have no centre; boxes without a curated one use their midpoint
+        self.assertIsNone(intent_rules.center_of("arctic", brain.LOCATIONS))
+        self.assertEqual(intent_rules.center_of("chennai", brain.LOCATIONS), (13.08, 80.27))
+        self.assertEqual(intent_rules.center_of("gulf of aden", brain.LOCATIONS), (12.5, 47.0))
+
+    def test_04_parsing_is_sub_millisecond(self):
+        """A parse takes well under a millisecond, with the gazetteer compiled once."""
+        questions = list(CONFIDENT) + list(UNSURE)
+        for question in questions:
+            intent_rules.parse(question, brain.LOCATIONS)
+        start = time.perf_counter()
+        for _ in range(20):
+            for question in questions:
+                intent_rules.parse(question, brain.LOCATIONS)
+        self.assertLess((time.perf_counter() - start) / (20 * len(questions)), 1e-3)
+
+    def test_05_confident_questions_skip_the_llm_parse(self):
+        """brain answers from the rules and the summary templates without calling the LLM."""
+        tmp = tempfile.TemporaryDirectory()
+        engine = create_engine(f"duckdb:///{tmp.name}/argo.duckdb")
+        pd.DataFrame({"float_id": [1, 1, 2], "timestamp": pd.to_datetime(["2024-01-01", "2024-01-05", "2024-01-09"]),
+                      "latitude": 15.0, "longitude": 88.0, "pressure": 5.0, "temperature": [28.0, 29.0, 30.0],
+                      "salinity": 34.5}).to_sql("argo_data", engine, index=False)
+        llm = FakeListLLM(responses=[])
+        schema_catalog.invalidate()
+        with mock.patch.object(brain, "_ENGINE", engine), mock.patch.object(brain, "get_llm", return_value=llm), \
+                mock.patch.object(brain, "_db_context_cache", None), \
+                mock.patch.object(brain, "parse_intent_with_llm", side_effect=AssertionError("LLM parse")), \
+                mock.patch.object(intent_cache, "get", side_effect=AssertionError("cache lookup")):
+            result = brain.get_intelligent_answer("Average temperature in the Bay of Bengal in 2024")
+        engine.dispose()
+        schema_catalog.invalidate()
+        tmp.cleanup()
+        self.assertEqual(result["query_type"], "Statistic")
+        self.assertEqual((result["metadata"]["intent_source"], result["metadata"]["intent_confidence"]), ("rules", 1.0))
+        self.assertEqual(result["data"], [{"temperature": 29.0}])
+        self.assertEqual(result["metadata"]["summary_source"], "template")
+
+    def test_06_float_questions_are_scoped_to_the_float(self):
+        """Statistic, Time-Series and Scatter questions naming a float read that float's rows only."""
+        tmp = tempfile.TemporaryDirectory()
+        engine = create_engine(f"duckdb:///{tmp.name}/argo.duckdb")
+        pd.DataFrame({"float_id": [2902115, 2902115, 2902116, 2902116],
+                      "timestamp": pd.to_datetime(["2024-01-01", "2024-01-05", "2024-01-02", "2024-01-09"]),
+                      "latitude": 15.0, "longitude": 88.0, "pressure": 5.0, "temperature": [28.0, 29.0, 10.0, 12.0],
+                      "salinity": [34.0, 34.5, 36.0, 36.5]}).to_sql("argo_data", engine, index=False)
+        results = {}
+        schema_catalog.invalidate()
+        with mock.patch.object(brain, "_ENGINE", engine), mock.patch.object(brain, "_db_context_cache", None), \
+                mock.patch.object(brain, "parse_intent_with_llm", side_effect=AssertionError("LLM parse")), \
+                mock.patch.dict(os.environ, {"INTENT_CACHE_ENABLED": "0", "LLM_SUMMARY_ENABLED": "0"}):
+            for question in ["average temperature of float 2902115", "max salinity of float 2902115",
+                             "temperature trend for float 2902115 in 2024",
+                             "scatter of temperature vs salinity for float 2902115"]:
+                results[question] = brain.get_intelligent_answer(question)
+        engine.dispose()
+        schema_catalog.invalidate()
+        tmp.cleanup()
+
+        self.assertEqual(results["average temperature of float 2902115"]["data"], [{"temperature": 28.5}])
+        self.assertEqual(results["max salinity of float 2902115"]["data"], [{"salinity": 34.5}])
+        series = results["temperature trend for float 2902115 in 2024"]
+        self.assertEqual(series["query_type"], "Time-Series")
+        self.assertEqual(sorted(row["temperature"] for row in series["data"]), [28.0, 29.0])
+        scatter = results["scatter of temperature vs salinity for float 2902115"]
+        self.assertEqual(scatter["query_type"], "Scatter")
+        self.assertEqual(sorted(row["temperature"] for row in scatter["data"]), [28.0, 29.0])
+
+
+if __name__ == "__main__":
+    unittest.main()
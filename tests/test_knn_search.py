@@ -0,0 +1,176 @@
+"""
+FloatChart KNN Search — Unit Tests
+==================================
+Checks the latitude-scaled search box and that the expanding-radius search
+returns exactly the k nearest floats as the single Proximity query reports
+them: at their latest position in the search area, if inside the circle.
+
+Run:
+    python -m pytest tests/test_knn_search.py -v
+"""
+
+import math
+import os
+import random
+import sys
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine
+
+# ── Ensure ARGO_CHATBOT is on the path ────────────────────────────────────────
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ARGO_CHATBOT"))
+
+import geocell
+import knn_search
+import query_executor
+import sql_builder
+
+CONTEXT = {"max_date_obj": datetime(2024, 6, 30)}
+COLS = {"float_id", "timestamp", "latitude", "longitude", "temperature"}
+
+
+def _destination(lat, lon, bearing, km):
+    """Point ``km`` from (lat, lon) along ``bearing`` on the 6371 km sphere."""
+    d, b = km / 6371.0, math.radians(bearing)
+    p1, l1 = math.radians(lat), math.radians(lon)
+    p2 = math.asin(math.sin(p1) * math.cos(d) + math.cos(p1) * math.sin(d) * math.cos(b))
+    l2 = l1 + math.atan2(math.sin(b) * math.sin(d) * math.cos(p1), math.cos(d) - math.sin(p1) * math.sin(p2))
+    return math.degrees(p2), (math.degrees(l2) + 540) % 360 - 180
+
+
+def _in_box(box, lat, lon):
+    lat_min, lat_max, lon_ranges = box
+    return lat_min <= lat <= lat_max and (not lon_ranges or any(lo <= lon <= hi for lo, hi in lon_ranges))
+
+
+def _fleet(centres, cycles=6, start=datetime(2024, 1, 1)):
+    """Floats drifting east from each centre, one row per cycle (newest is furthest east)."""
+    rows = []
+    for i, (lat, lon) in enumerate(centres):
+        for c in range(cycles):
+            lon_c = (lon + c * 0.3 + 540) % 360 - 180
+            rows.append((2900000 + i, start + timedelta(days=10 * c), lat, lon_c, 28.0 - i * 0.01))
+    return pd.DataFrame(rows, columns=["float_id", "timestamp", "latitude", "longitude", "temperature"])
+
+
+def _brute_force(df, lat, lon, radius, k):
+    """The k floats nearest by their latest position in the search area, kept if inside the circle."""
+    area = geocell.search_area(lat, lon, radius)
+    rows = df[[_in_box(area, a, b) for a, b in zip(df["latitude"], df["longitude"])]]
+    latest = rows.sort_values("timestamp").groupby("float_id").tail(1).copy()
+    p1, p2 = np.radians(lat), np.radians(latest["latitude"])
+    cos_angle = (np.cos(p1) * np.cos(p2) * np.cos(np.radians(latest["longitude"] - lon)) + np.sin(p1) * np.sin(p2))
+    latest["distance_km"] = 6371 * np.arccos(np.clip(cos_angle, -1, 1))
+    return list(latest[latest["distance_km"] <= radius].sort_values("distance_km")["float_id"].head(k))
+
+
+class TestKnnSearch(unittest.TestCase):
+    """Search box geometry and exact k-nearest results."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.engine = create_engine(f"duckdb:///{self.tmp.name}/argo.duckdb")
+
+    def tearDown(self):
+        self.engine.dispose()
+        self.tmp.cleanup()
+
+    def _load(self, df):
+        df.to_sql("argo_data", self.engine, index=False)
+
+    def test_01_bounding_box_contains_circle(self):
+        """The box is latitude-scaled, split at the antimeridian and never misses a point."""
+        lat_min, lat_max, ranges = geocell.bounding_box(60.0, 10.0, 300)
+        (lo, hi), = ranges
+        self.assertAlmostEqual((hi - lo) / (lat_max - lat_min), 2.0, delta=0.05)  # 1 / cos(60°)
+        self.assertEqual(len(geocell.bounding_box(-17.7, 179.5, 800)[2]), 2)
+        self.assertEqual(geocell.bounding_box(-85.0, 0.0, 1000)[2], [])
+
+        rng = random.Random(7)
+        for _ in range(2000):
+            lat, lon = rng.uniform(-88, 88), rng.uniform(-180, 180)
+            radius = rng.choice([50, 300, 1500, 4000])
+            box = geocell.bounding_box(lat, lon, radius)
+            p_lat, p_lon = _destination(lat, lon, rng.uniform(0, 360), radius * rng.uniform(0, 1))
+            self.assertTrue(_in_box(box, p_lat, p_lon), (lat, lon, radius, p_lat, p_lon))
+
+    def test_02_expanding_search_matches_full_radius(self):
+        """Every radius step schedule returns the full-radius answer (latest positions in the area)."""
+        rng = random.Random(3)
+        centres = [(rng.uniform(5, 20), rng.uniform(70, 90)) for _ in range(40)]
+        df = _fleet(centres)
+        self._load(df)
+        for lat, lon, radius, k in ((13.08, 80.27, 1000, 5), (10.0, 85.0, 600, 8), (18.0, 72.0, 2000, 12)):
+            intent = {"query_type": "Proximity", "latitude": lat, "longitude": lon,
+                      "distance_km": radius, "limit": k, "metrics": ["temperature"]}
+            expected = _brute_force(df, lat, lon, radius, k)
+            single = knn_search.nearest(dict(intent), CONTEXT, self.engine, existing_cols=COLS)
+            stepped = knn_search.nearest(dict(intent), CONTEXT, self.engine, existing_cols=COLS, initial_km=50)
+            self.assertEqual(list(single["float_id"]), expected)
+            self.assertEqual(list(stepped["float_id"]), expected)
+            self.assertEqual(list(stepped.columns), ["float_id", "timestamp", "latitude", "longitude",
+                                                     "temperature", "distance_km"])
+
+    def test_03_antimeridian_and_high_latitude(self):
+        """Floats across ±180° and far east/west at high latitude are found."""
+        df = _fleet([(-17.0, 179.0), (-18.0, -179.6), (70.0, 18.0), (70.0, -19.0)], cycles=1)
+        self._load(df)
+        fiji = {"query_type": "Proximity", "latitude": -17.7, "longitude": -179.9, "distance_km": 300, "limit": 5}
+        self.assertEqual(sorted(knn_search.nearest(fiji, CONTEXT, self.engine, existing_cols=COLS)["float_id"]),
+                         [2900000, 2900001])
+        # 18-19° of longitude at 70°N is ~700 km: outside the old fixed ±13.5° box
+        arctic = {"query_type": "Proximity", "latitude": 70.0, "longitude": 0.0, "distance_km": 1000, "limit": 5}
+        self.assertEqual(sorted(knn_search.nearest(arctic, CONTEXT, self.engine, existing_cols=COLS)["float_id"]),
+                         [2900002, 2900003])
+
+    def test_04_stops_at_first_sufficient_radius(self):
+        """A dense neighbourhood is answered by the first step; smaller steps share one query shape."""
+        self.assertEqual(knn_search.radius_steps(1000, 150), [150, 300, 600, 1000])
+        self.assertEqual(knn_search.radius_steps(100, 150), [100])
+        rng = random.Random(5)
+        self._load(_fleet([(13.0 + rng.uniform(-0.5, 0.5), 80.0 + rng.uniform(-0.5, 0.5)) for _ in range(10)]
+                          + [(0.0, 60.0)], cycles=1))
+        query_executor.reset_shape_stats()
+        intent = {"query_type": "Proximity", "latitude": 13.0, "longitude": 80.2, "distance_km": 3000, "limit": 5}
+        self.assertEqual(len(knn_search.nearest(dict(intent), CONTEXT, self.engine, existing_cols=COLS,
+                                                initial_km=150)), 5)
+        self.assertEqual(query_executor.shape_stats()["executions"], 1)
+        intent["limit"] = 11
+        self.assertEqual(len(knn_search.nearest(dict(intent), CONTEXT, self.engine, existing_cols=COLS,
+                                                initial_km=150)), 11)
+        stats = query_executor.shape_stats()
+        self.assertEqual(stats["executions"], 1 + len(knn_search.radius_steps(3000, 150)))
+        # The steps below 3000 km, and the full-radius query
+        self.assertEqual(stats["distinct_shapes"], 2)
+
+    def test_05_float_that_left_the_circle_is_dropped(self):
+        """A float whose newest fix in the search area is outside the circle is not reported, at any step."""
+        # Both drift east from inside a 200 km circle; the first ends 300 km out, the second 189 km out
+        df = _fleet([(0.0, 80.0), (0.0, 79.0)], cycles=10)
+        self._load(df)
+        intent = {"query_type": "Proximity", "latitude": 0.0, "longitude": 80.0, "distance_km": 200, "limit": 2}
+        expected = _brute_force(df, 0.0, 80.0, 200, 2)
+        self.assertEqual(expected, [2900001])
+        for initial_km in (200, 50):
+            found = knn_search.nearest(dict(intent), CONTEXT, self.engine, existing_cols=COLS, initial_km=initial_km)
+            self.assertEqual(list(found["float_id"]), expected)
+            self.assertEqual(pd.Timestamp(found["timestamp"].iloc[0]), datetime(2024, 1, 1) + timedelta(days=90))
+            self.assertLessEqual(found["distance_km"].iloc[0], 200)
+
+    def test_06_search_area_is_the_previous_box(self):
+        """The area is the fixed ±max(8°, 1.5 r / 111) box, wrapped at ±180° and widened to hold the circle."""
+        self.assertEqual(geocell.search_area(13.0, 80.0, 500), (5.0, 21.0, [(72.0, 88.0)]))
+        lat_min, lat_max, ranges = geocell.search_area(13.0, 80.0, 2000)
+        self.assertAlmostEqual(lat_max - 13.0, 2000 / 111 * 1.5)
+        self.assertEqual(geocell.search_area(-17.7, 179.5, 500)[2], [(171.5, 180.0), (-180.0, -172.5)])
+        # At 70°N a 1000 km circle reaches ±26° of longitude, beyond the ±13.5° box
+        (lo, hi), = geocell.search_area(70.0, 0.0, 1000)[2]
+        self.assertEqual((lo, hi), tuple(geocell.bounding_box(70.0, 0.0, 1000)[2][0]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,140 @@
+"""
+FloatChart Profile Lookup — Unit Tests
+======================================
+Checks that Profile queries pick the latest, the N most recent and the
+closest-to-date profile with ordered lookups instead of a correlated
+MAX("timestamp") subquery.
+
+Run:
+    python -m pytest tests/test_profile_lookup.py -v
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+import pandas as pd
+from langchain_core.language_models.fake import FakeListLLM
+from sqlalchemy import create_engine
+
+# ── Ensure ARGO_CHATBOT is on the path ────────────────────────────────────────
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ARGO_CHATBOT"))
+
+import brain
+import query_executor
+import schema_catalog
+import sql_builder
+
+CONTEXT = {"max_date_obj": datetime(2024, 6, 30)}
+REGION = '("latitude" BETWEEN 5 AND 22 AND "longitude" BETWEEN 80 AND 95)'
+LEVELS = 4
+
+
+def _fleet():
+    """Six floats, 20 cycles each, 4 levels per cycle; float f surfaces on day f of each cycle."""
+    rows = []
+    for f in range(6):
+        lat = 10.0 + f if f < 5 else 40.0  # the last float is outside REGION
+        for c in range(20):
+            ts = datetime(2024, 1, 1) + timedelta(days=10 * c + f)
+            for level in range(LEVELS):
+                rows.append((2902290 + f, ts, lat, 85.0, 5.0 + level * 100, 28.0 - level * 3 - c * 0.01))
+    return pd.DataFrame(rows, columns=["float_id", "timestamp", "latitude", "longitude", "pressure", "temperature"])
+
+
+class TestProfileLookup(unittest.TestCase):
+    """Profile selection by ordered lookups."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.engine = create_engine(f"duckdb:///{cls.tmp.name}/argo.duckdb")
+        cls.df = _fleet()
+        cls.df.to_sql("argo_data", cls.engine, index=False)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.engine.dispose()
+        cls.tmp.cleanup()
+
+    def _run(self, **intent):
+        sql = sql_builder.build_query(dict(query_type="Profile", metrics=["temperature"], **intent), CONTEXT)
+        self.assertNotIn("MAX(", sql.upper())
+        return sql, query_executor.execute(sql, self.engine, "Profile")
+
+    def _profiles(self, df):
+        return list(df[["float_id", "timestamp"]].drop_duplicates().itertuples(index=False, name=None))
+
+    def test_01_latest_profile(self):
+        """A float's and a region's newest profile, surface to bottom."""
+        _, df = self._run(float_id=2902292)
+        self.assertEqual(self._profiles(df), [(2902292, pd.Timestamp("2024-07-11"))])
+        self.assertEqual(list(df["pressure"]), [5.0, 105.0, 205.0, 305.0])
+        _, df = self._run(location_clause=REGION)
+        self.assertEqual(self._profiles(df), [(2902294, pd.Timestamp("2024-07-13"))])
+        _, df = self._run(location_clause=REGION, time_constraint="March 2024")
+        self.assertEqual(self._profiles(df), [(2902290, pd.Timestamp("2024-03-31"))])
+
+    def test_02_most_recent_profiles(self):
+        """The N newest profiles of a float or region, newest first, each complete."""
+        _, df = self._run(float_id=2902291, profile_count=3)
+        self.assertEqual([ts.day for _, ts in self._profiles(df)], [10, 30, 20])
+        self.assertEqual(len(df), 3 * LEVELS)
+
+        sql, df = self._run(location_clause=REGION, profile_count=7)
+        self.assertEqual(sql.params["profiles"], 7)
+        latest = self.df[self.df["latitude"] < 22][["float_id", "timestamp"]].drop_duplicates()
+        expected = latest.sort_values(["timestamp", "float_id"], ascending=False).head(7)
+        self.assertEqual(self._profiles(df), list(expected.itertuples(index=False, name=None)))
+        self.assertEqual(len(df), 7 * LEVELS)
+        capped = sql_builder.build_query({"query_type": "Profile", "float_id": 1, "profile_count": 10_000}, CONTEXT)
+        self.assertEqual(capped.params["profiles"], sql_builder.MAX_PROFILES)
+
+    def test_03_closest_to_date(self):
+        """The profile nearest the target date, on either side of it."""
+        # Float 2902290 surfaces on Jan 1, 11, 21, ...
+        for target, expected in (("2024-01-14", "2024-01-11"), ("2024-01-19", "2024-01-21"),
+                                 ("2023-06-01", "2024-01-01"), ("2030-01-01", "2024-07-09")):
+            _, df = self._run(float_id=2902290, target_date=target)
+            self.assertEqual(self._profiles(df), [(2902290, pd.Timestamp(expected))], target)
+        # A month resolves to its midpoint: 2024-02-15 12:00 → float 2902294 on Feb 14
+        _, df = self._run(location_clause=REGION, target_date="February 2024")
+        self.assertEqual(self._profiles(df), [(2902294, pd.Timestamp("2024-02-14"))])
+
+    def test_04_one_shape_per_lookup(self):
+        """Different floats and dates share one SQL template; a missing scope is refused."""
+        first = sql_builder.build_query({"query_type": "Profile", "float_id": 1, "target_date": "2024-01-01"}, CONTEXT)
+        second = sql_builder.build_query({"query_type": "Profile", "float_id": 2, "target_date": "2022-05"}, CONTEXT)
+        self.assertEqual(str(first), str(second))
+        self.assertNotEqual(first.params, second.params)
+        with self.assertRaises(ValueError):
+            sql_builder.build_query({"query_type": "Profile"}, CONTEXT)
+
+    def test_05_brain_answers_region_profiles_without_a_float(self):
+        """A region or N-most-recent profile question gets rows; only an unscoped one asks for a float."""
+        schema_catalog.invalidate()
+        with mock.patch.object(brain, "_ENGINE", self.engine), mock.patch.object(brain, "_db_context_cache", None), \
+                mock.patch.object(brain, "get_llm", return_value=FakeListLLM(responses=[])), \
+                mock.patch.dict(os.environ, {"INTENT_CACHE_ENABLED": "0", "LLM_SUMMARY_ENABLED": "0"}):
+            region = brain.get_intelligent_answer("latest temperature profile in the bay of bengal")
+            recent = brain.get_intelligent_answer("last 3 profiles in the bay of bengal")
+            unscoped_intent = {"query_type": "Profile", "metrics": ["temperature"]}
+            with mock.patch.object(brain, "parse_intent_with_llm", return_value=(unscoped_intent, "llm")), \
+                    mock.patch.dict(os.environ, {"INTENT_RULES_ENABLED": "0"}), \
+                    mock.patch.object(brain.tiered_storage, "read_query", side_effect=AssertionError("SQL ran")):
+                unscoped = brain.get_intelligent_answer("show me a profile")
+        schema_catalog.invalidate()
+        self.assertEqual(region["query_type"], "Profile")
+        self.assertEqual({(r["float_id"], r["pressure"]) for r in region["data"]},
+                         {(2902294, 5.0 + level * 100) for level in range(LEVELS)})
+        self.assertEqual(len(recent["data"]), 3 * LEVELS)
+        # The float ID question comes before any SQL runs
+        self.assertEqual(unscoped["query_type"], "Error")
+        self.assertIn("No float ID specified", unscoped["summary"])
+
+
+if __name__ == "__main__":
+    unittest.main()
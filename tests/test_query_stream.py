@@ -0,0 +1,166 @@
+"""
+FloatChart Query Streaming — Unit Tests
+=======================================
+Checks that brain reports intent, SQL, data, insights and summary chunks as
+each is ready (LLM tokens as they arrive), that /api/query/stream relays
+them as server-sent events over GET and POST, and that a client disconnect
+stops the query.
+
+Run:
+    python -m pytest tests/test_query_stream.py -v
+"""
+
+import json
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import pandas as pd
+from langchain_core.language_models.fake import FakeListLLM, FakeStreamingListLLM
+from sqlalchemy import create_engine
+
+# ── Ensure ARGO_CHATBOT is on the path ────────────────────────────────────────
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ARGO_CHATBOT"))
+
+# ── Prevent database auto-connect during tests ───────────────────────────────
+os.environ.setdefault("DATABASE_URL", "")
+
+import app as app_module
+import brain
+import schema_catalog
+
+QUESTION = "Average temperature in the Bay of Bengal in 2024"
+
+
+def _events(body: str) -> list:
+    """The JSON payloads of an SSE body, keep-alive comments skipped."""
+    return [json.loads(block[6:]) for block in body.split("\n\n") if block.startswith("data: ")]
+
+
+def _read(response) -> tuple:
+    return response.mimetype, response.get_data(as_text=True)
+
+
+class TestQueryStream(unittest.TestCase):
+    """Streaming events from brain and the SSE endpoint."""
+
+    def test_01_brain_reports_each_part_as_it_is_ready(self):
+        """Intent, SQL, data and insights come before the summary; LLM tokens stream one by one."""
+        tmp = tempfile.TemporaryDirectory()
+        engine = create_engine(f"duckdb:///{tmp.name}/argo.duckdb")
+        pd.DataFrame({"float_id": [1, 1, 2], "timestamp": pd.to_datetime(["2024-01-01", "2024-01-05", "2024-01-09"]),
+                      "latitude": 15.0, "longitude": 88.0, "pressure": 5.0, "temperature": [28.0, 29.0, 30.0],
+                      "salinity": 34.5}).to_sql("argo_data", engine, index=False)
+        template_events, llm_events = [], []
+        schema_catalog.invalidate()
+        with mock.patch.object(brain, "_ENGINE", engine), mock.patch.object(brain, "_db_context_cache", None), \
+                mock.patch.dict(os.environ, {"LLM_SUMMARY_ENABLED": "0"}):
+            with mock.patch.object(brain, "get_llm", return_value=FakeListLLM(responses=[])):
+                template = brain.get_intelligent_answer(
+                    QUESTION, on_event=lambda kind, payload: template_events.append((kind, payload)))
+            with mock.patch.object(brain, "get_llm", return_value=FakeStreamingListLLM(responses=["Warm water."])):
+                streamed = brain.get_intelligent_answer(
+                    QUESTION, llm_summary=True, on_event=lambda kind, payload: llm_events.append((kind, payload)))
+        engine.dispose()
+        schema_catalog.invalidate()
+        tmp.cleanup()
+
+        kinds = [kind for kind, _ in template_events]
+        self.assertEqual(kinds, ["intent", "sql", "data", "insights", "chunk"])
+        payloads = dict(template_events)
+        self.assertEqual(payloads["intent"]["query_type"], "Statistic")
+        self.assertNotIn("location_clause", payloads["intent"]["intent"])
+        self.assertEqual(payloads["sql"]["sql_query"], template["sql_query"])
+        self.assertEqual(payloads["data"]["data"], [{"temperature": 29.0}])
+        self.assertEqual(payloads["insights"]["insights"], template["insights"])
+        self.assertEqual(payloads["chunk"]["content"], template["summary"])
+
+        chunks = [payload["content"] for kind, payload in llm_events if kind == "chunk"]
+        self.assertEqual(chunks, list("Warm water."))
+        self.assertEqual((streamed["summary"], streamed["metadata"]["summary_source"]), ("Warm water.", "llm"))
+
+    def test_02_endpoint_streams_events_over_get_and_post(self):
+        """Events reach the client in order, ending with the full response; a missing query is a 400."""
+        result = {"query_type": "Statistic", "summary": "28.4 °C.", "data": [{"temperature": 28.4}]}
+
+        def answer(question, zoom=None, llm_summary=None, on_event=None):
+            on_event("intent", {"query_type": "Statistic"})
+            on_event("data", {"query_type": "Statistic", "data": result["data"], "record_count": 1})
+            on_event("chunk", {"content": result["summary"]})
+            return result
+
+        client = app_module.app.test_client()
+        with mock.patch.object(app_module, "get_intelligent_answer", side_effect=answer) as fake:
+            # Each stream is read to the end before the next request
+            bodies = [_read(client.get("/api/query/stream?question=average+temperature&llm_summary=1"))]
+            bodies.append(_read(client.post("/api/query/stream", json={"query": "average temperature", "zoom": 4})))
+            self.assertEqual(client.post("/api/query/stream", json={}).status_code, 400)
+        for mimetype, body in bodies:
+            self.assertEqual(mimetype, "text/event-stream")
+            events = _events(body)
+            self.assertEqual([e["type"] for e in events], ["start", "intent", "data", "chunk", "done"])
+            self.assertEqual(events[-1]["result"], result)
+        self.assertEqual([(c.kwargs["llm_summary"], c.kwargs["zoom"]) for c in fake.call_args_list],
+                         [(True, None), (None, 4.0)])
+
+        with mock.patch.object(app_module, "get_intelligent_answer", side_effect=RuntimeError("database down")):
+            events = _events(client.get("/api/query/stream?question=x").get_data(as_text=True))
+        self.assertEqual(events[-1], {"type": "error", "message": "database down"})
+
+    def test_03_client_disconnect_cancels_the_query(self):
+        """After the client goes away, the query's next event raises QueryCancelled and nothing more runs."""
+        reached_data, client_gone, finished = threading.Event(), threading.Event(), threading.Event()
+        outcome = []
+
+        def answer(question, zoom=None, llm_summary=None, on_event=None):
+            try:
+                on_event("data", {"data": []})
+                reached_data.set()
+                client_gone.wait(5)
+                on_event("chunk", {"content": "never sent"})
+                outcome.append("continued")
+            except brain.QueryCancelled:
+                outcome.append("cancelled")
+                raise
+            finally:
+                finished.set()
+
+        client = app_module.app.test_client()
+        with mock.patch.object(app_module, "get_intelligent_answer", side_effect=answer):
+            response = client.get("/api/query/stream?question=x", buffered=False)
+            body = iter(response.response)
+            self.assertIn(b'"type": "start"', next(body))
+            self.assertTrue(reached_data.wait(5))
+            response.close()
+            client_gone.set()
+            self.assertTrue(finished.wait(5))
+        self.assertEqual(outcome, ["cancelled"])
+
+    def test_04_summary_failing_mid_stream_is_replaced_by_the_template(self):
+        """Tokens already sent are superseded: the template chunk carries replace, not more text."""
+        tmp = tempfile.TemporaryDirectory()
+        engine = create_engine(f"duckdb:///{tmp.name}/argo.duckdb")
+        pd.DataFrame({"float_id": [1, 1, 2], "timestamp": pd.to_datetime(["2024-01-01", "2024-01-05", "2024-01-09"]),
+                      "latitude": 15.0, "longitude": 88.0, "pressure": 5.0, "temperature": [28.0, 29.0, 30.0],
+                      "salinity": 34.5}).to_sql("argo_data", engine, index=False)
+        events = []
+        schema_catalog.invalidate()
+        with mock.patch.object(brain, "_ENGINE", engine), mock.patch.object(brain, "_db_context_cache", None), \
+                mock.patch.object(brain, "get_llm",
+                                  return_value=FakeStreamingListLLM(responses=["Warm water."], error_on_chunk_number=4)):
+            result = brain.get_intelligent_answer(
+                QUESTION, llm_summary=True, on_event=lambda kind, payload: events.append((kind, payload)))
+        engine.dispose()
+        schema_catalog.invalidate()
+        tmp.cleanup()
+
+        chunks = [payload for kind, payload in events if kind == "chunk"]
+        self.assertEqual([chunk["content"] for chunk in chunks[:-1]], list("Warm"))
+        self.assertEqual(chunks[-1], {"content": result["summary"], "replace": True})
+        self.assertEqual(result["metadata"]["summary_source"], "template")
+
+if __name__ == "__main__":
+    unittest.main()
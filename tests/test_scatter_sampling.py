@@ -0,0 +1,117 @@
+"""
+FloatChart Scatter Sampling — Unit Tests
+========================================
+Checks the seeded, deterministic Scatter sample and the binned density mode
+with its population correlation and regression statistics.
+
+Run:
+    python -m pytest tests/test_scatter_sampling.py -v
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine
+
+# ── Ensure ARGO_CHATBOT is on the path ────────────────────────────────────────
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ARGO_CHATBOT"))
+
+import density
+import query_executor
+import sql_builder
+
+CONTEXT = {"max_date_obj": datetime(2024, 6, 30)}
+ROWS = 60_000
+
+
+def _rows():
+    """Rows ordered by depth, so a plain LIMIT returns only the warm surface layer."""
+    rng = np.random.default_rng(11)
+    level = np.repeat(np.arange(20), ROWS // 20)
+    temperature = 29.0 - level * 1.3 + rng.normal(0, 0.4, ROWS)
+    return pd.DataFrame({
+        "float_id": 2902000 + np.arange(ROWS) % 300,
+        "timestamp": pd.Timestamp("2022-01-01") + pd.to_timedelta((np.arange(ROWS) // 300) % 200 * 10, unit="D"),
+        "latitude": 12.0, "longitude": 85.0,
+        "pressure": 5.0 + level * 50.0,
+        "temperature": temperature,
+        "salinity": 34.2 + 0.03 * temperature + rng.normal(0, 0.05, ROWS),
+    })
+
+
+class TestScatterSampling(unittest.TestCase):
+    """Representative samples and full-population density grids."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.engine = create_engine(f"duckdb:///{cls.tmp.name}/argo.duckdb")
+        cls.df = _rows()
+        cls.df.to_sql("argo_data", cls.engine, index=False)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.engine.dispose()
+        cls.tmp.cleanup()
+
+    def _run(self, **intent):
+        sql = sql_builder.build_query(dict(query_type="Scatter", metrics=["temperature", "salinity"], **intent),
+                                      CONTEXT, self.engine)
+        return sql, query_executor.execute(sql, self.engine, "Scatter")
+
+    def test_01_sample_is_deterministic(self):
+        """The same rows come back on every run, exactly SCATTER_SAMPLE_ROWS of them."""
+        sql, first = self._run()
+        _, second = self._run()
+        self.assertEqual(len(first), sql_builder.SCATTER_SAMPLE_ROWS)
+        pd.testing.assert_frame_equal(first, second)
+        self.assertTrue(first["sample_key"].is_monotonic_increasing)
+        self.assertEqual(sql.params["seed"], sql_builder.SCATTER_SEED)
+
+    def test_02_sample_is_representative(self):
+        """Sampled depths and temperatures follow the whole population, not the table order."""
+        _, sample = self._run()
+        self.assertGreater(sample["temperature"].std(), 0.8 * self.df["temperature"].std())
+        self.assertAlmostEqual(sample["temperature"].mean(), self.df["temperature"].mean(), delta=0.6)
+        # Every depth level is present in roughly its population share (1/20)
+        joined = sample.merge(self.df, on=["temperature", "salinity"])
+        shares = joined["pressure"].value_counts(normalize=True)
+        self.assertEqual(len(shares), 20)
+        self.assertLess(shares.max(), 0.1)
+
+    def test_03_density_statistics_are_exact(self):
+        """Density cells cover every row; r and the fitted line match NumPy on the full table."""
+        sql, cells = self._run(scatter_mode="density")
+        bins = sql_builder.SCATTER_DENSITY_BINS
+        self.assertEqual(int(cells["count"].sum()), ROWS)
+        self.assertLessEqual(len(cells), bins * bins)
+        self.assertTrue(cells["x_bin"].between(0, bins - 1).all())
+        fit = density.scatter_stats(cells)
+        r = np.corrcoef(self.df["temperature"], self.df["salinity"])[0, 1]
+        slope, intercept = np.polyfit(self.df["temperature"], self.df["salinity"], 1)
+        self.assertEqual(fit["n"], ROWS)
+        self.assertAlmostEqual(fit["r"], r, places=4)
+        self.assertAlmostEqual(fit["slope"], slope, places=5)
+        self.assertAlmostEqual(fit["intercept"], intercept, places=4)
+        self.assertEqual(density.chart_columns(cells), ["temperature", "salinity", "count"])
+
+    def test_04_one_template_per_shape(self):
+        """Sampling is plain arithmetic SQL, with one template for every time range."""
+        sql, _ = self._run()
+        for clause in ("TABLESAMPLE", "USING SAMPLE", "RANDOM(", "MD5("):
+            self.assertNotIn(clause, sql.upper())
+        other = sql_builder.build_query({"query_type": "Scatter", "metrics": ["temperature", "salinity"],
+                                         "time_constraint": "2023"}, CONTEXT)
+        self.assertEqual(other.shape, sql_builder.build_query(
+            {"query_type": "Scatter", "metrics": ["temperature", "salinity"], "time_constraint": "2019"}, CONTEXT).shape)
+        fit = density.sample_fit(pd.DataFrame({"a": [1.0, 2.0, 3.0], "b": [2.0, 4.0, 6.0]}), "a", "b")
+        self.assertEqual((fit["r"], fit["slope"], fit["intercept"]), (1.0, 2.0, 0.0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+"""
+FloatChart Schema Catalog — Unit Tests
+======================================
+Checks that the columns, indexes and row estimate of argo_data are loaded
+once, served from cache to the query builder, and reloaded on TTL expiry or
+a data-version change.
+
+Run:
+    python -m pytest tests/test_schema_catalog.py -v
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from datetime import datetime
+from unittest import mock
+
+import pandas as pd
+from sqlalchemy import create_engine, event, text
+
+# ── Ensure ARGO_CHATBOT is on the path ────────────────────────────────────────
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ARGO_CHATBOT"))
+
+import schema_catalog
+import sql_builder
+
+CONTEXT = {"max_date_obj": datetime(2024, 6, 30)}
+
+
+class TestSchemaCatalog(unittest.TestCase):
+    """Catalog loading, caching and refresh."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.engine = create_engine(f"duckdb:///{self.tmp.name}/argo.duckdb")
+        self.statements = []
+        event.listen(self.engine, "before_cursor_execute",
+                     lambda conn, cursor, sql, *args: self.statements.append(sql))
+        schema_catalog.invalidate()
+
+    def tearDown(self):
+        schema_catalog.invalidate()
+        self.engine.dispose()
+        self.tmp.cleanup()
+
+    def _create(self):
+        df = pd.DataFrame({"float_id": [1, 2], "timestamp": pd.to_datetime(["2024-01-01", "2024-01-02"]),
+                           "latitude": 10.0, "longitude": 80.0, "temperature": 28.0})
+        df.to_sql("argo_data", self.engine, index=False)
+        with self.engine.begin() as conn:
+            conn.execute(text('CREATE INDEX idx_argo_float_time ON argo_data ("float_id", "timestamp")'))
+
+    def test_01_loads_columns_indexes_and_rows(self):
+        """Columns keep table order with their types; the index and row estimate are read."""
+        self.assertFalse(schema_catalog.table_exists(self.engine))
+        self._create()
+        catalog = schema_catalog.get_catalog(self.engine)
+        self.assertEqual(list(catalog.columns),
+                         ["float_id", "timestamp", "latitude", "longitude", "temperature"])
+        self.assertEqual(catalog.columns["temperature"], "DOUBLE")
+        self.assertIn("idx_argo_float_time", catalog.indexes)
+        self.assertEqual(catalog.row_estimate, 2)
+        self.assertEqual(catalog.to_dict()["table"], "argo_data")
+
+    def test_02_cache_hits_skip_the_database(self):
+        """Repeated builds read the catalog once and send no further catalog queries."""
+        self._create()
+        intent = {"query_type": "Statistic", "metrics": ["temperature", "doxy"], "aggregation": "avg"}
+        first = sql_builder.build_query(intent, CONTEXT, self.engine)
+        loaded = len(self.statements)
+        self.assertGreater(loaded, 0)
+        for _ in range(20):
+            self.assertEqual(sql_builder.build_query(intent, CONTEXT, self.engine), first)
+        self.assertEqual(len(self.statements), loaded)
+        # Metrics missing from the table are dropped, as before
+        self.assertNotIn("doxy", first)
+
+    def test_03_ttl_and_data_version_reload(self):
+        """An expired TTL, a new data version or invalidate() reloads the catalog."""
+        self._create()
+        first = schema_catalog.get_catalog(self.engine)
+        # A token given to an unversioned catalog is adopted without a reload
+        self.assertEqual(schema_catalog.get_catalog(self.engine, data_version="v1").loaded_at, first.loaded_at)
+        with self.engine.begin() as conn:
+            conn.execute(text("ALTER TABLE argo_data ADD COLUMN salinity DOUBLE"))
+        self.assertNotIn("salinity", schema_catalog.columns(self.engine))
+        self.assertIn("salinity", schema_catalog.get_catalog(self.engine, data_version="v2").columns)
+
+        with self.engine.begin() as conn:
+            conn.execute(text("ALTER TABLE argo_data ADD COLUMN doxy DOUBLE"))
+        with mock.patch.dict(os.environ, {"SCHEMA_CATALOG_TTL": "0"}):
+            self.assertIn("doxy", schema_catalog.columns(self.engine))
+        self.assertEqual(schema_catalog.get_catalog(self.engine).data_version, "v2")
+
+        with self.engine.begin() as conn:
+            conn.execute(text("ALTER TABLE argo_data ADD COLUMN pressure DOUBLE"))
+        self.assertNotIn("pressure", schema_catalog.columns(self.engine))
+        schema_catalog.invalidate(self.engine)
+        self.assertIn("pressure", schema_catalog.columns(self.engine))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+"""
+FloatChart Session Profiles — Unit Tests
+========================================
+Checks the per-query-type execution settings: profile overrides, the SET
+statements per database, DuckDB settings applied around one query only,
+and statement timeouts surfacing as errors and metrics.
+
+Run:
+    python -m pytest tests/test_session_profiles.py -v
+"""
+
+import os
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from sqlalchemy import create_engine
+
+# ── Ensure ARGO_CHATBOT is on the path ────────────────────────────────────────
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ARGO_CHATBOT"))
+
+import query_executor
+import session_profiles
+
+SETTINGS_SQL = "SELECT current_setting('threads') AS threads, current_setting('memory_limit') AS memory_limit"
+SLOW_SQL = "SELECT COUNT(*) FROM range(100000000) a, range(1000) b WHERE (a.range * b.range) % 7 = 3"
+
+
+class TestSessionProfiles(unittest.TestCase):
+    """Profiles applied around each execution."""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.engine = create_engine(f"duckdb:///{self.tmp.name}/argo.duckdb")
+        session_profiles.reset_timeout_stats()
+
+    def tearDown(self):
+        session_profiles.reset_timeout_stats()
+        self.engine.dispose()
+        self.tmp.cleanup()
+
+    def _settings(self, query_type=None):
+        return query_executor.execute(SETTINGS_SQL, self.engine, query_type).iloc[0].tolist()
+
+    def test_01_profiles_and_overrides(self):
+        """Unknown types use the default; SESSION_* overrides apply globally or per type."""
+        self.assertEqual(session_profiles.profile_for("Unknown"), session_profiles.PROFILES["default"])
+        env = {"SESSION_STATEMENT_TIMEOUT_MS": "30000", "SESSION_WORK_MEM_TIME_SERIES": "128MB",
+               "SESSION_JIT_TIME_SERIES": "off", "SESSION_THREADS": "lots"}
+        with mock.patch.dict(os.environ, env):
+            profile = session_profiles.profile_for("Time-Series")
+            self.assertEqual(profile["statement_timeout_ms"], 30000)
+            self.assertEqual((profile["work_mem"], profile["jit"]), ("128MB", False))
+            # Invalid values are ignored
+            self.assertEqual(profile["threads"], session_profiles.PROFILES["Time-Series"]["threads"])
+            self.assertEqual(session_profiles.profile_for("Scatter")["work_mem"], "64MB")
+
+    def test_02_statements_per_database(self):
+        """PostgreSQL gets SET LOCAL for every setting, CockroachDB the timeout only."""
+        profile = session_profiles.profile_for("Statistic")
+        self.assertEqual(session_profiles.statements(profile, "postgresql"), [
+            "SET LOCAL statement_timeout = 20000",
+            "SET LOCAL work_mem = '64MB'",
+            "SET LOCAL max_parallel_workers_per_gather = 2",
+            "SET LOCAL jit = on",
+        ])
+        self.assertEqual(session_profiles.statements(profile, "cockroachdb"),
+                         ["SET LOCAL statement_timeout = 20000"])
+        self.assertEqual(session_profiles.statements(profile, "duckdb"),
+                         ["SET threads = 4", "SET memory_limit = '2GB'"])
+
+    def test_03_duckdb_settings_last_one_query(self):
+        """A query runs with its type's threads and memory; the defaults return afterwards."""
+        with mock.patch.dict(os.environ, {"SESSION_PROFILES_ENABLED": "0"}):
+            defaults = self._settings()
+        threads, memory = self._settings("Proximity")
+        self.assertEqual(int(threads), 2)
+        self.assertNotEqual(memory, defaults[1])
+        self.assertEqual(int(self._settings("Statistic")[0]), 4)
+        with mock.patch.dict(os.environ, {"SESSION_PROFILES_ENABLED": "0"}):
+            self.assertEqual(self._settings(), defaults)
+
+    def test_04_timeouts_are_raised_and_counted(self):
+        """A query past its timeout is stopped, reported and counted; the pool stays usable."""
+        with mock.patch.dict(os.environ, {"SESSION_STATEMENT_TIMEOUT_MS_SCATTER": "200"}):
+            started = time.time()
+            with self.assertRaises(session_profiles.QueryTimeoutError) as raised:
+                query_executor.execute(SLOW_SQL, self.engine, "Scatter")
+        self.assertLess(time.time() - started, 10)
+        self.assertIsInstance(raised.exception, TimeoutError)
+        self.assertIn("0.2s", str(raised.exception))
+        self.assertEqual(session_profiles.timeout_stats(), {"total": 1, "by_query_type": {"Scatter": 1}})
+        # Ordinary errors are not timeouts
+        with self.assertRaises(Exception) as raised:
+            query_executor.execute("SELECT * FROM missing_table", self.engine, "General")
+        self.assertNotIsInstance(raised.exception, session_profiles.QueryTimeoutError)
+        self.assertEqual(session_profiles.timeout_stats()["total"], 1)
+        self.assertEqual(int(self._settings("Proximity")[0]), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
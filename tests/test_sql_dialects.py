@@ -0,0 +1,128 @@
+"""
+FloatChart SQL Dialects — Unit Tests
+====================================
+Golden SQL per dialect for the builders that compile differently
+(Proximity, Trajectory, Path), and checks that the DuckDB idioms return
+the same rows as the PostgreSQL ones.
+
+Golden files live in tests/golden/. After an intended change, regenerate
+them and review the diff:
+
+    UPDATE_GOLDEN=1 python -m pytest tests/test_sql_dialects.py
+
+Run:
+    python -m pytest tests/test_sql_dialects.py -v
+"""
+
+import os
+import re
+import sys
+import tempfile
+import unittest
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+# ── Ensure ARGO_CHATBOT is on the path ────────────────────────────────────────
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ARGO_CHATBOT"))
+
+import sql_builder
+import sql_dialects
+
+GOLDEN_DIR = Path(__file__).parent / "golden"
+CONTEXT = {"max_date_obj": datetime(2024, 2, 8)}
+COLUMNS = {"float_id", "timestamp", "latitude", "longitude", "temperature", "salinity", "pressure"}
+CASES = {
+    "proximity": {"query_type": "Proximity", "latitude": 13.08, "longitude": 80.27, "distance_km": 300,
+                  "limit": 5, "metrics": ["temperature"], "time_constraint": "2023"},
+    "trajectory": {"query_type": "Trajectory", "float_id": 2900003, "metrics": ["temperature"]},
+    "path": {"query_type": "Path", "float_id": 2900003},
+}
+
+
+def _build(case, dialect):
+    return sql_builder.build_query(dict(CASES[case]), CONTEXT, existing_cols=COLUMNS, dialect=dialect)
+
+
+class TestSqlDialects(unittest.TestCase):
+    """Per-dialect compilation of the builders."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.engine = create_engine(f"duckdb:///{cls.tmp.name}/argo.duckdb")
+        with cls.engine.begin() as conn:
+            # 20 floats, 40 cycles of 5 levels; coordinates with 4 significant decimals
+            conn.execute(text("""
+                CREATE TABLE argo_data AS SELECT
+                    2900000 + i // 200 AS float_id,
+                    TIMESTAMP '2023-01-01' + TO_DAYS(CAST((i // 5) % 40 * 7 + i // 200 AS INTEGER)) AS "timestamp",
+                    12.0 + (i // 200) * 0.1234 + (i // 5) % 40 * 0.0101 AS latitude,
+                    79.5 + (i // 200) * 0.0987 + (i // 5) % 40 * 0.0203 AS longitude,
+                    CAST(i % 5 * 50 AS DOUBLE) AS pressure,
+                    28.0 - i % 5 * 2.5 + (i // 200) * 0.01234 AS temperature,
+                    34.5 + i % 5 * 0.1 AS salinity
+                FROM range(4000) AS t(i)
+            """))
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.engine.dispose()
+        cls.tmp.cleanup()
+
+    def _run(self, sql):
+        with self.engine.connect() as conn:
+            return pd.read_sql_query(text(sql), conn, params=sql.params)
+
+    def test_01_golden_sql(self):
+        """Each builder's SQL per dialect matches its golden file."""
+        for case in CASES:
+            for dialect in sql_dialects.DIALECTS:
+                with self.subTest(case=case, dialect=dialect):
+                    sql = str(_build(case, dialect)).strip() + "\n"
+                    path = GOLDEN_DIR / f"{case}.{dialect}.sql"
+                    if os.getenv("UPDATE_GOLDEN") == "1":
+                        path.parent.mkdir(exist_ok=True)
+                        path.write_text(sql)
+                    self.assertEqual(sql, path.read_text())
+
+    def test_02_dialect_choice(self):
+        """The engine picks the dialect; no engine means PostgreSQL; idioms differ as intended."""
+        self.assertEqual(sql_dialects.dialect_of(self.engine), "duckdb")
+        self.assertEqual(sql_dialects.dialect_of(None), "postgresql")
+        self.assertEqual(sql_dialects.dialect_of(self.engine, "cockroachdb"), "cockroachdb")
+        with self.assertRaises(ValueError):
+            sql_dialects.dialect_of(None, "oracle")
+        self.assertEqual(sql_builder.build_query(dict(CASES["proximity"]), CONTEXT, self.engine),
+                         _build("proximity", "duckdb"))
+        duckdb_sql, postgres_sql = _build("proximity", "duckdb"), _build("proximity", "postgresql")
+        self.assertIn("arg_max(", duckdb_sql)
+        self.assertNotIn("DISTINCT ON", duckdb_sql)
+        self.assertIn("DISTINCT ON", postgres_sql)
+        for dialect in sql_dialects.DIALECTS:
+            sql = str(_build("proximity", dialect))
+            # No casts of scanned columns, and no 4-byte FLOAT
+            self.assertIsNone(re.search(r'"(latitude|longitude)"::', sql.split("rounded AS")[0]), dialect)
+            self.assertNotRegex(sql, r"(?i)\bAS float\)|::float\b")
+        self.assertNotIn("::numeric", _build("proximity", "cockroachdb"))
+
+    def test_03_duckdb_idioms_return_the_same_rows(self):
+        """arg_max / arg_min pick the same rows as DISTINCT ON, without truncating decimals."""
+        for case in CASES:
+            with self.subTest(case=case):
+                postgres_sql = _build(case, "postgresql")
+                # DuckDB's bare NUMERIC is DECIMAL(18,3); the cold tier rewrites the cast the same way
+                portable = sql_builder.BoundQuery(re.sub(r"::numeric\b", "::DOUBLE", postgres_sql),
+                                                  postgres_sql.params)
+                got, want = self._run(_build(case, "duckdb")), self._run(portable)
+                self.assertFalse(want.empty)
+                pd.testing.assert_frame_equal(got, want, check_dtype=False)
+        nearest = self._run(_build("proximity", "duckdb"))
+        # 4 decimal places survive (a NUMERIC cast on DuckDB would keep 3)
+        self.assertTrue((nearest["latitude"] * 1000 % 1).abs().gt(1e-6).any())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,171 @@
+"""
+FloatChart SQL Sanitizer — Unit Tests
+=====================================
+Checks the single-pass validator: the same checks and reasons as before on
+generated and hostile SQL, keywords and ';' inside literals, quoted
+identifiers and comments handled by the lexer, memoized verdicts, and the
+resource limits: the table allowlist, join guards and the automatic LIMIT.
+
+Run:
+    python -m pytest tests/test_sql_sanitizer.py -v
+"""
+
+import os
+import sys
+import unittest
+from datetime import datetime
+
+# ── Ensure ARGO_CHATBOT is on the path ────────────────────────────────────────
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "ARGO_CHATBOT"))
+sys.path.insert(0, os.path.join(ROOT, "DATA_GENERATOR"))
+
+import sql_sanitizer
+from index_advisor import build_workload
+from sql_sanitizer import SQLSanitizer
+
+ALL_CHECKS = ["non_empty", "is_select_or_cte", "no_blocked_keywords", "no_stacked_statements",
+              "no_comment_injection", "limit_within_cap", "no_system_function_abuse",
+              "tables_allowed", "no_cartesian_join", "no_unbounded_self_join"]
+
+
+class TestSqlSanitizer(unittest.TestCase):
+    """SQLSanitizer.validate verdicts."""
+
+    def _failed(self, sql):
+        result = SQLSanitizer.validate(sql)
+        self.assertFalse(result["safe"], sql)
+        failed = [name for name, ok in result["checks"].items() if not ok]
+        # Checks stop at the first failure
+        self.assertEqual(list(result["checks"]), ALL_CHECKS[:ALL_CHECKS.index(failed[0]) + 1])
+        return failed[0], result["reason"]
+
+    def test_01_generated_sql_passes_every_check(self):
+        """Every builder shape passes, with all checks reported."""
+        for label, sql in build_workload(max_date=datetime(2024, 12, 31)):
+            with self.subTest(label=label):
+                result = SQLSanitizer.validate(str(sql))
+                limit_added, bounded = result.pop("limit_added"), result.pop("sql")
+                # Every check true, and nothing else among them
+                self.assertEqual(result, {"safe": True, "reason": None,
+                                          "checks": dict.fromkeys(ALL_CHECKS, True)})
+                # Profiles and trajectories return rows with no LIMIT of their own
+                self.assertEqual(bounded, str(sql).rstrip().rstrip(";").rstrip() + "\nLIMIT 10000"
+                                 if limit_added else str(sql))
+
+    def test_02_unsafe_sql_is_rejected(self):
+        """Each check fails with the same reason as before."""
+        cases = {
+            "   ": ("non_empty", "SQL string is empty."),
+            "DROP TABLE argo_data;": ("is_select_or_cte", "Only SELECT queries are allowed. Got: 'DROP'."),
+            "SELECT * FROM argo_data; delete FROM argo_data": ("no_blocked_keywords",
+                                                               "Blocked keyword detected: DELETE"),
+            "WITH x AS (SELECT 1) SELECT * FROM x WHERE 1 = 1 COMMENT\n ON": ("no_blocked_keywords",
+                                                                              "Blocked keyword detected: COMMENT ON"),
+            'SELECT "pg_sleep"(10)': ("no_blocked_keywords", "Blocked keyword detected: PG_SLEEP"),
+            "SELECT 1; SELECT 2": ("no_stacked_statements",
+                                   "Stacked SQL statements (multiple ';') are not allowed."),
+            "SELECT * FROM argo_data -- WHERE float_id = 1": ("no_comment_injection",
+                                                              "SQL comments ('--' or '/* */') are not permitted in queries."),
+            "SELECT * FROM argo_data /* unclosed": ("no_comment_injection",
+                                                    "SQL comments ('--' or '/* */') are not permitted in queries."),
+            "SELECT * FROM argo_data LIMIT 50000": ("limit_within_cap",
+                                                   "LIMIT 50000 exceeds the maximum allowed cap of 10000."),
+            "SELECT current_setting('work_mem')": ("no_system_function_abuse",
+                                                   "Disallowed system function reference detected."),
+            "SELECT * FROM pg_catalog.pg_tables": ("no_system_function_abuse",
+                                                   "Disallowed system function reference detected."),
+        }
+        for sql, expected in cases.items():
+            with self.subTest(sql=sql):
+                self.assertEqual(self._failed(sql), expected)
+
+    def test_03_literals_and_quoted_names_are_skipped(self):
+        """Keywords, ';' and comment markers inside strings or quoted identifiers are data."""
+        for sql in ['SELECT "update", "timestamp" FROM argo_data;;',
+                    "SELECT 'drop; -- table' AS label FROM argo_data",
+                    "SELECT E'it\\'s; DELETE' AS note",
+                    "SELECT 'it''s; /* x */' AS note",
+                    "SELECT $$ INSERT INTO x $$ AS note",
+                    "SELECT AVG(temperature)::numeric FROM argo_data LIMIT :limit"]:
+            with self.subTest(sql=sql):
+                self.assertTrue(SQLSanitizer.validate(sql)["safe"], SQLSanitizer.validate(sql)["reason"])
+        # An unterminated quote does not hide what follows it
+        self.assertFalse(SQLSanitizer.validate("SELECT 'x FROM argo_data; DROP TABLE argo_data")["safe"])
+        # A dollar-quoted string ends only at its own tag, so a stray quote cannot hide a stacked statement
+        for sql in ["SELECT $a$ $b$ ' $a$; DROP TABLE argo_data; SELECT ' ' FROM argo_data LIMIT 1",
+                    "SELECT $a$ $A$ ' $a$; DROP TABLE argo_data; SELECT ' ' FROM argo_data LIMIT 1"]:
+            with self.subTest(sql=sql):
+                self.assertEqual(self._failed(sql), ("no_blocked_keywords", "Blocked keyword detected: DROP"))
+        self.assertTrue(SQLSanitizer.validate("SELECT $note$ $x$ DROP; $X$ $note$ AS note")["safe"])
+        self.assertEqual(SQLSanitizer.tokenize("SELECT $a$ $b$ $a$, $$x$$"), ["SELECT", "$A$ $B$ $A$", ",", "$$X$$"])
+        self.assertEqual(SQLSanitizer.tokenize("SELECT 'a;b' AS \"x\" -- c\n;"),
+                         ["SELECT", "'A;B'", "AS", '"X"', "-- C", ";"])
+
+    def test_04_verdicts_are_memoized(self):
+        """Repeated SQL is lexed once; each caller gets its own checks dict."""
+        sql_sanitizer._cached_verdict.cache_clear()
+        first = SQLSanitizer.validate("SELECT * FROM argo_data LIMIT 10")
+        first["checks"]["cost"] = False
+        second = SQLSanitizer.validate("SELECT * FROM argo_data LIMIT 10")
+        self.assertEqual(sql_sanitizer._cached_verdict.cache_info().hits, 1)
+        self.assertNotIn("cost", second["checks"])
+        self.assertTrue(second["safe"])
+
+    def test_05_only_allowlisted_relations(self):
+        """argo_data and the query's own CTEs pass; other tables and file readers do not."""
+        for sql in ["SELECT * FROM public.argo_data LIMIT 5",
+                    "WITH recent AS (SELECT * FROM argo_data LIMIT 5) SELECT * FROM recent",
+                    "SELECT g FROM generate_series(1, 3) AS g",
+                    "SELECT EXTRACT(YEAR FROM timestamp) AS y FROM argo_data LIMIT 5"]:
+            with self.subTest(sql=sql):
+                self.assertTrue(SQLSanitizer.validate(sql)["safe"], SQLSanitizer.validate(sql)["reason"])
+        for sql, relation in [("SELECT * FROM users", "users"),
+                              ("SELECT * FROM argo_data JOIN secrets USING (float_id)", "secrets"),
+                              ("SELECT * FROM read_csv('/etc/passwd')", "read_csv"),
+                              ("SELECT * FROM '/etc/passwd'", "'/ETC/PASSWD'"),
+                              ("SELECT * FROM argo_data WHERE float_id IN (SELECT id FROM users)", "users")]:
+            with self.subTest(sql=sql):
+                self.assertEqual(self._failed(sql), ("tables_allowed", f"Relation {relation} is not allowed; "
+                                                                      "only argo_data may be queried."))
+
+    def test_06_joins_of_large_relations(self):
+        """Large joins need an equality condition on float_id and timestamp."""
+        for sql in ["SELECT * FROM argo_data a, argo_data b",
+                    "SELECT * FROM argo_data a CROSS JOIN argo_data b LIMIT 10",
+                    "SELECT * FROM argo_data a JOIN (SELECT * FROM argo_data) b ON TRUE"]:
+            with self.subTest(sql=sql):
+                self.assertEqual(self._failed(sql)[0], "no_cartesian_join")
+        self.assertEqual(self._failed("SELECT * FROM argo_data a JOIN argo_data b ON a.float_id = b.float_id"),
+                         ("no_unbounded_self_join", "Join of argo_data and argo_data must match rows on "
+                                                    "float_id and timestamp."))
+        for sql in ["SELECT * FROM argo_data a JOIN argo_data b "
+                    "ON a.float_id = b.float_id AND a.timestamp = b.timestamp LIMIT 5",
+                    "SELECT * FROM argo_data a JOIN argo_data b USING (float_id, timestamp) LIMIT 5",
+                    # One-row and correlated relations are cheap to join
+                    "WITH m AS (SELECT AVG(temperature) AS t FROM argo_data) SELECT * FROM argo_data, m LIMIT 5",
+                    "SELECT * FROM argo_data a, LATERAL (SELECT * FROM argo_data b "
+                    "WHERE b.float_id = a.float_id LIMIT 1) c LIMIT 5"]:
+            with self.subTest(sql=sql):
+                self.assertTrue(SQLSanitizer.validate(sql)["safe"], SQLSanitizer.validate(sql)["reason"])
+
+    def test_07_row_queries_get_a_limit(self):
+        """Queries returning rows without a LIMIT are capped; aggregates and bounded queries are unchanged."""
+        result = SQLSanitizer.validate("SELECT * FROM argo_data;")
+        self.assertTrue(result["limit_added"])
+        self.assertTrue(all(result["checks"].values()))
+        self.assertEqual(result["sql"], "SELECT * FROM argo_data\nLIMIT 10000")
+        self.assertEqual(SQLSanitizer.sanitize_and_raise("SELECT float_id FROM argo_data"),
+                         "SELECT float_id FROM argo_data\nLIMIT 10000")
+        for sql in ["SELECT COUNT(*) FROM argo_data",
+                    "SELECT float_id, AVG(temperature) FROM argo_data GROUP BY float_id",
+                    "SELECT * FROM argo_data LIMIT 5",
+                    "SELECT * FROM (SELECT * FROM argo_data) t LIMIT :limit"]:
+            with self.subTest(sql=sql):
+                result = SQLSanitizer.validate(sql)
+                self.assertEqual((result["sql"], result["limit_added"]), (sql, False))
+                self.assertTrue(all(result["checks"].values()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+"""
+FloatChart Stage Graph — Unit Tests
+===================================
+Checks that independent stages overlap and dependent ones wait, that stage
+errors and bad graphs surface, and that brain's pre-query stage overlaps
+the LLM intent parse with the database context and skips the LLM branch
+when the rules have the intent.
+
+Run:
+    python -m pytest tests/test_stage_graph.py -v
+"""
+
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+import pandas as pd
+from langchain_core.language_models.fake import FakeListLLM
+from sqlalchemy import create_engine
+
+# ── Ensure ARGO_CHATBOT is on the path ────────────────────────────────────────
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ARGO_CHATBOT"))
+
+import brain
+import schema_catalog
+import stage_graph
+
+DELAY = 0.15
+
+
+def _slow(value):
+    def stage(**_):
+        time.sleep(DELAY)
+        return value
+    return stage
+
+
+class TestStageGraph(unittest.TestCase):
+    """Concurrent stages and brain's pre-query stage."""
+
+    def test_01_independent_stages_overlap(self):
+        """Two branches of two stages each take about two delays, not four; results flow along edges."""
+        run = stage_graph.run([
+            stage_graph.Stage("llm", _slow("model")),
+            stage_graph.Stage("intent", lambda llm: (time.sleep(DELAY), f"intent from {llm}")[1], after=("llm",)),
+            stage_graph.Stage("context", _slow({"max_date": "2024-01-09"})),
+            stage_graph.Stage("schema", lambda context: (time.sleep(DELAY), {"temperature"})[1], after=("context",)),
+        ], workers=4)
+        self.assertEqual(run.results["intent"], "intent from model")
+        self.assertEqual(run.results["schema"], {"temperature"})
+        self.assertLess(run.wall_ms, 3.5 * DELAY * 1000)
+        report = run.report()
+        self.assertEqual(set(report), {"llm", "intent", "context", "schema", "wall", "saved"})
+        self.assertGreater(report["saved"], 0.5 * DELAY * 1000)
+
+    def test_02_serial_mode_and_errors(self):
+        """workers=0 runs in the caller's thread; a failing stage is re-raised and its dependents skipped."""
+        threads = []
+        run = stage_graph.run([stage_graph.Stage("a", lambda: threads.append(threading.current_thread()) or 1),
+                               stage_graph.Stage("b", lambda a: a + 1, after=("a",))], workers=0)
+        self.assertEqual((run.results["b"], threads), (2, [threading.current_thread()]))
+
+        dependent = mock.Mock()
+        with self.assertRaisesRegex(RuntimeError, "no API key"):
+            stage_graph.run([stage_graph.Stage("llm", mock.Mock(side_effect=RuntimeError("no API key"))),
+                             stage_graph.Stage("intent", dependent, after=("llm",)),
+                             stage_graph.Stage("context", _slow(None))], workers=4)
+        dependent.assert_not_called()
+
+        with self.assertRaisesRegex(ValueError, "unknown"):
+            stage_graph.run([stage_graph.Stage("a", lambda b: b, after=("b",))])
+        with self.assertRaisesRegex(ValueError, "cycle"):
+            stage_graph.run([stage_graph.Stage("a", lambda b: b, after=("b",)),
+                             stage_graph.Stage("b", lambda a: a, after=("a",))])
+
+    def test_03_brain_overlaps_the_llm_parse_with_the_database_context(self):
+        """A question for the LLM parses while the context loads; a rules question never builds an LLM."""
+        tmp = tempfile.TemporaryDirectory()
+        engine = create_engine(f"duckdb:///{tmp.name}/argo.duckdb")
+        pd.DataFrame({"float_id": [1, 1, 2], "timestamp": pd.to_datetime(["2024-01-01", "2024-01-05", "2024-01-09"]),
+                      "latitude": 15.0, "longitude": 88.0, "pressure": 5.0, "temperature": [28.0, 29.0, 30.0],
+                      "salinity": 34.5}).to_sql("argo_data", engine, index=False)
+        intent = {"query_type": "Statistic", "metrics": ["temperature"], "aggregation": "avg",
+                  "location_name": "bay of bengal"}
+        context = brain.get_database_context
+
+        def slow_context(engine):
+            time.sleep(DELAY)
+            return context(engine)
+
+        def slow_llm(**_):
+            time.sleep(DELAY)
+            return FakeListLLM(responses=[json.dumps(intent)])
+
+        schema_catalog.invalidate()
+        with mock.patch.object(brain, "_ENGINE", engine), mock.patch.object(brain, "_db_context_cache", None), \
+                mock.patch.object(brain, "get_database_context", side_effect=slow_context), \
+                mock.patch.dict(os.environ, {"INTENT_CACHE_ENABLED": "0", "PREQUERY_WORKERS": "4"}):
+            with mock.patch.object(brain, "get_llm", side_effect=slow_llm), \
+                    mock.patch.dict(os.environ, {"INTENT_RULES_ENABLED": "0"}):
+                parsed = brain.get_intelligent_answer("Average temperature in the Bay of Bengal")
+            with mock.patch.object(brain, "get_llm", side_effect=AssertionError("LLM built")):
+                ruled = brain.get_intelligent_answer("Average temperature in the Bay of Bengal")
+        engine.dispose()
+        schema_catalog.invalidate()
+        tmp.cleanup()
+
+        self.assertEqual((parsed["metadata"]["intent_source"], parsed["data"]), ("llm", [{"temperature": 29.0}]))
+        timings = parsed["metadata"]["stage_timings_ms"]
+        self.assertEqual(set(timings), {"context", "schema", "llm", "intent", "wall", "saved"})
+        # get_llm and the context each sleep one delay; serially that would be two
+        self.assertLess(timings["wall"], 1.8 * DELAY * 1000)
+        self.assertGreater(timings["saved"], 0.5 * DELAY * 1000)
+
+        self.assertEqual((ruled["metadata"]["intent_source"], ruled["data"]), ("rules", [{"temperature": 29.0}]))
+        self.assertEqual(set(ruled["metadata"]["stage_timings_ms"]), {"context", "schema", "wall", "saved"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,153 @@
+"""
+FloatChart Summary Templates — Unit Tests
+=========================================
+Checks the answer text rendered from brain's insights for each query type,
+the fallback for empty results and the appended notes, that brain answers
+without a summary LLM call unless one is asked for, and that /api/v1/query
+never asks for one.
+
+Run:
+    python -m pytest tests/test_summary_templates.py -v
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import pandas as pd
+from langchain_core.language_models.fake import FakeListLLM
+from sqlalchemy import create_engine
+
+# ── Ensure ARGO_CHATBOT is on the path ────────────────────────────────────────
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ARGO_CHATBOT"))
+
+import brain
+import schema_catalog
+import summary_templates
+
+
+def _insights(highlight=None, quality="good", **stats):
+    return {"highlight": highlight, "stats": stats, "context": None, "quality": quality}
+
+
+class TestSummaryTemplates(unittest.TestCase):
+    """Template answers and the opt-in LLM summary."""
+
+    def test_01_each_query_type_has_a_template(self):
+        """The highlight and stats of every query type are put into sentences."""
+        cases = [
+            ("Statistic", _insights({"type": "statistic", "metric": "temperature", "value": 28.41, "unit": "°C",
+                                     "label": "Average Temperature"}, quality="limited",
+                                    temperature={"avg": 28.41, "min": 28.41, "max": 28.41}),
+             {"location_name": "bay of bengal", "time_constraint": "2024"}, 1,
+             "Average Temperature in the Bay of Bengal during 2024: 28.41 °C."),
+            ("Statistic", _insights({"type": "count", "value": 1203, "label": "Unique Floats"}),
+             {"location_name": "arabian sea"}, 1, "Unique Floats in the Arabian Sea: 1,203."),
+            ("Proximity", _insights({"type": "nearest_float", "float_id": 2902115, "distance_km": 41.2,
+                                     "location": "9.61°N, 76.02°E"}, unique_floats=12,
+                                    nearest_distance_km=41.2, farthest_distance_km=290.0, count_within_100km=3),
+             {"location_name": "kochi", "distance_km": 300}, 12,
+             "Found 12 floats within 300 km of Kochi. The nearest is Float #2902115, 41.2 km away at "
+             "9.61°N, 76.02°E. The farthest is 290 km away (3 within 100 km)."),
+            ("Trajectory", _insights(total_distance_km=1840.5, waypoints=96, time_span_days=310,
+                                     avg_speed_km_day=5.9, lat_range="8.00° to 12.00°", lon_range="85.00° to 88.00°"),
+             {"float_id": 2902115}, 96,
+             "Float #2902115 travelled 1,840.5 km over 96 positions in 310 days (5.9 km/day on average). "
+             "It ranged over latitudes 8.00° to 12.00° and longitudes 85.00° to 88.00°."),
+            ("Profile", _insights(max_depth_dbar=2000.0, depth_layers=71, surface_temp=29.1, deep_temp=2.4,
+                                  thermocline_depth=80.0, profiles=1),
+             {"float_id": 2902115}, 71,
+             "The profile of Float #2902115 reaches 2,000 dbar over 71 depth levels. Temperature goes from "
+             "29.1 °C at the top to 2.4 °C at depth. The steepest temperature gradient (thermocline) is near 80 dbar."),
+            ("Time-Series", _insights({"type": "trend", "metric": "salinity", "trend": "increasing", "change": 0.12,
+                                       "unit": "PSU"}, data_points=180,
+                                      salinity={"avg": 34.9, "min": 34.7, "max": 35.1, "trend": "increasing"}),
+             {"location_name": "arabian sea", "time_constraint": "last 6 months"}, 180,
+             "Salinity in the Arabian Sea during last 6 months is increasing (+0.12 PSU between the first and "
+             "second half) across 180 data points. It averages 34.9 PSU (range 34.7 – 35.1 PSU)."),
+            ("Scatter", _insights({"type": "correlation", "r": -0.82, "slope": -0.045, "population": True},
+                                  fit={"n": 52000, "r": -0.82, "slope": -0.045}),
+             {"metrics": ["temperature", "salinity"], "location_name": "red sea"}, 400,
+             "Salinity vs temperature in the Red Sea shows a strong negative correlation (r = -0.82) over "
+             "52,000 measurements; salinity changes by -0.045 per unit of temperature."),
+            ("Comparison", _insights({"type": "comparison", "metric": "temperature", "highest": "bay of bengal",
+                                      "highest_mean": 28.9, "lowest": "arabian sea", "lowest_mean": 27.4,
+                                      "difference": 1.5},
+                                     regions=[{"region": "bay of bengal", "measurements": 5000,
+                                               "temperature": {"mean": 28.9}},
+                                              {"region": "arabian sea", "measurements": 4200,
+                                               "temperature": {"mean": 27.4}}]),
+             {"time_constraint": "2023"}, 24,
+             "During 2023: The Bay of Bengal: temperature 28.9 °C from 5,000 measurements. The Arabian Sea: "
+             "temperature 27.4 °C from 4,200 measurements. The Bay of Bengal has the higher average temperature, "
+             "1.5 °C above the Arabian Sea."),
+            ("General", _insights(unique_floats=2, temperature={"avg": 27.0, "min": 26.0, "max": 28.0}),
+             {}, 40, "Found 40 records from 2 floats. Temperature averages 27 °C (range 26 – 28 °C)."),
+        ]
+        for query_type, insights, intent, count, expected in cases:
+            with self.subTest(query_type=query_type, expected=expected[:40]):
+                self.assertEqual(summary_templates.render(query_type, insights, intent, count), expected)
+
+    def test_02_empty_results_and_notes(self):
+        """Empty results keep brain's explanation; short results and cost notes are appended."""
+        self.assertEqual(summary_templates.render("Proximity", _insights(quality="no_data"), {}, 0,
+                                                  fallback="No ARGO floats found near goa."),
+                         "No ARGO floats found near goa.")
+        text = summary_templates.render("General", _insights(quality="limited"), {}, 3,
+                                        notes=["Data available: Jan 01, 2024 to Jul 14, 2024", None])
+        self.assertEqual(text, "Found 3 records. Only 3 records matched. Data available: Jan 01, 2024 to Jul 14, 2024")
+        # A template that cannot read its insights falls back rather than failing the query
+        broken = _insights({"type": "statistic", "label": "Average Temperature"})
+        self.assertEqual(summary_templates.render("Statistic", broken, {}, 1, fallback="Found 1 records."),
+                         "Found 1 records.")
+
+    def test_03_brain_calls_the_llm_for_the_summary_only_when_asked(self):
+        """Default answers come from the templates; llm_summary=True adds one LLM call, with a template fallback."""
+        tmp = tempfile.TemporaryDirectory()
+        engine = create_engine(f"duckdb:///{tmp.name}/argo.duckdb")
+        pd.DataFrame({"float_id": [1, 1, 2], "timestamp": pd.to_datetime(["2024-01-01", "2024-01-05", "2024-01-09"]),
+                      "latitude": 15.0, "longitude": 88.0, "pressure": 5.0, "temperature": [28.0, 29.0, 30.0],
+                      "salinity": 34.5}).to_sql("argo_data", engine, index=False)
+        question = "Average temperature in the Bay of Bengal in 2024"
+        schema_catalog.invalidate()
+        results = {}
+        with mock.patch.object(brain, "_ENGINE", engine), mock.patch.object(brain, "_db_context_cache", None), \
+                mock.patch.dict(os.environ, {"LLM_SUMMARY_ENABLED": "0"}):
+            with mock.patch.object(brain, "get_llm", return_value=FakeListLLM(responses=[])):
+                results["template"] = brain.get_intelligent_answer(question)
+            with mock.patch.object(brain, "get_llm", return_value=FakeListLLM(responses=["Warm: 29 °C."])):
+                results["llm"] = brain.get_intelligent_answer(question, llm_summary=True)
+            with mock.patch.object(brain, "get_llm", return_value=FakeListLLM(responses=[])), \
+                    mock.patch.object(brain, "invoke_with_retry", side_effect=RuntimeError("provider down")):
+                results["failed"] = brain.get_intelligent_answer(question, llm_summary=True)
+        engine.dispose()
+        schema_catalog.invalidate()
+        tmp.cleanup()
+        expected = "Average Temperature in the Bay of Bengal during 2024: 29 °C."
+        self.assertEqual((results["template"]["summary"], results["template"]["metadata"]["summary_source"]),
+                         (expected, "template"))
+        self.assertEqual((results["llm"]["summary"], results["llm"]["metadata"]["summary_source"]),
+                         ("Warm: 29 °C.", "llm"))
+        self.assertEqual((results["failed"]["summary"], results["failed"]["metadata"]["summary_source"]),
+                         (expected, "template"))
+        self.assertEqual(results["template"]["insights"]["highlight"]["value"], 29.0)
+
+    def test_04_api_routes_choose_the_summary(self):
+        """/api/v1/query never asks for the LLM summary; /api/query passes the request's choice through."""
+        os.environ.setdefault("DATABASE_URL", "")
+        import app as app_module
+        client = app_module.app.test_client()
+        answer = mock.Mock(return_value={"query_type": "Statistic", "summary": "ok", "data": []})
+        with mock.patch.object(app_module, "get_intelligent_answer", answer), \
+                mock.patch.object(app_module, "get_cached_query", return_value=None), \
+                mock.patch.object(app_module, "cache_query_result"):
+            client.post("/api/v1/query", json={"query": "average temperature in the arabian sea"})
+            client.post("/api/query", json={"query": "average temperature in the arabian sea", "llm_summary": True})
+            client.get("/api/query?question=average+temperature+in+the+arabian+sea")
+        self.assertEqual([c.kwargs.get("llm_summary") for c in answer.call_args_list], [False, True, None])
+
+
+if __name__ == "__main__":
+    unittest.main()
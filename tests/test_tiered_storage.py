@@ -0,0 +1,266 @@
+"""
+FloatChart Tiered Storage — Unit Tests
+======================================
+Splits a synthetic dataset into a hot DuckDB table and a cold Parquet tier,
+then checks that federated queries return the same answer as the unsplit
+table, and that a dataset_stats rebuild counts both tiers.
+
+Run:
+    python -m pytest tests/test_tiered_storage.py -v
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+# ── Ensure ARGO_CHATBOT and DATA_GENERATOR are on the path ────────────────────
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "ARGO_CHATBOT"))
+sys.path.insert(0, os.path.join(ROOT, "DATA_GENERATOR"))
+
+import density
+import sql_builder
+import tiered_storage
+from tier_mover import write_manifest, write_partition
+
+CUTOFF = datetime(2023, 1, 1)
+BAY_OF_BENGAL = '("latitude" BETWEEN 5 AND 22 AND "longitude" BETWEEN 80 AND 95)'
+
+
+def _synthetic_rows():
+    rng = np.random.default_rng(7)
+    rows = []
+    for f in range(6):
+        for cycle in range(120):  # 2021-01 .. 2024-04, straddling the cutoff
+            ts = datetime(2021, 1, 3) + timedelta(days=10 * cycle + f)
+            lat, lon = 8 + f + cycle * 0.05, 82 + f * 1.5 + cycle * 0.03
+            for level in range(5):
+                rows.append((2902290 + f, ts, lat, lon,
+                             round(29 - level * 3 + rng.normal(0, 0.5), 3),
+                             round(34 + level * 0.2 + rng.normal(0, 0.05), 3),
+                             float(level * 100)))
+    # A profile on the cutoff day: its week starts on 2022-12-26, in the cold tier
+    rows += [(2902290, CUTOFF, 12.0, 85.0, 28.5 - level * 3, 34.1, float(level * 100)) for level in range(5)]
+    return pd.DataFrame(rows, columns=["float_id", "timestamp", "latitude", "longitude",
+                                       "temperature", "salinity", "pressure"])
+
+
+class TestTieredStorage(unittest.TestCase):
+    """Federated results match a single-tier database exactly."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        df = _synthetic_rows()
+        cls.truth = create_engine(f"duckdb:///{cls.tmp.name}/truth.duckdb")
+        cls.hot = create_engine(f"duckdb:///{cls.tmp.name}/hot.duckdb")
+        for engine, part in ((cls.truth, df), (cls.hot, df[df["timestamp"] >= CUTOFF])):
+            part.to_sql("argo_data", engine, index=False)
+
+        cold_dir = Path(cls.tmp.name) / "cold"
+        cold = df[df["timestamp"] < CUTOFF]
+        for month, group in cold.groupby(cold["timestamp"].dt.to_period("M")):
+            write_partition(group.reset_index(drop=True), cold_dir, month.to_timestamp().to_pydatetime())
+        write_manifest(cold_dir, {"cutoff": CUTOFF.isoformat(),
+                                  "min_timestamp": cold["timestamp"].min().isoformat(),
+                                  "rows": len(cold)})
+        cls._previous_dir = os.environ.get("COLD_TIER_DIR")
+        os.environ["COLD_TIER_DIR"] = str(cold_dir)
+
+    @classmethod
+    def tearDownClass(cls):
+        if cls._previous_dir is None:
+            os.environ.pop("COLD_TIER_DIR", None)
+        else:
+            os.environ["COLD_TIER_DIR"] = cls._previous_dir
+        cls.truth.dispose()
+        cls.hot.dispose()
+        cls.tmp.cleanup()
+
+    def _compare(self, intent):
+        sql = sql_builder.build_query(intent, {"max_date_obj": datetime(2022, 12, 31)}, self.truth)
+        time_range = sql_builder._get_time_range(intent.get("time_constraint"), datetime(2022, 12, 31))
+        self.assertTrue(tiered_storage.reaches_cold_tier(time_range))
+        merged = tiered_storage.read_query(sql, self.hot, intent["query_type"], time_range)
+        with self.truth.connect() as conn:
+            expected = pd.read_sql_query(text(sql), conn, params=sql.params)
+        self.assertFalse(expected.empty)
+        self.assertEqual(list(merged.columns), list(expected.columns))
+        self.assertEqual(len(merged), len(expected))
+        for i, col in enumerate(expected.columns):
+            got, want = merged.iloc[:, i], expected.iloc[:, i]
+            if pd.api.types.is_numeric_dtype(want):
+                # atol covers ROUND() on DuckDB DECIMAL vs DOUBLE in the last digit
+                np.testing.assert_allclose(got.astype(float), want.astype(float), rtol=1e-9, atol=0.011, err_msg=col)
+            else:
+                self.assertEqual(list(pd.to_datetime(got)), list(pd.to_datetime(want)), col)
+        return merged
+
+    def test_01_recent_range_skips_cold(self):
+        """A range starting after the cutoff touches the hot tier only."""
+        self.assertFalse(tiered_storage.reaches_cold_tier((datetime(2023, 3, 1), datetime(2023, 4, 1))))
+        self.assertTrue(tiered_storage.reaches_cold_tier((None, None)))
+
+    def test_02_statistic_avg_is_weighted(self):
+        """AVG across tiers equals the single-table AVG (weighted by row count)."""
+        self._compare({"query_type": "Statistic", "location_clause": BAY_OF_BENGAL,
+                       "metrics": ["temperature", "salinity"], "aggregation": "avg"})
+
+    def test_03_statistic_min_max_count(self):
+        """MIN, MAX and COUNT(DISTINCT) merge exactly."""
+        for aggregation in ("min", "max"):
+            self._compare({"query_type": "Statistic", "location_clause": BAY_OF_BENGAL,
+                           "metrics": ["temperature"], "aggregation": aggregation})
+        merged = self._compare({"query_type": "Statistic", "location_clause": BAY_OF_BENGAL,
+                                "aggregation": "count"})
+        self.assertEqual(int(merged.iloc[0, 0]), 6)
+
+    def test_04_row_queries(self):
+        """Trajectory, time series and proximity re-sort and re-limit the union."""
+        self._compare({"query_type": "Trajectory", "float_id": 2902292})
+        self._compare({"query_type": "Time-Series", "location_clause": BAY_OF_BENGAL,
+                       "metrics": ["temperature"], "limit": 40})
+        self._compare({"query_type": "Proximity", "latitude": 10.0, "longitude": 85.0,
+                       "distance_km": 800, "limit": 4, "time_constraint": "2022"})
+        self._compare({"query_type": "Scatter", "location_clause": BAY_OF_BENGAL,
+                       "metrics": ["temperature", "salinity"]})
+
+    def test_05_profile_keeps_latest(self):
+        """A float's latest profile comes from the hot tier, not the cold one."""
+        merged = self._compare({"query_type": "Profile", "float_id": 2902291})
+        self.assertTrue((pd.to_datetime(merged["timestamp"]) >= CUTOFF).all())
+
+    def test_06_profile_lookups_span_tiers(self):
+        """N most recent and closest-to-date profiles re-pick across the cutoff."""
+        merged = self._compare({"query_type": "Profile", "location_clause": BAY_OF_BENGAL,
+                                "time_constraint": "before 2023-01-04", "profile_count": 8})
+        self.assertEqual(len(merged[["float_id", "timestamp"]].drop_duplicates()), 8)
+        self.assertTrue((pd.to_datetime(merged["timestamp"]) >= CUTOFF).any())
+        merged = self._compare({"query_type": "Profile", "float_id": 2902293, "target_date": "2022-12-31"})
+        self.assertEqual(merged["timestamp"].nunique(), 1)
+
+    def test_07_scatter_density_statistics_span_tiers(self):
+        """Density cells from both tiers keep every row and the exact population fit."""
+        intent = {"query_type": "Scatter", "location_clause": BAY_OF_BENGAL,
+                  "metrics": ["temperature", "salinity"], "scatter_mode": "density"}
+        sql = sql_builder.build_query(intent, {"max_date_obj": datetime(2022, 12, 31)}, self.truth)
+        merged = tiered_storage.read_query(sql, self.hot, "Scatter", (None, None))
+        with self.truth.connect() as conn:
+            expected = pd.read_sql_query(text(sql), conn, params=sql.params)
+        self.assertEqual(int(merged["count"].sum()), int(expected["count"].sum()))
+        got, want = density.population_fit(merged), density.population_fit(expected)
+        for key in ("n", "r", "slope", "intercept"):
+            self.assertAlmostEqual(got[key], want[key], places=4, msg=key)
+        self.assertLessEqual(len(merged), sql.params["bins"] ** 2)
+
+    def test_08_time_series_buckets_split_by_the_cutoff_merge(self):
+        """A weekly bucket straddling the cutoff comes back once, with the all-rows mean."""
+        intent = {"query_type": "Time-Series", "location_clause": BAY_OF_BENGAL,
+                  "metrics": ["temperature", "salinity"], "time_constraint": "from 2022 to 2023"}
+        merged = self._compare(intent)
+        self.assertTrue(merged["day"].is_unique)
+        self.assertIn(pd.Timestamp("2022-12-26"), set(pd.to_datetime(merged["day"])))
+
+    def test_09_cold_failure_falls_back_to_the_hot_tier(self):
+        """An unreadable cold tier leaves Statistic and Time-Series answers hot-only instead of failing."""
+        sql = sql_builder.build_query({"query_type": "Statistic", "location_clause": BAY_OF_BENGAL,
+                                       "metrics": ["temperature"], "aggregation": "avg"},
+                                      {"max_date_obj": datetime(2022, 12, 31)}, self.truth)
+        series = sql_builder.build_query({"query_type": "Time-Series", "location_clause": BAY_OF_BENGAL,
+                                          "metrics": ["temperature"], "time_constraint": "from 2022 to 2023"},
+                                         {"max_date_obj": datetime(2022, 12, 31)}, self.truth)
+        with mock.patch.object(tiered_storage, "_run_cold", side_effect=OSError("parquet gone")), \
+                self.assertLogs(level="ERROR"):
+            mean = tiered_storage.read_query(sql, self.hot, "Statistic", (None, None))
+            weeks = tiered_storage.read_query(series, self.hot, "Time-Series", (datetime(2022, 1, 1), None))
+        with self.hot.connect() as conn:
+            hot_mean = conn.execute(text(f'SELECT AVG("temperature") FROM argo_data WHERE {BAY_OF_BENGAL}')).scalar()
+        self.assertAlmostEqual(float(mean.iloc[0, 0]), float(hot_mean), places=6)
+        self.assertTrue((pd.to_datetime(weeks["day"]) >= pd.Timestamp("2022-12-26")).all())
+
+    def test_10_rewriting_a_month_replaces_its_partition(self):
+        """The same rows in any order get the same file name; different rows get another."""
+        month = _synthetic_rows()
+        month = month[month["timestamp"] < datetime(2021, 2, 1)].reset_index(drop=True)
+        with tempfile.TemporaryDirectory() as tmp:
+            cold_dir = Path(tmp)
+            first = write_partition(month, cold_dir, datetime(2021, 1, 1))
+            shuffled = write_partition(month.sample(frac=1, random_state=3).reset_index(drop=True),
+                                       cold_dir, datetime(2021, 1, 1))
+            self.assertEqual(first, shuffled)
+            self.assertEqual(len(list(first.parent.glob("*.parquet"))), 1)
+            fewer = write_partition(month.iloc[1:], cold_dir, datetime(2021, 1, 1))
+            self.assertNotEqual(fewer, first)
+
+    def test_11_proximity_ranks_each_floats_newest_position(self):
+        """A float that left the circle after the cutoff is dropped, not reported at its older cold position."""
+        rows = pd.DataFrame([(2903001, datetime(2022, 6, 1), 10.0, 85.05, 28.0, 34.0, 5.0),   # 5 km, cold
+                             (2903001, datetime(2023, 6, 1), 10.0, 88.00, 28.0, 34.0, 5.0),   # 329 km, hot
+                             (2903002, datetime(2023, 6, 1), 10.0, 85.90, 28.0, 34.0, 5.0)],  # 99 km, hot
+                            columns=["float_id", "timestamp", "latitude", "longitude",
+                                     "temperature", "salinity", "pressure"])
+        intent = {"query_type": "Proximity", "latitude": 10.0, "longitude": 85.0, "distance_km": 200, "limit": 1}
+        with tempfile.TemporaryDirectory() as tmp, mock.patch.dict(os.environ, {"COLD_TIER_DIR": f"{tmp}/cold"}):
+            hot = create_engine(f"duckdb:///{tmp}/hot.duckdb")
+            rows[rows["timestamp"] >= CUTOFF].to_sql("argo_data", hot, index=False)
+            cold = rows[rows["timestamp"] < CUTOFF].reset_index(drop=True)
+            write_partition(cold, Path(tmp) / "cold", datetime(2022, 6, 1))
+            write_manifest(Path(tmp) / "cold", {"cutoff": CUTOFF.isoformat(),
+                                                "min_timestamp": "2022-06-01T00:00:00", "rows": len(cold)})
+            sql = sql_builder.build_query(intent, {"max_date_obj": datetime(2023, 12, 31)}, hot)
+            merged = tiered_storage.read_query(sql, hot, "Proximity", (None, None))
+            with mock.patch.object(tiered_storage, "_run_cold", side_effect=OSError("parquet gone")), \
+                    self.assertLogs(level="ERROR"):
+                hot_only = tiered_storage.read_query(sql, hot, "Proximity", (None, None))
+            hot.dispose()
+        self.assertEqual(list(merged["float_id"]), [2903002])
+        self.assertEqual(list(hot_only["float_id"]), [2903002])
+        self.assertAlmostEqual(float(merged["distance_km"].iloc[0]), 97.6, delta=1.5)
+
+    def test_12_dataset_stats_rebuild_counts_both_tiers(self):
+        """Rebuilding dataset_stats after a move counts the cold rows and floats as well."""
+        import duckdb
+        import dataset_stats
+
+        class Cursor:
+            """psycopg2-style placeholders over a DuckDB connection."""
+            def __init__(self, con):
+                self.con = con
+
+            def execute(self, sql, params=()):
+                self.con.execute(sql.replace("%s", "?"), list(params))
+
+            def executemany(self, sql, rows):
+                self.con.executemany(sql.replace("%s", "?"), [list(r) for r in rows])
+
+            def fetchone(self):
+                return self.con.fetchone()
+
+        df = _synthetic_rows()
+        con = duckdb.connect()
+        con.register("hot_rows", df[df["timestamp"] >= CUTOFF])
+        con.execute("CREATE TABLE argo_data AS SELECT * FROM hot_rows")
+        dataset_stats.rebuild(Cursor(con))
+        scope, rows, floats, min_ts, max_ts, t_sum, t_count = con.execute(
+            "SELECT scope, total_rows, float_count, min_timestamp, max_timestamp, temperature_sum, temperature_count "
+            "FROM dataset_stats WHERE scope = 'global'").fetchone()
+        bay = con.execute("SELECT total_rows FROM dataset_stats WHERE scope = 'region:bay_of_bengal'").fetchone()[0]
+        con.close()
+        self.assertEqual((rows, floats, t_count), (len(df), 6, len(df)))
+        self.assertEqual((min_ts, max_ts), (df["timestamp"].min(), df["timestamp"].max()))
+        self.assertAlmostEqual(t_sum, df["temperature"].sum(), places=6)
+        lat_min, lat_max, lon_min, lon_max = dataset_stats.STATS_REGIONS["bay_of_bengal"]
+        self.assertEqual(bay, int((df["latitude"].between(lat_min, lat_max)
+                                   & df["longitude"].between(lon_min, lon_max)).sum()))
+
+
+if __name__ == "__main__":
+    unittest.main()
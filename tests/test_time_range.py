@@ -0,0 +1,104 @@
+"""
+FloatChart Time Ranges — Unit Tests
+===================================
+Checks the time-range grammar and that the predicates sql_builder emits
+from it are sargable: EXPLAIN shows an index range search (SQLite) and a
+scan-level filter DuckDB can prune row groups with.
+
+Run:
+    python -m pytest tests/test_time_range.py -v
+"""
+
+import os
+import sqlite3
+import sys
+import unittest
+from datetime import datetime
+
+import duckdb
+
+# ── Ensure ARGO_CHATBOT is on the path ────────────────────────────────────────
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "ARGO_CHATBOT"))
+
+import sql_builder
+from time_range import resolve
+
+ANCHOR = datetime(2024, 6, 30, 14, 0)
+
+
+def d(*args):
+    return datetime(*args)
+
+
+class TestTimeRange(unittest.TestCase):
+    """Grammar, half-open predicates and index usage."""
+
+    def test_01_grammar(self):
+        """Every supported form resolves to the expected [start, end)."""
+        cases = {
+            "2024": (d(2024, 1, 1), d(2025, 1, 1)),
+            "March 2024": (d(2024, 3, 1), d(2024, 4, 1)),
+            "2024-03-15": (d(2024, 3, 15), d(2024, 3, 16)),
+            "Q4 2023": (d(2023, 10, 1), d(2024, 1, 1)),
+            "second quarter of 2023": (d(2023, 4, 1), d(2023, 7, 1)),
+            "monsoon 2023": (d(2023, 6, 1), d(2023, 10, 1)),
+            "winter": (d(2024, 1, 1), d(2024, 3, 1)),
+            "post-monsoon 2022": (d(2022, 10, 1), d(2023, 1, 1)),
+            "from 2019 to 2022": (d(2019, 1, 1), d(2023, 1, 1)),
+            "2019-2022": (d(2019, 1, 1), d(2023, 1, 1)),
+            "March to May 2024": (d(2024, 3, 1), d(2024, 6, 1)),
+            "2024-01-05 to 2024-02-01": (d(2024, 1, 5), d(2024, 2, 2)),
+            "last 30 days": (d(2024, 6, 1), d(2024, 7, 1)),
+            "last 2 weeks": (d(2024, 6, 17), d(2024, 7, 1)),
+            "last 6 months": (d(2024, 1, 1), d(2024, 7, 1)),
+            "last month": (d(2024, 5, 1), d(2024, 6, 1)),
+            "last year": (d(2023, 1, 1), d(2024, 1, 1)),
+            "since 2020": (d(2020, 1, 1), None),
+            "before 2015": (None, d(2015, 1, 1)),
+            "december": (d(2023, 12, 1), d(2024, 1, 1)),
+            "sometime": (None, None),
+        }
+        for constraint, expected in cases.items():
+            self.assertEqual(resolve(constraint, ANCHOR), expected, constraint)
+
+    def test_02_clause_is_half_open_and_bound(self):
+        """The builder emits >= / < on the raw column, with bound dates."""
+        params = {}
+        clause = sql_builder._get_time_clause("March 2024", ANCHOR, params)
+        self.assertEqual(clause, '"timestamp" >= :start_date AND "timestamp" < :end_date')
+        self.assertEqual(params, {"start_date": d(2024, 3, 1), "end_date": d(2024, 4, 1)})
+        self.assertEqual(sql_builder._get_time_clause("since 2020", ANCHOR, {}), '"timestamp" >= :start_date')
+        self.assertNotIn("EXTRACT", sql_builder._get_time_clause("Q2 2023", ANCHOR))
+        self.assertEqual(sql_builder._get_time_clause("", ANCHOR), "1=1")
+
+    def test_03_explain_uses_timestamp_index(self):
+        """EXPLAIN shows a range search on a timestamp-leading index for every form."""
+        con = sqlite3.connect(":memory:")
+        con.execute("CREATE TABLE argo_data (float_id INTEGER, timestamp TEXT, latitude REAL, longitude REAL)")
+        con.execute("CREATE INDEX idx_argo_time_geo ON argo_data (timestamp, latitude, longitude)")
+        for constraint in ("March 2024", "Q1 2024", "monsoon 2023", "2019-2022", "last 30 days", "since 2020"):
+            params = {}
+            clause = sql_builder._get_time_clause(constraint, ANCHOR, params)
+            binds = {k: v.isoformat(" ") for k, v in params.items()}
+            plan = " ".join(row[3] for row in con.execute(
+                f"EXPLAIN QUERY PLAN SELECT latitude, longitude FROM argo_data WHERE {clause}", binds))
+            self.assertIn("SEARCH argo_data USING COVERING INDEX idx_argo_time_geo (timestamp>", plan, constraint)
+        con.close()
+
+    def test_04_duckdb_pushes_filter_into_scan(self):
+        """DuckDB evaluates the range inside the scan (zone-map prunable), not as a FILTER."""
+        con = duckdb.connect()
+        con.execute("CREATE TABLE argo_data AS SELECT TIMESTAMP '2020-01-01' + INTERVAL 1 HOUR * range AS timestamp FROM range(50000)")
+        params = {}
+        clause = sql_builder._get_time_clause("Q1 2021", ANCHOR, params)
+        duck_sql = sql_builder.BIND_RE.sub(lambda m: "$" + m.group(1), f"SELECT COUNT(*) FROM argo_data WHERE {clause}")
+        plan = con.execute("EXPLAIN " + duck_sql, params).fetchall()[0][1]
+        self.assertIn("SEQ_SCAN", plan)
+        self.assertNotIn("FILTER", plan)
+        # Half-open: the last hour of the quarter is included, the first of Q2 is not
+        self.assertEqual(con.execute(duck_sql, params).fetchone()[0], 90 * 24)
+        con.close()
+
+
+if __name__ == "__main__":
+    unittest.main()